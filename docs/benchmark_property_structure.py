@@ -0,0 +1,373 @@
+"""
+Benchmark suite for the Property Structure Excel tooling
+Runs every registered case (template generation and stamping, the Unit sheet
+builder, validation, integrity check, bulk load) at growing row counts and
+records wall time, peak Python memory (tracemalloc) and output file size. Results
+are written as JSON and compared against a stored baseline; any case that
+got slower, bigger or hungrier than the tolerance allows is reported and
+the run exits with status 1. So does a case or size the baseline has no
+entry for, and a missing baseline file exits with status 2, unless
+--allow-missing-baseline is given (for new cases or local experiments).
+The baseline for the default sizes is committed under benchmarks/.
+
+Peak memory and file size depend only on the code and library versions,
+so they are always compared. Wall time depends on the machine: it is
+only compared when the baseline was recorded in the same environment
+(versions, platform and CPU count); otherwise the timing changes are
+listed for information and do not fail the run.
+
+Wall time and peak memory come from separate runs because tracemalloc
+slows allocation-heavy code down several times. Wall time is the fastest of
+--repeat runs (default 3), which filters out most scheduler noise. Sizes are numbers of units;
+each unit also gets one specification row, and floors/buildings scale with
+them (10 units per floor, 10 floors per building).
+
+New read, validation or loading paths only need a function decorated with
+@benchmark("name"); it receives the row count and a Fixture and returns the
+path of the file it wrote (for the size column) or None.
+
+Usage:
+    python benchmark_property_structure.py [--sizes 1000 10000] [--cases generate validate]
+        [--output results.json] [--baseline baseline.json] [--save-baseline] [--tolerance 0.25] [--repeat 3]
+        [--allow-missing-baseline]
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+import tracemalloc
+from dataclasses import dataclass
+
+import openpyxl
+
+from create_property_structure_excel import LookupLists, create_excel_template, register_styles, render_sheet
+from property_structure_integrity import check_integrity
+from property_structure_loader import create_sqlite_schema, load_workbook
+from property_structure_schema import SHEETS_BY_TITLE
+from property_structure_stamp import stamp_template
+from validate_property_structure import COMPACT_ENGINE, validate_workbook
+
+SIZES = (1000, 10000, 100000, 1000000)
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmarks", "property_structure_baseline.json")
+
+# Allowed growth over the baseline before a case counts as a regression
+DEFAULT_TOLERANCE = 0.25
+# Timed runs per case; the fastest counts
+DEFAULT_REPEAT = 3
+# Differences below these are noise whatever the ratio
+MIN_SECONDS_DELTA = 0.05
+MIN_BYTES_DELTA = 64 * 1024
+
+UNITS_PER_FLOOR = 10
+FLOORS_PER_BUILDING = 10
+
+
+def synthetic_data(units):
+    """Template rows for one ownership with ``units`` units, generated lazily"""
+    per_building = UNITS_PER_FLOOR * FLOORS_PER_BUILDING
+    buildings = (units + per_building - 1) // per_building
+
+    def building_rows():
+        for b in range(buildings):
+            yield {
+                "id": b + 1, "portfolio_id": 1, "ownership_id": 1, "name": f"Building {b + 1}",
+                "code": f"B{b + 1:05d}", "type": "residential", "city": "Riyadh",
+                "latitude": 24.7136, "longitude": 46.6753, "floors": FLOORS_PER_BUILDING,
+            }
+
+    def floor_rows():
+        for b in range(buildings):
+            for f in range(FLOORS_PER_BUILDING):
+                yield {"id": b * FLOORS_PER_BUILDING + f + 1, "building_id": b + 1, "number": f + 1}
+
+    def unit_rows():
+        for i in range(units):
+            b, f = divmod(i // UNITS_PER_FLOOR, FLOORS_PER_BUILDING)
+            yield {
+                "id": i + 1, "building_id": b + 1, "floor_id": b * FLOORS_PER_BUILDING + f + 1, "ownership_id": 1,
+                "number": f"{f + 1}{i % UNITS_PER_FLOOR:02d}", "type": "apartment", "area": 120.5,
+                "price_monthly": 4500, "price_yearly": 50000, "status": "available", "active": True,
+            }
+
+    def specification_rows():
+        for i in range(units):
+            yield {"unit_id": i + 1, "key": "bedrooms", "value": 2 + i % 3, "type": "integer"}
+
+    return {
+        "Ownership": [{
+            "id": 1, "name": "Benchmark Ownership", "type": "company",
+            "ownership_type": "real_estate", "city": "Riyadh", "active": True,
+        }],
+        "Portfolio": [{"id": 1, "ownership_id": 1, "name": "Main", "code": "PF-1", "active": True}],
+        "PortfolioLocation": [{"id": 1, "portfolio_id": 1, "city": "Riyadh", "primary": True}],
+        "Building": building_rows(),
+        "BuildingFloor": floor_rows(),
+        "Unit": unit_rows(),
+        "UnitSpecification": specification_rows(),
+    }
+
+
+@dataclass
+class Benchmark:
+    name: str
+    run: object
+    # Cases that read a filled workbook need the generated fixture
+    needs_workbook: bool = True
+
+
+BENCHMARKS = {}
+
+
+def benchmark(name, needs_workbook=True):
+    """Register a benchmark case: fn(rows, fixture) -> written file path or None"""
+    def register(fn):
+        BENCHMARKS[name] = Benchmark(name, fn, needs_workbook)
+        return fn
+    return register
+
+
+class Fixture:
+    """Per-size working directory with a lazily generated filled workbook"""
+
+    def __init__(self, rows, directory):
+        self.rows = rows
+        self.directory = directory
+        self._workbook = None
+
+    def path(self, name):
+        return os.path.join(self.directory, name)
+
+    @property
+    def workbook(self):
+        if self._workbook is None:
+            self._workbook = self.path("fixture.xlsx")
+            with contextlib.redirect_stdout(io.StringIO()):
+                create_excel_template(self._workbook, synthetic_data(self.rows))
+        return self._workbook
+
+
+@benchmark("generate", needs_workbook=False)
+def bench_generate(rows, fixture):
+    path = fixture.path("generate.xlsx")
+    with contextlib.redirect_stdout(io.StringIO()):
+        create_excel_template(path, synthetic_data(rows))
+    return path
+
+
+@benchmark("stamp", needs_workbook=False)
+def bench_stamp(rows, fixture):
+    path = fixture.path("stamp.xlsx")
+    stamp_template(path, synthetic_data(rows))
+    return path
+
+
+@benchmark("render_unit_sheet", needs_workbook=False)
+def bench_render_unit_sheet(rows, fixture):
+    path = fixture.path("unit_sheet.xlsx")
+    wb = openpyxl.Workbook(write_only=True)
+    register_styles(wb)
+    lookups = LookupLists()
+    render_sheet(wb, SHEETS_BY_TITLE["Unit"], lookups, synthetic_data(rows)["Unit"])
+    lookups.write(wb)
+    wb.save(path)
+    return path
+
+
+@benchmark("validate")
+def bench_validate(rows, fixture):
+    report = validate_workbook(fixture.workbook)
+    if not report["valid"]:
+        raise AssertionError(f"fixture failed validation: {report['errors'][:3]}")
+
+
+@benchmark("validate_compact")
+def bench_validate_compact(rows, fixture):
+    report = validate_workbook(fixture.workbook, engine=COMPACT_ENGINE)
+    if not report["valid"]:
+        raise AssertionError(f"fixture failed validation: {report['errors'][:3]}")
+
+
+@benchmark("integrity")
+def bench_integrity(rows, fixture):
+    report = check_integrity(fixture.workbook)
+    if not report["valid"]:
+        raise AssertionError(f"fixture failed integrity check: {report['errors'][:3]}")
+
+
+@benchmark("load")
+def bench_load(rows, fixture):
+    path = fixture.path("load.db")
+    if os.path.exists(path):
+        os.remove(path)
+    conn = sqlite3.connect(path)
+    try:
+        create_sqlite_schema(conn)
+        load_workbook(fixture.workbook, conn, check=False)
+    finally:
+        conn.close()
+    return path
+
+
+def measure(case, rows, fixture, memory=True, repeat=DEFAULT_REPEAT):
+    """Run a case ``repeat`` times for its best wall time, then again under tracemalloc for peak memory"""
+    seconds = None
+    for _ in range(max(1, repeat)):
+        started = time.perf_counter()
+        output = case.run(rows, fixture)
+        elapsed = time.perf_counter() - started
+        seconds = elapsed if seconds is None else min(seconds, elapsed)
+    result = {
+        "case": case.name,
+        "rows": rows,
+        "seconds": round(seconds, 3),
+        "rows_per_second": round(rows / seconds) if seconds else None,
+        "file_bytes": os.path.getsize(output) if output and os.path.exists(output) else None,
+        "peak_bytes": None,
+    }
+    if memory:
+        tracemalloc.start()
+        try:
+            case.run(rows, fixture)
+            result["peak_bytes"] = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return result
+
+
+def environment():
+    return {
+        "python": platform.python_version(),
+        "openpyxl": openpyxl.__version__,
+        "sqlite": sqlite3.sqlite_version,
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def run_suite(sizes=SIZES, cases=None, memory=True, repeat=DEFAULT_REPEAT, log=print):
+    """Run the selected cases at every size; returns the results document"""
+    selected = [BENCHMARKS[name] for name in (cases or BENCHMARKS)]
+    results = []
+    for rows in sizes:
+        directory = tempfile.mkdtemp(prefix=f"ps-bench-{rows}-")
+        try:
+            fixture = Fixture(rows, directory)
+            if any(case.needs_workbook for case in selected):
+                fixture.workbook
+            for case in selected:
+                result = measure(case, rows, fixture, memory, repeat)
+                results.append(result)
+                log(_format_result(result))
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+    return {"environment": environment(), "results": results}
+
+
+def compare(results, baseline, tolerance=DEFAULT_TOLERANCE, timings=True):
+    """List the results that grew past the tolerance over the baseline
+
+    Each entry carries ``informational``: set for wall-time changes when
+    ``timings`` is false (baseline from another environment), which are
+    reported but are not regressions.
+    """
+    previous = {(item["case"], item["rows"]): item for item in baseline.get("results", ())}
+    changes = []
+    for item in results["results"]:
+        before = previous.get((item["case"], item["rows"]))
+        if before is None:
+            continue
+        for metric, min_delta in (("seconds", MIN_SECONDS_DELTA), ("peak_bytes", MIN_BYTES_DELTA), ("file_bytes", MIN_BYTES_DELTA)):
+            old, new = before.get(metric), item.get(metric)
+            if old is None or new is None:
+                continue
+            if new > old * (1 + tolerance) and new - old > min_delta:
+                changes.append({
+                    "case": item["case"], "rows": item["rows"], "metric": metric,
+                    "baseline": old, "current": new, "change": round(new / old - 1, 3) if old else None,
+                    "informational": metric == "seconds" and not timings,
+                })
+    return changes
+
+
+def missing_from_baseline(results, baseline):
+    """List the (case, rows) pairs of the results that the baseline has no entry for"""
+    recorded = {(item["case"], item["rows"]) for item in baseline.get("results", ())}
+    return [(item["case"], item["rows"]) for item in results["results"] if (item["case"], item["rows"]) not in recorded]
+
+
+def _format_result(result):
+    peak = f"{result['peak_bytes'] / 1048576:.1f} MiB peak" if result["peak_bytes"] is not None else "peak n/a"
+    size = f", {result['file_bytes'] / 1048576:.2f} MiB file" if result["file_bytes"] is not None else ""
+    return f"{result['case']:<18} {result['rows']:>9} rows  {result['seconds']:>8.2f}s  {peak}{size}"
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark the Property Structure Excel tooling")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(SIZES), help="Unit counts to run")
+    parser.add_argument("--cases", nargs="+", choices=sorted(BENCHMARKS), help="Cases to run (default: all)")
+    parser.add_argument("--output", help="Write the results JSON to this file")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="Baseline JSON to compare against")
+    parser.add_argument("--save-baseline", action="store_true", help="Store these results as the new baseline")
+    parser.add_argument(
+        "--tolerance", type=float, default=DEFAULT_TOLERANCE,
+        help=f"Allowed growth over the baseline (default: {DEFAULT_TOLERANCE})",
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=DEFAULT_REPEAT,
+        help=f"Timed runs per case; the fastest is recorded (default: {DEFAULT_REPEAT})",
+    )
+    parser.add_argument("--no-memory", action="store_true", help="Skip the tracemalloc run")
+    parser.add_argument(
+        "--allow-missing-baseline", action="store_true",
+        help="Do not fail when the baseline file, or its entry for a case and size, is missing",
+    )
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    # Checked before the (long) run rather than after it
+    if not args.save_baseline and not os.path.exists(args.baseline) and not args.allow_missing_baseline:
+        print(f"error: no baseline at {args.baseline}; run with --save-baseline to create one", file=sys.stderr)
+        sys.exit(2)
+    results = run_suite(args.sizes, args.cases, memory=not args.no_memory, repeat=args.repeat)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as handle:
+            json.dump(results, handle, indent=2)
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(args.baseline) or ".", exist_ok=True)
+        with open(args.baseline, "w", encoding="utf-8") as handle:
+            json.dump(results, handle, indent=2)
+        print(f"Baseline saved: {args.baseline}")
+        sys.exit(0)
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as handle:
+            baseline = json.load(handle)
+    same_environment = baseline.get("environment") == results["environment"]
+    if baseline and not same_environment:
+        print("note: baseline was recorded on a different environment; wall times are not compared")
+    changes = compare(results, baseline, args.tolerance, timings=same_environment)
+    regressions = [item for item in changes if not item["informational"]]
+    for item in changes:
+        print(
+            f"{'info' if item['informational'] else 'REGRESSION'} {item['case']} @ {item['rows']} rows: "
+            f"{item['metric']} {item['baseline']} -> {item['current']} (+{item['change']:.0%})"
+        )
+    missing = missing_from_baseline(results, baseline)
+    for case, rows in missing:
+        print(f"{'warning' if args.allow_missing_baseline else 'MISSING'}: no baseline for {case} @ {rows} rows")
+    print(f"{len(regressions)} regressions, {len(missing)} cases missing from {args.baseline}")
+    failed = regressions or (missing and not args.allow_missing_baseline)
+    sys.exit(1 if failed else 0)
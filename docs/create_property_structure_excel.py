@@ -1,17 +1,42 @@
 """
 Script to create an advanced Excel template for Property Structure data import
 This script creates a comprehensive Excel file with all fields needed for importing ownership data
+
+Run without arguments to build the empty template with example rows, or pass
+--data-dir to export existing records into the same template. Exports use
+openpyxl's write-only mode so memory stays flat regardless of the row count.
+
+Dropdowns read their values from a hidden Lists sheet through named ranges,
+so they are not bound by Excel's 255-character limit on inline lists. In
+exports, reference columns list the parent sheet's ids and the Unit floor
+dropdown only offers the floors of the row's building. A sheet can take at
+most MAX_EXPORT_ROWS data rows, since its dropdowns must end by the last
+worksheet row; larger exports raise TemplateError (use a columnar bundle).
 """
 
+import argparse
+import json
+import os
+from itertools import zip_longest
+
 import openpyxl
-from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
-from openpyxl.utils import get_column_letter
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font, PatternFill, Alignment, Border, Side, NamedStyle
+from openpyxl.styles.fonts import DEFAULT_FONT
+from openpyxl.utils import get_column_letter, quote_sheetname
+from openpyxl.workbook.defined_name import DefinedName
 from openpyxl.worksheet.datavalidation import DataValidation
 from datetime import datetime
 
+from property_structure_instrumentation import add_arguments as add_instrumentation_arguments
+from property_structure_instrumentation import current as instrumentation
+from property_structure_instrumentation import instrumented_from_args
+from property_structure_schema import CONSISTENT_REFERENCES, FIRST_DATA_ROW, MAX_ROW, RELATIONSHIPS, SHEETS
+
 # Colors
 HEADER_FILL = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
 HEADER_FONT = Font(color="FFFFFF", bold=True, size=11)
+REQUIRED_HEADER_FILL = PatternFill(start_color="E67E22", end_color="E67E22", fill_type="solid")
 REQUIRED_FILL = PatternFill(start_color="FFE699", end_color="FFE699", fill_type="solid")
 OPTIONAL_FILL = PatternFill(start_color="E7E6E6", end_color="E7E6E6", fill_type="solid")
 EXAMPLE_FILL = PatternFill(start_color="D9E1F2", end_color="D9E1F2", fill_type="solid")
@@ -22,568 +47,427 @@ BORDER = Border(
     bottom=Side(style='thin')
 )
 
-def create_excel_template():
-    """Create the Excel template file"""
-    wb = openpyxl.Workbook()
-    
+# Dropdowns of the empty template cover this many rows
+DEFAULT_LAST_ROW = 1000
+# Exports keep dropdowns on this many empty rows below the data for new records
+EXPORT_EXTRA_ROWS = 500
+# Data rows an exported sheet can hold with its dropdowns still ending by MAX_ROW
+MAX_EXPORT_ROWS = MAX_ROW - (FIRST_DATA_ROW - 1) - EXPORT_EXTRA_ROWS
+
+# Hidden sheet holding the dropdown values
+LOOKUP_SHEET = "Lists"
+
+INSTRUCTIONS = [
+    ["Property Structure Import Template - Instructions"],
+    [],
+    ["IMPORTANT NOTES:"],
+    ["1. Fill data starting from row 2 (row 1 contains headers)"],
+    ["2. Required fields are marked with yellow background"],
+    ["3. Optional fields are marked with gray background"],
+    ["4. Example rows are provided in blue background - DELETE before import"],
+    ["5. Use exact values for dropdown fields"],
+    ["6. Maintain referential integrity (IDs must exist in parent sheets)"],
+    ["7. Dropdown values come from the hidden 'Lists' sheet - do not delete or rename it"],
+    [],
+    ["SHEET ORDER (Fill in this order):"],
+    ["1. Ownership - First create ownership records"],
+    ["2. Portfolio - Link to ownership"],
+    ["3. PortfolioLocation - Link to portfolio"],
+    ["4. Building - Link to portfolio and ownership"],
+    ["5. BuildingFloor - Link to building"],
+    ["6. Unit - Link to building, floor, and ownership"],
+    ["7. UnitSpecification - Link to unit"],
+    [],
+    ["FIELD TYPES:"],
+    ["- Text: Enter text values"],
+    ["- Number: Enter numeric values"],
+    ["- Boolean: Enter 'true' or 'false' (lowercase)"],
+    ["- Date: Use format YYYY-MM-DD"],
+    ["- Decimal: Use dot (.) as decimal separator"],
+    [],
+    ["VALIDATION RULES:"],
+    ["- Ownership: name, type, ownership_type, city are required"],
+    ["- Portfolio: name, code are required (code must be unique per ownership)"],
+    ["- Building: name, code, type, portfolio_id are required"],
+    ["- BuildingFloor: building_id, number are required (number unique per building)"],
+    ["- Unit: building_id, number, type, area are required"],
+    ["- UnitSpecification: unit_id, key are required"],
+    [],
+    ["RELATIONSHIPS:"],
+    ["- Portfolio.ownership_id → Ownership.id"],
+    ["- PortfolioLocation.portfolio_id → Portfolio.id"],
+    ["- Building.portfolio_id → Portfolio.id"],
+    ["- Building.ownership_id → Ownership.id"],
+    ["- BuildingFloor.building_id → Building.id"],
+    ["- Unit.building_id → Building.id"],
+    ["- Unit.floor_id → BuildingFloor.id"],
+    ["- Unit.ownership_id → Ownership.id"],
+    ["- UnitSpecification.unit_id → Unit.id"],
+]
+
+# Named styles registered once per workbook; cells only reference them by name
+HEADER_STYLE = "PS Header"
+REQUIRED_HEADER_STYLE = "PS Required Header"
+REQUIRED_DESCRIPTION_STYLE = "PS Required Description"
+OPTIONAL_DESCRIPTION_STYLE = "PS Optional Description"
+EXAMPLE_STYLE = "PS Example"
+TITLE_STYLE = "PS Title"
+SECTION_STYLE = "PS Section"
+
+def build_named_styles():
+    """Build the named styles used by the template"""
+    header_alignment = Alignment(horizontal="center", vertical="center", wrap_text=True)
+    description_alignment = Alignment(horizontal="left", vertical="top", wrap_text=True)
+    description_font = Font(size=9, italic=True)
+    return [
+        NamedStyle(name=HEADER_STYLE, font=HEADER_FONT, fill=HEADER_FILL, alignment=header_alignment, border=BORDER),
+        NamedStyle(
+            name=REQUIRED_HEADER_STYLE, font=HEADER_FONT, fill=REQUIRED_HEADER_FILL,
+            alignment=header_alignment, border=BORDER,
+        ),
+        NamedStyle(
+            name=REQUIRED_DESCRIPTION_STYLE, font=description_font, fill=REQUIRED_FILL,
+            alignment=description_alignment, border=BORDER,
+        ),
+        NamedStyle(
+            name=OPTIONAL_DESCRIPTION_STYLE, font=description_font, fill=OPTIONAL_FILL,
+            alignment=description_alignment, border=BORDER,
+        ),
+        NamedStyle(name=EXAMPLE_STYLE, font=DEFAULT_FONT, fill=EXAMPLE_FILL, border=BORDER),
+        NamedStyle(name=TITLE_STYLE, font=Font(bold=True, size=14, color="366092")),
+        NamedStyle(name=SECTION_STYLE, font=Font(bold=True, size=11)),
+    ]
+
+def register_styles(wb):
+    """Register the template's named styles on the workbook (once)"""
+    for style in build_named_styles():
+        if style.name not in wb.named_styles:
+            wb.add_named_style(style)
+
+class TemplateError(Exception):
+    """The data does not fit in the template"""
+
+
+def row_limit_message(title, count=None):
+    """Explain that a sheet has more rows than MAX_EXPORT_ROWS (``count`` when known)"""
+    rows = f"{count} rows" if count is not None else f"more than {MAX_EXPORT_ROWS} rows"
+    return (
+        f"{title} has {rows}; a template sheet takes at most {MAX_EXPORT_ROWS} so that its header, description "
+        f"and {EXPORT_EXTRA_ROWS} blank rows fit within row {MAX_ROW}. Export a columnar bundle instead"
+    )
+
+
+def check_row_limits(data):
+    """Raise TemplateError if a sheet of ``data`` with a known length has more than MAX_EXPORT_ROWS rows"""
+    for schema in SHEETS:
+        rows = data.get(schema.title)
+        if hasattr(rows, "__len__") and len(rows) > MAX_EXPORT_ROWS:
+            raise TemplateError(row_limit_message(schema.title, len(rows)))
+
+
+def create_excel_template(filename=None, data=None):
+    """Create the Excel template file
+
+    When ``data`` is given it maps sheet titles to iterables of rows and the
+    workbook is streamed with write-only mode instead of being built in memory.
+    Sheets missing from ``data`` are left without rows: the example rows
+    reference ids 1, 2, ... which would attach them to real records.
+    """
+    if filename is None:
+        filename = f"Property_Structure_Import_Template_{datetime.now().strftime('%Y%m%d')}.xlsx"
+
+    metrics = instrumentation()
+    with metrics.span("generate", file=str(filename), write_only=data is not None):
+        wb = build_workbook(data)
+
+        # Save file
+        with metrics.span("save"):
+            wb.save(filename)
+    print(f"Excel template created successfully: {filename}")
+    return filename
+
+def build_workbook(data=None, lookups=None):
+    """Render every sheet into a new, unsaved workbook
+
+    ``data`` is interpreted as in :func:`create_excel_template`. ``lookups``
+    lets a caller keep the dropdown sources (or pre-seed grouped lists) of
+    the rendered workbook.
+    """
+    if data is not None:
+        check_row_limits(data)
+    metrics = instrumentation()
+    wb = openpyxl.Workbook(write_only=data is not None)
+
     # Remove default sheet
     if 'Sheet' in wb.sheetnames:
         wb.remove(wb['Sheet'])
-    
+
+    with metrics.span("style"):
+        register_styles(wb)
+
     # Create sheets
     create_instructions_sheet(wb)
-    create_ownership_sheet(wb)
-    create_portfolio_sheet(wb)
-    create_portfolio_location_sheet(wb)
-    create_building_sheet(wb)
-    create_building_floor_sheet(wb)
-    create_unit_sheet(wb)
-    create_unit_specification_sheet(wb)
-    
-    # Save file
-    filename = f"Property_Structure_Import_Template_{datetime.now().strftime('%Y%m%d')}.xlsx"
-    wb.save(filename)
-    print(f"Excel template created successfully: {filename}")
-    return filename
+    if lookups is None:
+        lookups = LookupLists()
+    for schema in SHEETS:
+        rows = None
+        if data is not None:
+            rows = data.get(schema.title)
+            rows = rows if rows is not None else ()
+        render_sheet(wb, schema, lookups, rows)
+    with metrics.span("lookups"):
+        lookups.write(wb)
+    return wb
 
 def create_instructions_sheet(wb):
     """Create instructions sheet"""
-    ws = wb.create_sheet("Instructions", 0)
-    
-    instructions = [
-        ["Property Structure Import Template - Instructions"],
-        [""],
-        ["IMPORTANT NOTES:"],
-        ["1. Fill data starting from row 2 (row 1 contains headers)"],
-        ["2. Required fields are marked with yellow background"],
-        ["3. Optional fields are marked with gray background"],
-        ["4. Example rows are provided in blue background - DELETE before import"],
-        ["5. Use exact values for dropdown fields"],
-        ["6. Maintain referential integrity (IDs must exist in parent sheets)"],
-        [""],
-        ["SHEET ORDER (Fill in this order):"],
-        ["1. Ownership - First create ownership records"],
-        ["2. Portfolio - Link to ownership"],
-        ["3. PortfolioLocation - Link to portfolio"],
-        ["4. Building - Link to portfolio and ownership"],
-        ["5. BuildingFloor - Link to building"],
-        ["6. Unit - Link to building, floor, and ownership"],
-        ["7. UnitSpecification - Link to unit"],
-        [""],
-        ["FIELD TYPES:"],
-        ["- Text: Enter text values"],
-        ["- Number: Enter numeric values"],
-        ["- Boolean: Enter 'true' or 'false' (lowercase)"],
-        ["- Date: Use format YYYY-MM-DD"],
-        ["- Decimal: Use dot (.) as decimal separator"],
-        [""],
-        ["VALIDATION RULES:"],
-        ["- Ownership: name, type, ownership_type, city are required"],
-        ["- Portfolio: name, code are required (code must be unique per ownership)"],
-        ["- Building: name, code, type, portfolio_id are required"],
-        ["- BuildingFloor: building_id, number are required (number unique per building)"],
-        ["- Unit: building_id, number, type, area are required"],
-        ["- UnitSpecification: unit_id, key are required"],
-        [""],
-        ["RELATIONSHIPS:"],
-        ["- Portfolio.ownership_id → Ownership.id"],
-        ["- PortfolioLocation.portfolio_id → Portfolio.id"],
-        ["- Building.portfolio_id → Portfolio.id"],
-        ["- Building.ownership_id → Ownership.id"],
-        ["- BuildingFloor.building_id → Building.id"],
-        ["- Unit.building_id → Building.id"],
-        ["- Unit.floor_id → BuildingFloor.id"],
-        ["- Unit.ownership_id → Ownership.id"],
-        ["- UnitSpecification.unit_id → Unit.id"],
-    ]
-    
-    for row_idx, row_data in enumerate(instructions, start=1):
-        for col_idx, value in enumerate(row_data, start=1):
-            cell = ws.cell(row=row_idx, column=col_idx, value=value)
-            if row_idx == 1:
-                cell.font = Font(bold=True, size=14, color="366092")
-            elif value and value.isupper() and ":" in value:
-                cell.font = Font(bold=True, size=11)
-    
+    ws = wb.create_sheet("Instructions")
+
     # Auto-adjust column width
     ws.column_dimensions['A'].width = 80
 
-def create_ownership_sheet(wb):
-    """Create Ownership sheet"""
-    ws = wb.create_sheet("Ownership")
-    
-    headers = [
-        ("id", "Auto-generated ID (leave empty)", False),
-        ("name", "Ownership name (e.g., 'Al-Rashid Real Estate Company')", True),
-        ("legal", "Legal/registered name", False),
-        ("type", "Ownership type (company, individual, government, etc.)", True),
-        ("ownership_type", "Category (real_estate, investment, etc.)", True),
-        ("registration", "Registration number (unique)", False),
-        ("tax_id", "Tax identification number", False),
-        ("street", "Street address", False),
-        ("city", "City name", True),
-        ("state", "State/Province", False),
-        ("country", "Country (default: Saudi Arabia)", False),
-        ("zip_code", "Postal/ZIP code", False),
-        ("email", "Contact email", False),
-        ("phone", "Contact phone", False),
-        ("active", "Active status (true/false, default: true)", False),
-    ]
-    
-    # Write headers
-    for col_idx, (header, description, required) in enumerate(headers, start=1):
-        cell = ws.cell(row=1, column=col_idx, value=header)
-        cell.fill = HEADER_FILL if not required else PatternFill(start_color="E67E22", end_color="E67E22", fill_type="solid")
-        cell.font = HEADER_FONT
-        cell.alignment = Alignment(horizontal="center", vertical="center", wrap_text=True)
-        cell.border = BORDER
-        
-        # Add description in row 2
-        desc_cell = ws.cell(row=2, column=col_idx, value=description)
-        desc_cell.fill = REQUIRED_FILL if required else OPTIONAL_FILL
-        desc_cell.font = Font(size=9, italic=True)
-        desc_cell.alignment = Alignment(horizontal="left", vertical="top", wrap_text=True)
-        desc_cell.border = BORDER
-    
-    # Example data
-    example_row = [
-        "",  # id
-        "شركة الراشد العقارية",  # name
-        "شركة الراشد العقارية المساهمة",  # legal
-        "company",  # type
-        "real_estate",  # ownership_type
-        "CR-1234567890",  # registration
-        "310123456700003",  # tax_id
-        "طريق الملك فهد، 123",  # street
-        "الرياض",  # city
-        "منطقة الرياض",  # state
-        "Saudi Arabia",  # country
-        "12345",  # zip_code
-        "info@alrashid.com",  # email
-        "+966501234567",  # phone
-        "true",  # active
-    ]
-    
-    for col_idx, value in enumerate(example_row, start=1):
-        cell = ws.cell(row=3, column=col_idx, value=value)
-        cell.fill = EXAMPLE_FILL
-        cell.border = BORDER
-    
-    # Add data validation for type
-    type_validation = DataValidation(type="list", formula1='"company,individual,government,organization,other"')
-    ws.add_data_validation(type_validation)
-    type_validation.add(f"C3:C1000")
-    
-    # Add data validation for ownership_type
-    ownership_type_validation = DataValidation(type="list", formula1='"real_estate,investment,development,management,other"')
-    ws.add_data_validation(ownership_type_validation)
-    ownership_type_validation.add(f"E3:E1000")
-    
-    # Add data validation for active
-    active_validation = DataValidation(type="list", formula1='"true,false"')
-    ws.add_data_validation(active_validation)
-    active_validation.add(f"O3:O1000")
-    
-    # Freeze panes
-    ws.freeze_panes = "A3"
-    
-    # Auto-adjust column widths
-    for col_idx in range(1, len(headers) + 1):
-        ws.column_dimensions[get_column_letter(col_idx)].width = 20
-
-def create_portfolio_sheet(wb):
-    """Create Portfolio sheet"""
-    ws = wb.create_sheet("Portfolio")
-    
-    headers = [
-        ("id", "Auto-generated ID (leave empty)", False),
-        ("ownership_id", "Ownership ID (reference to Ownership.id)", True),
-        ("parent_id", "Parent Portfolio ID (for nested portfolios, leave empty if root)", False),
-        ("name", "Portfolio name", True),
-        ("code", "Portfolio code (unique per ownership)", True),
-        ("type", "Portfolio type (general, residential, commercial, mixed, industrial)", False),
-        ("description", "Portfolio description", False),
-        ("area", "Total area in square meters (decimal)", False),
-        ("active", "Active status (true/false, default: true)", False),
-    ]
-    
-    # Write headers
-    for col_idx, (header, description, required) in enumerate(headers, start=1):
-        cell = ws.cell(row=1, column=col_idx, value=header)
-        cell.fill = HEADER_FILL if not required else PatternFill(start_color="E67E22", end_color="E67E22", fill_type="solid")
-        cell.font = HEADER_FONT
-        cell.alignment = Alignment(horizontal="center", vertical="center", wrap_text=True)
-        cell.border = BORDER
-        
-        desc_cell = ws.cell(row=2, column=col_idx, value=description)
-        desc_cell.fill = REQUIRED_FILL if required else OPTIONAL_FILL
-        desc_cell.font = Font(size=9, italic=True)
-        desc_cell.alignment = Alignment(horizontal="left", vertical="top", wrap_text=True)
-        desc_cell.border = BORDER
-    
-    # Example data
-    example_row = [
-        "",  # id
-        "1",  # ownership_id
-        "",  # parent_id (empty for root)
-        "المشاريع السكنية في الرياض",  # name
-        "PORT-001-01",  # code
-        "residential",  # type
-        "محفظة المشاريع السكنية في منطقة الرياض",  # description
-        "25000.50",  # area
-        "true",  # active
-    ]
-    
-    for col_idx, value in enumerate(example_row, start=1):
-        cell = ws.cell(row=3, column=col_idx, value=value)
-        cell.fill = EXAMPLE_FILL
-        cell.border = BORDER
-    
-    # Add data validation
-    type_validation = DataValidation(type="list", formula1='"general,residential,commercial,mixed,industrial"')
-    ws.add_data_validation(type_validation)
-    type_validation.add(f"F3:F1000")
-    
-    active_validation = DataValidation(type="list", formula1='"true,false"')
-    ws.add_data_validation(active_validation)
-    active_validation.add(f"I3:I1000")
-    
-    ws.freeze_panes = "A3"
-    
-    for col_idx in range(1, len(headers) + 1):
-        ws.column_dimensions[get_column_letter(col_idx)].width = 25
-
-def create_portfolio_location_sheet(wb):
-    """Create PortfolioLocation sheet"""
-    ws = wb.create_sheet("PortfolioLocation")
-    
-    headers = [
-        ("id", "Auto-generated ID (leave empty)", False),
-        ("portfolio_id", "Portfolio ID (reference to Portfolio.id)", True),
-        ("street", "Street address", False),
-        ("city", "City name", False),
-        ("state", "State/Province", False),
-        ("country", "Country (default: Saudi Arabia)", False),
-        ("zip_code", "Postal/ZIP code", False),
-        ("latitude", "Latitude coordinate (decimal, -90 to 90)", False),
-        ("longitude", "Longitude coordinate (decimal, -180 to 180)", False),
-        ("primary", "Primary location flag (true/false, default: false)", False),
-    ]
-    
-    # Write headers
-    for col_idx, (header, description, required) in enumerate(headers, start=1):
-        cell = ws.cell(row=1, column=col_idx, value=header)
-        cell.fill = HEADER_FILL if not required else PatternFill(start_color="E67E22", end_color="E67E22", fill_type="solid")
-        cell.font = HEADER_FONT
-        cell.alignment = Alignment(horizontal="center", vertical="center", wrap_text=True)
-        cell.border = BORDER
-        
-        desc_cell = ws.cell(row=2, column=col_idx, value=description)
-        desc_cell.fill = REQUIRED_FILL if required else OPTIONAL_FILL
-        desc_cell.font = Font(size=9, italic=True)
-        desc_cell.alignment = Alignment(horizontal="left", vertical="top", wrap_text=True)
-        desc_cell.border = BORDER
-    
-    # Example data
-    example_row = [
-        "",  # id
-        "1",  # portfolio_id
-        "طريق الملك فهد",  # street
-        "الرياض",  # city
-        "منطقة الرياض",  # state
-        "Saudi Arabia",  # country
-        "12345",  # zip_code
-        "24.7136",  # latitude
-        "46.6753",  # longitude
-        "true",  # primary
-    ]
-    
-    for col_idx, value in enumerate(example_row, start=1):
-        cell = ws.cell(row=3, column=col_idx, value=value)
-        cell.fill = EXAMPLE_FILL
-        cell.border = BORDER
-    
-    # Add data validation
-    primary_validation = DataValidation(type="list", formula1='"true,false"')
-    ws.add_data_validation(primary_validation)
-    primary_validation.add(f"J3:J1000")
-    
-    ws.freeze_panes = "A3"
-    
-    for col_idx in range(1, len(headers) + 1):
-        ws.column_dimensions[get_column_letter(col_idx)].width = 20
-
-def create_building_sheet(wb):
-    """Create Building sheet"""
-    ws = wb.create_sheet("Building")
-    
-    headers = [
-        ("id", "Auto-generated ID (leave empty)", False),
-        ("portfolio_id", "Portfolio ID (reference to Portfolio.id)", True),
-        ("ownership_id", "Ownership ID (reference to Ownership.id)", True),
-        ("parent_id", "Parent Building ID (for nested buildings, leave empty if root)", False),
-        ("name", "Building name", True),
-        ("code", "Building code (unique per ownership)", True),
-        ("type", "Building type (residential, commercial, mixed, office, retail)", True),
-        ("description", "Building description", False),
-        ("street", "Street address", False),
-        ("city", "City name", False),
-        ("state", "State/Province", False),
-        ("country", "Country (default: Saudi Arabia)", False),
-        ("zip_code", "Postal/ZIP code", False),
-        ("latitude", "Latitude coordinate (decimal, -90 to 90)", False),
-        ("longitude", "Longitude coordinate (decimal, -180 to 180)", False),
-        ("floors", "Number of floors (integer, min: 1)", False),
-        ("year", "Construction year (integer, 1800 to current year + 10)", False),
-        ("active", "Active status (true/false, default: true)", False),
-    ]
-    
-    # Write headers
-    for col_idx, (header, description, required) in enumerate(headers, start=1):
-        cell = ws.cell(row=1, column=col_idx, value=header)
-        cell.fill = HEADER_FILL if not required else PatternFill(start_color="E67E22", end_color="E67E22", fill_type="solid")
-        cell.font = HEADER_FONT
-        cell.alignment = Alignment(horizontal="center", vertical="center", wrap_text=True)
-        cell.border = BORDER
-        
-        desc_cell = ws.cell(row=2, column=col_idx, value=description)
-        desc_cell.fill = REQUIRED_FILL if required else OPTIONAL_FILL
-        desc_cell.font = Font(size=9, italic=True)
-        desc_cell.alignment = Alignment(horizontal="left", vertical="top", wrap_text=True)
-        desc_cell.border = BORDER
-    
-    # Example data
-    example_row = [
-        "",  # id
-        "1",  # portfolio_id
-        "1",  # ownership_id
-        "",  # parent_id
-        "برج الراشد السكني",  # name
-        "BLD-001-01",  # code
-        "residential",  # type
-        "برج سكني فاخر مكون من 10 طوابق",  # description
-        "طريق الملك فهد، 123",  # street
-        "الرياض",  # city
-        "منطقة الرياض",  # state
-        "Saudi Arabia",  # country
-        "12345",  # zip_code
-        "24.7136",  # latitude
-        "46.6753",  # longitude
-        "10",  # floors
-        "2020",  # year
-        "true",  # active
-    ]
-    
-    for col_idx, value in enumerate(example_row, start=1):
-        cell = ws.cell(row=3, column=col_idx, value=value)
-        cell.fill = EXAMPLE_FILL
-        cell.border = BORDER
-    
-    # Add data validation
-    type_validation = DataValidation(type="list", formula1='"residential,commercial,mixed,office,retail,warehouse,industrial"')
-    ws.add_data_validation(type_validation)
-    type_validation.add(f"G3:G1000")
-    
-    active_validation = DataValidation(type="list", formula1='"true,false"')
-    ws.add_data_validation(active_validation)
-    active_validation.add(f"R3:R1000")
-    
-    ws.freeze_panes = "A3"
-    
-    for col_idx in range(1, len(headers) + 1):
-        ws.column_dimensions[get_column_letter(col_idx)].width = 20
-
-def create_building_floor_sheet(wb):
-    """Create BuildingFloor sheet"""
-    ws = wb.create_sheet("BuildingFloor")
-    
-    headers = [
-        ("id", "Auto-generated ID (leave empty)", False),
-        ("building_id", "Building ID (reference to Building.id)", True),
-        ("number", "Floor number (integer, unique per building, can be negative for basements)", True),
-        ("name", "Floor name (e.g., 'Ground Floor', 'الطابق الأرضي')", False),
-        ("description", "Floor description", False),
-        ("units", "Number of units on this floor (integer, min: 0)", False),
-        ("active", "Active status (true/false, default: true)", False),
-    ]
-    
-    # Write headers
-    for col_idx, (header, description, required) in enumerate(headers, start=1):
-        cell = ws.cell(row=1, column=col_idx, value=header)
-        cell.fill = HEADER_FILL if not required else PatternFill(start_color="E67E22", end_color="E67E22", fill_type="solid")
-        cell.font = HEADER_FONT
-        cell.alignment = Alignment(horizontal="center", vertical="center", wrap_text=True)
-        cell.border = BORDER
-        
-        desc_cell = ws.cell(row=2, column=col_idx, value=description)
-        desc_cell.fill = REQUIRED_FILL if required else OPTIONAL_FILL
-        desc_cell.font = Font(size=9, italic=True)
-        desc_cell.alignment = Alignment(horizontal="left", vertical="top", wrap_text=True)
-        desc_cell.border = BORDER
-    
-    # Example data
-    example_row = [
-        "",  # id
-        "1",  # building_id
-        "1",  # number
-        "الطابق الأرضي",  # name
-        "الطابق الأول من البرج",  # description
-        "5",  # units
-        "true",  # active
-    ]
-    
-    for col_idx, value in enumerate(example_row, start=1):
-        cell = ws.cell(row=3, column=col_idx, value=value)
-        cell.fill = EXAMPLE_FILL
-        cell.border = BORDER
-    
-    # Add data validation
-    active_validation = DataValidation(type="list", formula1='"true,false"')
-    ws.add_data_validation(active_validation)
-    active_validation.add(f"G3:G1000")
-    
-    ws.freeze_panes = "A3"
-    
-    for col_idx in range(1, len(headers) + 1):
-        ws.column_dimensions[get_column_letter(col_idx)].width = 30
-
-def create_unit_sheet(wb):
-    """Create Unit sheet"""
-    ws = wb.create_sheet("Unit")
-    
-    headers = [
-        ("id", "Auto-generated ID (leave empty)", False),
-        ("building_id", "Building ID (reference to Building.id)", True),
-        ("floor_id", "Floor ID (reference to BuildingFloor.id, optional)", False),
-        ("ownership_id", "Ownership ID (reference to Ownership.id)", True),
-        ("number", "Unit number (unique per building)", True),
-        ("type", "Unit type (apartment, office, shop, warehouse, studio, penthouse)", True),
-        ("name", "Unit name", False),
-        ("description", "Unit description", False),
-        ("area", "Unit area in square meters (decimal, required)", True),
-        ("price_monthly", "Monthly price in SAR (decimal)", False),
-        ("price_quarterly", "Quarterly price in SAR (decimal)", False),
-        ("price_yearly", "Yearly price in SAR (decimal)", False),
-        ("status", "Unit status (available, rented, maintenance, reserved, sold)", False),
-        ("active", "Active status (true/false, default: true)", False),
-    ]
-    
-    # Write headers
-    for col_idx, (header, description, required) in enumerate(headers, start=1):
-        cell = ws.cell(row=1, column=col_idx, value=header)
-        cell.fill = HEADER_FILL if not required else PatternFill(start_color="E67E22", end_color="E67E22", fill_type="solid")
-        cell.font = HEADER_FONT
-        cell.alignment = Alignment(horizontal="center", vertical="center", wrap_text=True)
-        cell.border = BORDER
-        
-        desc_cell = ws.cell(row=2, column=col_idx, value=description)
-        desc_cell.fill = REQUIRED_FILL if required else OPTIONAL_FILL
-        desc_cell.font = Font(size=9, italic=True)
-        desc_cell.alignment = Alignment(horizontal="left", vertical="top", wrap_text=True)
-        desc_cell.border = BORDER
-    
-    # Example data
-    example_row = [
-        "",  # id
-        "1",  # building_id
-        "1",  # floor_id
-        "1",  # ownership_id
-        "0101",  # number
-        "apartment",  # type
-        "شقة 0101",  # name
-        "شقة فاخرة بغرفتين",  # description
-        "120.50",  # area
-        "6000.00",  # price_monthly
-        "17100.00",  # price_quarterly
-        "64800.00",  # price_yearly
-        "available",  # status
-        "true",  # active
-    ]
-    
-    for col_idx, value in enumerate(example_row, start=1):
-        cell = ws.cell(row=3, column=col_idx, value=value)
-        cell.fill = EXAMPLE_FILL
-        cell.border = BORDER
-    
-    # Add data validation
-    type_validation = DataValidation(type="list", formula1='"apartment,office,shop,warehouse,studio,penthouse"')
-    ws.add_data_validation(type_validation)
-    type_validation.add(f"F3:F1000")
-    
-    status_validation = DataValidation(type="list", formula1='"available,rented,maintenance,reserved,sold"')
-    ws.add_data_validation(status_validation)
-    status_validation.add(f"M3:M1000")
-    
-    active_validation = DataValidation(type="list", formula1='"true,false"')
-    ws.add_data_validation(active_validation)
-    active_validation.add(f"N3:N1000")
-    
-    ws.freeze_panes = "A3"
-    
-    for col_idx in range(1, len(headers) + 1):
-        ws.column_dimensions[get_column_letter(col_idx)].width = 20
-
-def create_unit_specification_sheet(wb):
-    """Create UnitSpecification sheet"""
-    ws = wb.create_sheet("UnitSpecification")
-    
-    headers = [
-        ("id", "Auto-generated ID (leave empty)", False),
-        ("unit_id", "Unit ID (reference to Unit.id)", True),
-        ("key", "Specification key (e.g., 'bedrooms', 'bathrooms', 'parking')", True),
-        ("value", "Specification value", False),
-        ("type", "Value type (integer, boolean, string)", False),
-    ]
-    
-    # Write headers
-    for col_idx, (header, description, required) in enumerate(headers, start=1):
-        cell = ws.cell(row=1, column=col_idx, value=header)
-        cell.fill = HEADER_FILL if not required else PatternFill(start_color="E67E22", end_color="E67E22", fill_type="solid")
-        cell.font = HEADER_FONT
-        cell.alignment = Alignment(horizontal="center", vertical="center", wrap_text=True)
-        cell.border = BORDER
-        
-        desc_cell = ws.cell(row=2, column=col_idx, value=description)
-        desc_cell.fill = REQUIRED_FILL if required else OPTIONAL_FILL
-        desc_cell.font = Font(size=9, italic=True)
-        desc_cell.alignment = Alignment(horizontal="left", vertical="top", wrap_text=True)
-        desc_cell.border = BORDER
-    
-    # Example data rows
-    example_rows = [
-        ["", "1", "bedrooms", "2", "integer"],
-        ["", "1", "bathrooms", "2", "integer"],
-        ["", "1", "balcony", "true", "boolean"],
-        ["", "1", "parking", "1", "integer"],
-        ["", "1", "furnished", "false", "boolean"],
-    ]
-    
-    for row_idx, example_row in enumerate(example_rows, start=3):
-        for col_idx, value in enumerate(example_row, start=1):
-            cell = ws.cell(row=row_idx, column=col_idx, value=value)
-            cell.fill = EXAMPLE_FILL
-            cell.border = BORDER
-    
-    # Add data validation
-    type_validation = DataValidation(type="list", formula1='"integer,boolean,string"')
-    ws.add_data_validation(type_validation)
-    type_validation.add(f"E3:E1000")
-    
-    # Common keys validation
-    key_validation = DataValidation(type="list", formula1='"bedrooms,bathrooms,balcony,parking,furnished,capacity,meeting_rooms,storefront,storage,loading_dock,ceiling_height,security"')
-    ws.add_data_validation(key_validation)
-    key_validation.add(f"C3:C1000")
-    
-    ws.freeze_panes = "A3"
-    
-    for col_idx in range(1, len(headers) + 1):
-        ws.column_dimensions[get_column_letter(col_idx)].width = 25
+    for row_idx, row_data in enumerate(INSTRUCTIONS, start=1):
+        row = []
+        for value in row_data:
+            if row_idx == 1:
+                value = _styled_cell(ws, value, TITLE_STYLE)
+            elif value and value.isupper() and ":" in value:
+                value = _styled_cell(ws, value, SECTION_STYLE)
+            row.append(value)
+        ws.append(row)
+    return ws
+
+def render_sheet(wb, schema, lookups, rows=None):
+    """Render one data sheet from its schema
+
+    Rows are appended in order, which works for both regular and write-only
+    workbooks. Column widths and freeze panes are set before the first row
+    (write-only sheets require it) and validation ranges are sized once the
+    rows have been consumed. Without ``rows`` the schema's example rows are
+    written instead.
+    """
+    metrics = instrumentation()
+    with metrics.span("sheet", sheet=schema.title) as sheet_span:
+        ws = wb.create_sheet(schema.title)
+
+        # One <col> span covers every column of the sheet
+        dimension = ws.column_dimensions['A']
+        dimension.width = schema.width
+        dimension.min, dimension.max = 1, len(schema.columns)
+        ws.freeze_panes = f"A{FIRST_DATA_ROW}"
+
+        with metrics.span("write", sheet=schema.title):
+            ws.append([
+                _styled_cell(ws, column.name, REQUIRED_HEADER_STYLE if column.required else HEADER_STYLE)
+                for column in schema.columns
+            ])
+            ws.append([
+                _styled_cell(
+                    ws, column.description,
+                    REQUIRED_DESCRIPTION_STYLE if column.required else OPTIONAL_DESCRIPTION_STYLE,
+                )
+                for column in schema.columns
+            ])
+            last_row = _write_rows(ws, schema, lookups, rows)
+
+        row_count = last_row - FIRST_DATA_ROW + 1
+        sheet_span.set(rows=row_count, cells=row_count * len(schema.columns))
+        if rows is None:
+            last_row = max(last_row, DEFAULT_LAST_ROW)
+        else:
+            last_row += EXPORT_EXTRA_ROWS
+            lookups.last_rows[schema.title] = last_row
+        with metrics.span("validate", sheet=schema.title):
+            add_validations(ws, schema, lookups, last_row)
+    return ws
+
+def _write_rows(ws, schema, lookups, rows):
+    """Append the example rows (``rows`` is None) or the data rows; returns the last row number"""
+    last_row = FIRST_DATA_ROW - 1
+    if rows is None:
+        for example_row in schema.example_rows:
+            ws.append([_styled_cell(ws, value, EXAMPLE_STYLE) for value in example_row])
+            last_row += 1
+        return last_row
+
+    names = schema.headers
+    collectors = lookups.collectors(schema)
+    for row in rows:
+        if last_row >= MAX_ROW - EXPORT_EXTRA_ROWS:
+            raise TemplateError(row_limit_message(schema.title))
+        values = row_values(names, row)
+        ws.append(values)
+        for key_idx, id_idx, pairs in collectors:
+            if max(key_idx, id_idx) < len(values) and values[key_idx] is not None and values[id_idx] is not None:
+                pairs.append((values[key_idx], values[id_idx]))
+        last_row += 1
+    return last_row
+
+def add_validations(ws, schema, lookups, last_row):
+    """Attach the sheet's dropdowns, all backed by named ranges"""
+    def add(letter, formula):
+        validation = DataValidation(type="list", formula1=formula)
+        validation.add(f"{letter}{FIRST_DATA_ROW}:{letter}{last_row}")
+        ws.data_validations.append(validation)
+
+    for letter, column in schema.choice_columns():
+        add(letter, lookups.choices(schema, column))
+
+    # via column -> (column holding the key, parent column it must match)
+    dependent = {
+        via: (column, parent_column)
+        for sheet, column, via, parent_column in CONSISTENT_REFERENCES if sheet == schema.title
+    }
+    for sheet, column, parent in RELATIONSHIPS:
+        if sheet != schema.title:
+            continue
+        letter = schema.column_letter(column)
+        if column in dependent:
+            key_column, parent_column = dependent[column]
+            names = lookups.grouped(parent, parent_column)
+            if names is not None:
+                keys, ids = names
+                key_cell = f"${schema.column_letter(key_column)}{FIRST_DATA_ROW}"
+                add(letter, f"OFFSET({ids},MATCH({key_cell},{keys},0)-1,0,COUNTIF({keys},{key_cell}),1)")
+                continue
+        name = lookups.sheet_ids(parent)
+        if name is not None:
+            add(letter, name)
+
+class LookupLists:
+    """Dropdown sources of one workbook, written last to a hidden sheet with named ranges
+
+    Choice lists and grouped reference lists (parent ids sorted by a key,
+    e.g. floors by building) become columns of the lookup sheet. Plain
+    references point at the parent sheet's own id column, so ids typed in
+    later still show up.
+    """
+
+    def __init__(self):
+        self.columns = []
+        self.names = {}
+        self.choice_refs = {}
+        # Sheet title -> last row covered by its validations (exported sheets only)
+        self.last_rows = {}
+        # (parent sheet, parent column) -> [(key, id)] collected while the parent is rendered
+        self.groups = {}
+        for sheet, column, via, parent_column in CONSISTENT_REFERENCES:
+            parent = next(p for s, c, p in RELATIONSHIPS if s == sheet and c == via)
+            self.groups.setdefault((parent, parent_column), [])
+        self.grouped_names = {}
+
+    def add_column(self, name, values):
+        letter = get_column_letter(len(self.columns) + 1)
+        self.columns.append((name, values))
+        self.names[name] = f"{quote_sheetname(LOOKUP_SHEET)}!${letter}$2:${letter}${max(len(values), 1) + 1}"
+
+    def choices(self, schema, column):
+        """Name of the range holding a column's dropdown values (identical lists share one range)"""
+        name = f"list_{schema.title}_{column.name}"
+        ref = self.choice_refs.get(column.choices)
+        if ref is None:
+            self.add_column(name, list(column.choices))
+            self.choice_refs[column.choices] = self.names[name]
+        else:
+            self.names[name] = ref
+        return name
+
+    def sheet_ids(self, title):
+        """Name of a sheet's id column range, or None when the sheet has no exported rows"""
+        last_row = self.last_rows.get(title)
+        if last_row is None:
+            return None
+        schema = next(schema for schema in SHEETS if schema.title == title)
+        letter = schema.column_letter("id")
+        name = f"ids_{title}"
+        self.names[name] = f"{quote_sheetname(title)}!${letter}${FIRST_DATA_ROW}:${letter}${last_row}"
+        return name
+
+    def collectors(self, schema):
+        """(key index, id index, pairs) for the grouped lists fed by this sheet's rows"""
+        headers = schema.headers
+        return [
+            (headers.index(parent_column), headers.index("id"), pairs)
+            for (parent, parent_column), pairs in self.groups.items() if parent == schema.title
+        ]
+
+    def grouped(self, parent, parent_column):
+        """Names of the (keys, ids) ranges of a parent grouped by one of its columns, or None if empty"""
+        key = (parent, parent_column)
+        if key not in self.grouped_names:
+            pairs = self.groups.get(key)
+            if not pairs:
+                return None
+            pairs.sort(key=lambda pair: (isinstance(pair[0], str), pair[0]))
+            keys_name, ids_name = f"keys_{parent}_{parent_column}", f"ids_{parent}_by_{parent_column}"
+            self.add_column(keys_name, [pair[0] for pair in pairs])
+            self.add_column(ids_name, [pair[1] for pair in pairs])
+            self.grouped_names[key] = (keys_name, ids_name)
+        return self.grouped_names[key]
+
+    def write(self, wb):
+        ws = wb.create_sheet(LOOKUP_SHEET)
+        ws.sheet_state = "hidden"
+        ws.append([name for name, _ in self.columns])
+        for row in zip_longest(*(values for _, values in self.columns)):
+            ws.append(list(row))
+        for name, ref in self.names.items():
+            wb.defined_names[name] = DefinedName(name, attr_text=ref)
+        return ws
+
+def _styled_cell(ws, value, style):
+    """Build a cell that references a registered named style"""
+    cell = WriteOnlyCell(ws, value=value)
+    cell.style = style
+    return cell
+
+def row_values(names, row):
+    """Convert a row (mapping keyed by header, or sequence) to template cell values"""
+    if isinstance(row, dict):
+        values = [row.get(name) for name in names]
+    else:
+        values = list(row)
+    return [_cell_value(value) for value in values]
+
+def _cell_value(value):
+    """Booleans are written as the lowercase literals the template documents"""
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    return value
+
+def iter_jsonl(path):
+    """Lazily yield one row per line of a JSON Lines file"""
+    with open(path, encoding="utf-8") as handle:
+        for line in handle:
+            if line.strip():
+                yield json.loads(line)
+
+def load_data_dir(directory):
+    """Map sheet titles to lazy row iterators read from ``<Sheet>.jsonl`` files"""
+    data = {}
+    for schema in SHEETS:
+        path = os.path.join(directory, f"{schema.title}.jsonl")
+        if os.path.exists(path):
+            data[schema.title] = iter_jsonl(path)
+    return data
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Create the Property Structure import template")
+    parser.add_argument("-o", "--output", help="Output .xlsx path (default: dated file name)")
+    parser.add_argument(
+        "--data-dir",
+        help="Directory with <Sheet>.jsonl files to export into the template (streams in write-only mode)",
+    )
+    add_instrumentation_arguments(parser)
+    return parser.parse_args()
 
 if __name__ == "__main__":
+    args = parse_args()
     try:
-        create_excel_template()
+        data = load_data_dir(args.data_dir) if args.data_dir else None
+        with instrumented_from_args(args):
+            create_excel_template(args.output, data)
     except Exception as e:
         print(f"Error creating Excel template: {e}")
         import traceback
         traceback.print_exc()
-
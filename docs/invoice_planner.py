@@ -0,0 +1,557 @@
+"""
+Batched due-invoice planner for AutomatedInvoiceService
+AutomatedInvoiceService::generateInvoicesForDueContracts walks
+Ownership::all(), reads each ownership's settings with one query per
+setting, then for every active contract calls generateInvoiceForContract in
+a loop (up to 100 times), and each call queries the contract's last invoice,
+checks overlaps and looks up the next invoice number. Run time grows with
+ownerships times contracts times missing periods.
+
+This planner reads a snapshot (a SQLite database with the application's
+ownerships, contracts, invoices and system_settings tables) with one query
+per table and computes the same decisions for every contract at once:
+contracts are stepped together in numpy "waves", one billing period per
+wave, with the rules of the service:
+
+    next period   last invoice period_end + 1 day (or the contract start), for
+                  1/3/6/12 months by payment frequency (Carbon addMonths, which
+                  overflows: Jan 31 + 1 month is Mar 3), minus a day, capped
+                  at the contract end; due = start + due days setting
+    stop when     the start is after the contract end; the start is in the
+                  future and today is before due - generation days; the period
+                  overlaps an existing invoice or leaves the contract dates
+                  (an error for the contract when overlap prevention is off)
+
+Settings resolve like SystemSettingRepository::getValue (ownership row, then
+the system-wide row, then the default) and InvoiceSettingService, including
+its PHP-falsy fallbacks. Amounts follow ContractInvoiceService's fixed
+amounts per frequency, and numbers continue each ownership's
+INV-{ownership}-{year}-{sequence} series.
+
+The plan is split into chunks of whole contracts, each holding its own
+precomputed invoice numbers, so chunks are independent and can run in
+parallel in any order. Applying a chunk is idempotent: an invoice whose
+contract already has an invoice starting on the same day is skipped, and one
+whose number is taken by another contract is reported as a conflict (the plan
+is stale). Invoice items and notifications stay with the service.
+
+Usage:
+    python invoice_planner.py app.db --dry-run [--today 2026-10-17] [--json]
+    python invoice_planner.py app.db -o plan/ [--chunk-size 500] [--apply]
+    python invoice_planner.py app.db --apply-plan plan/ [--chunk 3 ...]
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import sys
+import time
+from datetime import date, datetime
+
+import numpy as np
+import pandas as pd
+
+from report_analytics import create_report_schema, php_round_array
+
+MANIFEST_NAME = "manifest.json"
+CHUNK_PREFIX = "chunk-"
+DEFAULT_CHUNK_SIZE = 500
+MAX_ITERATIONS = 100  # generateInvoicesForDueContracts' safety limit per contract
+
+SKIPPED_MODES = ("disabled", "user_only")
+INITIAL_STATUSES = ("draft", "pending", "sent")
+MONTHS_PER_PERIOD = {"monthly": 1, "quarterly": 3, "semi_annually": 6, "yearly": 12}  # anything else: 1
+PERIODS_PER_YEAR = {"monthly": 12, "quarterly": 4, "semi_annually": 2, "yearly": 1, "weekly": 52}
+
+OUT_OF_RANGE = "Invoice period must be within contract dates"
+OVERLAPPING = "Invoice period overlaps with existing invoice"
+
+PLANNER_SCHEMA = """
+CREATE TABLE IF NOT EXISTS system_settings (
+    id INTEGER PRIMARY KEY,
+    ownership_id INTEGER REFERENCES ownerships (id),
+    key VARCHAR(255) NOT NULL,
+    value TEXT,
+    value_type VARCHAR(20) NOT NULL DEFAULT 'string',
+    "group" VARCHAR(50) NOT NULL DEFAULT 'invoice',
+    UNIQUE (key, ownership_id)
+);
+"""
+
+QUERIES = {
+    "ownerships": "SELECT id FROM ownerships ORDER BY id",
+    "settings": (
+        "SELECT ownership_id, key, value, value_type FROM system_settings WHERE key IN "
+        "('invoice_auto_generation_mode', 'invoice_generation_days_before_due', "
+        "'invoice_due_days_after_period_start', 'invoice_due_days_after_period', "
+        "'invoice_prevent_overlapping_periods', 'invoice_default_status')"
+    ),
+    # getContractsDueForInvoicing: active, started, not ended
+    "contracts": (
+        'SELECT id, ownership_id, start, "end", payment_frequency, total_rent FROM contracts '
+        "WHERE status = 'active' AND date(start) <= :today AND date(\"end\") >= :today ORDER BY ownership_id, id"
+    ),
+    "invoices": (
+        "SELECT contract_id, period_start, period_end FROM invoices WHERE contract_id IN ("
+        "SELECT id FROM contracts WHERE status = 'active' AND date(start) <= :today AND date(\"end\") >= :today)"
+    ),
+    "numbers": "SELECT ownership_id, number FROM invoices WHERE number LIKE :pattern",
+}
+
+
+class PlanError(Exception):
+    pass
+
+
+def create_planner_schema(conn):
+    """Create the report tables plus system_settings in a SQLite database"""
+    create_report_schema(conn)
+    conn.executescript(PLANNER_SCHEMA)
+
+
+# ---- settings, as SystemSetting::getTypedValue and InvoiceSettingService read them ----
+
+def php_int(value):
+    """(int) cast: numbers truncate, strings keep their leading integer, anything else is 0"""
+    if isinstance(value, (bool, int, float)):
+        return int(value)
+    match = re.match(r"\s*([+-]?\d+)", str(value or ""))
+    return int(match.group(1)) if match else 0
+
+
+def php_truthy(value):
+    return value not in (None, False, 0, 0.0, "", "0", [], {})
+
+
+def typed_value(value, value_type):
+    """SystemSetting::getTypedValue"""
+    if value is None:
+        return None
+    if value_type == "integer":
+        return php_int(value)
+    if value_type == "decimal":
+        try:
+            return float(value)
+        except ValueError:
+            return 0.0
+    if value_type == "boolean":
+        return str(value).strip().lower() in ("1", "true", "on", "yes")
+    if value_type in ("json", "array"):
+        try:
+            return json.loads(value)
+        except ValueError:
+            return None
+    return value
+
+
+class Settings:
+    """The invoice settings of every ownership from one read of system_settings"""
+
+    def __init__(self, rows):
+        self.values = {}
+        for ownership_id, key, value, value_type in rows:
+            self.values[(key, ownership_id)] = typed_value(value, value_type)
+
+    def get(self, key, ownership_id, default=None):
+        # An ownership row wins even when its value is NULL, like getValue
+        if (key, ownership_id) in self.values:
+            return self.values[key, ownership_id]
+        return self.values.get((key, None), default)
+
+    def for_ownership(self, ownership_id):
+        mode = self.get("invoice_auto_generation_mode", ownership_id, "disabled")
+        due_days = self.get("invoice_due_days_after_period_start", ownership_id)
+        if due_days is None:
+            due_days = self.get("invoice_due_days_after_period", ownership_id, 10)
+        status = self.get("invoice_default_status", ownership_id, "draft")
+        status = status if php_truthy(status) else "draft"
+        return {
+            "mode": mode if php_truthy(mode) else "disabled",
+            "generation_days": php_int(self.get("invoice_generation_days_before_due", ownership_id, 5)) or 5,
+            "due_days": php_int(due_days) or 10,
+            "prevent_overlap": php_truthy(self.get("invoice_prevent_overlapping_periods", ownership_id, True)),
+            "status": status if status in INITIAL_STATUSES else "draft",
+        }
+
+
+# ---- planning ----
+
+def days(column):
+    """Date column as datetime64[D]; NULL and unparseable values are NaT"""
+    return pd.to_datetime(column, errors="coerce", format="ISO8601").to_numpy(dtype="datetime64[D]")
+
+
+def add_months(starts, months):
+    """Carbon addMonths with overflow: the day of month is kept and spills into the next month"""
+    month = starts.astype("datetime64[M]")
+    return (month + months).astype("datetime64[D]") + (starts - month.astype("datetime64[D]"))
+
+
+class Plan:
+    """Invoices to generate, contracts that failed, and per-ownership decisions"""
+
+    def __init__(self, today, year):
+        self.today, self.year = today, year
+        self.invoices = []
+        self.skipped = []
+        self.ownerships = {}
+        self.timings = {}
+        self.chunks = []
+
+    def summary(self):
+        return {
+            "today": self.today.isoformat(),
+            "invoices": len(self.invoices),
+            "contracts": len({invoice["contract_id"] for invoice in self.invoices}),
+            "skipped": len(self.skipped),
+            "ownerships": {
+                mode: sum(1 for decision in self.ownerships.values() if decision["mode"] == mode)
+                for mode in sorted({decision["mode"] for decision in self.ownerships.values()})
+            },
+            "chunks": len(self.chunks),
+            "timings": {name: round(seconds, 3) for name, seconds in self.timings.items()},
+        }
+
+
+def load_snapshot(conn, today):
+    """The planner's inputs, one query per table"""
+    parameters = {"today": today.isoformat(), "pattern": f"INV-%-{today.year}-%"}
+    frames = {}
+    for name, sql in QUERIES.items():
+        if name == "settings":
+            frames[name] = conn.execute(sql).fetchall()
+        else:
+            frames[name] = pd.read_sql_query(sql, conn, params={k: v for k, v in parameters.items() if f":{k}" in sql})
+    return frames
+
+
+def plan_invoices(frames, today, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Decide every invoice generateInvoicesForDueContracts would create today"""
+    started = time.perf_counter()
+    plan = Plan(today, today.year)
+    settings = Settings(frames["settings"])
+    ownership_ids = frames["ownerships"]["id"].to_numpy(dtype=np.int64)
+    for ownership_id in ownership_ids.tolist():
+        plan.ownerships[ownership_id] = settings.for_ownership(ownership_id)
+
+    contracts = frames["contracts"]
+    enabled = np.array(
+        [ownership_id in plan.ownerships and plan.ownerships[ownership_id]["mode"] not in SKIPPED_MODES
+         for ownership_id in contracts["ownership_id"].tolist()],
+        dtype=bool,
+    )
+    contracts = contracts[enabled].reset_index(drop=True)
+    contract_ids = contracts["id"].to_numpy(dtype=np.int64)
+    owners = contracts["ownership_id"].to_numpy(dtype=np.int64)
+    frequency = contracts["payment_frequency"].to_numpy(dtype=object)
+    decision = {key: np.array([plan.ownerships[owner][key] for owner in owners.tolist()])
+                for key in ("generation_days", "due_days", "prevent_overlap", "status")}
+    months = np.array([MONTHS_PER_PERIOD.get(value, 1) for value in frequency.tolist()], dtype=np.int64)
+    per_year = np.array([PERIODS_PER_YEAR.get(value, 1) for value in frequency.tolist()], dtype=np.float64)
+    rent = pd.to_numeric(contracts["total_rent"], errors="coerce").fillna(0).to_numpy(dtype=np.float64)
+    amounts = php_round_array(rent / per_year)
+    contract_start, contract_end = days(contracts["start"]), days(contracts["end"])
+
+    # Existing invoices per contract, sorted by contract position
+    invoices = frames["invoices"]
+    if len(contract_ids):
+        # contract_ids are sorted within each ownership only; look positions up through an argsort
+        order = np.argsort(contract_ids, kind="stable")
+        found = np.searchsorted(contract_ids[order], invoices["contract_id"].to_numpy(dtype=np.int64))
+        found = np.minimum(found, len(order) - 1)
+        hit = contract_ids[order][found] == invoices["contract_id"].to_numpy(dtype=np.int64)
+        position = np.where(hit, order[found], -1)
+    else:
+        position = np.full(len(invoices), -1)
+    linked = position >= 0
+    invoice_contract = position[linked]
+    invoice_start, invoice_end = days(invoices["period_start"])[linked], days(invoices["period_end"])[linked]
+
+    # getLastInvoice orders by period_end desc: the next period starts after the latest end
+    last_end = np.full(len(contract_ids), np.datetime64("NaT"), dtype="datetime64[D]")
+    has_end = ~np.isnat(invoice_end)
+    # NaT is the smallest int64, so it only survives where a contract has no invoice
+    np.maximum.at(last_end.view(np.int64), invoice_contract[has_end], invoice_end[has_end].view(np.int64))
+    next_start = np.where(np.isnat(last_end), contract_start, last_end + 1)
+
+    # Contracts the service would fail on or leave to ContractInvoiceService, once a period is left
+    billable = ~np.isnat(next_start) & (next_start <= contract_end)
+    missing = pd.isna(frequency)
+    unsupported = ~missing & ~np.isin(frequency, list(PERIODS_PER_YEAR))
+    for mask, error in ((missing, "payment_frequency is null"), (unsupported, "custom payment frequency")):
+        for contract in np.flatnonzero(mask & billable).tolist():
+            plan.skipped.append({"contract_id": int(contract_ids[contract]), "ownership_id": int(owners[contract]), "error": error})
+    plan.timings["prepare_seconds"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    today_day = np.datetime64(today, "D")
+    active = np.flatnonzero(~missing & ~unsupported & ~np.isnat(next_start))
+    slot = np.full(len(contract_ids), -1)
+    pending = np.arange(len(invoice_contract))
+    generated = []
+    for iteration in range(MAX_ITERATIONS):
+        if not len(active):
+            break
+        start = next_start[active]
+        end_cap = contract_end[active]
+        alive = start <= end_cap
+        end = np.minimum(add_months(start, months[active]) - 1, end_cap)
+        due = start + decision["due_days"][active].astype("timedelta64[D]")
+        earliest = due - decision["generation_days"][active].astype("timedelta64[D]")
+        # isFuture: a start after today (midnight today is already past)
+        alive &= ~((start > today_day) & (today_day < earliest))
+
+        # validatePeriod: inside the contract dates and no overlap with the contract's invoices
+        out_of_range = start < contract_start[active]
+        slot[active] = np.arange(len(active))
+        pending = pending[slot[invoice_contract[pending]] >= 0]
+        candidate = slot[invoice_contract[pending]]
+        s, e = start[candidate], end[candidate]
+        i_start, i_end = invoice_start[pending], invoice_end[pending]
+        clash = (
+            ((i_start >= s) & (i_start <= e)) | ((i_end >= s) & (i_end <= e))
+            | ((i_start <= s) & (i_end >= e)) | ((i_start >= s) & (i_end <= e))
+        )
+        overlapping = np.zeros(len(active), dtype=bool)
+        overlapping[candidate[clash]] = True
+        slot[active] = -1
+
+        conflict = alive & (out_of_range | overlapping)
+        failing = conflict & ~decision["prevent_overlap"][active]
+        for idx in np.flatnonzero(failing).tolist():
+            contract = active[idx]
+            plan.skipped.append({
+                "contract_id": int(contract_ids[contract]),
+                "ownership_id": int(owners[contract]),
+                "error": OUT_OF_RANGE if out_of_range[idx] else OVERLAPPING,
+            })
+        alive &= ~conflict
+
+        produced = active[alive]
+        generated.append((produced, start[alive], end[alive], due[alive], np.full(len(produced), iteration)))
+        next_start[produced] = end[alive] + 1
+        active = produced
+    plan.timings["plan_seconds"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    if generated:
+        contract = np.concatenate([part[0] for part in generated])
+        columns = [np.concatenate([part[idx] for part in generated]) for idx in range(1, 5)]
+        order = np.lexsort((columns[3], contract_ids[contract], owners[contract]))
+        contract = contract[order]
+        period_start, period_end, due, _ = (column[order] for column in columns)
+        _number_invoices(plan, frames["numbers"], contract_ids, owners, contract, period_start, period_end, due,
+                         amounts, decision["status"])
+    plan.chunks = chunk_plan(plan.invoices, chunk_size)
+    plan.timings["number_seconds"] = time.perf_counter() - started
+    return plan
+
+
+def _number_invoices(plan, numbers, contract_ids, owners, contract, period_start, period_end, due, amounts, status):
+    """Fill plan.invoices in generation order, continuing each ownership's number series"""
+    # generateInvoiceNumber takes the greatest number (as a string) with the prefix and adds one; past
+    # 99999 the string order would hand out a duplicate, so the series keeps counting instead
+    greatest = {}
+    for ownership_id, number in zip(numbers["ownership_id"].tolist(), numbers["number"].tolist()):
+        if isinstance(number, str) and number.startswith(invoice_prefix(ownership_id, plan.year)):
+            greatest[ownership_id] = max(number, greatest.get(ownership_id, number))
+    last = {ownership_id: php_int(number[number.rfind("-") + 1:]) for ownership_id, number in greatest.items()}
+    columns = zip(
+        contract_ids[contract].tolist(), owners[contract].tolist(),
+        period_start.astype(str).tolist(), period_end.astype(str).tolist(), due.astype(str).tolist(),
+        amounts[contract].tolist(), status[contract].tolist(),
+    )
+    for contract_id, ownership_id, start, end, due_day, amount, initial_status in columns:
+        last[ownership_id] = last.get(ownership_id, 0) + 1
+        plan.invoices.append({
+            "contract_id": contract_id,
+            "ownership_id": ownership_id,
+            "number": f"{invoice_prefix(ownership_id, plan.year)}{last[ownership_id]:05d}",
+            "period_start": start,
+            "period_end": end,
+            "due": due_day,
+            "amount": amount,
+            "total": amount,
+            "status": initial_status,
+        })
+
+
+def invoice_prefix(ownership_id, year):
+    return f"INV-{ownership_id:03d}-{year}-"
+
+
+def chunk_plan(invoices, chunk_size):
+    """Group invoices into chunks of about ``chunk_size``, never splitting a contract"""
+    chunks, current = [], []
+    for idx, invoice in enumerate(invoices):
+        current.append(invoice)
+        following = invoices[idx + 1] if idx + 1 < len(invoices) else None
+        if following is None or (len(current) >= chunk_size and following["contract_id"] != invoice["contract_id"]):
+            chunks.append(current)
+            current = []
+    return chunks
+
+
+def chunk_digest(invoices):
+    return hashlib.sha256(json.dumps(invoices, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+# ---- output and application ----
+
+def _write_json(filename, data):
+    with open(filename + ".partial", "w", encoding="utf-8") as handle:
+        json.dump(data, handle, ensure_ascii=False, indent=1)
+    os.replace(filename + ".partial", filename)
+
+
+def write_plan(plan, output_dir):
+    """One JSON file per chunk plus manifest.json; chunks left from an earlier plan are removed"""
+    os.makedirs(output_dir, exist_ok=True)
+    entries = []
+    for idx, invoices in enumerate(plan.chunks, 1):
+        name = f"{CHUNK_PREFIX}{idx:05d}.json"
+        _write_json(os.path.join(output_dir, name), {"chunk": idx, "invoices": invoices})
+        entries.append({
+            "chunk": idx,
+            "file": name,
+            "sha256": chunk_digest(invoices),
+            "contracts": len({invoice["contract_id"] for invoice in invoices}),
+            "invoices": len(invoices),
+        })
+    manifest = {
+        **plan.summary(),
+        "generated_at": datetime.now().isoformat(timespec="seconds"),
+        "skipped_contracts": plan.skipped,
+        "chunks": entries,
+    }
+    _write_json(os.path.join(output_dir, MANIFEST_NAME), manifest)
+    current = {entry["file"] for entry in entries}
+    for name in os.listdir(output_dir):
+        if name.startswith(CHUNK_PREFIX) and name.endswith(".json") and name not in current:
+            os.remove(os.path.join(output_dir, name))
+    return manifest
+
+
+def apply_chunk(conn, invoices, created_at=None):
+    """Insert a chunk's invoices in one transaction; rerunning it inserts nothing twice"""
+    created_at = created_at or datetime.now().isoformat(sep=" ", timespec="seconds")
+    counts = {"inserted": 0, "existing": 0, "conflicts": []}
+    with conn:
+        for invoice in invoices:
+            found = conn.execute(
+                "SELECT 1 FROM invoices WHERE contract_id = ? AND date(period_start) = ?",
+                (invoice["contract_id"], invoice["period_start"]),
+            ).fetchone()
+            if found:
+                counts["existing"] += 1
+                continue
+            if conn.execute("SELECT 1 FROM invoices WHERE number = ?", (invoice["number"],)).fetchone():
+                counts["conflicts"].append(invoice["number"])
+                continue
+            conn.execute(
+                "INSERT INTO invoices (contract_id, ownership_id, number, period_start, period_end, due, amount, tax, "
+                "total, status, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, NULL, ?, ?, ?)",
+                (invoice["contract_id"], invoice["ownership_id"], invoice["number"], invoice["period_start"],
+                 invoice["period_end"], invoice["due"], invoice["amount"], invoice["total"], invoice["status"], created_at),
+            )
+            counts["inserted"] += 1
+    return counts
+
+
+def apply_plan_dir(conn, plan_dir, chunk_numbers=None):
+    """Apply the chunks of a written plan (all, or the given chunk numbers); returns counts per chunk"""
+    with open(os.path.join(plan_dir, MANIFEST_NAME), encoding="utf-8") as handle:
+        manifest = json.load(handle)
+    unknown = set(chunk_numbers or ()) - {entry["chunk"] for entry in manifest["chunks"]}
+    if unknown:
+        raise PlanError(f"the plan has no chunk {', '.join(map(str, sorted(unknown)))}")
+    results = {}
+    for entry in manifest["chunks"]:
+        if chunk_numbers and entry["chunk"] not in chunk_numbers:
+            continue
+        with open(os.path.join(plan_dir, entry["file"]), encoding="utf-8") as handle:
+            invoices = json.load(handle)["invoices"]
+        if chunk_digest(invoices) != entry["sha256"]:
+            raise PlanError(f"{entry['file']} does not match its manifest checksum")
+        results[entry["chunk"]] = apply_chunk(conn, invoices)
+    return results
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Plan the invoices AutomatedInvoiceService would generate, in chunks")
+    parser.add_argument("snapshot", help="SQLite database with ownerships, contracts, invoices and system_settings")
+    parser.add_argument("--today", type=date.fromisoformat, help="Run date (default: today)")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="Invoices per chunk (whole contracts)")
+    parser.add_argument("-o", "--output-dir", help="Write the chunks and manifest.json here")
+    parser.add_argument("--dry-run", action="store_true", help="Only report the plan and its timing; write nothing")
+    parser.add_argument("--apply", action="store_true", help="Insert the planned invoices into the snapshot")
+    parser.add_argument("--apply-plan", metavar="DIR", help="Apply the chunks of a plan written earlier")
+    parser.add_argument("--chunk", type=int, action="append", help="With --apply-plan: only this chunk (repeatable)")
+    parser.add_argument("--json", action="store_true", help="Print the summary as JSON")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    if not os.path.exists(args.snapshot):
+        print(f"error: {args.snapshot} does not exist", file=sys.stderr)
+        sys.exit(2)
+    if args.dry_run and (args.apply or args.apply_plan or args.output_dir):
+        print("error: --dry-run writes nothing; drop --apply, --apply-plan and --output-dir", file=sys.stderr)
+        sys.exit(2)
+    if args.apply_plan and (args.apply or args.output_dir):
+        print("error: --apply-plan applies an existing plan; drop --apply and --output-dir", file=sys.stderr)
+        sys.exit(2)
+    if args.chunk and not args.apply_plan:
+        print("error: --chunk only applies with --apply-plan", file=sys.stderr)
+        sys.exit(2)
+    # A dry run opens the snapshot read-only
+    conn = sqlite3.connect(f"file:{args.snapshot}?mode=ro" if args.dry_run else args.snapshot, uri=args.dry_run)
+    try:
+        if args.apply_plan:
+            results = apply_plan_dir(conn, args.apply_plan, set(args.chunk or ()))
+            if args.json:
+                print(json.dumps({str(chunk): counts for chunk, counts in results.items()}, indent=2))
+            else:
+                for chunk, counts in results.items():
+                    print(f"chunk {chunk}: {counts['inserted']} inserted, {counts['existing']} already there, "
+                          f"{len(counts['conflicts'])} number conflicts")
+            sys.exit(1 if any(counts["conflicts"] for counts in results.values()) else 0)
+
+        today = args.today or date.today()
+        started = time.perf_counter()
+        frames = load_snapshot(conn, today)
+        loaded = time.perf_counter() - started
+        plan = plan_invoices(frames, today, args.chunk_size)
+        plan.timings = {"load_seconds": loaded, **plan.timings}
+        summary = plan.summary()
+        if args.output_dir:
+            write_plan(plan, args.output_dir)
+        if args.apply:
+            started = time.perf_counter()
+            results = [apply_chunk(conn, invoices) for invoices in plan.chunks]
+            summary["inserted"] = sum(counts["inserted"] for counts in results)
+            summary["existing"] = sum(counts["existing"] for counts in results)
+            summary["conflicts"] = [number for counts in results for number in counts["conflicts"]]
+            summary["timings"]["apply_seconds"] = round(time.perf_counter() - started, 3)
+    except (PlanError, sqlite3.Error) as e:
+        print(f"error: {e}", file=sys.stderr)
+        sys.exit(2)
+    finally:
+        conn.close()
+
+    if args.json:
+        print(json.dumps({**summary, "skipped_contracts": plan.skipped}, ensure_ascii=False, indent=2))
+    else:
+        timings = ", ".join(f"{name.replace('_seconds', '')} {seconds}s" for name, seconds in summary["timings"].items())
+        print(f"{'Dry run: ' if args.dry_run else ''}{summary['invoices']} invoices for {summary['contracts']} contracts "
+              f"as of {summary['today']} in {summary['chunks']} chunks; {summary['skipped']} contracts skipped")
+        print(f"Ownerships by mode: {summary['ownerships']}")
+        print(f"Timing: {timings}")
+        if args.apply:
+            print(f"Applied: {summary['inserted']} inserted, {summary['existing']} already there, "
+                  f"{len(summary['conflicts'])} number conflicts")
+    sys.exit(1 if args.apply and summary["conflicts"] else 0)
@@ -0,0 +1,253 @@
+"""
+Batch export of prefilled Property Structure templates, one per ownership
+Reads a data snapshot (a JSON file or a SQLite database with the loader's
+tables), groups every ownership's portfolios, locations, buildings, floors,
+units and specifications, and renders one prefilled template per ownership
+in a process pool.
+
+Each output file is named after a SHA-256 of the ownership's rows plus a
+fingerprint of the generator and schema sources, so a nightly run only
+rebuilds the ownerships whose structure (or the template itself) changed;
+the others are served from the existing files. manifest.json maps
+ownership ids to their current file.
+
+JSON snapshots hold one list of records per sheet title:
+    {"Ownership": [{"id": 1, "name": ...}], "Portfolio": [...], ...}
+
+Usage:
+    python property_structure_batch_export.py snapshot.json -o templates/
+    python property_structure_batch_export.py import.db -o templates/ [--workers 4] [--ownership 7 ...] [--force]
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+from property_structure_loader import TABLES, quote
+from property_structure_schema import BOOLEAN, SHEETS
+from property_structure_stamp import stamp_template
+
+MANIFEST_NAME = "manifest.json"
+FILE_PREFIX = "ownership-"
+
+# Files whose content shapes the rendered template; editing them invalidates the cache
+TEMPLATE_SOURCES = ("create_property_structure_excel.py", "property_structure_schema.py", "property_structure_stamp.py")
+
+# How each sheet's rows are restricted to one ownership in a SQLite snapshot
+OWNERSHIP_FILTERS = {
+    "Ownership": "id = ?",
+    "Portfolio": "ownership_id = ?",
+    "PortfolioLocation": "portfolio_id IN (SELECT id FROM portfolios WHERE ownership_id = ?)",
+    "Building": "ownership_id = ?",
+    "BuildingFloor": "building_id IN (SELECT id FROM buildings WHERE ownership_id = ?)",
+    "Unit": "ownership_id = ?",
+    "UnitSpecification": "unit_id IN (SELECT id FROM units WHERE ownership_id = ?)",
+}
+
+# Sheets that belong to an ownership through a parent row: sheet -> (column, parent sheet)
+OWNED_THROUGH = {
+    "PortfolioLocation": ("portfolio_id", "Portfolio"),
+    "BuildingFloor": ("building_id", "Building"),
+    "UnitSpecification": ("unit_id", "Unit"),
+}
+
+
+def template_fingerprint():
+    """Hash of the generator and schema sources"""
+    digest = hashlib.sha256()
+    directory = os.path.dirname(os.path.abspath(__file__))
+    for name in TEMPLATE_SOURCES:
+        with open(os.path.join(directory, name), "rb") as handle:
+            digest.update(handle.read())
+    return digest.hexdigest()
+
+
+def content_hash(data, fingerprint):
+    """Hash one ownership's rows (sheet by sheet, in order) together with the template fingerprint"""
+    digest = hashlib.sha256(fingerprint.encode())
+    for schema in SHEETS:
+        digest.update(b"\0" + schema.title.encode())
+        for row in data.get(schema.title, ()):
+            digest.update(json.dumps(row, ensure_ascii=False, default=str).encode())
+            digest.update(b"\n")
+    return digest.hexdigest()
+
+
+def _row(row, booleans):
+    """Template row from values in header order"""
+    for idx in booleans:
+        # SQLite stores booleans as 0/1
+        if row[idx].__class__ is int:
+            row[idx] = bool(row[idx])
+    return row
+
+
+def _boolean_positions(schema):
+    return [idx for idx, column in enumerate(schema.columns) if column.kind == BOOLEAN]
+
+
+def sqlite_snapshots(path, ownership_ids=None):
+    """Yield (ownership id, {sheet title: rows}) from a SQLite snapshot, one ownership at a time"""
+    conn = sqlite3.connect(path)
+    try:
+        if ownership_ids is None:
+            ownership_ids = [row[0] for row in conn.execute("SELECT id FROM ownerships ORDER BY id")]
+        queries = {
+            schema.title: (
+                f"SELECT {', '.join(quote(name) for name in schema.headers)} "
+                f"FROM {quote(TABLES[schema.title].name)} WHERE {OWNERSHIP_FILTERS[schema.title]} ORDER BY id",
+                _boolean_positions(schema),
+            )
+            for schema in SHEETS
+        }
+        for ownership_id in ownership_ids:
+            data = {}
+            for schema in SHEETS:
+                sql, booleans = queries[schema.title]
+                data[schema.title] = [_row(list(row), booleans) for row in conn.execute(sql, (ownership_id,))]
+            if data["Ownership"]:
+                yield ownership_id, data
+    finally:
+        conn.close()
+
+
+def json_snapshots(path, ownership_ids=None):
+    """Yield (ownership id, {sheet title: rows}) from a JSON snapshot grouped in one pass"""
+    with open(path, encoding="utf-8") as handle:
+        snapshot = json.load(handle)
+
+    owners = {}
+    grouped = {}
+    for schema in SHEETS:
+        booleans = _boolean_positions(schema)
+        through = OWNED_THROUGH.get(schema.title)
+        sheet_owners = owners.setdefault(schema.title, {})
+        for record in snapshot.get(schema.title, ()):
+            if schema.title == "Ownership":
+                owner = record.get("id")
+            elif through is not None:
+                owner = owners[through[1]].get(record.get(through[0]))
+            else:
+                owner = record.get("ownership_id")
+            if owner is None:
+                continue
+            sheet_owners[record.get("id")] = owner
+            grouped.setdefault(owner, {}).setdefault(schema.title, []).append(
+                _row([record.get(name) for name in schema.headers], booleans)
+            )
+
+    for ownership_id in ownership_ids if ownership_ids is not None else sorted(grouped):
+        data = grouped.get(ownership_id)
+        if data and data.get("Ownership"):
+            yield ownership_id, {schema.title: data.get(schema.title, []) for schema in SHEETS}
+
+
+def open_snapshots(path, ownership_ids=None):
+    """Pick the snapshot reader from the file extension"""
+    if path.endswith(".json"):
+        return json_snapshots(path, ownership_ids)
+    return sqlite_snapshots(path, ownership_ids)
+
+
+def output_name(ownership_id, digest):
+    return f"{FILE_PREFIX}{ownership_id}-{digest[:16]}.xlsx"
+
+
+def render_template(filename, data):
+    """Worker: write one prefilled template atomically (stamped from the worker's cached skeletons)"""
+    partial = filename + ".partial"
+    stamp_template(partial, data)
+    os.replace(partial, filename)
+    return filename
+
+
+def export_ownerships(source, output_dir, workers=None, ownership_ids=None, force=False, prune=True):
+    """Render one template per ownership, reusing files whose content hash is unchanged
+
+    Snapshots are read one ownership at a time and at most ``2 * workers``
+    renders are in flight, so memory stays bounded by a few ownerships.
+    Returns a summary with the built and cached ownership ids.
+    """
+    workers = workers or os.cpu_count() or 1
+    os.makedirs(output_dir, exist_ok=True)
+    fingerprint = template_fingerprint()
+    manifest_path = os.path.join(output_dir, MANIFEST_NAME)
+    manifest = {}
+    if ownership_ids is not None and os.path.exists(manifest_path):
+        with open(manifest_path, encoding="utf-8") as handle:
+            manifest = json.load(handle)
+
+    built, cached = [], []
+    pending = []
+
+    def drain(limit):
+        while len(pending) > limit:
+            ownership_id, future = pending.pop(0)
+            future.result()
+            built.append(ownership_id)
+
+    pool = ProcessPoolExecutor(workers) if workers > 1 else None
+    try:
+        for ownership_id, data in open_snapshots(source, ownership_ids):
+            digest = content_hash(data, fingerprint)
+            name = output_name(ownership_id, digest)
+            filename = os.path.join(output_dir, name)
+            manifest[str(ownership_id)] = {
+                "file": name,
+                "hash": digest,
+                "rows": {title: len(rows) for title, rows in data.items()},
+            }
+            if not force and os.path.exists(filename):
+                cached.append(ownership_id)
+                continue
+            if pool is None:
+                render_template(filename, data)
+                built.append(ownership_id)
+            else:
+                pending.append((ownership_id, pool.submit(render_template, filename, data)))
+                drain(2 * workers)
+        drain(0)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    with open(manifest_path + ".partial", "w", encoding="utf-8") as handle:
+        json.dump(manifest, handle, ensure_ascii=False, indent=2, sort_keys=True)
+    os.replace(manifest_path + ".partial", manifest_path)
+
+    removed = []
+    if prune:
+        current = {entry["file"] for entry in manifest.values()}
+        for name in os.listdir(output_dir):
+            if name.startswith(FILE_PREFIX) and name.endswith(".xlsx") and name not in current:
+                os.remove(os.path.join(output_dir, name))
+                removed.append(name)
+
+    return {"built": built, "cached": cached, "removed": removed, "manifest": manifest_path}
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Render a prefilled Property Structure template per ownership")
+    parser.add_argument("snapshot", help="Snapshot: .json file or SQLite database")
+    parser.add_argument("-o", "--output-dir", required=True, help="Directory for the templates and manifest.json")
+    parser.add_argument("--workers", type=int, help="Worker processes (default: number of CPUs)")
+    parser.add_argument("--ownership", type=int, action="append", help="Only export this ownership id (repeatable)")
+    parser.add_argument("--force", action="store_true", help="Rebuild even when the content hash is unchanged")
+    parser.add_argument("--keep-stale", action="store_true", help="Do not delete templates no longer in the manifest")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    summary = export_ownerships(
+        args.snapshot, args.output_dir, args.workers, args.ownership, args.force, prune=not args.keep_stale,
+    )
+    print(
+        f"Built {len(summary['built'])}, reused {len(summary['cached'])}, "
+        f"removed {len(summary['removed'])} stale templates ({summary['manifest']})"
+    )
+    sys.exit(0)
@@ -0,0 +1,527 @@
+"""
+Resumable chunked import for validated Property Structure workbooks
+UnitImportService wraps a whole file in one transaction: one bad row near
+the end rolls everything back, and a large file holds its locks for the
+whole run. This pipeline loads a workbook (or columnar bundle) in fill
+order in fixed-size chunks of one sheet each; every chunk is its own
+transaction and progress is recorded in a checkpoint manifest, so an
+interrupted or failed run resumes after the last committed chunk.
+
+Rows the database refuses (constraint violations, or a parent that was
+itself rejected) do not stop the run: the chunk is retried row by row and
+the failing rows are written to a reject file, one JSON object per line,
+with the error, the template values and the real ids of the parents that
+did load. After fixing the values there, the reject file itself can be
+imported with the same command; its rows go through the same validation
+and integrity checks as a workbook first.
+
+Checkpoint protocol, per chunk: the rows are inserted, the rejects are
+appended to the reject file, the chunk is recorded as pending in the
+manifest, the transaction commits, then the chunk is marked done. On
+resume a pending chunk counts as committed when its rows exist; otherwise
+the reject file is cut back and the chunk is loaded again. Committed
+chunks are replayed without writing to rebuild the template key -> id
+maps, so the workbook must not change between runs (its SHA-256 is
+checked). Like the bulk loader, this assumes no other writer allocates
+ids in these tables while a chunk is in flight.
+
+Usage:
+    python property_structure_chunked_import.py filled.xlsx --sqlite import.db [--create-schema]
+        [--chunk-size 5000] [--checkpoint filled.xlsx.checkpoint.json] [--rejects filled.xlsx.rejects.jsonl]
+    python property_structure_chunked_import.py filled.xlsx.rejects.jsonl --sqlite import.db   # after fixing
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import time
+
+from property_structure_columnar import MANIFEST_NAME, file_sha256, is_bundle
+from property_structure_integrity import check_integrity, check_sheets, normalize_integer, resolve_key
+from property_structure_loader import BulkLoader, LoadError, create_sqlite_schema, quote
+from property_structure_schema import RELATIONSHIPS, SHEETS, SHEETS_BY_TITLE
+from validate_property_structure import (
+    ENGINES,
+    FAST_ENGINE,
+    IssueCollector,
+    iter_template_sheets,
+    validate_rows,
+    validate_workbook,
+)
+
+DEFAULT_CHUNK_SIZE = 5000
+CHECKPOINT_SUFFIX = ".checkpoint.json"
+REJECTS_SUFFIX = ".rejects.jsonl"
+CHECKPOINT_VERSION = 1
+
+
+def _is_blank(row):
+    return not any(row) and all(value is None or value == "" for value in row)
+
+
+def source_fingerprint(path):
+    """SHA-256 of a workbook or reject file; for a bundle, of its manifest (which hashes every file)"""
+    path = str(path)
+    if is_bundle(path):
+        return file_sha256(path if path.endswith(MANIFEST_NAME) else os.path.join(path, MANIFEST_NAME))
+    return file_sha256(path)
+
+
+def default_path(source, suffix):
+    return str(source).rstrip("/\\") + suffix
+
+
+class Checkpoint:
+    """The progress manifest, rewritten atomically after every state change"""
+
+    def __init__(self, path, state):
+        self.path = path
+        self.state = state
+
+    @classmethod
+    def open(cls, path, source, fingerprint, chunk_size):
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as handle:
+                state = json.load(handle)
+            if state.get("fingerprint") != fingerprint:
+                raise LoadError(f"{path} belongs to a different version of {state.get('source')}; "
+                                "delete it to start over")
+            return cls(path, state)
+        state = {
+            "version": CHECKPOINT_VERSION,
+            "source": str(source),
+            "fingerprint": fingerprint,
+            "chunk_size": chunk_size,
+            "status": "running",
+            "started": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "reject_offset": 0,
+            "rejected": 0,
+            "warnings": [],
+            "sheets": {},
+        }
+        checkpoint = cls(path, state)
+        checkpoint.save()
+        return checkpoint
+
+    @property
+    def resumed(self):
+        return bool(self.state["sheets"])
+
+    def sheet(self, title):
+        return self.state["sheets"].setdefault(title, {"chunks": [], "pending": None, "parents_done": False, "rows": 0})
+
+    def save(self):
+        self.state["updated"] = time.strftime("%Y-%m-%d %H:%M:%S")
+        with open(self.path + ".partial", "w", encoding="utf-8") as handle:
+            json.dump(self.state, handle, indent=1)
+            handle.flush()
+            os.fsync(handle.fileno())
+        os.replace(self.path + ".partial", self.path)
+
+
+def _json_value(value):
+    return value if value is None or isinstance(value, (str, int, float, bool)) else str(value)
+
+
+class ChunkedImporter:
+    """Loads template sheets chunk by chunk, one transaction per chunk"""
+
+    def __init__(self, conn, checkpoint, reject_path, chunk_size=DEFAULT_CHUNK_SIZE, placeholder="?", log=None):
+        self.conn = conn
+        self.checkpoint = checkpoint
+        self.reject_path = reject_path
+        self.chunk_size = chunk_size
+        self.loader = BulkLoader(conn, placeholder=placeholder)
+        self.log = log or (lambda message: None)
+        self.rejects = None
+
+    def run(self, sheets):
+        """Import (title, header, rows) triples in fill order; returns per-sheet counts"""
+        state = self.checkpoint.state
+        # Keep only the rejects of chunks recorded as committed
+        self.rejects = open(self.reject_path, "a+", encoding="utf-8")
+        try:
+            self.rejects.truncate(state["reject_offset"])
+            self.rejects.seek(state["reject_offset"])
+            for title, header, rows in sheets:
+                self.import_sheet(title, header, rows)
+            state["status"] = "complete"
+            self.checkpoint.save()
+        finally:
+            self.rejects.close()
+        if not state["rejected"] and os.path.getsize(self.reject_path) == 0:
+            os.remove(self.reject_path)
+        return {
+            title: {"rows": sheet["rows"], "rejected": sum(len(chunk["rejected"]) for chunk in sheet["chunks"])}
+            for title, sheet in state["sheets"].items()
+        }
+
+    def seed(self, id_maps):
+        """Template keys that already have real ids (used when importing a reject file)"""
+        for title, keys in id_maps.items():
+            self.loader.id_maps.setdefault(title, {}).update(keys)
+
+    def import_sheet(self, title, header, rows):
+        loader = self.loader
+        sheet = loader.prepare_sheet(title, header)
+        progress = self.checkpoint.sheet(title)
+        done = progress["chunks"]
+        self._settle_pending(sheet, progress)
+        replayed_rejects = [set(chunk["rejected"]) for chunk in done]
+        new_ids = loader.ids.reserve(sheet.table.name)
+        deferred_parents = []
+        chunk = []
+        position = 0
+        chunk_index = 0
+
+        for row_number, row in rows:
+            if _is_blank(row):
+                continue
+            position += 1
+            chunk_index = (position - 1) // self.chunk_size
+            key = loader.row_key(sheet, row, position)
+            if chunk_index < len(done):
+                if row_number not in replayed_rejects[chunk_index]:
+                    self._replay(sheet, done[chunk_index], row_number, row, key, position, deferred_parents)
+                continue
+            chunk.append((row_number, row, key))
+            if len(chunk) == self.chunk_size:
+                self._load_chunk(sheet, progress, chunk, position - len(chunk) + 1, new_ids, deferred_parents)
+                chunk = []
+        if chunk:
+            self._load_chunk(sheet, progress, chunk, position - len(chunk) + 1, new_ids, deferred_parents)
+
+        if sheet.hierarchy is not None and not progress["parents_done"]:
+            self._update_parents(sheet, deferred_parents)
+            progress["parents_done"] = True
+            self.checkpoint.save()
+        self.log(f"{title}: {progress['rows']} rows, "
+                 f"{sum(len(c['rejected']) for c in done)} rejected, {len(done)} chunks")
+
+    def _replay(self, sheet, chunk, row_number, row, key, position, deferred_parents):
+        """Rebuild the id map entry of a row committed by an earlier run"""
+        real_id = chunk["first_id"] + position - chunk["first_position"]
+        try:
+            self.loader.convert_row(sheet, row_number, row, key, real_id, deferred_parents)
+        except LoadError:
+            self.loader.id_maps[sheet.title].pop(key, None)
+
+    def _settle_pending(self, sheet, progress):
+        """Decide whether a chunk left pending by an interrupted run was committed"""
+        pending = progress["pending"]
+        if pending is None:
+            return
+        committed = False
+        if pending["probe_id"] is not None:
+            p = self.loader.placeholder
+            found = self.conn.execute(
+                f"SELECT 1 FROM {quote(sheet.table.name)} WHERE id = {p}", (pending["probe_id"],),
+            ).fetchone()
+            committed = found is not None
+        if committed:
+            self._finish_chunk(progress, pending)
+        else:
+            self.rejects.truncate(self.checkpoint.state["reject_offset"])
+            self.rejects.seek(self.checkpoint.state["reject_offset"])
+            progress["pending"] = None
+            self.checkpoint.save()
+
+    def _load_chunk(self, sheet, progress, chunk, first_position, new_ids, deferred_parents):
+        loader = self.loader
+        self._begin()
+        title = sheet.title
+        id_map = loader.id_maps.setdefault(title, {})
+        first_id = None
+        converted, rejects = [], []
+        chunk_deferred = []
+        for offset, (row_number, row, key) in enumerate(chunk):
+            real_id = next(new_ids)
+            if first_id is None:
+                first_id = real_id - offset
+            try:
+                values = loader.convert_row(sheet, row_number, row, key, real_id, chunk_deferred)
+            except LoadError as e:
+                id_map.pop(key, None)
+                rejects.append(self._reject(sheet, row_number, row, key, e))
+                continue
+            converted.append((row_number, row, key, values))
+
+        try:
+            self._insert(sheet, [values for _, _, _, values in converted])
+            loaded = converted
+        except LoadError:
+            # The savepoint undid the statements that did go in; isolate the rows the database refuses
+            loaded = []
+            for item in converted:
+                row_number, row, key, values = item
+                try:
+                    self._insert(sheet, [values])
+                    loaded.append(item)
+                except LoadError as e:
+                    id_map.pop(key, None)
+                    rejects.append(self._reject(sheet, row_number, row, key, e))
+
+        loaded_ids = {values[0] for _, _, _, values in loaded}
+        deferred_parents.extend(item for item in chunk_deferred if item[0] in loaded_ids)
+        for record in rejects:
+            self.rejects.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self.rejects.flush()
+        os.fsync(self.rejects.fileno())
+
+        progress["pending"] = {
+            "first_position": first_position,
+            "first_id": first_id,
+            "rows": len(chunk),
+            # One row known to be in the chunk tells on resume whether it committed
+            "probe_id": min(loaded_ids) if loaded_ids else None,
+            "loaded": len(loaded),
+            "rejected": [record["row"] for record in rejects],
+            "reject_offset": self.rejects.tell(),
+        }
+        self.checkpoint.save()
+        self.conn.commit()
+        self._finish_chunk(progress, progress["pending"])
+
+    def _begin(self):
+        """Open the chunk's transaction so the savepoints below nest inside it
+
+        Outside a transaction SAVEPOINT starts one and RELEASE commits it,
+        which would commit rows before their rejects and pending record are
+        saved. Drivers without ``in_transaction`` open transactions on their
+        own.
+        """
+        if not getattr(self.conn, "in_transaction", True):
+            self.conn.execute("BEGIN")
+
+    def _insert(self, sheet, rows):
+        """Insert rows all-or-nothing, leaving the surrounding transaction usable on failure."""
+        cursor = self.conn.cursor()
+        cursor.execute("SAVEPOINT chunk_rows")
+        try:
+            self.loader.insert_rows(sheet, rows)
+        except LoadError:
+            cursor.execute("ROLLBACK TO SAVEPOINT chunk_rows")
+            cursor.execute("RELEASE SAVEPOINT chunk_rows")
+            raise
+        cursor.execute("RELEASE SAVEPOINT chunk_rows")
+
+    def _finish_chunk(self, progress, pending):
+        state = self.checkpoint.state
+        progress["chunks"].append({
+            "first_position": pending["first_position"],
+            "first_id": pending["first_id"],
+            "rows": pending["rows"],
+            "rejected": pending["rejected"],
+        })
+        progress["rows"] += pending["loaded"]
+        progress["pending"] = None
+        state["rejected"] += len(pending["rejected"])
+        state["reject_offset"] = pending["reject_offset"]
+        self.checkpoint.save()
+
+    def _update_parents(self, sheet, deferred_parents):
+        """Set parent_id values that pointed at later rows; parents that were rejected stay NULL"""
+        id_map = self.loader.id_maps.get(sheet.title, {})
+        resolvable = []
+        for real_id, parent_key, row_number in deferred_parents:
+            if resolve_key(parent_key, id_map) is not None:
+                resolvable.append((real_id, parent_key, row_number))
+            else:
+                self.checkpoint.state["warnings"].append(
+                    f"{sheet.title} row {row_number}: {sheet.hierarchy} {parent_key} was rejected; left empty"
+                )
+        if resolvable:
+            self.loader.update_parents(sheet, resolvable)
+        self.conn.commit()
+
+    def _reject(self, sheet, row_number, row, key, error):
+        """Reject file record: the template values plus the real ids of parents that loaded"""
+        schema = SHEETS_BY_TITLE[sheet.title]
+        values = {}
+        for name, idx, _, _, _ in sheet.readers:
+            if idx is not None and idx < len(row):
+                values[name] = _json_value(row[idx])
+        resolved = {}
+        for name, idx, convert, parent, _ in sheet.readers:
+            if parent is not None and parent != sheet.title and idx is not None and idx < len(row):
+                ref = convert(row[idx])
+                id_map = self.loader.id_maps.get(parent, {})
+                parent_key = resolve_key(ref, id_map) if ref is not None else None
+                if parent_key is not None:
+                    resolved[name] = id_map[parent_key]
+        return {
+            "sheet": schema.title,
+            "row": row_number,
+            "key": key,
+            "error": str(error),
+            "values": values,
+            "resolved": resolved,
+        }
+
+
+def _reject_id(key):
+    return key[1] if isinstance(key, list) else key
+
+
+def reject_file_sheets(path):
+    """(title, header, rows) triples and parent id seeds from a reject file
+
+    Each rejected row keeps its template key in the id column, so rows that
+    reference each other (a rejected unit of a rejected floor) still link
+    up; a blank-id row (key ["row", position]) gets its position as id,
+    which is what references to it hold. References to parents that did
+    load are seeded with their real ids.
+    """
+    records = {}
+    with open(path, encoding="utf-8") as handle:
+        for line in handle:
+            if line.strip():
+                record = json.loads(line)
+                records.setdefault(record["sheet"], []).append(record)
+
+    seeds = {}
+    for title, sheet_records in records.items():
+        parents = {column: parent for sheet, column, parent in RELATIONSHIPS if sheet == title}
+        for record in sheet_records:
+            for column, real_id in record["resolved"].items():
+                seeds.setdefault(parents[column], {})[normalize_integer(record["values"][column])] = real_id
+
+    def sheets():
+        for schema in SHEETS:
+            if schema.title not in records:
+                continue
+            header = schema.headers
+            rows = (
+                (record["row"], [_reject_id(record["key"]) if name == "id" else record["values"].get(name)
+                                 for name in header])
+                for record in records[schema.title]
+            )
+            yield schema.title, header, rows
+
+    return sheets(), seeds
+
+
+def check_reject_file(path, seeds):
+    """Validate and integrity-check a reject file's rows; returns (stage, errors) of the first failure or None
+
+    Runs the workbook checks over the rows as edited: the template rules
+    per row, then the references between them. Parents that did load count
+    as existing under the keys the rows reference them by (the ``seeds``).
+    """
+    errors = IssueCollector()
+    sheets, _ = reject_file_sheets(path)
+    for title, header, rows in sheets:
+        validate_rows(SHEETS_BY_TITLE[title], header, rows, errors)
+    if errors.count:
+        return "validation", errors.issues
+
+    sheets, _ = reject_file_sheets(path)
+    check_sheets(sheets, errors, {title: set(ids) for title, ids in seeds.items()})
+    if errors.count:
+        return "integrity", errors.issues
+    return None
+
+
+def import_chunked(path, conn, chunk_size=DEFAULT_CHUNK_SIZE, checkpoint_path=None, reject_path=None,
+                   engine=FAST_ENGINE, check=True, log=None):
+    """Import a workbook, bundle or reject file in committed chunks, resuming from its checkpoint"""
+    path = str(path)
+    checkpoint_path = checkpoint_path or default_path(path, CHECKPOINT_SUFFIX)
+    reject_path = reject_path or default_path(path, REJECTS_SUFFIX)
+    from_rejects = path.endswith(".jsonl")
+    checkpoint = Checkpoint.open(checkpoint_path, path, source_fingerprint(path), chunk_size)
+    chunk_size = checkpoint.state["chunk_size"]
+    resumed = checkpoint.resumed
+
+    if from_rejects:
+        sheets, seeds = reject_file_sheets(path)
+
+    if check and not resumed:
+        if from_rejects:
+            failure = check_reject_file(path, seeds)
+        else:
+            failure = None
+            for name, run in (
+                ("validation", lambda: validate_workbook(path, engine=engine)),
+                ("integrity", lambda: check_integrity(path, engine=engine)),
+            ):
+                report = run()
+                if not report["valid"]:
+                    failure = name, report["errors"]
+                    break
+        if failure is not None:
+            os.remove(checkpoint_path)
+            return {"file": path, "loaded": False, "stage": failure[0], "errors": failure[1]}
+
+    importer = ChunkedImporter(conn, checkpoint, reject_path, chunk_size, log=log)
+    if from_rejects:
+        importer.seed(seeds)
+    else:
+        sheets = iter_template_sheets(path, engine)
+    started = time.perf_counter()
+    stats = importer.run(sheets)
+    state = checkpoint.state
+    return {
+        "file": path,
+        "loaded": True,
+        "resumed": resumed,
+        "rows": sum(sheet["rows"] for sheet in stats.values()),
+        "rejected": state["rejected"],
+        "rejects": reject_path if state["rejected"] else None,
+        "warnings": state["warnings"],
+        "seconds": round(time.perf_counter() - started, 3),
+        "checkpoint": checkpoint_path,
+        "sheets": stats,
+    }
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Import a Property Structure workbook in resumable chunks")
+    parser.add_argument("file", help="Filled .xlsx template, columnar bundle directory or reject file (.jsonl)")
+    parser.add_argument("--sqlite", required=True, help="SQLite database file to load into")
+    parser.add_argument("--create-schema", action="store_true", help="Create the tables if they do not exist")
+    parser.add_argument(
+        "--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE,
+        help=f"Rows per committed chunk (default: {DEFAULT_CHUNK_SIZE}; a resumed run keeps its original size)",
+    )
+    parser.add_argument("--checkpoint", help=f"Checkpoint manifest (default: FILE{CHECKPOINT_SUFFIX})")
+    parser.add_argument("--rejects", help=f"Reject file (default: FILE{REJECTS_SUFFIX})")
+    parser.add_argument("--skip-checks", action="store_true", help="Do not validate the workbook first")
+    parser.add_argument("--engine", choices=ENGINES, default=FAST_ENGINE, help="Row reader (default: fast)")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    conn = sqlite3.connect(args.sqlite)
+    conn.execute("PRAGMA foreign_keys = ON")
+    if args.create_schema:
+        create_sqlite_schema(conn)
+    try:
+        report = import_chunked(
+            args.file, conn, args.chunk_size, args.checkpoint, args.rejects, args.engine,
+            check=not args.skip_checks, log=None if args.json else print,
+        )
+    except LoadError as e:
+        print(f"Import stopped: {e}", file=sys.stderr)
+        sys.exit(1)
+    finally:
+        conn.close()
+
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2, default=str))
+    elif not report["loaded"]:
+        for error in report["errors"]:
+            location = error["sheet"] + (f"!{error['cell']}" if error["cell"] else "")
+            print(f"  {location}: {error['message']}")
+        print(f"Workbook rejected at {report['stage']}; nothing was imported")
+    else:
+        for warning in report["warnings"]:
+            print(f"  warning: {warning}")
+        print(f"Imported {report['rows']} rows in {report['seconds']}s "
+              f"({'resumed' if report['resumed'] else 'fresh run'}), {report['rejected']} rejected"
+              + (f" -> {report['rejects']}" if report["rejects"] else ""))
+    sys.exit(0 if report["loaded"] and not report["rejected"] else 1)
@@ -0,0 +1,523 @@
+"""
+Columnar interchange format for Property Structure data
+For machine-to-machine bulk loads the xlsx template's XML and per-cell
+styling are pure overhead. A bundle holds the same sheets and columns as
+the template, one compressed file per sheet plus manifest.json:
+
+    bundle/
+        manifest.json           format version, sheets in fill order, typed columns,
+                                row counts and a SHA-256 per file
+        Ownership.csv.gz        header row = template headers, then one row per record
+        Portfolio.csv.gz
+        ...
+
+CSV values are typed by the column kind recorded in the manifest: blank
+fields are empty cells, booleans are 'true'/'false', integers and years
+are digits and decimals (amounts, areas, coordinates) use the shortest
+round-trip form of the number. With pyarrow installed a bundle can be
+written as Parquet instead, with int64/float64/bool/string columns.
+
+Bundles stream in both directions: export reads the workbook with the fast
+XML reader and writes each sheet as it goes, and read_bundle_sheets()
+yields the same (title, header, data rows) triples as iter_template_sheets,
+so the validator, integrity checker and loader accept a bundle directory
+wherever they accept an xlsx file. Values that do not parse as their
+column's kind are kept as text (CSV only), so the validator still reports
+them with the template's messages.
+
+Usage:
+    python property_structure_columnar.py filled.xlsx -o bundle/ [--format csv|parquet] [--check]
+    python property_structure_columnar.py bundle/ -o filled.xlsx [--check]
+"""
+
+import argparse
+import csv
+import gzip
+import hashlib
+import io
+import itertools
+import json
+import os
+import re
+import sys
+from datetime import datetime
+
+from create_property_structure_excel import MAX_EXPORT_ROWS, row_limit_message
+from property_structure_reader import read_workbook_rows, split_header
+from property_structure_schema import BOOLEAN, DECIMAL, FIRST_DATA_ROW, INTEGER, SHEETS, SHEETS_BY_TITLE, YEAR
+from property_structure_stamp import StampError, stamp_template
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:  # Parquet bundles are optional
+    pyarrow = None
+
+FORMAT_NAME = "property-structure-columnar"
+FORMAT_VERSION = 1
+MANIFEST_NAME = "manifest.json"
+
+CSV_FORMAT = "csv"
+PARQUET_FORMAT = "parquet"
+FORMATS = (CSV_FORMAT, PARQUET_FORMAT)
+EXTENSIONS = {CSV_FORMAT: ".csv.gz", PARQUET_FORMAT: ".parquet"}
+
+# gzip level 1 keeps export I/O-bound; higher levels barely shrink repetitive sheets
+COMPRESS_LEVEL = 1
+# Rows per Parquet row group / per read batch
+BATCH_ROWS = 65536
+
+INTEGER_RE = re.compile(r"^-?\d+$")
+NUMBER_RE = re.compile(r"^-?\d+(\.\d+)?([eE][-+]?\d+)?$")
+
+
+class ColumnarError(Exception):
+    """A bundle is malformed, does not match its manifest or cannot hold a value"""
+
+
+def _parse_text(text):
+    return text or None
+
+
+def _parse_integer(text):
+    if not text:
+        return None
+    return int(text) if INTEGER_RE.match(text) else text
+
+
+def _parse_decimal(text):
+    if not text:
+        return None
+    if INTEGER_RE.match(text):
+        return int(text)
+    return float(text) if NUMBER_RE.match(text) else text
+
+
+def _parse_boolean(text):
+    if text == "true":
+        return True
+    if text == "false":
+        return False
+    return text or None
+
+
+# Field text -> value, by column kind; text that does not parse is returned as is
+PARSERS = {INTEGER: _parse_integer, YEAR: _parse_integer, DECIMAL: _parse_decimal, BOOLEAN: _parse_boolean}
+
+
+def format_value(value):
+    """Field text for a cell value (None -> '', booleans as 'true'/'false', 12.0 -> '12')"""
+    if value is None:
+        return ""
+    if value.__class__ is str:
+        return value
+    if value.__class__ is bool:
+        return "true" if value else "false"
+    if value.__class__ is float:
+        return str(int(value)) if value.is_integer() else repr(value)
+    return str(value)
+
+
+def same_values(parsers, left, right):
+    """Whether two rows hold the same typed values ('true' == True, 12.0 == 12, '' == None)"""
+    for parse, a, b in zip(parsers, left, right):
+        if a != b and parse(format_value(a)) != parse(format_value(b)):
+            return False
+    return True
+
+
+def is_bundle(path):
+    """True for a bundle directory or its manifest.json"""
+    path = str(path)
+    if os.path.basename(path) == MANIFEST_NAME:
+        return os.path.isfile(path)
+    return os.path.isdir(path) and os.path.isfile(os.path.join(path, MANIFEST_NAME))
+
+
+def _bundle_directory(path):
+    path = str(path)
+    return os.path.dirname(path) if os.path.basename(path) == MANIFEST_NAME else path
+
+
+def read_manifest(path):
+    directory = _bundle_directory(path)
+    with open(os.path.join(directory, MANIFEST_NAME), encoding="utf-8") as handle:
+        manifest = json.load(handle)
+    if manifest.get("format") != FORMAT_NAME:
+        raise ColumnarError(f"{directory} is not a {FORMAT_NAME} bundle")
+    if manifest.get("version", 0) > FORMAT_VERSION:
+        raise ColumnarError(f"Bundle version {manifest['version']} is newer than supported ({FORMAT_VERSION})")
+    return manifest
+
+
+def _require_pyarrow():
+    if pyarrow is None:
+        raise ColumnarError("Parquet bundles need pyarrow (pip install pyarrow)")
+
+
+class _HashingWriter:
+    """Binary file wrapper that hashes and counts what is written"""
+
+    def __init__(self, handle):
+        self.handle = handle
+        self.digest = hashlib.sha256()
+        self.size = 0
+
+    def write(self, data):
+        self.digest.update(data)
+        self.size += len(data)
+        return self.handle.write(data)
+
+    def flush(self):
+        self.handle.flush()
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as handle:
+        for block in iter(lambda: handle.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _selected_rows(schema, header, rows):
+    """Data rows reordered to the schema's columns; blank rows are dropped"""
+    positions = {}
+    for col_idx, name in enumerate(header):
+        if isinstance(name, str) and name.strip():
+            positions.setdefault(name.strip(), col_idx)
+    picks = [positions.get(name) for name in schema.headers]
+    if picks == list(range(len(picks))):
+        picks = None
+    width = len(schema.columns)
+    for _, row in rows:
+        if not any(row) and all(value is None or value == "" for value in row):
+            continue
+        if picks is None:
+            values = list(row[:width])
+            if len(values) < width:
+                values += [None] * (width - len(values))
+        else:
+            values = [row[idx] if idx is not None and idx < len(row) else None for idx in picks]
+        yield values
+
+
+# Value types each kind stores as is; anything else goes through the parser
+NATIVE_TYPES = {INTEGER: (int,), YEAR: (int,), DECIMAL: (int, float), BOOLEAN: (bool,)}
+
+
+def _field_formatter(kind):
+    """Field text in canonical form for the column kind ('100.50' -> '100.5', 7.0 -> '7')"""
+    parse = PARSERS.get(kind)
+    if parse is None:
+        return format_value
+    native = NATIVE_TYPES[kind]
+
+    def canonical(value):
+        if value.__class__ in native:
+            return format_value(value)
+        if value is None:
+            return ""
+        return format_value(parse(format_value(value)))
+    return canonical
+
+
+def _write_csv(filename, schema, rows):
+    with open(filename, "wb") as raw:
+        hashing = _HashingWriter(raw)
+        # mtime=0 makes unchanged data produce byte-identical files
+        with gzip.GzipFile(fileobj=hashing, mode="wb", compresslevel=COMPRESS_LEVEL, mtime=0) as compressed:
+            with io.TextIOWrapper(compressed, encoding="utf-8", newline="") as text:
+                writer = csv.writer(text)
+                writer.writerow(schema.headers)
+                formatters = [_field_formatter(column.kind) for column in schema.columns]
+                count = 0
+                for values in rows:
+                    writer.writerow([fmt(value) for fmt, value in zip(formatters, values)])
+                    count += 1
+    return count, hashing.size, hashing.digest.hexdigest()
+
+
+ARROW_TYPES = {}
+
+
+def _arrow_schema(schema):
+    if not ARROW_TYPES:
+        ARROW_TYPES.update({
+            INTEGER: pyarrow.int64(), YEAR: pyarrow.int64(),
+            DECIMAL: pyarrow.float64(), BOOLEAN: pyarrow.bool_(),
+        })
+    return pyarrow.schema([(column.name, ARROW_TYPES.get(column.kind, pyarrow.string())) for column in schema.columns])
+
+
+def _typed(schema, row_number, values):
+    """Coerce a row to the Parquet column types; Parquet cannot keep unparsable text"""
+    typed = []
+    for column, value in zip(schema.columns, values):
+        parse = PARSERS.get(column.kind)
+        if parse is None:
+            typed.append(None if value is None else format_value(value))
+            continue
+        value = parse(format_value(value))
+        if value.__class__ is str:
+            raise ColumnarError(f"{schema.title} data row {row_number}: {column.name} {value!r} is not a valid {column.kind}")
+        if column.kind == DECIMAL and value.__class__ is int:
+            value = float(value)
+        typed.append(value)
+    return typed
+
+
+def _write_parquet(filename, schema, rows):
+    arrow_schema = _arrow_schema(schema)
+    names = schema.headers
+    count = 0
+    with pyarrow.parquet.ParquetWriter(filename, arrow_schema, compression="zstd") as writer:
+        batch = [[] for _ in names]
+
+        def flush():
+            table = pyarrow.Table.from_arrays(
+                [pyarrow.array(values, type=field.type) for values, field in zip(batch, arrow_schema)],
+                schema=arrow_schema,
+            )
+            writer.write_table(table)
+            for values in batch:
+                values.clear()
+
+        for values in rows:
+            for target, value in zip(batch, _typed(schema, count + 1, values)):
+                target.append(value)
+            count += 1
+            if count % BATCH_ROWS == 0:
+                flush()
+        if count % BATCH_ROWS or count == 0:
+            flush()
+    return count, os.path.getsize(filename), file_sha256(filename)
+
+
+def write_bundle(output_dir, template_sheets, fmt=CSV_FORMAT, source=None):
+    """Write (title, header, data rows) triples as a bundle; returns the manifest
+
+    Sheets are written one at a time as the rows stream in; each file is
+    renamed into place once complete and manifest.json is written last, so a
+    bundle with a manifest is always complete.
+    """
+    if fmt not in FORMATS:
+        raise ColumnarError(f"Unknown bundle format {fmt!r} (expected one of {', '.join(FORMATS)})")
+    if fmt == PARQUET_FORMAT:
+        _require_pyarrow()
+    os.makedirs(output_dir, exist_ok=True)
+    writer = _write_parquet if fmt == PARQUET_FORMAT else _write_csv
+
+    sheets = {}
+    for title, header, rows in template_sheets:
+        schema = SHEETS_BY_TITLE.get(title)
+        if schema is None:
+            continue
+        name = title + EXTENSIONS[fmt]
+        filename = os.path.join(output_dir, name)
+        count, size, digest = writer(filename + ".partial", schema, _selected_rows(schema, header, rows))
+        os.replace(filename + ".partial", filename)
+        sheets[title] = {
+            "title": title,
+            "file": name,
+            "rows": count,
+            "bytes": size,
+            "sha256": digest,
+            "columns": [{"name": column.name, "kind": column.kind} for column in schema.columns],
+        }
+
+    manifest = {
+        "format": FORMAT_NAME,
+        "version": FORMAT_VERSION,
+        "encoding": fmt,
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "source": os.path.basename(str(source)) if source else None,
+        "sheets": [sheets[schema.title] for schema in SHEETS if schema.title in sheets],
+    }
+    manifest_path = os.path.join(output_dir, MANIFEST_NAME)
+    with open(manifest_path + ".partial", "w", encoding="utf-8") as handle:
+        json.dump(manifest, handle, ensure_ascii=False, indent=2)
+    os.replace(manifest_path + ".partial", manifest_path)
+    return manifest
+
+
+def workbook_sheets(path):
+    """(title, header, data rows) triples of an xlsx workbook, via the fast reader"""
+    for title, rows in read_workbook_rows(path, [schema.title for schema in SHEETS]):
+        header, data = split_header(rows, FIRST_DATA_ROW)
+        yield title, header, data
+
+
+def data_sheets(data):
+    """(title, header, data rows) triples for create_excel_template()-style data"""
+    for schema in SHEETS:
+        if schema.title not in data:
+            continue
+        names = schema.headers
+        rows = (
+            (row_number, [row.get(name) for name in names] if isinstance(row, dict) else list(row))
+            for row_number, row in enumerate(data[schema.title], start=FIRST_DATA_ROW)
+        )
+        yield schema.title, names, rows
+
+
+def export_workbook(path, output_dir, fmt=CSV_FORMAT):
+    """Convert a filled xlsx template to a bundle"""
+    return write_bundle(output_dir, workbook_sheets(path), fmt, source=path)
+
+
+def _csv_rows(filename, entry, parsers):
+    with gzip.open(filename, "rt", encoding="utf-8", newline="") as handle:
+        reader = csv.reader(handle)
+        header = next(reader, None)
+        names = [column["name"] for column in entry["columns"]]
+        if header != names:
+            raise ColumnarError(f"{entry['file']}: header {header} does not match the manifest columns")
+        yield header
+        for row_number, fields in enumerate(reader, start=FIRST_DATA_ROW):
+            yield row_number, [parse(field) for parse, field in zip(parsers, fields)]
+
+
+def _parquet_rows(filename, entry, parsers):
+    parquet = pyarrow.parquet.ParquetFile(filename)
+    header = parquet.schema_arrow.names
+    if header != [column["name"] for column in entry["columns"]]:
+        raise ColumnarError(f"{entry['file']}: columns {header} do not match the manifest")
+    yield header
+    row_number = FIRST_DATA_ROW
+    for batch in parquet.iter_batches(batch_size=BATCH_ROWS):
+        for values in zip(*(column.to_pylist() for column in batch.columns)):
+            yield row_number, list(values)
+            row_number += 1
+
+
+def _sheet_rows(rows, entry):
+    """Data rows of one sheet, checking the row count against the manifest at the end"""
+    count = 0
+    for row in rows:
+        count += 1
+        yield row
+    if count != entry["rows"]:
+        raise ColumnarError(f"{entry['file']} has {count} rows, the manifest says {entry['rows']}")
+
+
+def read_bundle_sheets(path, verify=False):
+    """Yield (title, header, data rows) for the sheets of a bundle, in fill order
+
+    Rows are streamed from the compressed files and numbered from the
+    template's first data row. ``verify`` checks every file's SHA-256
+    against the manifest first (one extra sequential read).
+    """
+    directory = _bundle_directory(path)
+    manifest = read_manifest(directory)
+    reader = _parquet_rows if manifest.get("encoding") == PARQUET_FORMAT else _csv_rows
+    if reader is _parquet_rows:
+        _require_pyarrow()
+    entries = {entry["title"]: entry for entry in manifest["sheets"]}
+    for schema in SHEETS:
+        entry = entries.get(schema.title)
+        if entry is None:
+            continue
+        filename = os.path.join(directory, entry["file"])
+        if verify and file_sha256(filename) != entry["sha256"]:
+            raise ColumnarError(f"{entry['file']} does not match its manifest checksum")
+        parsers = [PARSERS.get(column["kind"], _parse_text) for column in entry["columns"]]
+        rows = reader(filename, entry, parsers)
+        header = next(rows)
+        yield schema.title, header, _sheet_rows(rows, entry)
+
+
+def bundle_to_workbook(path, filename):
+    """Render a bundle as a prefilled xlsx template
+
+    Bundles have no row limit; one with a sheet too large for a template
+    raises ColumnarError before anything is written.
+    """
+    for entry in read_manifest(_bundle_directory(path))["sheets"]:
+        if entry["rows"] > MAX_EXPORT_ROWS:
+            raise ColumnarError(row_limit_message(entry["title"], entry["rows"]))
+
+    def records(header, rows):
+        for _, values in rows:
+            yield dict(zip(header, values))
+
+    data = {title: records(header, rows) for title, header, rows in read_bundle_sheets(path)}
+    stamp_template(filename, data)
+    return filename
+
+
+def compare_sheets(left, right):
+    """Differences between two sources of (title, header, data rows), compared as typed values
+
+    Returns a list of (sheet, message) for sheets missing on one side,
+    differing row counts and the first differing row of each sheet.
+    """
+    def canonical(sheets):
+        result = {}
+        for title, header, rows in sheets:
+            schema = SHEETS_BY_TITLE.get(title)
+            if schema is not None:
+                parsers = [PARSERS.get(column.kind, _parse_text) for column in schema.columns]
+                result[title] = (parsers, _selected_rows(schema, header, rows))
+        return result
+
+    left, right = canonical(left), canonical(right)
+    differences = []
+    for schema in SHEETS:
+        title = schema.title
+        if (title in left) != (title in right):
+            differences.append((title, "sheet is missing on one side"))
+            continue
+        if title not in left:
+            continue
+        parsers, left_rows = left[title]
+        _, right_rows = right[title]
+        for count, (a, b) in enumerate(itertools.zip_longest(left_rows, right_rows), start=1):
+            if a is None or b is None:
+                differences.append((title, f"row counts differ from data row {count}"))
+                break
+            if not same_values(parsers, a, b):
+                differences.append((title, f"data row {count} differs: {a} != {b}"))
+                break
+    return differences
+
+
+def open_sheets(path):
+    """(title, header, data rows) triples of a bundle or an xlsx workbook"""
+    return read_bundle_sheets(path, verify=True) if is_bundle(path) else workbook_sheets(path)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Convert Property Structure workbooks to and from columnar bundles")
+    parser.add_argument("source", help="Filled .xlsx template, or a bundle directory to turn back into .xlsx")
+    parser.add_argument("-o", "--output", required=True, help="Bundle directory (from .xlsx) or .xlsx file (from a bundle)")
+    parser.add_argument(
+        "--format", choices=FORMATS, default=CSV_FORMAT,
+        help="Bundle file format when exporting (default: csv; parquet needs pyarrow)",
+    )
+    parser.add_argument("--check", action="store_true", help="Re-read both sides and verify they hold the same data")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    try:
+        if is_bundle(args.source):
+            bundle_to_workbook(args.source, args.output)
+            print(f"Workbook written: {args.output}")
+        else:
+            manifest = export_workbook(args.source, args.output, args.format)
+            for entry in manifest["sheets"]:
+                print(f"{entry['title']}: {entry['rows']} rows, {entry['bytes']} bytes ({entry['file']})")
+        if args.check:
+            differences = compare_sheets(open_sheets(args.source), open_sheets(args.output))
+            for title, message in differences:
+                print(f"  {title}: {message}")
+            if differences:
+                print("Round trip check failed")
+                sys.exit(1)
+            print("Round trip check passed")
+    except (ColumnarError, StampError) as exc:
+        print(f"error: {exc}", file=sys.stderr)
+        sys.exit(2)
+    sys.exit(0)
@@ -0,0 +1,432 @@
+"""
+Compact in-memory model of parsed Property Structure workbooks
+Parsed rows held as tuples, or as dicts keyed by header the way the PHP
+UnitImportService consumes them, cost several hundred bytes per row: every
+cell is a boxed object and the same headers, dropdown values and city
+names are repeated for every row. read_compact_workbook() parses a
+workbook into one CompactSheet per template sheet, stored column by column
+with an encoding picked from the schema:
+
+- dropdown and boolean columns (type, status, active, ...) hold a one-byte
+  code per row into the column's table of distinct values, which starts
+  with the schema's choices
+- integer and year columns are int64 arrays
+- decimal columns are fixed-point int64 arrays: hundredths for areas and
+  prices (DECIMAL(12,2) in the database), 10^-8 for coordinates
+- text columns are lists in which repeated values share one string
+
+Cells that do not fit their column's encoding (text in a number column, a
+price with more decimals than the scale) are kept verbatim in a small
+per-column exceptions dict, so rows() yields exactly the values the reader
+produced. CompactSheet stands in for SheetColumns: with --engine compact
+the validator, integrity check, diff and loader parse the workbook once
+into this model and run every pass over it.
+
+Usage:
+    python property_structure_compact.py filled.xlsx [--sample 1000] [--json]
+"""
+
+import argparse
+import itertools
+import json
+import math
+import sys
+from array import array
+
+from property_structure_reader import read_workbook_rows
+from property_structure_schema import BOOLEAN, DECIMAL, FIRST_DATA_ROW, INTEGER, SHEETS, SHEETS_BY_TITLE, YEAR
+
+# Rows are encoded this many at a time, column by column
+CHUNK_ROWS = 4096
+
+# Fixed-point scale (decimal places) of decimal columns; the rest use DEFAULT_SCALE
+DEFAULT_SCALE = 2
+DECIMAL_SCALES = {"latitude": 8, "longitude": 8}
+
+# Sentinel codes of integer and fixed-point columns; encoded values stay within +-LIMIT
+NULL = -(2 ** 63)
+EXCEPTION = NULL + 1
+LIMIT = 2 ** 62
+
+# Text columns stop sharing repeated strings after this many distinct values
+MAX_SHARED = 4096
+
+# Code array types of interned columns, by table size
+CODE_TYPES = ((1 << 8, "B"), (1 << 16, "H"), (1 << 32, "L"))
+
+
+class CompactError(Exception):
+    pass
+
+
+class InternedColumn:
+    """Low-cardinality column: one code per row into a table of distinct values
+
+    Values are told apart by type as well, so True, "TRUE" and "true" get
+    their own codes and come back exactly as read.
+    """
+
+    __slots__ = ("codes", "table", "index")
+
+    def __init__(self, seed=()):
+        self.codes = array("B")
+        self.table = []
+        self.index = {}
+        for value in (None, *seed):
+            self._add(value)
+
+    def __len__(self):
+        return len(self.codes)
+
+    def _add(self, value):
+        code = len(self.table)
+        for limit, typecode in CODE_TYPES:
+            if code < limit:
+                break
+        else:
+            raise CompactError("too many distinct values for an interned column")
+        if typecode != self.codes.typecode:
+            self.codes = array(typecode, self.codes)
+        self.table.append(value)
+        self.index[value if value.__class__ is str else (value.__class__, value)] = code
+        return code
+
+    def extend(self, values):
+        index = self.index
+        codes = []
+        for value in values:
+            code = index.get(value if value.__class__ is str else (value.__class__, value))
+            codes.append(self._add(value) if code is None else code)
+        self.codes.extend(codes)
+
+    def values(self):
+        return map(self.table.__getitem__, self.codes)
+
+    def nbytes(self):
+        return self.codes.itemsize * len(self.codes) + _list_bytes(self.table)
+
+
+class IntegerColumn:
+    """Integer column as an int64 array; None and anything else are flagged by sentinel codes"""
+
+    __slots__ = ("codes", "exceptions")
+
+    def __init__(self):
+        self.codes = array("q")
+        self.exceptions = {}
+
+    def __len__(self):
+        return len(self.codes)
+
+    def extend(self, values):
+        if set(map(type, values)) == {int} and -LIMIT < min(values) and max(values) < LIMIT:
+            self.codes.extend(values)
+            return
+        codes = []
+        offset = len(self.codes)
+        for idx, value in enumerate(values, start=offset):
+            if value.__class__ is int and -LIMIT < value < LIMIT:
+                codes.append(value)
+            elif value is None:
+                codes.append(NULL)
+            else:
+                self.exceptions[idx] = value
+                codes.append(EXCEPTION)
+        self.codes.extend(codes)
+
+    def values(self):
+        if not self.exceptions and NULL not in self.codes:
+            return iter(self.codes)
+        return _decode(self.codes, self.exceptions, None)
+
+    def nbytes(self):
+        return self.codes.itemsize * len(self.codes) + _dict_bytes(self.exceptions)
+
+
+class FixedPointColumn:
+    """Decimal column as int64 multiples of 10^-scale
+
+    A value is encoded only if it decodes back to the same number. Whole
+    numbers are read back as the type the first one had (the reader returns
+    int for "12" and float for "12.0"); whole numbers of the other type,
+    -0.0, nan and values beyond the scale are exceptions.
+    """
+
+    __slots__ = ("scale", "whole", "codes", "exceptions")
+
+    def __init__(self, places=DEFAULT_SCALE):
+        self.scale = 10 ** places
+        self.whole = None
+        self.codes = array("q")
+        self.exceptions = {}
+
+    def __len__(self):
+        return len(self.codes)
+
+    def _encode(self, value):
+        cls = value.__class__
+        if cls is not int and cls is not float:
+            return None
+        if cls is int:
+            code = value * self.scale
+            if not -LIMIT < code < LIMIT:
+                return None
+        else:
+            if not -LIMIT < value * self.scale < LIMIT:
+                return None  # also nan and inf
+            code = round(value * self.scale)
+            if code / self.scale != value or (value == 0 and math.copysign(1, value) < 0):
+                return None
+            if code % self.scale:
+                return code
+        if self.whole is None:
+            self.whole = cls
+        return code if cls is self.whole else None
+
+    def extend(self, values):
+        codes = []
+        offset = len(self.codes)
+        for idx, value in enumerate(values, start=offset):
+            if value is None:
+                codes.append(NULL)
+                continue
+            code = self._encode(value)
+            if code is None:
+                self.exceptions[idx] = value
+                code = EXCEPTION
+            codes.append(code)
+        self.codes.extend(codes)
+
+    def values(self):
+        return _decode(self.codes, self.exceptions, self)
+
+    def decode(self, code):
+        if code % self.scale or self.whole is float:
+            return code / self.scale
+        return code // self.scale
+
+    def nbytes(self):
+        return self.codes.itemsize * len(self.codes) + _dict_bytes(self.exceptions)
+
+
+class ObjectColumn:
+    """Any other column as a list; repeated strings share one object while the column has few distinct values"""
+
+    __slots__ = ("items", "shared")
+
+    def __init__(self, count=0):
+        self.items = [None] * count
+        self.shared = {}
+
+    def __len__(self):
+        return len(self.items)
+
+    def extend(self, values):
+        shared = self.shared
+        if shared is None:
+            self.items.extend(values)
+            return
+        setdefault = shared.setdefault
+        self.items.extend([setdefault(value, value) if value.__class__ is str else value for value in values])
+        if len(shared) > MAX_SHARED:
+            self.shared = None
+
+    def values(self):
+        return iter(self.items)
+
+    def nbytes(self):
+        return _list_bytes(self.items)
+
+
+def _decode(codes, exceptions, column):
+    for idx, code in enumerate(codes):
+        if code > EXCEPTION:
+            yield code if column is None else column.decode(code)
+        elif code == NULL:
+            yield None
+        else:
+            yield exceptions[idx]
+
+
+def _list_bytes(items):
+    """Size of a list and of each distinct object in it"""
+    distinct = {id(item): item for item in items if item is not None}
+    return sys.getsizeof(items) + sum(sys.getsizeof(item) for item in distinct.values())
+
+
+def _dict_bytes(mapping):
+    if not mapping:
+        return 0
+    return sys.getsizeof(mapping) + sum(sys.getsizeof(key) + sys.getsizeof(value) for key, value in mapping.items())
+
+
+def column_encoder(column, count=0):
+    """Empty encoder for a schema column, padded with ``count`` Nones"""
+    if column is None:
+        return ObjectColumn(count)
+    if column.choices or column.kind == BOOLEAN:
+        seed = column.choices + ((True, False) if column.kind == BOOLEAN else ())
+        encoder = InternedColumn(seed)
+    elif column.kind in (INTEGER, YEAR):
+        encoder = IntegerColumn()
+    elif column.kind == DECIMAL:
+        encoder = FixedPointColumn(DECIMAL_SCALES.get(column.name, DEFAULT_SCALE))
+    else:
+        return ObjectColumn(count)
+    encoder.extend([None] * count)
+    return encoder
+
+
+class CompactSheet:
+    """Rows of one template sheet in encoded columns
+
+    Same interface as SheetColumns: ``head`` holds the header and
+    description rows as read, and rows() yields (row number, values)
+    pairs, every row padded with None to the sheet's width. Row numbers are
+    a range when the data rows are contiguous.
+    """
+
+    __slots__ = ("title", "head", "row_numbers", "columns")
+
+    def __init__(self, title):
+        self.title = title
+        self.head = []
+        self.row_numbers = array("q")
+        self.columns = None
+
+    def __len__(self):
+        return len(self.row_numbers)
+
+    @property
+    def header(self):
+        for number, values in self.head:
+            if number == 1:
+                return values
+        return ()
+
+    def _start(self):
+        schema = SHEETS_BY_TITLE.get(self.title)
+        by_name = {column.name: column for column in schema.columns} if schema else {}
+        self.columns = [column_encoder(by_name.get(name)) for name in self.header]
+
+    def extend(self, rows):
+        """Encode a batch of (row number, values) pairs"""
+        rows = list(rows)
+        while rows and rows[0][0] < FIRST_DATA_ROW:
+            self.head.append(rows.pop(0))
+        if not rows:
+            return
+        if self.columns is None:
+            self._start()
+        count = len(self.row_numbers)
+        numbers, values = zip(*rows)
+        self.row_numbers.extend(numbers)
+        width = max(map(len, values))
+        while len(self.columns) < width:
+            self.columns.append(ObjectColumn(count))
+        transposed = itertools.zip_longest(*values) if width else ()
+        for column, column_values in itertools.zip_longest(self.columns, transposed):
+            column.extend(column_values if column_values is not None else [None] * len(rows))
+
+    def finish(self):
+        """Freeze after the last row: contiguous row numbers become a range and text stops sharing"""
+        numbers = self.row_numbers
+        if numbers and numbers[-1] - numbers[0] == len(numbers) - 1:
+            self.row_numbers = range(numbers[0], numbers[-1] + 1)
+        for column in self.columns or ():
+            if isinstance(column, ObjectColumn):
+                column.shared = None
+        return self
+
+    @classmethod
+    def from_rows(cls, title, rows, chunk_rows=CHUNK_ROWS):
+        """Encode (row number, values) pairs in ascending row order"""
+        sheet = cls(title)
+        rows = iter(rows)
+        while True:
+            chunk = list(itertools.islice(rows, chunk_rows))
+            if not chunk:
+                return sheet.finish()
+            sheet.extend(chunk)
+
+    def rows(self):
+        """Yield (row number, values) pairs, as SheetColumns.rows() does"""
+        yield from self.head
+        if self.columns:
+            yield from zip(self.row_numbers, zip(*(column.values() for column in self.columns)))
+
+    def nbytes(self):
+        """Approximate memory held by the data rows"""
+        numbers = self.row_numbers
+        total = sys.getsizeof(numbers) if isinstance(numbers, range) else numbers.itemsize * len(numbers)
+        return total + sum(column.nbytes() for column in self.columns or ())
+
+    def encodings(self):
+        """Encoder class name per header column"""
+        return {name: column.__class__.__name__ for name, column in zip(self.header, self.columns or ())}
+
+
+def read_compact_workbook(path, titles=None):
+    """Parse the template sheets of a workbook into {title: CompactSheet}"""
+    if titles is None:
+        titles = [schema.title for schema in SHEETS]
+    return {title: CompactSheet.from_rows(title, rows) for title, rows in read_workbook_rows(path, titles)}
+
+
+def row_dict_bytes(sheet, sample):
+    """Average size of a data row held as a dict keyed by header (values included), over the first rows"""
+    header = [name for name in sheet.header if name]
+    measured = 0
+    total = 0
+    for _, values in itertools.islice(sheet.rows(), len(sheet.head), len(sheet.head) + sample):
+        row = dict(zip(header, values))
+        total += sys.getsizeof(row) + sum(sys.getsizeof(value) for value in row.values() if value is not None)
+        measured += 1
+    return total / measured if measured else 0
+
+
+def workbook_stats(sheets, sample=1000):
+    """Per-sheet row count, compact bytes and the estimated size of the same rows as dicts"""
+    stats = {}
+    for title, sheet in sheets.items():
+        rows = len(sheet)
+        compact = sheet.nbytes()
+        dicts = round(row_dict_bytes(sheet, sample) * rows)
+        stats[title] = {
+            "rows": rows,
+            "compact_bytes": compact,
+            "compact_bytes_per_row": round(compact / rows, 1) if rows else 0,
+            "dict_bytes_estimate": dicts,
+            "ratio": round(dicts / compact, 1) if compact else 0,
+            "encodings": sheet.encodings(),
+        }
+    return stats
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Parse a filled template into compact columns and report their size")
+    parser.add_argument("path", help="Filled .xlsx template")
+    parser.add_argument("--sample", type=int, default=1000,
+                        help="Rows per sheet measured as dicts for the comparison (default: 1000)")
+    parser.add_argument("--json", action="store_true", help="Print the statistics as JSON")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    try:
+        stats = workbook_stats(read_compact_workbook(args.path), args.sample)
+    except (CompactError, OSError, ValueError) as e:
+        print(f"error: {e}", file=sys.stderr)
+        sys.exit(2)
+    if args.json:
+        print(json.dumps(stats, indent=2))
+        sys.exit(0)
+    for title, sheet in stats.items():
+        print(f"{title}: {sheet['rows']} rows, {sheet['compact_bytes'] / 1e6:.2f} MB compact "
+              f"({sheet['compact_bytes_per_row']} bytes/row), ~{sheet['dict_bytes_estimate'] / 1e6:.2f} MB as dicts "
+              f"({sheet['ratio']}x)")
+    compact = sum(sheet["compact_bytes"] for sheet in stats.values())
+    dicts = sum(sheet["dict_bytes_estimate"] for sheet in stats.values())
+    if compact:
+        print(f"total: {compact / 1e6:.2f} MB compact, ~{dicts / 1e6:.2f} MB as dicts ({dicts / compact:.1f}x)")
@@ -0,0 +1,558 @@
+"""
+Incremental diff import for edited Property Structure workbooks
+Re-importing an edited template through UnitImportService either fails on
+"Unit number already exists" or means deleting and recreating rows. This
+module compares a filled workbook (or columnar bundle) against a snapshot
+of the ownership's current data and plans the minimal set of changes:
+
+- Buildings are matched on their code, floors on (building code, number),
+  units on (building code, unit number) and specifications on (building
+  code, unit number, key); ids in the workbook are only used to follow
+  its own references
+- every row gets a content hash over its typed values (references
+  replaced by the parent's natural key, empty cells by the column
+  defaults), and only rows whose hash differs are updated, with just the
+  changed columns
+- rows missing from the workbook are deactivated (active = false), or
+  deleted for specifications, which have no active flag
+
+The snapshot is a SQLite database with the loader's tables or a JSON
+snapshot, as read by property_structure_batch_export. The plan can be
+written as JSON or applied to a SQLite database in one transaction.
+
+Usage:
+    python property_structure_diff.py filled.xlsx --snapshot current.db [--ownership 7] [--json] [--output plan.json]
+    python property_structure_diff.py filled.xlsx --snapshot current.db --apply [--keep-missing]
+"""
+
+import argparse
+import hashlib
+import json
+import sqlite3
+import sys
+import uuid
+from dataclasses import dataclass
+from datetime import datetime
+
+from property_structure_batch_export import open_snapshots
+from property_structure_integrity import check_integrity, normalize_integer, normalize_text, resolve_key, row_key
+from property_structure_loader import CONVERTERS, TABLES, IdAllocator, LoadError, quote
+from property_structure_schema import INTEGER, RELATIONSHIPS, SHEETS, SHEETS_BY_TITLE
+from validate_property_structure import (
+    COLUMN_ENGINES,
+    DEFAULT_MAX_ERRORS,
+    ENGINES,
+    FAST_ENGINE,
+    IssueCollector,
+    columns_to_sheets,
+    is_bundle,
+    iter_template_sheets,
+    read_sheet_columns,
+    validate_workbook,
+)
+
+# Sheets the diff covers, in fill order: sheet -> columns of its natural key.
+# A reference column in a key stands for the parent's natural key.
+NATURAL_KEYS = {
+    "Building": ("code",),
+    "BuildingFloor": ("building_id", "number"),
+    "Unit": ("building_id", "number"),
+    "UnitSpecification": ("unit_id", "key"),
+}
+
+# Parents that are matched but not diffed, so references to them can be compared
+REFERENCE_KEYS = {
+    "Portfolio": ("code",),
+}
+
+# Sheets without an active flag lose missing rows instead of deactivating them
+ACTIVE_COLUMN = "active"
+
+INSERT = "insert"
+UPDATE = "update"
+DEACTIVATE = "deactivate"
+DELETE = "delete"
+
+
+class DiffError(Exception):
+    """Raised when a workbook cannot be diffed against the snapshot"""
+
+
+@dataclass
+class Record:
+    """One row of either side: its local id (template key or database id), row number and typed values"""
+    local_id: object
+    row_number: object
+    values: list
+
+    @property
+    def hash(self):
+        return row_hash(self.values)
+
+
+def row_hash(values):
+    """Content hash of a row's typed values (repr is stable for None/bool/int/float/str/tuple)"""
+    return hashlib.blake2b(repr(values).encode(), digest_size=16).hexdigest()
+
+
+def _key_part(value, kind):
+    return normalize_integer(value) if kind == INTEGER else normalize_text(value)
+
+
+class SheetIndex:
+    """Rows of one sheet keyed by natural key, plus the local id -> natural key map references use
+
+    ``columns`` are the compared columns in schema order: the id and the
+    ownership columns (the diff is scoped to one ownership) are left out.
+    """
+
+    def __init__(self, title, key_columns):
+        self.title = title
+        self.schema = SHEETS_BY_TITLE[title]
+        self.table = TABLES[title]
+        self.key_columns = key_columns
+        self.references = {
+            column: parent for sheet, column, parent in RELATIONSHIPS
+            if sheet == title and parent != "Ownership"
+        }
+        skipped = {"id"} | {column for sheet, column, parent in RELATIONSHIPS if sheet == title and parent == "Ownership"}
+        self.columns = [column for column in self.schema.columns if column.name not in skipped]
+        self.names = [column.name for column in self.columns]
+        self.records = {}
+        self.natural = {}
+
+    def add_rows(self, rows, indexes, errors, label):
+        """Index (row number, full-width values in schema order) pairs; ``indexes`` holds the parents"""
+        defaults = dict(self.table.defaults)
+        positions = {name: idx for idx, name in enumerate(self.schema.headers)}
+        converters = []
+        for column in self.columns:
+            parent = self.references.get(column.name)
+            default = defaults.get(column.name)
+            converters.append((column.name, positions[column.name], CONVERTERS[column.kind], parent, default))
+        key_positions = [self.names.index(name) for name in self.key_columns]
+        key_kinds = {name: column.kind for name, column in zip(self.names, self.columns)}
+        self_references = []
+        position = 0
+
+        for row_number, row in rows:
+            position += 1
+            local_id = row_key(row[0], position)
+            values = []
+            broken = False
+            for name, idx, convert, parent, default in converters:
+                raw = row[idx]
+                if parent is None:
+                    value = convert(raw)
+                    if value is None:
+                        value = default
+                    elif value.__class__ is float and value.is_integer():
+                        value = int(value)
+                    values.append(value)
+                    continue
+                ref = normalize_integer(raw)
+                if ref is None:
+                    values.append(None)
+                elif parent == self.title:
+                    self_references.append((values, len(values), ref, row_number, name, idx, raw))
+                    values.append(None)
+                else:
+                    natural = indexes[parent].natural
+                    key = natural.get(resolve_key(ref, natural))
+                    if key is None:
+                        errors.add(self.title, row_number, name, "missing_reference",
+                                   f"{label}: {name} {raw} does not exist in {parent}", raw, idx + 1)
+                        broken = True
+                    values.append(key)
+            if broken:
+                continue
+
+            key = ()
+            for idx in key_positions:
+                value = values[idx]
+                if self.names[idx] in self.references:
+                    key += value or (None,)
+                else:
+                    key += (_key_part(value, key_kinds[self.names[idx]]),)
+            if None in key:
+                errors.add(self.title, row_number, None, "missing_natural_key",
+                           f"{label}: row has no {' + '.join(self.key_columns)}")
+                continue
+            first = self.records.get(key)
+            if first is not None:
+                errors.add(self.title, row_number, self.key_columns[-1], "duplicate_natural_key",
+                           f"{label}: duplicate {' + '.join(self.key_columns)} (first used on row {first.row_number})",
+                           values[key_positions[-1]])
+                continue
+            self.records[key] = Record(local_id, row_number, values)
+            self.natural[local_id] = key
+
+        # Self references (parent_id) may point at later rows
+        for values, value_idx, ref, row_number, name, idx, raw in self_references:
+            key = self.natural.get(resolve_key(ref, self.natural))
+            if key is None:
+                errors.add(self.title, row_number, name, "missing_reference",
+                           f"{label}: {name} {raw} does not exist in {self.title}", raw, idx + 1)
+            values[value_idx] = key
+
+
+class ReferenceIndex:
+    """Parent sheet that is only matched by natural key (local id -> natural key)"""
+
+    def __init__(self, title, key_columns):
+        self.title = title
+        self.key_columns = key_columns
+        self.natural = {}
+        self.keys = set()
+
+    def add_rows(self, rows, indexes, errors, label):
+        schema = SHEETS_BY_TITLE[self.title]
+        kinds = {column.name: column.kind for column in schema.columns}
+        positions = [schema.headers.index(name) for name in self.key_columns]
+        for position, (row_number, row) in enumerate(rows, start=1):
+            local_id = row_key(row[0], position)
+            key = tuple(_key_part(row[idx] if idx < len(row) else None, kinds[name])
+                        for idx, name in zip(positions, self.key_columns))
+            if None not in key:
+                self.natural[local_id] = key
+                self.keys.add(key)
+
+
+def build_indexes(sheets, errors, label):
+    """Index (title, rows in schema order) pairs in fill order"""
+    indexes = {}
+    for title, rows in sheets:
+        if title in NATURAL_KEYS:
+            index = SheetIndex(title, NATURAL_KEYS[title])
+        elif title in REFERENCE_KEYS:
+            index = ReferenceIndex(title, REFERENCE_KEYS[title])
+        else:
+            continue
+        index.add_rows(rows, indexes, errors, label)
+        indexes[title] = index
+    return indexes
+
+
+def _schema_rows(schema, header, rows):
+    """(row number, values in schema column order) for the non-empty data rows of a sheet"""
+    positions = {}
+    for col_idx, name in enumerate(header):
+        if isinstance(name, str) and name.strip():
+            positions.setdefault(name.strip(), col_idx)
+    picks = [positions.get(name) for name in schema.headers]
+    for row_number, row in rows:
+        if not any(row) and all(value is None or value == "" for value in row):
+            continue
+        yield row_number, [row[idx] if idx is not None and idx < len(row) else None for idx in picks]
+
+
+def workbook_ownership(template_sheets):
+    """Ownership id from the Ownership sheet when it holds exactly one row with an id"""
+    for title, header, rows in template_sheets:
+        if title != "Ownership":
+            continue
+        ids = [values[0] for _, values in _schema_rows(SHEETS_BY_TITLE[title], header, rows)]
+        if len(ids) == 1:
+            return normalize_integer(ids[0])
+        return None
+    return None
+
+
+def diff_indexes(new, old, deactivate_missing=True):
+    """Compare workbook and snapshot indexes sheet by sheet; returns the plan's summary and changes"""
+    summary = {}
+    changes = {}
+    for title in NATURAL_KEYS:
+        if title not in new or title not in old:
+            continue
+        new_index, old_index = new[title], old[title]
+        names = new_index.names
+        has_active = ACTIVE_COLUMN in names
+        active_idx = names.index(ACTIVE_COLUMN) if has_active else None
+        inserts, updates, removals = [], [], []
+        unchanged = 0
+
+        for key, record in new_index.records.items():
+            current = old_index.records.get(key)
+            if current is None:
+                inserts.append({"key": list(key), "row": record.row_number, "hash": record.hash,
+                                "values": dict(zip(names, record.values))})
+                continue
+            digest = record.hash
+            if digest == current.hash:
+                unchanged += 1
+                continue
+            changed = {
+                name: [before, after]
+                for name, before, after in zip(names, current.values, record.values) if before != after
+            }
+            updates.append({"id": current.local_id, "key": list(key), "row": record.row_number,
+                            "hash": digest, "changes": changed})
+
+        if deactivate_missing:
+            for key, current in old_index.records.items():
+                if key in new_index.records:
+                    continue
+                if has_active and not current.values[active_idx]:
+                    unchanged += 1
+                    continue
+                removals.append({"id": current.local_id, "key": list(key)})
+
+        removal = DEACTIVATE if has_active else DELETE
+        summary[title] = {INSERT: len(inserts), UPDATE: len(updates), removal: len(removals), "unchanged": unchanged}
+        changes[title] = {INSERT: inserts, UPDATE: updates, removal: removals}
+
+    return summary, changes
+
+
+def _check_portfolios(new, old, errors):
+    """Buildings may only reference portfolios that already exist"""
+    if "Building" not in new or "Portfolio" not in old:
+        return
+    index = new["Building"]
+    idx = index.names.index("portfolio_id")
+    for record in index.records.values():
+        key = record.values[idx]
+        if key is not None and key not in old["Portfolio"].keys:
+            errors.add("Building", record.row_number, "portfolio_id", "unknown_portfolio",
+                       f"Portfolio {key[0]} does not exist yet; load it before diffing its buildings", key[0])
+
+
+def diff_workbook(path, snapshot, ownership_id=None, engine=FAST_ENGINE, check=True, deactivate_missing=True,
+                  max_errors=DEFAULT_MAX_ERRORS):
+    """Plan the inserts, updates and deactivations that bring the snapshot in line with the workbook"""
+    if engine in COLUMN_ENGINES and not is_bundle(path):
+        columns = read_sheet_columns(path, engine)
+
+        def template_sheets():
+            return columns_to_sheets(columns)
+    else:
+        def template_sheets():
+            return iter_template_sheets(path, engine)
+
+    if check:
+        for name, run in (
+            ("validation", lambda: validate_workbook(path, template_sheets=template_sheets())),
+            ("integrity", lambda: check_integrity(path, template_sheets=template_sheets())),
+        ):
+            report = run()
+            if not report["valid"]:
+                return {"file": str(path), "valid": False, "stage": name, "errors": report["errors"]}
+
+    if ownership_id is None:
+        ownership_id = workbook_ownership(template_sheets())
+        if ownership_id is None:
+            raise DiffError("The workbook does not name its ownership id; pass it explicitly (--ownership)")
+
+    errors = IssueCollector(max_errors)
+    new = build_indexes(
+        ((title, _schema_rows(SHEETS_BY_TITLE[title], header, rows)) for title, header, rows in template_sheets()),
+        errors, "workbook",
+    )
+    data = next((data for _, data in open_snapshots(snapshot, [ownership_id])), None)
+    if data is None:
+        raise DiffError(f"Ownership {ownership_id} does not exist in {snapshot}")
+    warnings = IssueCollector(max_errors)
+    old = build_indexes(
+        ((schema.title, ((row[0], row) for row in data[schema.title])) for schema in SHEETS),
+        warnings, "snapshot",
+    )
+    _check_portfolios(new, old, errors)
+    if errors.count:
+        return {"file": str(path), "valid": False, "stage": "diff", "errors": errors.issues}
+
+    summary, changes = diff_indexes(new, old, deactivate_missing)
+    return {
+        "file": str(path),
+        "snapshot": str(snapshot),
+        "valid": True,
+        "ownership_id": ownership_id,
+        "summary": summary,
+        "warnings": warnings.issues,
+        "changes": changes,
+    }
+
+
+def _existing_keys(conn, ownership_id):
+    """Natural key -> id for the ownership's rows that plan entries can reference"""
+    keys = {title: {} for title in (*REFERENCE_KEYS, *NATURAL_KEYS)}
+    for row_id, code in conn.execute("SELECT id, code FROM portfolios WHERE ownership_id = ?", (ownership_id,)):
+        keys["Portfolio"][(normalize_text(code),)] = row_id
+    for row_id, code in conn.execute("SELECT id, code FROM buildings WHERE ownership_id = ?", (ownership_id,)):
+        keys["Building"].setdefault((normalize_text(code),), row_id)
+    for row_id, code, number in conn.execute(
+        "SELECT f.id, b.code, f.number FROM building_floors f JOIN buildings b ON b.id = f.building_id "
+        "WHERE b.ownership_id = ?", (ownership_id,),
+    ):
+        keys["BuildingFloor"][(normalize_text(code), normalize_integer(number))] = row_id
+    for row_id, code, number in conn.execute(
+        "SELECT u.id, b.code, u.number FROM units u JOIN buildings b ON b.id = u.building_id "
+        "WHERE u.ownership_id = ?", (ownership_id,),
+    ):
+        keys["Unit"][(normalize_text(code), normalize_text(number))] = row_id
+    return keys
+
+
+def apply_plan(conn, plan, placeholder="?"):
+    """Apply a diff plan to the database in one transaction; returns the number of rows touched per sheet
+
+    Reference values in the plan are natural keys; they are resolved
+    against the rows already in the database and the rows inserted earlier
+    in the plan, so the plan stays valid if ids were reassigned meanwhile.
+    """
+    p = placeholder
+    ownership_id = plan["ownership_id"]
+    keys = _existing_keys(conn, ownership_id)
+    allocator = IdAllocator(conn)
+    now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    touched = {}
+
+    def resolve(title, column, parent, value):
+        if value is None:
+            return None
+        row_id = keys[parent].get(tuple(value))
+        if row_id is None:
+            raise LoadError(f"{title}: {column} {value} does not exist in {parent}")
+        return row_id
+
+    try:
+        for title, changes in plan["changes"].items():
+            index = SheetIndex(title, NATURAL_KEYS[title])
+            table = TABLES[title]
+            ownership_columns = [
+                column for sheet, column, parent in RELATIONSHIPS if sheet == title and parent == "Ownership"
+            ]
+            count = 0
+
+            inserts = changes.get(INSERT, ())
+            if inserts:
+                columns = ["id"] + (["uuid"] if table.uuid else []) + index.names + ownership_columns
+                if table.timestamps:
+                    columns += ["created_at", "updated_at"]
+                new_ids = allocator.reserve(table.name)
+                entries = [(next(new_ids), entry) for entry in inserts]
+                for real_id, entry in entries:
+                    keys[title][tuple(entry["key"])] = real_id
+                rows, self_references = [], []
+                for real_id, entry in entries:
+                    values = [real_id] + ([str(uuid.uuid4())] if table.uuid else [])
+                    for name in index.names:
+                        value = entry["values"].get(name)
+                        parent = index.references.get(name)
+                        if parent == title and value is not None:
+                            # Filled in once every new row of the sheet exists, as the loader does
+                            self_references.append((resolve(title, name, parent, value), real_id, name))
+                            value = None
+                        elif parent is not None:
+                            value = resolve(title, name, parent, value)
+                        values.append(value)
+                    values += [ownership_id] * len(ownership_columns)
+                    if table.timestamps:
+                        values += [now, now]
+                    rows.append(values)
+                conn.executemany(
+                    f"INSERT INTO {quote(table.name)} ({', '.join(quote(c) for c in columns)}) "
+                    f"VALUES ({', '.join([p] * len(columns))})",
+                    rows,
+                )
+                for parent_id, real_id, name in self_references:
+                    conn.execute(f"UPDATE {quote(table.name)} SET {quote(name)} = {p} WHERE id = {p}", (parent_id, real_id))
+                count += len(rows)
+
+            for entry in changes.get(UPDATE, ()):
+                assignments = []
+                params = []
+                for name, (_, value) in entry["changes"].items():
+                    parent = index.references.get(name)
+                    if parent is not None:
+                        value = resolve(title, name, parent, value)
+                    assignments.append(f"{quote(name)} = {p}")
+                    params.append(value)
+                if table.timestamps:
+                    assignments.append(f"{quote('updated_at')} = {p}")
+                    params.append(now)
+                conn.execute(
+                    f"UPDATE {quote(table.name)} SET {', '.join(assignments)} WHERE id = {p}", params + [entry["id"]],
+                )
+                count += 1
+
+            if changes.get(DEACTIVATE):
+                stamp = f", {quote('updated_at')} = {p}" if table.timestamps else ""
+                conn.executemany(
+                    f"UPDATE {quote(table.name)} SET {quote(ACTIVE_COLUMN)} = 0{stamp} WHERE id = {p}",
+                    [([now] if table.timestamps else []) + [entry["id"]] for entry in changes[DEACTIVATE]],
+                )
+                count += len(changes[DEACTIVATE])
+
+            if changes.get(DELETE):
+                conn.executemany(
+                    f"DELETE FROM {quote(table.name)} WHERE id = {p}", [(entry["id"],) for entry in changes[DELETE]],
+                )
+                count += len(changes[DELETE])
+
+            touched[title] = count
+        conn.commit()
+    except LoadError:
+        conn.rollback()
+        raise
+    except Exception as e:
+        conn.rollback()
+        raise LoadError(f"Applying the diff failed: {e}") from e
+    return touched
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Diff a filled Property Structure workbook against current data")
+    parser.add_argument("file", help="Filled .xlsx template or columnar bundle directory")
+    parser.add_argument("--snapshot", required=True, help="Current data: SQLite database or .json snapshot")
+    parser.add_argument("--ownership", type=int, help="Ownership id (default: the id on the Ownership sheet)")
+    parser.add_argument("--output", help="Write the plan as JSON to this file")
+    parser.add_argument("--apply", action="store_true", help="Apply the plan to the --snapshot SQLite database")
+    parser.add_argument("--keep-missing", action="store_true", help="Do not deactivate rows missing from the workbook")
+    parser.add_argument("--skip-checks", action="store_true", help="Do not validate the workbook first")
+    parser.add_argument("--engine", choices=ENGINES, default=FAST_ENGINE, help="Row reader (default: fast)")
+    parser.add_argument("--json", action="store_true", help="Print the plan as JSON")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    try:
+        plan = diff_workbook(
+            args.file, args.snapshot, args.ownership, args.engine,
+            check=not args.skip_checks, deactivate_missing=not args.keep_missing,
+        )
+    except DiffError as e:
+        print(f"error: {e}", file=sys.stderr)
+        sys.exit(2)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as handle:
+            json.dump(plan, handle, ensure_ascii=False, indent=2, default=str)
+
+    if args.json:
+        print(json.dumps(plan, ensure_ascii=False, indent=2, default=str))
+    elif not plan["valid"]:
+        for error in plan["errors"]:
+            location = error["sheet"] + (f"!{error['cell']}" if error["cell"] else "")
+            print(f"  {location}: {error['message']}")
+        print(f"Workbook rejected at {plan['stage']}")
+    else:
+        for title, counts in plan["summary"].items():
+            print(f"{title}: " + ", ".join(f"{count} {name}" for name, count in counts.items()))
+
+    if not plan["valid"]:
+        sys.exit(1)
+
+    if args.apply:
+        conn = sqlite3.connect(args.snapshot)
+        try:
+            conn.execute("PRAGMA foreign_keys = ON")
+            touched = apply_plan(conn, plan)
+        except LoadError as e:
+            print(f"Apply failed, nothing was changed: {e}", file=sys.stderr)
+            sys.exit(1)
+        finally:
+            conn.close()
+        print(f"Applied: {sum(touched.values())} rows changed")
+    sys.exit(0)
@@ -0,0 +1,245 @@
+"""
+Opt-in instrumentation for the Property Structure Excel tooling
+The generator, validator, integrity checker and loader open a span per
+sheet and per phase (style, write, validate, save, load) through
+``current()``. Nothing is recorded unless a Recorder is activated with
+``instrumented()``; the default recorder hands out one shared no-op span, so
+the cost when instrumentation is off is a function call per sheet or phase,
+never per row.
+
+Each finished span carries its wall time, parent span and attributes
+(sheet, row and cell counts); with --trace-memory also the tracemalloc peak
+reached inside the span, above what was allocated when it started. The
+report adds the process max RSS of the whole run. It can be written as one
+JSON document or logged as one JSON line per span on the
+``property_structure.metrics`` logger, and a cProfile dump can be taken
+around the whole run.
+
+Usage from the command line tools:
+    python create_property_structure_excel.py --metrics metrics.json [--profile build.prof]
+    python validate_property_structure.py filled.xlsx --metrics -     # JSON lines on stderr
+"""
+
+import cProfile
+import json
+import logging
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+logger = logging.getLogger("property_structure.metrics")
+
+# --metrics value that logs JSON lines instead of writing a file
+LOG_TARGET = "-"
+
+
+def max_rss_kb():
+    """Process-wide max resident set size so far in KiB, or None where unavailable"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **values):
+        pass
+
+
+NULL_SPAN = _NullSpan()
+
+
+class _NullRecorder:
+    enabled = False
+
+    def span(self, name, **attrs):
+        return NULL_SPAN
+
+
+NULL_RECORDER = _NullRecorder()
+
+
+class Span:
+    """One timed stage; ``set()`` attaches counts known only at the end"""
+
+    __slots__ = ("recorder", "name", "attrs", "parent", "started", "traced_start", "traced_peak")
+
+    def __init__(self, recorder, name, attrs):
+        self.recorder = recorder
+        self.name = name
+        self.attrs = attrs
+        self.parent = None
+        self.started = None
+        self.traced_start = None
+        self.traced_peak = None
+
+    def __enter__(self):
+        stack = self.recorder.stack
+        self.parent = stack[-1].name if stack else None
+        if self.recorder.trace_memory:
+            self.traced_start = self.traced_peak = self.recorder.settle_traced_peak()
+        stack.append(self)
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        seconds = time.perf_counter() - self.started
+        if self.traced_start is not None:
+            self.recorder.settle_traced_peak()
+        self.recorder.stack.pop()
+        self.recorder.finish(self, seconds, failed=exc_type is not None)
+        return False
+
+    def set(self, **values):
+        self.attrs.update(values)
+
+
+class Recorder:
+    """Collects spans while active"""
+
+    enabled = True
+
+    def __init__(self, log=False):
+        self.log = log
+        # Set by instrumented(trace_memory=True) while it owns tracemalloc
+        self.trace_memory = False
+        self.spans = []
+        self.stack = []
+        self.started = time.perf_counter()
+        self.traced_peak = None
+
+    def span(self, name, **attrs):
+        return Span(self, name, attrs)
+
+    def settle_traced_peak(self):
+        """Credit the tracemalloc peak since the last span boundary to every open span, then reset it
+
+        tracemalloc keeps a single peak, so it is reset at each span start
+        and end; returns the traced size at this point.
+        """
+        traced, peak = tracemalloc.get_traced_memory()
+        for holder in (self, *self.stack):
+            holder.traced_peak = peak if holder.traced_peak is None else max(holder.traced_peak, peak)
+        tracemalloc.reset_peak()
+        return traced
+
+    def finish(self, span, seconds, failed=False):
+        record = {
+            "span": span.name,
+            "parent": span.parent,
+            "start": round(span.started - self.started, 6),
+            "seconds": round(seconds, 6),
+        }
+        if span.traced_start is not None:
+            record["traced_peak_bytes"] = span.traced_peak - span.traced_start
+        record.update(span.attrs)
+        if failed:
+            record["failed"] = True
+        self.spans.append(record)
+        if self.log:
+            logger.info(json.dumps(record, ensure_ascii=False, default=str))
+
+    def report(self):
+        report = {
+            "seconds": round(time.perf_counter() - self.started, 6),
+            "max_rss_kb": max_rss_kb(),
+            "spans": self.spans,
+        }
+        if self.trace_memory:
+            self.settle_traced_peak()
+        if self.traced_peak is not None:
+            report["traced_peak_bytes"] = self.traced_peak
+        return report
+
+
+_active = NULL_RECORDER
+
+
+def current():
+    """The active recorder (a no-op recorder unless instrumentation is on)"""
+    return _active
+
+
+@contextmanager
+def instrumented(recorder=None, profile_path=None, trace_memory=False):
+    """Activate a recorder for the duration of the block
+
+    ``profile_path`` dumps cProfile stats there on exit; ``trace_memory``
+    also records tracemalloc peaks, per span and for the whole block (slows
+    the run down noticeably).
+    """
+    global _active
+    recorder = recorder or Recorder()
+    previous, _active = _active, recorder
+    profiler = cProfile.Profile() if profile_path else None
+    if trace_memory:
+        tracemalloc.start()
+        recorder.trace_memory = True
+    if profiler is not None:
+        profiler.enable()
+    try:
+        yield recorder
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            profiler.dump_stats(profile_path)
+        if trace_memory:
+            recorder.settle_traced_peak()
+            recorder.trace_memory = False
+            tracemalloc.stop()
+        _active = previous
+
+
+def add_arguments(parser):
+    """Add the --metrics/--profile/--trace-memory options to a command line parser"""
+    parser.add_argument(
+        "--metrics", metavar="PATH",
+        help=f"Record per-sheet/per-phase spans to a JSON file ('{LOG_TARGET}' logs JSON lines to stderr)",
+    )
+    parser.add_argument("--profile", metavar="PATH", help="Write cProfile stats of the run to PATH")
+    parser.add_argument(
+        "--trace-memory", action="store_true",
+        help=f"Also record tracemalloc peaks per span (implies --metrics {LOG_TARGET} when --metrics is not given)",
+    )
+
+
+@contextmanager
+def instrumented_from_args(args):
+    """Activate instrumentation as requested by add_arguments() options; no-op when none are set"""
+    if not (args.metrics or args.profile or args.trace_memory):
+        yield NULL_RECORDER
+        return
+    metrics = args.metrics or (LOG_TARGET if args.trace_memory else None)
+    log = metrics == LOG_TARGET
+    if log and not logger.handlers:
+        handler = logging.StreamHandler(sys.stderr)
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+    recorder = Recorder(log=log)
+    try:
+        with instrumented(recorder, args.profile, args.trace_memory):
+            yield recorder
+    finally:
+        if metrics and not log:
+            with open(metrics, "w", encoding="utf-8") as handle:
+                json.dump(recorder.report(), handle, ensure_ascii=False, indent=2, default=str)
+        elif log:
+            summary = recorder.report()
+            summary.pop("spans")
+            logger.info(json.dumps({"span": "summary", **summary}, default=str))
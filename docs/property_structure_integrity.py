@@ -0,0 +1,330 @@
+"""
+Referential integrity checker for filled Property Structure workbooks
+Loads every sheet once, in fill order, into hash indexes (id -> row) and
+verifies across the whole workbook, in linear time:
+
+- every foreign key listed on the Instructions sheet (RELATIONSHIPS)
+- references that must agree, e.g. a unit's floor belongs to its building
+- composite unique keys (portfolio code per ownership, floor number per
+  building, unit number per building, ...)
+- parent/child cycles in Portfolio.parent_id and Building.parent_id
+
+A row's key is its ``id`` cell. A row whose ``id`` is left empty (as the
+template asks) is keyed by its 1-based position among the sheet's data
+rows, in a key space of its own: it never collides with an explicit id,
+and a reference only reaches it by position when no row of the sheet (or
+existing record) has that id, which is how the example rows reference
+each other.
+
+Usage:
+    python property_structure_integrity.py filled.xlsx [--json] [--max-errors 1000]
+        [--engine fast|parallel|openpyxl|compact]
+"""
+
+import argparse
+import json
+import sys
+
+from property_structure_instrumentation import add_arguments as add_instrumentation_arguments
+from property_structure_instrumentation import current as instrumentation
+from property_structure_instrumentation import instrumented_from_args
+from property_structure_schema import (
+    CONSISTENT_REFERENCES,
+    HIERARCHIES,
+    INTEGER,
+    RELATIONSHIPS,
+    SHEETS,
+    SHEETS_BY_TITLE,
+    UNIQUE_KEYS,
+)
+from validate_property_structure import (
+    DEFAULT_MAX_ERRORS,
+    ENGINES,
+    FAST_ENGINE,
+    IssueCollector,
+    iter_template_sheets,
+    parse_integer,
+)
+
+
+def normalize_integer(value):
+    """Whole numbers compare as int ('7', 7 and 7.0 are the same key)"""
+    if value is None:
+        return None
+    number = parse_integer(value)
+    if number is not None:
+        return number
+    text = str(value).strip()
+    return text.casefold() if text else None
+
+
+def normalize_text(value):
+    """Text compares trimmed and case-insensitively, like the MySQL collation"""
+    if value is None:
+        return None
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    text = str(value).strip()
+    return text.casefold() if text else None
+
+
+def row_key(raw_id, position):
+    """Key of a data row: its normalized id, or ("row", position) when the id cell is blank"""
+    key = normalize_integer(raw_id)
+    return ("row", position) if key is None else key
+
+
+def resolve_key(ref, keys, existing=()):
+    """Key a normalized reference points at among ``keys``, or None
+
+    An explicit id wins, then an id in ``existing`` (records already in the
+    database), then the blank-id row at that position.
+    """
+    if ref in keys or ref in existing:
+        return ref
+    position = ("row", ref)
+    return position if isinstance(ref, int) and position in keys else None
+
+
+def describe_key(key):
+    return f"row {key[1]}" if isinstance(key, tuple) else str(key)
+
+
+def normalizer_for(schema, column):
+    for col in schema.columns:
+        if col.name == column:
+            return normalize_integer if col.kind == INTEGER else normalize_text
+    return normalize_text
+
+
+def find_cycles(parents):
+    """Return the cycles of a child -> parent mapping, each as a list of keys
+
+    Every key is visited once, so this is linear in the number of rows.
+    """
+    state = {}
+    cycles = []
+    for start in parents:
+        if start in state:
+            continue
+        path = []
+        on_path = {}
+        node = start
+        while node is not None and node not in state:
+            state[node] = 1
+            on_path[node] = len(path)
+            path.append(node)
+            node = parents.get(node)
+        if node is not None and node in on_path:
+            cycles.append(path[on_path[node]:])
+        for visited in path:
+            state[visited] = 2
+    return cycles
+
+
+class SheetPlan:
+    """What has to be indexed and checked for one sheet, resolved against its header"""
+
+    def __init__(self, schema, positions):
+        self.schema = schema
+        self.positions = positions
+        self.id_idx = positions.get("id")
+        self.references = [
+            (column, positions[column], parent, normalizer_for(schema, column))
+            for sheet, column, parent in RELATIONSHIPS
+            if sheet == schema.title and column in positions
+        ]
+        self.uniques = [
+            (columns, [positions[column] for column in columns], [normalizer_for(schema, c) for c in columns])
+            for sheet, columns in UNIQUE_KEYS
+            if sheet == schema.title and all(column in positions for column in columns)
+        ]
+        self.consistency = []
+        for sheet, column, via, parent_column in CONSISTENT_REFERENCES:
+            if sheet == schema.title and column in positions and via in positions:
+                parent = next(p for s, c, p in RELATIONSHIPS if s == sheet and c == via)
+                self.consistency.append((column, positions[column], positions[via], parent, parent_column))
+        self.hierarchy = next(
+            (positions[column] for sheet, column in HIERARCHIES if sheet == schema.title and column in positions),
+            None,
+        )
+
+    def value(self, row, idx):
+        return row[idx] if idx < len(row) else None
+
+
+def check_sheets(sheets, errors, existing=None):
+    """Check integrity over (title, header, rows) triples given in fill order
+
+    ``existing`` optionally maps sheet titles to ids that already exist in
+    the database, so prefilled exports can reference them. Returns per-sheet
+    row and key counts.
+    """
+    existing = existing or {}
+    keys = {}
+    attributes = {}
+    stats = {}
+
+    # Parent columns whose values other sheets compare against
+    needed = {}
+    for sheet, column, via, parent_column in CONSISTENT_REFERENCES:
+        parent = next(p for s, c, p in RELATIONSHIPS if s == sheet and c == via)
+        needed.setdefault(parent, set()).add(parent_column)
+
+    known = {title: set(ids) for title, ids in existing.items()}
+    metrics = instrumentation()
+    for title, header, rows in sheets:
+        with metrics.span("sheet", sheet=title, stage="integrity") as span:
+            schema = SHEETS_BY_TITLE[title]
+            positions = {}
+            for col_idx, name in enumerate(header):
+                if isinstance(name, str) and name.strip():
+                    positions.setdefault(name.strip(), col_idx)
+            plan = SheetPlan(schema, positions)
+
+            sheet_keys = {}
+            stored = {
+                column: ({}, positions[column], normalizer_for(schema, column))
+                for column in needed.get(title, ()) if column in positions
+            }
+            seen_unique = [{} for _ in plan.uniques]
+            self_references = []
+            parents = {}
+            position = 0
+
+            for row_number, row in rows:
+                if not any(row) and all(value is None or value == "" for value in row):
+                    continue
+                position += 1
+
+                raw_id = plan.value(row, plan.id_idx) if plan.id_idx is not None else None
+                key = row_key(raw_id, position)
+                if key in sheet_keys:
+                    errors.add(
+                        title, row_number, "id", "duplicate_key",
+                        f"Duplicate id {key} (first used on row {sheet_keys[key]})",
+                        raw_id, (plan.id_idx or 0) + 1,
+                    )
+                else:
+                    sheet_keys[key] = row_number
+
+                for column, (values, idx, normalize) in stored.items():
+                    value = normalize(plan.value(row, idx))
+                    if value is not None:
+                        values[key] = value
+
+                for column, idx, parent, normalize in plan.references:
+                    raw = plan.value(row, idx)
+                    ref = normalize(raw)
+                    if ref is None:
+                        continue
+                    if parent == title:
+                        # Resolved once the whole sheet is indexed: they may point at later rows
+                        self_references.append((row_number, column, idx, ref, raw, key))
+                    elif resolve_key(ref, keys.get(parent, ()), known.get(parent, ())) is None:
+                        errors.add(
+                            title, row_number, column, "missing_reference",
+                            f"{column} {raw} does not exist in {parent}", raw, idx + 1,
+                        )
+
+                for (columns, idxs, normalizers), seen in zip(plan.uniques, seen_unique):
+                    values = tuple(normalize(plan.value(row, idx)) for idx, normalize in zip(idxs, normalizers))
+                    if None in values:
+                        continue
+                    first = seen.setdefault(values, row_number)
+                    if first != row_number:
+                        label = " + ".join(columns)
+                        errors.add(
+                            title, row_number, columns[-1], "duplicate_unique",
+                            f"Duplicate {label} (first used on row {first})",
+                            plan.value(row, idxs[-1]), idxs[-1] + 1,
+                        )
+
+                for column, idx, via_idx, parent, parent_column in plan.consistency:
+                    value = normalize_integer(plan.value(row, idx))
+                    via = normalize_integer(plan.value(row, via_idx))
+                    if value is None or via is None:
+                        continue
+                    parent_key = resolve_key(via, keys.get(parent, ()))
+                    expected = attributes.get((parent, parent_column), {}).get(parent_key)
+                    if expected is not None and expected != value:
+                        errors.add(
+                            title, row_number, column, "mismatched_reference",
+                            f"{column} {value} does not match {parent}.{parent_column} {expected}"
+                            f" of {schema.headers[via_idx]} {via}",
+                            plan.value(row, idx), idx + 1,
+                        )
+
+            for row_number, column, idx, ref, raw, key in self_references:
+                target = resolve_key(ref, sheet_keys, known.get(title, ()))
+                if target is None:
+                    errors.add(
+                        title, row_number, column, "missing_reference",
+                        f"{column} {raw} does not exist in {title}", raw, idx + 1,
+                    )
+                elif idx == plan.hierarchy:
+                    parents[key] = target
+
+            for cycle in find_cycles(parents):
+                chain = " -> ".join(describe_key(key) for key in cycle + cycle[:1])
+                row_number = sheet_keys.get(cycle[0])
+                errors.add(
+                    title, row_number, "parent_id", "parent_cycle",
+                    f"parent_id cycle: {chain}", None, plan.hierarchy + 1,
+                )
+
+            keys[title] = sheet_keys
+            for column, (values, _, _) in stored.items():
+                attributes[(title, column)] = values
+            stats[title] = {"rows": position, "keys": len(sheet_keys)}
+            span.set(rows=position, keys=len(sheet_keys))
+
+    return stats
+
+
+def check_integrity(path, max_errors=DEFAULT_MAX_ERRORS, engine=FAST_ENGINE, existing=None, template_sheets=None):
+    """Check referential integrity of a filled template and return a structured report"""
+    errors = IssueCollector(max_errors)
+    if template_sheets is None:
+        template_sheets = iter_template_sheets(path, engine)
+    stats = check_sheets(template_sheets, errors, existing)
+    return {
+        "file": str(path),
+        "valid": errors.count == 0,
+        "error_count": errors.count,
+        "truncated": errors.count > len(errors.issues),
+        "sheets": stats,
+        "errors": errors.issues,
+    }
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Check referential integrity of a filled Property Structure workbook")
+    parser.add_argument("file", help="Filled .xlsx template or columnar bundle directory")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    parser.add_argument(
+        "--max-errors", type=int, default=DEFAULT_MAX_ERRORS,
+        help=f"Number of errors to keep in the report (default: {DEFAULT_MAX_ERRORS})",
+    )
+    parser.add_argument("--engine", choices=ENGINES, default=FAST_ENGINE, help="Row reader (default: fast)")
+    add_instrumentation_arguments(parser)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    with instrumented_from_args(args):
+        report = check_integrity(args.file, args.max_errors, args.engine)
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2, default=str))
+    else:
+        for title in (schema.title for schema in SHEETS):
+            if title in report["sheets"]:
+                print(f"{title}: {report['sheets'][title]['rows']} rows")
+        for error in report["errors"]:
+            location = error["sheet"] + (f"!{error['cell']}" if error["cell"] else "")
+            print(f"  {location}: {error['message']}")
+        if report["truncated"]:
+            print(f"  ... {report['error_count'] - len(report['errors'])} more errors not shown")
+        print("References are consistent" if report["valid"] else f"Workbook has {report['error_count']} integrity errors")
+    sys.exit(0 if report["valid"] else 1)
@@ -0,0 +1,602 @@
+"""
+Bulk loader for filled Property Structure workbooks
+UnitImportService runs a duplicate-check SELECT and a single-row INSERT per
+row. This loader streams a validated template in fill order (Ownership ->
+Portfolio -> PortfolioLocation -> Building -> BuildingFloor -> Unit ->
+UnitSpecification), maps the template's temporary ids to real ids and writes
+each sheet with large multi-row INSERT statements inside batch transactions.
+
+Real ids are allocated up front from MAX(id) of each table, so foreign keys
+can be resolved without reading anything back; the loader assumes it is the
+only writer to these tables while it runs. parent_id values that point at a
+later row of the same sheet are filled in with one UPDATE pass per sheet.
+
+The target is the schema of create_property_structure_tables.php plus the
+ownerships table; SQLITE_SCHEMA mirrors it so a load can be run end to end
+against a local SQLite file.
+
+Usage:
+    python property_structure_loader.py filled.xlsx --sqlite import.db [--create-schema]
+        [--batch-size 500] [--commit-every 50000] [--row-at-a-time] [--skip-checks]
+        [--engine fast|parallel|openpyxl|compact]
+"""
+
+import argparse
+import itertools
+import json
+import sqlite3
+import sys
+import time
+import uuid
+from dataclasses import dataclass
+from datetime import datetime
+
+from property_structure_columnar import is_bundle
+from property_structure_instrumentation import add_arguments as add_instrumentation_arguments
+from property_structure_instrumentation import current as instrumentation
+from property_structure_instrumentation import instrumented_from_args
+from property_structure_integrity import check_integrity, normalize_integer, resolve_key, row_key
+from property_structure_schema import (
+    BOOLEAN,
+    DECIMAL,
+    HIERARCHIES,
+    INTEGER,
+    RELATIONSHIPS,
+    SHEETS,
+    SHEETS_BY_TITLE,
+    STRING,
+    UNIQUE_KEYS,
+    YEAR,
+)
+from validate_property_structure import (
+    COLUMN_ENGINES,
+    DEFAULT_MAX_ERRORS,
+    ENGINES,
+    FAST_ENGINE,
+    columns_to_sheets,
+    iter_template_sheets,
+    parse_boolean,
+    parse_decimal,
+    parse_integer,
+    read_sheet_columns,
+    validate_workbook,
+)
+
+DEFAULT_BATCH_SIZE = 500
+
+# SQLite caps the number of bound parameters per statement
+SQLITE_MAX_VARIABLES = 32766 if sqlite3.sqlite_version_info >= (3, 32, 0) else 999
+
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS ownerships (
+    id INTEGER PRIMARY KEY,
+    uuid CHAR(36) NOT NULL UNIQUE,
+    name VARCHAR(255) NOT NULL,
+    legal VARCHAR(255),
+    type VARCHAR(50) NOT NULL,
+    ownership_type VARCHAR(50) NOT NULL,
+    registration VARCHAR(100) UNIQUE,
+    tax_id VARCHAR(100),
+    street VARCHAR(255),
+    city VARCHAR(100) NOT NULL,
+    state VARCHAR(100),
+    country VARCHAR(100) NOT NULL DEFAULT 'Saudi Arabia',
+    zip_code VARCHAR(20),
+    email VARCHAR(255),
+    phone VARCHAR(20),
+    active BOOLEAN NOT NULL DEFAULT 1,
+    created_by INTEGER,
+    created_at TIMESTAMP,
+    updated_at TIMESTAMP
+);
+CREATE TABLE IF NOT EXISTS portfolios (
+    id INTEGER PRIMARY KEY,
+    uuid CHAR(36) NOT NULL UNIQUE,
+    ownership_id INTEGER NOT NULL REFERENCES ownerships(id) ON DELETE CASCADE,
+    parent_id INTEGER REFERENCES portfolios(id) ON DELETE CASCADE,
+    name VARCHAR(255) NOT NULL,
+    code VARCHAR(50) NOT NULL UNIQUE,
+    type VARCHAR(50) NOT NULL DEFAULT 'general',
+    description TEXT,
+    area DECIMAL(12, 2),
+    active BOOLEAN NOT NULL DEFAULT 1,
+    created_at TIMESTAMP,
+    updated_at TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS portfolios_ownership_id_index ON portfolios (ownership_id);
+CREATE INDEX IF NOT EXISTS portfolios_parent_id_index ON portfolios (parent_id);
+CREATE TABLE IF NOT EXISTS portfolio_locations (
+    id INTEGER PRIMARY KEY,
+    portfolio_id INTEGER NOT NULL REFERENCES portfolios(id) ON DELETE CASCADE,
+    street VARCHAR(255),
+    city VARCHAR(100),
+    state VARCHAR(100),
+    country VARCHAR(100) NOT NULL DEFAULT 'Saudi Arabia',
+    zip_code VARCHAR(20),
+    latitude DECIMAL(10, 8),
+    longitude DECIMAL(11, 8),
+    `primary` BOOLEAN NOT NULL DEFAULT 0,
+    UNIQUE (portfolio_id, `primary`)
+);
+CREATE TABLE IF NOT EXISTS buildings (
+    id INTEGER PRIMARY KEY,
+    uuid CHAR(36) NOT NULL UNIQUE,
+    portfolio_id INTEGER NOT NULL REFERENCES portfolios(id) ON DELETE CASCADE,
+    ownership_id INTEGER NOT NULL REFERENCES ownerships(id) ON DELETE CASCADE,
+    parent_id INTEGER REFERENCES buildings(id) ON DELETE CASCADE,
+    name VARCHAR(255) NOT NULL,
+    code VARCHAR(50) NOT NULL,
+    type VARCHAR(50) NOT NULL,
+    description TEXT,
+    street VARCHAR(255),
+    city VARCHAR(100),
+    state VARCHAR(100),
+    country VARCHAR(100) NOT NULL DEFAULT 'Saudi Arabia',
+    zip_code VARCHAR(20),
+    latitude DECIMAL(10, 8),
+    longitude DECIMAL(11, 8),
+    floors INTEGER NOT NULL DEFAULT 1,
+    year INTEGER,
+    active BOOLEAN NOT NULL DEFAULT 1,
+    created_at TIMESTAMP,
+    updated_at TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS buildings_portfolio_id_index ON buildings (portfolio_id);
+CREATE INDEX IF NOT EXISTS buildings_ownership_id_index ON buildings (ownership_id);
+CREATE INDEX IF NOT EXISTS buildings_parent_id_index ON buildings (parent_id);
+CREATE INDEX IF NOT EXISTS buildings_code_index ON buildings (code);
+CREATE TABLE IF NOT EXISTS building_floors (
+    id INTEGER PRIMARY KEY,
+    building_id INTEGER NOT NULL REFERENCES buildings(id) ON DELETE CASCADE,
+    number INTEGER NOT NULL,
+    name VARCHAR(100),
+    description TEXT,
+    units INTEGER NOT NULL DEFAULT 0,
+    active BOOLEAN NOT NULL DEFAULT 1,
+    UNIQUE (building_id, number)
+);
+CREATE TABLE IF NOT EXISTS units (
+    id INTEGER PRIMARY KEY,
+    uuid CHAR(36) NOT NULL UNIQUE,
+    building_id INTEGER NOT NULL REFERENCES buildings(id) ON DELETE CASCADE,
+    floor_id INTEGER REFERENCES building_floors(id) ON DELETE SET NULL,
+    ownership_id INTEGER NOT NULL REFERENCES ownerships(id) ON DELETE CASCADE,
+    number VARCHAR(50) NOT NULL,
+    type VARCHAR(50) NOT NULL,
+    name VARCHAR(255),
+    description TEXT,
+    area DECIMAL(8, 2) NOT NULL,
+    price_monthly DECIMAL(12, 2),
+    price_quarterly DECIMAL(12, 2),
+    price_yearly DECIMAL(12, 2),
+    status VARCHAR(50) NOT NULL DEFAULT 'available',
+    active BOOLEAN NOT NULL DEFAULT 1,
+    created_at TIMESTAMP,
+    updated_at TIMESTAMP,
+    UNIQUE (building_id, number)
+);
+CREATE INDEX IF NOT EXISTS units_floor_id_index ON units (floor_id);
+CREATE INDEX IF NOT EXISTS units_ownership_id_index ON units (ownership_id);
+CREATE TABLE IF NOT EXISTS unit_specifications (
+    id INTEGER PRIMARY KEY,
+    unit_id INTEGER NOT NULL REFERENCES units(id) ON DELETE CASCADE,
+    `key` VARCHAR(255) NOT NULL,
+    value TEXT,
+    type VARCHAR(50),
+    UNIQUE (unit_id, `key`)
+);
+"""
+
+
+class LoadError(Exception):
+    """Raised when a workbook cannot be loaded; the open transaction is rolled back"""
+
+
+@dataclass(frozen=True)
+class Table:
+    """Database table behind one template sheet"""
+    name: str
+    uuid: bool = False
+    timestamps: bool = False
+    # Column defaults from the migrations, applied to empty cells
+    defaults: tuple = ()
+
+
+TABLES = {
+    "Ownership": Table("ownerships", uuid=True, timestamps=True, defaults=(("country", "Saudi Arabia"), ("active", 1))),
+    "Portfolio": Table("portfolios", uuid=True, timestamps=True, defaults=(("type", "general"), ("active", 1))),
+    "PortfolioLocation": Table("portfolio_locations", defaults=(("country", "Saudi Arabia"), ("primary", 0))),
+    "Building": Table(
+        "buildings", uuid=True, timestamps=True,
+        defaults=(("country", "Saudi Arabia"), ("floors", 1), ("active", 1)),
+    ),
+    "BuildingFloor": Table("building_floors", defaults=(("units", 0), ("active", 1))),
+    "Unit": Table("units", uuid=True, timestamps=True, defaults=(("status", "available"), ("active", 1))),
+    "UnitSpecification": Table("unit_specifications"),
+}
+
+
+@dataclass
+class SheetInsert:
+    """A sheet resolved for inserting: target table, output columns and column converters"""
+    title: str
+    table: Table
+    columns: list
+    # (column, header index, converter, parent sheet or None, default)
+    readers: list
+    id_idx: object
+    hierarchy: object
+    now: object
+
+
+def quote(name):
+    """Quote an identifier (primary and key are reserved words); backticks work in MySQL and SQLite"""
+    return f"`{name}`"
+
+
+def create_sqlite_schema(conn):
+    """Create the property structure tables in a SQLite database"""
+    conn.executescript(SQLITE_SCHEMA)
+
+
+def _text(value):
+    if value.__class__ is str:
+        value = value.strip()
+        return value or None
+    if value is None:
+        return None
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    text = str(value).strip()
+    return text or None
+
+
+def _boolean(value):
+    parsed = parse_boolean(value)
+    return None if parsed is None else int(parsed)
+
+
+def _blank_to_none(parse, native):
+    """Wrap a cell parser: blanks become None, values already of a native type pass through"""
+    def convert(value):
+        if value.__class__ in native:
+            return value
+        if value is None or (isinstance(value, str) and not value.strip()):
+            return None
+        return parse(value)
+    return convert
+
+
+CONVERTERS = {
+    STRING: _text,
+    INTEGER: _blank_to_none(parse_integer, (int,)),
+    YEAR: _blank_to_none(parse_integer, (int,)),
+    DECIMAL: _blank_to_none(parse_decimal, (int, float)),
+    BOOLEAN: _boolean,
+}
+
+
+class IdAllocator:
+    """Hands out real ids per table, continuing after the current MAX(id)"""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.counters = {}
+
+    def reserve(self, table):
+        """Return the iterator of fresh ids for a table"""
+        if table not in self.counters:
+            (current,) = self.conn.execute(f"SELECT COALESCE(MAX(id), 0) FROM {quote(table)}").fetchone()
+            self.counters[table] = itertools.count(current + 1)
+        return self.counters[table]
+
+
+class BulkLoader:
+    """Writes template sheets to the database in fill order
+
+    ``batch_size`` is the number of rows per INSERT statement (capped by the
+    driver's parameter limit) and ``commit_every`` the number of rows per
+    transaction; ``None`` loads everything in a single transaction, like
+    UnitImportService. ``row_at_a_time`` reproduces the PHP importer's
+    per-row SELECT + INSERT, for comparison.
+    """
+
+    def __init__(self, conn, batch_size=DEFAULT_BATCH_SIZE, commit_every=None, placeholder="?",
+                 max_variables=SQLITE_MAX_VARIABLES, row_at_a_time=False):
+        self.conn = conn
+        self.batch_size = batch_size
+        self.commit_every = commit_every
+        self.placeholder = placeholder
+        self.max_variables = max_variables
+        self.row_at_a_time = row_at_a_time
+        self.ids = IdAllocator(conn)
+        # Sheet title -> {template key: real id}
+        self.id_maps = {}
+        self._uncommitted = 0
+
+    def load(self, sheets):
+        """Load (title, header, rows) triples in fill order and commit; returns per-sheet stats"""
+        stats = {}
+        metrics = instrumentation()
+        try:
+            for title, header, rows in sheets:
+                with metrics.span("sheet", sheet=title, stage="load") as span:
+                    stats[title] = self.load_sheet(title, header, rows)
+                    span.set(rows=stats[title]["rows"])
+            with metrics.span("commit"):
+                self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+        return stats
+
+    def prepare_sheet(self, title, header):
+        """Resolve a sheet's header against its table: output columns and per-column converters"""
+        schema = SHEETS_BY_TITLE[title]
+        table = TABLES[title]
+        positions = {}
+        for col_idx, name in enumerate(header):
+            if isinstance(name, str) and name.strip():
+                positions.setdefault(name.strip(), col_idx)
+
+        foreign_keys = {column: parent for sheet, column, parent in RELATIONSHIPS if sheet == title}
+        defaults = dict(table.defaults)
+
+        # Output columns: id, optional uuid, every template column the sheet has, timestamps
+        columns = ["id"] + (["uuid"] if table.uuid else [])
+        readers = []
+        for column in schema.columns:
+            if column.name == "id":
+                continue
+            columns.append(column.name)
+            idx = positions.get(column.name)
+            convert = normalize_integer if column.name in foreign_keys else CONVERTERS.get(column.kind, _text)
+            readers.append((column.name, idx, convert, foreign_keys.get(column.name), defaults.get(column.name)))
+        if table.timestamps:
+            columns += ["created_at", "updated_at"]
+
+        return SheetInsert(
+            title=title,
+            table=table,
+            columns=columns,
+            readers=readers,
+            id_idx=positions.get("id"),
+            hierarchy=next((column for sheet, column in HIERARCHIES if sheet == title), None),
+            now=datetime.now().strftime("%Y-%m-%d %H:%M:%S") if table.timestamps else None,
+        )
+
+    def convert_row(self, sheet, row_number, row, key, real_id, deferred_parents):
+        """Map a template row to its INSERT values and record ``key -> real_id``
+
+        Foreign keys are resolved through the id maps of the sheets loaded
+        so far (see resolve_key). A parent_id is only resolved right away
+        when it names an explicit id already loaded; otherwise it is left
+        NULL and appended to ``deferred_parents``, since a later row may
+        still carry that id. Raises LoadError for any other unknown
+        reference.
+        """
+        title = sheet.title
+        self.id_maps.setdefault(title, {})[key] = real_id
+        row_len = len(row)
+        values = [real_id]
+        if sheet.table.uuid:
+            values.append(str(uuid.uuid4()))
+        for name, idx, convert, parent, default in sheet.readers:
+            value = convert(row[idx]) if idx is not None and idx < row_len else None
+            if parent is not None and value is not None:
+                id_map = self.id_maps.get(parent, {})
+                resolved = id_map.get(value)
+                if resolved is None:
+                    if name == sheet.hierarchy:
+                        deferred_parents.append((real_id, value, row_number))
+                    else:
+                        # Blank-id parents are only reachable by position
+                        resolved = id_map.get(("row", value))
+                        if resolved is None:
+                            raise LoadError(f"{title} row {row_number}: {name} {value} does not exist in {parent}")
+                value = resolved
+            if value is None:
+                value = default
+            values.append(value)
+        if sheet.now is not None:
+            values += [sheet.now, sheet.now]
+        return values
+
+    def row_key(self, sheet, row, position):
+        """Template key of a row: its id cell, or ("row", position) among the sheet's data rows when it is blank"""
+        return row_key(row[sheet.id_idx] if sheet.id_idx is not None and sheet.id_idx < len(row) else None, position)
+
+    def load_sheet(self, title, header, rows):
+        sheet = self.prepare_sheet(title, header)
+        table = sheet.table
+        columns = sheet.columns
+        new_ids = self.ids.reserve(table.name)
+        deferred_parents = []
+        batch = []
+        position = 0
+        started = time.perf_counter()
+
+        for row_number, row in rows:
+            if not any(row) and all(value is None or value == "" for value in row):
+                continue
+            position += 1
+            values = self.convert_row(sheet, row_number, row, self.row_key(sheet, row, position), next(new_ids),
+                                      deferred_parents)
+
+            if self.row_at_a_time:
+                self._insert_one(title, table.name, columns, values)
+            else:
+                batch.append(values)
+                if len(batch) >= self._rows_per_statement(columns):
+                    self._insert_many(title, table.name, columns, batch)
+                    batch = []
+
+        if batch:
+            self._insert_many(title, table.name, columns, batch)
+
+        if deferred_parents:
+            self.update_parents(sheet, deferred_parents)
+
+        elapsed = time.perf_counter() - started
+        return {
+            "rows": position,
+            "seconds": round(elapsed, 3),
+            "rows_per_second": round(position / elapsed) if elapsed and position else 0,
+        }
+
+    def update_parents(self, sheet, deferred_parents):
+        """Fill in parent_id values that pointed at later rows of the same sheet"""
+        id_map = self.id_maps.get(sheet.title, {})
+        updates = []
+        for real_id, parent_key, row_number in deferred_parents:
+            parent_id = id_map.get(resolve_key(parent_key, id_map))
+            if parent_id is None:
+                raise LoadError(f"{sheet.title} row {row_number}: {sheet.hierarchy} {parent_key} does not exist in {sheet.title}")
+            updates.append((parent_id, real_id))
+        p = self.placeholder
+        self.conn.cursor().executemany(
+            f"UPDATE {quote(sheet.table.name)} SET {quote(sheet.hierarchy)} = {p} WHERE id = {p}", updates,
+        )
+
+    def insert_rows(self, sheet, rows):
+        """INSERT converted rows with as few statements as the parameter limit allows"""
+        step = self._rows_per_statement(sheet.columns)
+        for start in range(0, len(rows), step):
+            self._insert_many(sheet.title, sheet.table.name, sheet.columns, rows[start:start + step])
+
+    def _rows_per_statement(self, columns):
+        return max(1, min(self.batch_size, self.max_variables // len(columns)))
+
+    def _insert_many(self, title, table, columns, batch):
+        p = self.placeholder
+        row_sql = "(" + ", ".join([p] * len(columns)) + ")"
+        sql = (
+            f"INSERT INTO {quote(table)} ({', '.join(quote(c) for c in columns)}) VALUES "
+            + ", ".join([row_sql] * len(batch))
+        )
+        params = [value for values in batch for value in values]
+        try:
+            self.conn.execute(sql, params)
+        except Exception as e:
+            raise LoadError(f"{title}: insert of {len(batch)} rows failed: {e}") from e
+        self._count(len(batch))
+
+    def _insert_one(self, title, table, columns, values):
+        """One duplicate check and one INSERT per row, as UnitImportService does"""
+        p = self.placeholder
+        for sheet, unique in UNIQUE_KEYS:
+            if sheet == title:
+                where = " AND ".join(f"{quote(c)} = {p}" for c in unique)
+                params = [values[columns.index(c)] for c in unique]
+                if self.conn.execute(f"SELECT 1 FROM {quote(table)} WHERE {where} LIMIT 1", params).fetchone():
+                    raise LoadError(f"{title}: duplicate {' + '.join(unique)} {params}")
+        sql = (
+            f"INSERT INTO {quote(table)} ({', '.join(quote(c) for c in columns)}) "
+            f"VALUES ({', '.join([p] * len(columns))})"
+        )
+        try:
+            self.conn.execute(sql, values)
+        except Exception as e:
+            raise LoadError(f"{title}: insert failed: {e}") from e
+        self._count(1)
+
+    def _count(self, rows):
+        if self.commit_every is None:
+            return
+        self._uncommitted += rows
+        if self._uncommitted >= self.commit_every:
+            self.conn.commit()
+            self._uncommitted = 0
+
+
+def load_workbook(path, conn, check=True, engine=FAST_ENGINE, **options):
+    """Validate and integrity-check a filled template, then bulk load it
+
+    The streaming engines read the workbook once per pass; the parallel
+    and compact engines parse it once into columns that every pass reuses. Returns a
+    report with the per-sheet row counts and throughput, or the
+    validation/integrity errors when the workbook is rejected.
+    """
+    if engine in COLUMN_ENGINES and not is_bundle(path):
+        columns = read_sheet_columns(path, engine)
+
+        def template_sheets():
+            return columns_to_sheets(columns)
+    else:
+        def template_sheets():
+            return iter_template_sheets(path, engine)
+
+    if check:
+        checks = (
+            ("validation", lambda: validate_workbook(path, template_sheets=template_sheets())),
+            ("integrity", lambda: check_integrity(path, template_sheets=template_sheets())),
+        )
+        for name, run in checks:
+            report = run()
+            if not report["valid"]:
+                return {"file": str(path), "loaded": False, "stage": name, "errors": report["errors"]}
+
+    loader = BulkLoader(conn, **options)
+    started = time.perf_counter()
+    stats = loader.load(template_sheets())
+    elapsed = time.perf_counter() - started
+    total = sum(sheet["rows"] for sheet in stats.values())
+    return {
+        "file": str(path),
+        "loaded": True,
+        "rows": total,
+        "seconds": round(elapsed, 3),
+        "sheets": stats,
+    }
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Bulk load a filled Property Structure workbook")
+    parser.add_argument("file", help="Filled .xlsx template or columnar bundle directory")
+    parser.add_argument("--sqlite", required=True, help="SQLite database file to load into")
+    parser.add_argument("--create-schema", action="store_true", help="Create the tables if they do not exist")
+    parser.add_argument(
+        "--batch-size", type=int, default=DEFAULT_BATCH_SIZE,
+        help=f"Rows per INSERT statement (default: {DEFAULT_BATCH_SIZE})",
+    )
+    parser.add_argument("--commit-every", type=int, help="Rows per transaction (default: one transaction)")
+    parser.add_argument("--row-at-a-time", action="store_true", help="Insert row by row like UnitImportService")
+    parser.add_argument("--skip-checks", action="store_true", help="Do not validate the workbook first")
+    parser.add_argument("--engine", choices=ENGINES, default=FAST_ENGINE, help="Row reader (default: fast)")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    add_instrumentation_arguments(parser)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    conn = sqlite3.connect(args.sqlite)
+    conn.execute("PRAGMA foreign_keys = ON")
+    if args.create_schema:
+        create_sqlite_schema(conn)
+    try:
+        with instrumented_from_args(args):
+            report = load_workbook(
+                args.file, conn, check=not args.skip_checks, batch_size=args.batch_size,
+                commit_every=args.commit_every, row_at_a_time=args.row_at_a_time, engine=args.engine,
+            )
+    except LoadError as e:
+        print(f"Load failed: {e}")
+        sys.exit(1)
+    finally:
+        conn.close()
+
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2, default=str))
+    elif not report["loaded"]:
+        for error in report["errors"][:DEFAULT_MAX_ERRORS]:
+            location = error["sheet"] + (f"!{error['cell']}" if error["cell"] else "")
+            print(f"  {location}: {error['message']}")
+        print(f"Workbook rejected by {report['stage']} checks; nothing was loaded")
+    else:
+        for title in (schema.title for schema in SHEETS):
+            if title in report["sheets"]:
+                sheet = report["sheets"][title]
+                print(f"{title}: {sheet['rows']} rows in {sheet['seconds']}s ({sheet['rows_per_second']} rows/s)")
+        print(f"Loaded {report['rows']} rows in {report['seconds']}s")
+    sys.exit(0 if report["loaded"] else 1)
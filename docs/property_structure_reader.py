@@ -0,0 +1,454 @@
+"""
+Fast streaming row reader for filled Property Structure workbooks
+openpyxl's read-only mode builds a Cell object per value and needs close to a
+minute for a 100k-unit workbook. The template only holds plain values, so
+this reader scans the worksheet XML inside the xlsx zip directly, in fixed
+size chunks, and yields plain value tuples. Memory is bounded by the chunk
+size plus the shared string table.
+
+Values are returned the way openpyxl returns them for plain cells: str for
+text, int/float for numbers, bool for booleans and None for empty cells.
+Number formats (dates) are not applied; the template has no date columns.
+
+read_workbook_columns() parses the worksheets in a process pool: each
+worker reads one sheet, or one byte range of a large sheet, and sends back
+compact columns (typed arrays where a column is all int or all float)
+instead of per-row objects, which keeps pickling cheap.
+"""
+
+import html
+import itertools
+import os
+import posixpath
+import re
+import zipfile
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+
+CHUNK_SIZE = 4 * 1024 * 1024
+
+# Sheets are split into one task per this many bytes of uncompressed XML
+SLICE_SIZE = 4 * CHUNK_SIZE
+
+SHEET_DATA_RE = re.compile(rb"<(\w+:)?sheetData\b")
+# Cell type, column letters and inner XML of a cell; t= is found with a
+# lookahead from the start of the tag, so it may come before or after r=
+CELL_RE = re.compile(
+    rb'<(?:\w+:)?c\b(?:(?=[^>]*?\bt="(\w+)"))?(?:[^>]*?\br="([A-Z]+)\d+")?[^>]*?(?:/>|>(.*?)</(?:\w+:)?c>)',
+    re.S,
+)
+ROW_NUMBER_RE = re.compile(rb'\br="(\d+)"')
+VALUE_RE = re.compile(rb"<(?:\w+:)?v>(.*?)</(?:\w+:)?v>", re.S)
+TEXT_RE = re.compile(rb"<(?:\w+:)?t(?:\s[^>]*)?>(.*?)</(?:\w+:)?t>", re.S)
+PHONETIC_RE = re.compile(rb"<(?:\w+:)?rPh\b.*?</(?:\w+:)?rPh>", re.S)
+SI_RE = re.compile(rb"<(?:\w+:)?si>(.*?)</(?:\w+:)?si>|<(?:\w+:)?si/>", re.S)
+SHEET_RE = re.compile(rb"<(?:\w+:)?sheet\b([^>]*?)/?>")
+RELATIONSHIP_RE = re.compile(rb"<(?:\w+:)?Relationship\b([^>]*?)/?>")
+ATTR_RE = re.compile(rb'([\w:]+)="([^"]*)"')
+RANGE_TAG_RE = re.compile(rb'<(?:\w+:)?(dimension|dataValidation)\b[^>]*?\b(?:sq)?ref="([^"]*)"')
+
+_COLUMN_INDEX = {}
+
+
+def column_index(letters):
+    """Zero-based column index for column letters (b'A' -> 0)"""
+    index = _COLUMN_INDEX.get(letters)
+    if index is None:
+        index = 0
+        for char in letters:
+            index = index * 26 + (char - 64)
+        index -= 1
+        _COLUMN_INDEX[letters] = index
+    return index
+
+
+def _text(raw):
+    text = raw.decode("utf-8")
+    if "&" in text:
+        text = html.unescape(text)
+    return text
+
+
+def _rich_text(raw):
+    """Concatenate the <t> runs of an inline or shared string"""
+    if b"<rPh" in raw:
+        raw = PHONETIC_RE.sub(b"", raw)
+    return "".join(_text(part) for part in TEXT_RE.findall(raw))
+
+
+def _number(raw):
+    try:
+        return int(raw)
+    except ValueError:
+        return float(raw)
+
+
+def _attributes(raw):
+    return {key.decode(): _text(value) for key, value in ATTR_RE.findall(raw)}
+
+
+def sheet_parts(zf):
+    """Map sheet titles to their worksheet part names inside the zip"""
+    targets = {}
+    for match in RELATIONSHIP_RE.finditer(zf.read("xl/_rels/workbook.xml.rels")):
+        attrs = _attributes(match.group(1))
+        target = attrs.get("Target", "")
+        if target.startswith("/"):
+            target = target[1:]
+        else:
+            target = posixpath.normpath(posixpath.join("xl", target))
+        targets[attrs.get("Id")] = target
+
+    parts = {}
+    for match in SHEET_RE.finditer(zf.read("xl/workbook.xml")):
+        attrs = _attributes(match.group(1))
+        rel_id = next((value for key, value in attrs.items() if key.endswith(":id")), None)
+        if rel_id in targets:
+            parts[attrs.get("name")] = targets[rel_id]
+    return parts
+
+
+def load_shared_strings(zf):
+    """Read the shared string table (empty list when the workbook has none)"""
+    try:
+        data = zf.read("xl/sharedStrings.xml")
+    except KeyError:
+        return []
+    return [_rich_text(match.group(1)) if match.group(1) else "" for match in SI_RE.finditer(data)]
+
+
+def parse_row(body, shared_strings):
+    """Decode the cells of one <row> element into a list of values"""
+    values = []
+    append = values.append
+    position = 0
+    for cell_type, letters, content in CELL_RE.findall(body):
+        if letters:
+            index = _COLUMN_INDEX.get(letters)
+            if index is None:
+                index = column_index(letters)
+            if index > position:
+                values.extend([None] * (index - position))
+            position = index + 1
+        else:
+            position += 1
+
+        if not content:
+            append(None)
+            continue
+        if content.startswith(b"<v>") and content.endswith(b"</v>"):
+            raw = content[3:-4]
+        elif cell_type == b"inlineStr":
+            if content.startswith(b"<is><t>") and content.endswith(b"</t></is>") and content.count(b"<t") == 1:
+                append(_text(content[7:-9]))
+            else:
+                append(_rich_text(content))
+            continue
+        else:
+            raw = VALUE_RE.search(content)
+            if raw is None:
+                append(None)
+                continue
+            raw = raw.group(1)
+
+        if cell_type == b"s":
+            append(shared_strings[int(raw)])
+        elif not cell_type or cell_type == b"n":
+            append(_number(raw) if raw else None)
+        elif cell_type == b"b":
+            append(raw == b"1")
+        else:  # str (formula result), e (error)
+            append(_text(raw))
+    return values
+
+
+def _split_rows(block, prefix):
+    """Yield (attributes, body) for each <row> of a block ending at a row boundary
+
+    Splitting on the closing tag is much cheaper than a lazy regex over the
+    whole block; self-closing (empty) rows are skipped.
+    """
+    open_tag = b"<" + prefix + b"row"
+    for piece in block.split(b"</" + prefix + b"row>"):
+        start = max(piece.rfind(open_tag + b" "), piece.rfind(open_tag + b">"))
+        if start < 0:
+            continue
+        end = piece.find(b">", start)
+        if end < 0 or piece[end - 1:end] == b"/":
+            continue
+        yield piece[start + len(open_tag):end], piece[end + 1:]
+
+
+def _last_row_number(block, prefix, last_row):
+    """Row number after a block that was skipped without parsing"""
+    open_tag = b"<" + prefix + b"row"
+    start = max(block.rfind(open_tag + b" "), block.rfind(open_tag + b">"))
+    if start >= 0:
+        number = ROW_NUMBER_RE.search(block, start, block.find(b">", start))
+        if number:
+            return int(number.group(1))
+    return last_row + block.count(b"</" + prefix + b"row>")
+
+
+def iter_part_rows(zf, part, shared_strings, min_row=1, chunk_size=CHUNK_SIZE, byte_range=None):
+    """Yield (row number, values) for every non-empty row of a worksheet part
+
+    With ``byte_range=(start, end)`` only the blocks starting inside that
+    range of the uncompressed XML are parsed, so several workers can share
+    one large sheet; block boundaries only depend on ``chunk_size``.
+    """
+    buffer = b""
+    prefix = None
+    last_row = 0
+    offset = 0
+    with zf.open(part) as stream:
+        while True:
+            chunk = stream.read(chunk_size)
+            if chunk:
+                buffer += chunk
+                if prefix is None:
+                    match = SHEET_DATA_RE.search(buffer)
+                    if match is None:
+                        continue
+                    prefix = match.group(1) or b""
+                row_end = b"</" + prefix + b"row>"
+                cut = buffer.rfind(row_end)
+                if cut < 0:
+                    continue
+                cut += len(row_end)
+                block, buffer = buffer[:cut], buffer[cut:]
+            else:
+                block, buffer = buffer, b""
+                if prefix is None:
+                    break
+
+            block_start = offset
+            offset += len(block)
+            if byte_range is not None:
+                if block_start >= byte_range[1]:
+                    break
+                if block_start < byte_range[0]:
+                    last_row = _last_row_number(block, prefix, last_row)
+                    continue
+
+            for attrs, body in _split_rows(block, prefix):
+                number = ROW_NUMBER_RE.search(attrs)
+                last_row = int(number.group(1)) if number else last_row + 1
+                if last_row < min_row:
+                    continue
+                values = parse_row(body, shared_strings)
+                if values:
+                    yield last_row, values
+
+            if not chunk:
+                break
+
+
+def iter_part_ranges(zf, part, chunk_size=CHUNK_SIZE):
+    """Yield (tag, ref) for the <dimension> and <dataValidation> ranges of a worksheet part
+
+    A dataValidation ref may hold several space separated ranges. The whole
+    part is scanned since data validations follow the sheet data.
+    """
+    buffer = b""
+    with zf.open(part) as stream:
+        while True:
+            chunk = stream.read(chunk_size)
+            buffer += chunk
+            # A tag can only be cut off after the last '<' of the buffer
+            cut = buffer.rfind(b"<") if chunk else len(buffer)
+            if cut > 0:
+                # Most chunks are plain rows; find() is much cheaper than the regex
+                if buffer.find(b"dimension", 0, cut) >= 0 or buffer.find(b"dataValidation", 0, cut) >= 0:
+                    for match in RANGE_TAG_RE.finditer(buffer, 0, cut):
+                        yield match.group(1).decode(), match.group(2).decode()
+                buffer = buffer[cut:]
+            if not chunk:
+                break
+
+
+def iter_sheet_rows(path, title, min_row=1):
+    """Yield (row number, values) for a worksheet of an xlsx file, by title"""
+    with zipfile.ZipFile(path) as zf:
+        parts = sheet_parts(zf)
+        if title not in parts:
+            raise KeyError(f"Worksheet {title} does not exist.")
+        shared_strings = load_shared_strings(zf)
+        yield from iter_part_rows(zf, parts[title], shared_strings, min_row)
+
+
+def read_workbook_rows(path, titles=None):
+    """Yield (title, row iterator) pairs for the requested sheets present in the workbook
+
+    The zip and the shared string table are opened once for all sheets.
+    """
+    with zipfile.ZipFile(path) as zf:
+        parts = sheet_parts(zf)
+        shared_strings = load_shared_strings(zf)
+        for title in titles if titles is not None else list(parts):
+            if title in parts:
+                yield title, iter_part_rows(zf, parts[title], shared_strings)
+
+
+def split_header(rows, first_data_row=2):
+    """Split (row number, values) pairs into the header (row 1) values and the data rows
+
+    Rows between the header and ``first_data_row`` (the template's
+    description row) are dropped.
+    """
+    rows = iter(rows)
+    first = next(rows, None)
+    if first is None:
+        return (), rows
+    if first[0] == 1:
+        header = first[1]
+    else:
+        header = ()
+        rows = itertools.chain([first], rows)
+    return header, (row for row in rows if row[0] >= first_data_row)
+
+
+class SheetColumns:
+    """Rows of one worksheet stored column by column
+
+    ``row_numbers`` is an array of sheet row numbers and ``columns`` holds one
+    array (all int or all float) or list (anything else) per column, padded
+    with None so every column has one value per row. Rows above the data
+    (header and description) are kept as-is in ``head`` so they do not turn
+    typed columns into lists.
+    """
+
+    __slots__ = ("head", "row_numbers", "columns")
+
+    def __init__(self, head=None, row_numbers=None, columns=None):
+        self.head = head if head is not None else []
+        self.row_numbers = row_numbers if row_numbers is not None else array("q")
+        self.columns = columns if columns is not None else []
+
+    def __len__(self):
+        return len(self.row_numbers)
+
+    def rows(self):
+        """Yield (row number, values) pairs, as iter_part_rows does"""
+        yield from self.head
+        if self.columns:
+            yield from zip(self.row_numbers, zip(*self.columns))
+
+    @classmethod
+    def from_rows(cls, rows, first_row=1):
+        """Build columns from (row number, values) pairs; rows above ``first_row`` go to ``head``"""
+        head = []
+        row_numbers = array("q")
+        columns = []
+        for number, values in rows:
+            if number < first_row:
+                head.append((number, values))
+                continue
+            count = len(row_numbers)
+            row_numbers.append(number)
+            while len(columns) < len(values):
+                columns.append([None] * count)
+            for column, value in zip(columns, values):
+                column.append(value)
+            for column in columns[len(values):]:
+                column.append(None)
+        return cls(head, row_numbers, [_compact(column) for column in columns])
+
+    @classmethod
+    def concat(cls, parts):
+        """Join consecutive slices of one sheet"""
+        parts = [part for part in parts if len(part) or part.head]
+        if len(parts) == 1:
+            return parts[0]
+        merged = cls()
+        for part in parts:
+            merged.head.extend(part.head)
+        width = max((len(part.columns) for part in parts), default=0)
+        for part in parts:
+            merged.row_numbers.extend(part.row_numbers)
+        for idx in range(width):
+            pieces = [
+                part.columns[idx] if idx < len(part.columns) else [None] * len(part)
+                for part in parts
+            ]
+            codes = {piece.typecode if isinstance(piece, array) else None for piece in pieces}
+            if len(codes) == 1 and None not in codes:
+                column = array(codes.pop())
+                for piece in pieces:
+                    column.extend(piece)
+            else:
+                column = []
+                for piece in pieces:
+                    column.extend(piece)
+            merged.columns.append(column)
+        return merged
+
+
+def _compact(values):
+    """Store all-int and all-float columns as typed arrays"""
+    kinds = set(map(type, values))
+    if kinds == {int}:
+        try:
+            return array("q", values)
+        except OverflowError:
+            return values
+    if kinds == {float}:
+        return array("d", values)
+    return values
+
+
+def parse_part_columns(path, part, byte_range=None, first_row=1):
+    """Worker: parse one worksheet part (or a byte range of it) into SheetColumns"""
+    with zipfile.ZipFile(path) as zf:
+        shared_strings = load_shared_strings(zf)
+        rows = iter_part_rows(zf, part, shared_strings, byte_range=byte_range)
+        return SheetColumns.from_rows(rows, first_row)
+
+
+def plan_part_tasks(zf, parts, titles, workers, slice_size=SLICE_SIZE):
+    """Split the requested sheets into (title, slice index, part, byte range) tasks, largest first"""
+    tasks = []
+    for title in titles:
+        if title not in parts:
+            continue
+        part = parts[title]
+        size = zf.getinfo(part).file_size
+        slices = max(1, min(workers, size // slice_size))
+        for index in range(slices):
+            byte_range = (size * index // slices, size * (index + 1) // slices) if slices > 1 else None
+            tasks.append((size // slices, title, index, part, byte_range))
+    tasks.sort(key=lambda task: -task[0])
+    return [task[1:] for task in tasks]
+
+
+def read_workbook_columns(path, titles=None, workers=None, first_row=1, slice_size=SLICE_SIZE):
+    """Parse the requested sheets in parallel and return {title: SheetColumns}
+
+    Every sheet is a separate task and sheets larger than ``slice_size`` are
+    split into up to ``workers`` byte ranges, so a workbook dominated by one
+    big Unit sheet still uses every core. With one worker (or one core) the
+    tasks run in this process.
+    """
+    workers = workers or os.cpu_count() or 1
+    with zipfile.ZipFile(path) as zf:
+        parts = sheet_parts(zf)
+        titles = [title for title in (titles if titles is not None else list(parts)) if title in parts]
+        tasks = plan_part_tasks(zf, parts, titles, workers, slice_size)
+
+    if workers == 1 or len(tasks) == 1:
+        results = [parse_part_columns(path, part, byte_range, first_row) for _, _, part, byte_range in tasks]
+    else:
+        with ProcessPoolExecutor(min(workers, len(tasks))) as pool:
+            futures = [
+                pool.submit(parse_part_columns, path, part, byte_range, first_row)
+                for _, _, part, byte_range in tasks
+            ]
+            results = [future.result() for future in futures]
+
+    slices = {}
+    for (title, index, _, _), result in zip(tasks, results):
+        slices.setdefault(title, {})[index] = result
+    return {
+        title: SheetColumns.concat([slices[title][index] for index in sorted(slices[title])])
+        for title in titles
+    }
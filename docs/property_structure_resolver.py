@@ -0,0 +1,437 @@
+"""
+Bulk building and floor resolver for unit import files
+UnitImportService resolves every row with its own queries: one for the
+building (code = ? OR name = ?) and one for the floor. Building names are
+Arabic and are typed in many spellings, so exact matches miss rows whose
+only difference is a hamza on the alef, taa marbuta written as haa, a
+tatweel or doubled spaces.
+
+This module loads an ownership's buildings and floors once from a snapshot
+(a SQLite database with the loader's tables or a JSON snapshot, as read by
+property_structure_batch_export) and resolves the "Building Code/Name" and
+"Floor Number" columns of a whole unit import file in one pass, with no
+database access per row. Identifiers are matched exactly first (trimmed and
+case-insensitive, like the MySQL collation), then after Arabic
+normalization; the "CODE - name" labels of the UnitsTemplateExport dropdown
+are accepted too. Misses get the closest buildings or floors as
+suggestions, found through a sorted prefix index and a similarity ranking.
+
+Usage:
+    python property_structure_resolver.py units.xlsx --snapshot import.db --ownership 7 [--building 12]
+        [--suggestions 3] [--output resolved.json] [--json]
+"""
+
+import argparse
+import bisect
+import csv
+import difflib
+import json
+import re
+import sys
+import time
+import unicodedata
+
+from property_structure_batch_export import open_snapshots
+from property_structure_integrity import normalize_integer, normalize_text
+from property_structure_reader import read_workbook_rows, split_header
+from property_structure_schema import SHEETS_BY_TITLE
+from validate_property_structure import DEFAULT_MAX_ERRORS, IssueCollector
+
+# Headings of UnitsTemplateExport as Laravel Excel turns them into row keys, in lookup order
+BUILDING_HEADERS = ("building_code_name", "building_codename", "building_code", "building_name", "building")
+FLOOR_HEADERS = ("floor_number", "floor")
+LABEL_SEPARATOR = " - "
+DEFAULT_SUGGESTIONS = 3
+SUGGESTION_CUTOFF = 0.6
+SHEET_NAME = "Units"
+
+ARABIC_FOLDING = str.maketrans({
+    # Alef with hamza or madda, and alef wasla, are typed as bare alef
+    "آ": "ا", "أ": "ا", "إ": "ا", "ٱ": "ا",
+    "ؤ": "و",  # waw with hamza
+    "ئ": "ي",  # yeh with hamza
+    "ى": "ي",  # alef maksura
+    "ة": "ه",  # taa marbuta
+    "ـ": None,  # tatweel
+    # Zero-width and direction marks pasted along with Arabic text
+    "\u200b": None, "\u200c": None, "\u200d": None, "\u200e": None, "\u200f": None,
+    "\u061c": None, "\ufeff": None,
+    **{chr(code): None for code in range(0x064b, 0x0660)},  # harakat
+    "\u0670": None,  # superscript alef
+    **{chr(0x0660 + digit): str(digit) for digit in range(10)},
+    **{chr(0x06f0 + digit): str(digit) for digit in range(10)},
+})
+
+HEADER_RE = re.compile(r"[^0-9a-z]+")
+
+
+def normalize_arabic(value):
+    """Fold the spelling variants of Arabic text into one key
+
+    Presentation forms are unified (NFKC), alef/hamza variants become bare
+    alef, taa marbuta becomes haa, alef maksura becomes yeh, tatweel,
+    harakat and invisible marks are dropped, Arabic-Indic digits become
+    ASCII, Latin letters are case-folded and whitespace runs collapse to
+    one space.
+    """
+    if value is None:
+        return None
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    text = unicodedata.normalize("NFKC", str(value)).translate(ARABIC_FOLDING).casefold()
+    text = " ".join(text.split())
+    return text or None
+
+
+def normalize_floor(value):
+    """Floor numbers compare as int, including Arabic-Indic digits ('٣', '3' and 3.0 are the same floor)"""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = value.translate(ARABIC_FOLDING)
+    return normalize_integer(value)
+
+
+def header_key(value):
+    """Row key for a heading, the way Laravel Excel slugs it ('Building Code/Name' -> 'building_code_name')"""
+    if value is None:
+        return ""
+    return HEADER_RE.sub("_", str(value).strip().casefold()).strip("_")
+
+
+class Building:
+    __slots__ = ("id", "code", "name", "floors")
+
+    def __init__(self, building_id, code, name):
+        self.id = building_id
+        self.code = code
+        self.name = name
+        self.floors = {}
+
+    @property
+    def label(self):
+        """The dropdown label of UnitsTemplateExport"""
+        return f"{self.code}{LABEL_SEPARATOR}{self.name}" if self.code else str(self.name)
+
+
+class Resolution:
+    """Outcome of resolving one identifier: the building, how it matched, or why it did not"""
+
+    __slots__ = ("building", "match", "candidates")
+
+    def __init__(self, building=None, match=None, candidates=()):
+        self.building = building
+        self.match = match
+        self.candidates = candidates
+
+
+class BuildingIndex:
+    """An ownership's buildings and floors indexed by exact and normalized code and name
+
+    Each index maps a key to the buildings that carry it, so a key shared by
+    two buildings (after normalization, say) resolves as ambiguous instead
+    of picking one. ``prefixes`` is the sorted list of (normalized key,
+    building id) pairs behind the suggestions.
+    """
+
+    def __init__(self, buildings, floors):
+        self.buildings = {}
+        self.exact = ({}, {})
+        self.normalized = ({}, {})
+        keys = set()
+        for building_id, code, name in buildings:
+            building = Building(building_id, code, name)
+            self.buildings[building_id] = building
+            for field, value in enumerate((code, name)):
+                self.exact[field].setdefault(normalize_text(value), []).append(building)
+                key = normalize_arabic(value)
+                self.normalized[field].setdefault(key, []).append(building)
+                if key is not None:
+                    keys.add((key, building_id))
+        for index in self.exact + self.normalized:
+            index.pop(None, None)
+        self.prefixes = sorted(keys)
+        self.prefix_keys = [key for key, _ in self.prefixes]
+
+        for floor_id, building_id, number in floors:
+            building = self.buildings.get(building_id)
+            if building is not None:
+                building.floors.setdefault(normalize_floor(number), floor_id)
+        self._cache = {}
+
+    @classmethod
+    def from_snapshot(cls, data):
+        """Build the index from one ownership's {sheet title: rows} as the snapshot readers yield it"""
+        building_cols = SHEETS_BY_TITLE["Building"].headers
+        floor_cols = SHEETS_BY_TITLE["BuildingFloor"].headers
+        b_id, b_code, b_name = (building_cols.index(name) for name in ("id", "code", "name"))
+        f_id, f_building, f_number = (floor_cols.index(name) for name in ("id", "building_id", "number"))
+        return cls(
+            ((row[b_id], row[b_code], row[b_name]) for row in data.get("Building", ())),
+            ((row[f_id], row[f_building], row[f_number]) for row in data.get("BuildingFloor", ())),
+        )
+
+    def resolve(self, identifier):
+        """Resolve a building code, name or dropdown label; results are cached per distinct value"""
+        result = self._cache.get(identifier)
+        if result is None:
+            result = self._cache[identifier] = self._resolve(identifier)
+        return result
+
+    def _resolve(self, identifier):
+        result = self._lookup(identifier)
+        if result.building is None and not result.candidates and LABEL_SEPARATOR in str(identifier):
+            code, _, name = identifier.partition(LABEL_SEPARATOR)
+            by_code, by_name = self._lookup(code).building, self._lookup(name).building
+            if by_code is not None and by_name is not None and by_code is not by_name:
+                # A label whose code and name point at different buildings is not trusted
+                return Resolution(candidates=(by_code, by_name))
+            if by_code is not None or by_name is not None:
+                return Resolution(by_code or by_name, "label")
+        return result
+
+    def _lookup(self, identifier):
+        ambiguous = []
+        for stage, key, indexes in (
+            ("exact", normalize_text(identifier), self.exact),
+            ("normalized", normalize_arabic(identifier), self.normalized),
+        ):
+            if key is None:
+                return Resolution()
+            for field, index in zip(("code", "name"), indexes):
+                matches = index.get(key)
+                if not matches:
+                    continue
+                if len(matches) == 1:
+                    return Resolution(matches[0], field if stage == "exact" else f"normalized_{field}")
+                ambiguous = ambiguous or matches
+        if ambiguous:
+            return Resolution(candidates=tuple(ambiguous))
+        return Resolution()
+
+    def prefixed(self, prefix, limit=None):
+        """Buildings whose normalized code or name starts with ``prefix``, in key order"""
+        found = []
+        start = bisect.bisect_left(self.prefix_keys, prefix)
+        for key, building_id in self.prefixes[start:]:
+            if not key.startswith(prefix):
+                break
+            building = self.buildings[building_id]
+            if building not in found:
+                found.append(building)
+                if limit is not None and len(found) >= limit:
+                    break
+        return found
+
+    def suggest(self, identifier, limit=DEFAULT_SUGGESTIONS):
+        """Closest buildings for an identifier that did not resolve
+
+        Candidates are the buildings sharing the longest prefix with the
+        normalized identifier, so a truncated name or one misspelled near
+        the end finds its building without scanning every key. When that
+        prefix is short the closest keys overall are added. Candidates are
+        ranked by similarity.
+        """
+        key = normalize_arabic(identifier)
+        if key is None or not self.prefixes:
+            return []
+        candidates = {}
+        shared = 0
+        for length in range(len(key), 0, -1):
+            for building in self.prefixed(key[:length], limit * 4):
+                shared = shared or length
+                candidates.setdefault(building.id, building)
+            if len(candidates) >= limit:
+                break
+        if shared * 2 < len(key):
+            # The typo is early in the key: fall back to a similarity scan of every key
+            for match in difflib.get_close_matches(key, self.prefix_keys, limit * 2, SUGGESTION_CUTOFF):
+                position = bisect.bisect_left(self.prefix_keys, match)
+                building = self.buildings[self.prefixes[position][1]]
+                candidates.setdefault(building.id, building)
+
+        def score(building):
+            return max(
+                difflib.SequenceMatcher(None, key, normalize_arabic(value) or "").ratio()
+                for value in (building.code, building.name)
+            )
+
+        return sorted(candidates.values(), key=lambda building: (-score(building), building.id))[:limit]
+
+    def suggest_floors(self, building, number, limit=DEFAULT_SUGGESTIONS):
+        """The building's floors closest to a number that does not exist"""
+        floors = [key for key in building.floors if key is not None]
+        if isinstance(number, int):
+            numbers = sorted((key for key in floors if isinstance(key, int)), key=lambda key: (abs(key - number), key))
+            return numbers[:limit]
+        return difflib.get_close_matches(str(number), [str(key) for key in floors], limit, SUGGESTION_CUTOFF)
+
+
+def _column_position(header, names):
+    keys = [header_key(value) for value in header]
+    for name in names:
+        if name in keys:
+            return keys.index(name)
+    return None
+
+
+def _cell(row, idx):
+    if idx is None or idx >= len(row):
+        return None
+    value = row[idx]
+    if isinstance(value, str) and not value.strip():
+        return None
+    return value
+
+
+def resolve_rows(index, header, rows, errors, building_id=None, suggestions=DEFAULT_SUGGESTIONS, sheet=SHEET_NAME):
+    """Resolve the building and floor of every (row number, values) pair
+
+    Returns (resolved, stats): ``resolved`` holds one (row number,
+    building id, floor id) triple per row whose building resolved (the
+    floor id is None when the row has no floor number), and ``stats``
+    counts the rows by how their building matched.
+    """
+    building_idx = _column_position(header, BUILDING_HEADERS)
+    floor_idx = _column_position(header, FLOOR_HEADERS)
+    building_column = header[building_idx] if building_idx is not None else BUILDING_HEADERS[0]
+    floor_column = header[floor_idx] if floor_idx is not None else FLOOR_HEADERS[0]
+
+    preselected = None
+    if building_id is not None:
+        preselected = index.buildings.get(building_id)
+        if preselected is None:
+            errors.add(sheet, None, None, "missing_reference", f"Pre-selected building {building_id} not found")
+            return [], {}
+    elif building_idx is None:
+        errors.add(sheet, 1, None, "missing_column", f"Missing building column ({', '.join(BUILDING_HEADERS)})")
+        return [], {}
+
+    resolved = []
+    stats = {}
+    suggested = {}
+    for row_number, row in rows:
+        if not any(value is not None and value != "" for value in row):
+            continue
+        if preselected is not None:
+            building, match = preselected, "preselected"
+        else:
+            identifier = _cell(row, building_idx)
+            if identifier is None:
+                errors.add(
+                    sheet, row_number, building_column, "required",
+                    "Building identifier is required (code or name)", None, building_idx + 1,
+                )
+                stats["unresolved"] = stats.get("unresolved", 0) + 1
+                continue
+            result = index.resolve(identifier)
+            building, match = result.building, result.match
+            if building is None:
+                stats["unresolved"] = stats.get("unresolved", 0) + 1
+                if result.candidates:
+                    labels = ", ".join(candidate.label for candidate in result.candidates)
+                    errors.add(
+                        sheet, row_number, building_column, "ambiguous_reference",
+                        f"Building {identifier} matches several buildings: {labels}", identifier, building_idx + 1,
+                    )
+                    continue
+                labels = suggested.get(identifier)
+                if labels is None:
+                    labels = suggested[identifier] = [b.label for b in index.suggest(identifier, suggestions)]
+                hint = f" Did you mean: {', '.join(labels)}?" if labels else ""
+                errors.add(
+                    sheet, row_number, building_column, "missing_reference",
+                    f"Building not found: {identifier}.{hint}", identifier, building_idx + 1,
+                )
+                continue
+
+        floor_id = None
+        number = _cell(row, floor_idx)
+        if number is not None:
+            key = normalize_floor(number)
+            floor_id = building.floors.get(key)
+            if floor_id is None:
+                stats["unresolved"] = stats.get("unresolved", 0) + 1
+                nearest = index.suggest_floors(building, key, suggestions)
+                hint = f" Nearest floors: {', '.join(str(floor) for floor in nearest)}." if nearest else ""
+                errors.add(
+                    sheet, row_number, floor_column, "missing_reference",
+                    f"Floor number {number} not found in building {building.label}.{hint}", number, floor_idx + 1,
+                )
+                continue
+        stats[match] = stats.get(match, 0) + 1
+        resolved.append((row_number, building.id, floor_id))
+    return resolved, stats
+
+
+def read_import_rows(path):
+    """Header and (row number, values) pairs of the first sheet of a unit import .xlsx, or of a .csv"""
+    if str(path).lower().endswith(".csv"):
+        with open(path, encoding="utf-8-sig", newline="") as handle:
+            rows = list(enumerate(csv.reader(handle), start=1))
+        return split_header(iter(rows))
+    for _, rows in read_workbook_rows(path):
+        header, data = split_header(rows)
+        return header, list(data)
+    return (), []
+
+
+def resolve_file(path, snapshot, ownership_id, building_id=None, suggestions=DEFAULT_SUGGESTIONS,
+                 max_errors=DEFAULT_MAX_ERRORS):
+    """Resolve a unit import file against one ownership's buildings and floors in a snapshot"""
+    started = time.perf_counter()
+    data = next((data for _, data in open_snapshots(str(snapshot), [ownership_id])), None)
+    errors = IssueCollector(max_errors)
+    if data is None:
+        errors.add(SHEET_NAME, None, None, "missing_reference", f"Ownership {ownership_id} does not exist in {snapshot}")
+        return {"file": str(path), "ownership_id": ownership_id, "valid": False, "rows": 0, "resolved": [],
+                "matches": {}, "error_count": errors.count, "errors": errors.issues}
+    index = BuildingIndex.from_snapshot(data)
+    header, rows = read_import_rows(path)
+    resolved, stats = resolve_rows(index, header, rows, errors, building_id, suggestions)
+    return {
+        "file": str(path),
+        "ownership_id": ownership_id,
+        "valid": errors.count == 0,
+        "rows": len(resolved) + stats.get("unresolved", 0),
+        "resolved": [{"row": row, "building_id": b_id, "floor_id": f_id} for row, b_id, f_id in resolved],
+        "matches": stats,
+        "seconds": round(time.perf_counter() - started, 3),
+        "error_count": errors.count,
+        "errors": errors.issues,
+    }
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Resolve the buildings and floors of a unit import file")
+    parser.add_argument("file", help="Unit import .xlsx (UnitsTemplateExport layout) or .csv")
+    parser.add_argument("--snapshot", required=True, help="Current data: SQLite database or .json snapshot")
+    parser.add_argument("--ownership", type=int, required=True, help="Ownership id the units are imported into")
+    parser.add_argument("--building", type=int, help="Pre-selected building id (the file's building column is ignored)")
+    parser.add_argument("--suggestions", type=int, default=DEFAULT_SUGGESTIONS, help="Suggestions per miss (default: 3)")
+    parser.add_argument("--max-errors", type=int, default=DEFAULT_MAX_ERRORS,
+                        help=f"Stop listing errors after this many (default: {DEFAULT_MAX_ERRORS})")
+    parser.add_argument("--output", help="Write the resolved (row, building_id, floor_id) list as JSON to this file")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    report = resolve_file(args.file, args.snapshot, args.ownership, args.building, args.suggestions, args.max_errors)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as handle:
+            json.dump(report["resolved"], handle, ensure_ascii=False)
+
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2, default=str))
+    else:
+        for error in report["errors"]:
+            location = error["sheet"] + (f"!{error['cell']}" if error["cell"] else "")
+            print(f"  {location}: {error['message']}")
+        if report["error_count"] > len(report["errors"]):
+            print(f"  ... and {report['error_count'] - len(report['errors'])} more")
+        matches = ", ".join(f"{count} {kind}" for kind, count in sorted(report["matches"].items()))
+        print(f"Resolved {len(report['resolved'])} of {report['rows']} rows ({matches or 'none'})")
+    sys.exit(0 if report["valid"] else 1)
@@ -0,0 +1,384 @@
+"""
+Declarative schema of the Property Structure import template
+Every data sheet of the template is described here once (columns, required
+flags, dropdown lists and example rows); the generator renders the workbook
+from this registry, so adding a sheet only means adding a SheetSchema.
+"""
+
+from dataclasses import dataclass
+
+from openpyxl.utils import get_column_letter
+
+BOOLEAN_CHOICES = ("true", "false")
+
+# Data rows start below the header (row 1) and description (row 2)
+FIRST_DATA_ROW = 3
+
+# Last row of a worksheet; Excel and openpyxl refuse workbooks that go past it
+MAX_ROW = 1048576
+
+# Value kinds understood by the validator
+STRING = "string"
+INTEGER = "integer"
+DECIMAL = "decimal"
+BOOLEAN = "boolean"
+YEAR = "year"
+
+# Construction year bounds: 1800 to current year + 10
+MIN_YEAR = 1800
+MAX_YEAR_AHEAD = 10
+
+# Largest magnitudes that fit DECIMAL(12,2) and DECIMAL(8,2) columns
+MAX_AMOUNT = 9999999999.99
+MAX_UNIT_AREA = 999999.99
+
+
+@dataclass(frozen=True)
+class Column:
+    """One template column: header, description row text, dropdown values and value rules"""
+    name: str
+    description: str
+    required: bool = False
+    choices: tuple = ()
+    kind: str = STRING
+    min_value: float = None
+    max_value: float = None
+
+
+@dataclass(frozen=True)
+class SheetSchema:
+    """One template data sheet"""
+    title: str
+    columns: tuple
+    example_rows: tuple = ()
+    width: int = 20
+
+    @property
+    def headers(self):
+        return [column.name for column in self.columns]
+
+    def column_letter(self, name):
+        return get_column_letter(self.headers.index(name) + 1)
+
+    def choice_columns(self):
+        """Yield (column letter, column) for every dropdown column"""
+        for col_idx, column in enumerate(self.columns, start=1):
+            if column.choices:
+                yield get_column_letter(col_idx), column
+
+
+OWNERSHIP = SheetSchema(
+    title="Ownership",
+    columns=(
+        Column("id", "Auto-generated ID (leave empty)", kind=INTEGER, min_value=1),
+        Column("name", "Ownership name (e.g., 'Al-Rashid Real Estate Company')", required=True),
+        Column("legal", "Legal/registered name"),
+        Column(
+            "type", "Ownership type (company, individual, government, etc.)", required=True,
+            choices=("company", "individual", "government", "organization", "other"),
+        ),
+        Column(
+            "ownership_type", "Category (real_estate, investment, etc.)", required=True,
+            choices=("real_estate", "investment", "development", "management", "other"),
+        ),
+        Column("registration", "Registration number (unique)"),
+        Column("tax_id", "Tax identification number"),
+        Column("street", "Street address"),
+        Column("city", "City name", required=True),
+        Column("state", "State/Province"),
+        Column("country", "Country (default: Saudi Arabia)"),
+        Column("zip_code", "Postal/ZIP code"),
+        Column("email", "Contact email"),
+        Column("phone", "Contact phone"),
+        Column("active", "Active status (true/false, default: true)", choices=BOOLEAN_CHOICES, kind=BOOLEAN),
+    ),
+    example_rows=(
+        (
+            "",  # id
+            "شركة الراشد العقارية",  # name
+            "شركة الراشد العقارية المساهمة",  # legal
+            "company",  # type
+            "real_estate",  # ownership_type
+            "CR-1234567890",  # registration
+            "310123456700003",  # tax_id
+            "طريق الملك فهد، 123",  # street
+            "الرياض",  # city
+            "منطقة الرياض",  # state
+            "Saudi Arabia",  # country
+            "12345",  # zip_code
+            "info@alrashid.com",  # email
+            "+966501234567",  # phone
+            "true",  # active
+        ),
+    ),
+)
+
+PORTFOLIO = SheetSchema(
+    title="Portfolio",
+    columns=(
+        Column("id", "Auto-generated ID (leave empty)", kind=INTEGER, min_value=1),
+        Column("ownership_id", "Ownership ID (reference to Ownership.id)", required=True, kind=INTEGER, min_value=1),
+        Column(
+            "parent_id", "Parent Portfolio ID (for nested portfolios, leave empty if root)",
+            kind=INTEGER, min_value=1,
+        ),
+        Column("name", "Portfolio name", required=True),
+        Column("code", "Portfolio code (unique per ownership)", required=True),
+        Column(
+            "type", "Portfolio type (general, residential, commercial, mixed, industrial)",
+            choices=("general", "residential", "commercial", "mixed", "industrial"),
+        ),
+        Column("description", "Portfolio description"),
+        Column("area", "Total area in square meters (decimal)", kind=DECIMAL, min_value=0, max_value=MAX_AMOUNT),
+        Column("active", "Active status (true/false, default: true)", choices=BOOLEAN_CHOICES, kind=BOOLEAN),
+    ),
+    example_rows=(
+        (
+            "",  # id
+            "1",  # ownership_id
+            "",  # parent_id (empty for root)
+            "المشاريع السكنية في الرياض",  # name
+            "PORT-001-01",  # code
+            "residential",  # type
+            "محفظة المشاريع السكنية في منطقة الرياض",  # description
+            "25000.50",  # area
+            "true",  # active
+        ),
+    ),
+    width=25,
+)
+
+PORTFOLIO_LOCATION = SheetSchema(
+    title="PortfolioLocation",
+    columns=(
+        Column("id", "Auto-generated ID (leave empty)", kind=INTEGER, min_value=1),
+        Column("portfolio_id", "Portfolio ID (reference to Portfolio.id)", required=True, kind=INTEGER, min_value=1),
+        Column("street", "Street address"),
+        Column("city", "City name"),
+        Column("state", "State/Province"),
+        Column("country", "Country (default: Saudi Arabia)"),
+        Column("zip_code", "Postal/ZIP code"),
+        Column("latitude", "Latitude coordinate (decimal, -90 to 90)", kind=DECIMAL, min_value=-90, max_value=90),
+        Column("longitude", "Longitude coordinate (decimal, -180 to 180)", kind=DECIMAL, min_value=-180, max_value=180),
+        Column("primary", "Primary location flag (true/false, default: false)", choices=BOOLEAN_CHOICES, kind=BOOLEAN),
+    ),
+    example_rows=(
+        (
+            "",  # id
+            "1",  # portfolio_id
+            "طريق الملك فهد",  # street
+            "الرياض",  # city
+            "منطقة الرياض",  # state
+            "Saudi Arabia",  # country
+            "12345",  # zip_code
+            "24.7136",  # latitude
+            "46.6753",  # longitude
+            "true",  # primary
+        ),
+    ),
+)
+
+BUILDING = SheetSchema(
+    title="Building",
+    columns=(
+        Column("id", "Auto-generated ID (leave empty)", kind=INTEGER, min_value=1),
+        Column("portfolio_id", "Portfolio ID (reference to Portfolio.id)", required=True, kind=INTEGER, min_value=1),
+        Column("ownership_id", "Ownership ID (reference to Ownership.id)", required=True, kind=INTEGER, min_value=1),
+        Column(
+            "parent_id", "Parent Building ID (for nested buildings, leave empty if root)",
+            kind=INTEGER, min_value=1,
+        ),
+        Column("name", "Building name", required=True),
+        Column("code", "Building code (unique per ownership)", required=True),
+        Column(
+            "type", "Building type (residential, commercial, mixed, office, retail)", required=True,
+            choices=("residential", "commercial", "mixed", "office", "retail", "warehouse", "industrial"),
+        ),
+        Column("description", "Building description"),
+        Column("street", "Street address"),
+        Column("city", "City name"),
+        Column("state", "State/Province"),
+        Column("country", "Country (default: Saudi Arabia)"),
+        Column("zip_code", "Postal/ZIP code"),
+        Column("latitude", "Latitude coordinate (decimal, -90 to 90)", kind=DECIMAL, min_value=-90, max_value=90),
+        Column("longitude", "Longitude coordinate (decimal, -180 to 180)", kind=DECIMAL, min_value=-180, max_value=180),
+        Column("floors", "Number of floors (integer, min: 1)", kind=INTEGER, min_value=1),
+        Column("year", "Construction year (integer, 1800 to current year + 10)", kind=YEAR),
+        Column("active", "Active status (true/false, default: true)", choices=BOOLEAN_CHOICES, kind=BOOLEAN),
+    ),
+    example_rows=(
+        (
+            "",  # id
+            "1",  # portfolio_id
+            "1",  # ownership_id
+            "",  # parent_id
+            "برج الراشد السكني",  # name
+            "BLD-001-01",  # code
+            "residential",  # type
+            "برج سكني فاخر مكون من 10 طوابق",  # description
+            "طريق الملك فهد، 123",  # street
+            "الرياض",  # city
+            "منطقة الرياض",  # state
+            "Saudi Arabia",  # country
+            "12345",  # zip_code
+            "24.7136",  # latitude
+            "46.6753",  # longitude
+            "10",  # floors
+            "2020",  # year
+            "true",  # active
+        ),
+    ),
+)
+
+BUILDING_FLOOR = SheetSchema(
+    title="BuildingFloor",
+    columns=(
+        Column("id", "Auto-generated ID (leave empty)", kind=INTEGER, min_value=1),
+        Column("building_id", "Building ID (reference to Building.id)", required=True, kind=INTEGER, min_value=1),
+        Column(
+            "number", "Floor number (integer, unique per building, can be negative for basements)", required=True,
+            kind=INTEGER,
+        ),
+        Column("name", "Floor name (e.g., 'Ground Floor', 'الطابق الأرضي')"),
+        Column("description", "Floor description"),
+        Column("units", "Number of units on this floor (integer, min: 0)", kind=INTEGER, min_value=0),
+        Column("active", "Active status (true/false, default: true)", choices=BOOLEAN_CHOICES, kind=BOOLEAN),
+    ),
+    example_rows=(
+        (
+            "",  # id
+            "1",  # building_id
+            "1",  # number
+            "الطابق الأرضي",  # name
+            "الطابق الأول من البرج",  # description
+            "5",  # units
+            "true",  # active
+        ),
+    ),
+    width=30,
+)
+
+UNIT = SheetSchema(
+    title="Unit",
+    columns=(
+        Column("id", "Auto-generated ID (leave empty)", kind=INTEGER, min_value=1),
+        Column("building_id", "Building ID (reference to Building.id)", required=True, kind=INTEGER, min_value=1),
+        Column("floor_id", "Floor ID (reference to BuildingFloor.id, optional)", kind=INTEGER, min_value=1),
+        Column("ownership_id", "Ownership ID (reference to Ownership.id)", required=True, kind=INTEGER, min_value=1),
+        Column("number", "Unit number (unique per building)", required=True),
+        Column(
+            "type", "Unit type (apartment, office, shop, warehouse, studio, penthouse)", required=True,
+            choices=("apartment", "office", "shop", "warehouse", "studio", "penthouse"),
+        ),
+        Column("name", "Unit name"),
+        Column("description", "Unit description"),
+        Column(
+            "area", "Unit area in square meters (decimal, required)", required=True,
+            kind=DECIMAL, min_value=0.01, max_value=MAX_UNIT_AREA,
+        ),
+        Column("price_monthly", "Monthly price in SAR (decimal)", kind=DECIMAL, min_value=0, max_value=MAX_AMOUNT),
+        Column("price_quarterly", "Quarterly price in SAR (decimal)", kind=DECIMAL, min_value=0, max_value=MAX_AMOUNT),
+        Column("price_yearly", "Yearly price in SAR (decimal)", kind=DECIMAL, min_value=0, max_value=MAX_AMOUNT),
+        Column(
+            "status", "Unit status (available, rented, maintenance, reserved, sold)",
+            choices=("available", "rented", "maintenance", "reserved", "sold"),
+        ),
+        Column("active", "Active status (true/false, default: true)", choices=BOOLEAN_CHOICES, kind=BOOLEAN),
+    ),
+    example_rows=(
+        (
+            "",  # id
+            "1",  # building_id
+            "1",  # floor_id
+            "1",  # ownership_id
+            "0101",  # number
+            "apartment",  # type
+            "شقة 0101",  # name
+            "شقة فاخرة بغرفتين",  # description
+            "120.50",  # area
+            "6000.00",  # price_monthly
+            "17100.00",  # price_quarterly
+            "64800.00",  # price_yearly
+            "available",  # status
+            "true",  # active
+        ),
+    ),
+)
+
+UNIT_SPECIFICATION = SheetSchema(
+    title="UnitSpecification",
+    columns=(
+        Column("id", "Auto-generated ID (leave empty)", kind=INTEGER, min_value=1),
+        Column("unit_id", "Unit ID (reference to Unit.id)", required=True, kind=INTEGER, min_value=1),
+        Column(
+            "key", "Specification key (e.g., 'bedrooms', 'bathrooms', 'parking')", required=True,
+            choices=(
+                "bedrooms", "bathrooms", "balcony", "parking", "furnished", "capacity", "meeting_rooms",
+                "storefront", "storage", "loading_dock", "ceiling_height", "security",
+            ),
+        ),
+        Column("value", "Specification value"),
+        Column("type", "Value type (integer, boolean, string)", choices=("integer", "boolean", "string")),
+    ),
+    example_rows=(
+        ("", "1", "bedrooms", "2", "integer"),
+        ("", "1", "bathrooms", "2", "integer"),
+        ("", "1", "balcony", "true", "boolean"),
+        ("", "1", "parking", "1", "integer"),
+        ("", "1", "furnished", "false", "boolean"),
+    ),
+    width=25,
+)
+
+# Data sheets in fill (and import) order
+SHEETS = (
+    OWNERSHIP,
+    PORTFOLIO,
+    PORTFOLIO_LOCATION,
+    BUILDING,
+    BUILDING_FLOOR,
+    UNIT,
+    UNIT_SPECIFICATION,
+)
+
+SHEETS_BY_TITLE = {sheet.title: sheet for sheet in SHEETS}
+
+# Foreign keys listed on the Instructions sheet: (sheet, column, parent sheet).
+# Every reference points at the parent's id column.
+RELATIONSHIPS = (
+    ("Portfolio", "ownership_id", "Ownership"),
+    ("Portfolio", "parent_id", "Portfolio"),
+    ("PortfolioLocation", "portfolio_id", "Portfolio"),
+    ("Building", "portfolio_id", "Portfolio"),
+    ("Building", "ownership_id", "Ownership"),
+    ("Building", "parent_id", "Building"),
+    ("BuildingFloor", "building_id", "Building"),
+    ("Unit", "building_id", "Building"),
+    ("Unit", "floor_id", "BuildingFloor"),
+    ("Unit", "ownership_id", "Ownership"),
+    ("UnitSpecification", "unit_id", "Unit"),
+)
+
+# References that must agree with each other: (sheet, column, via column, parent column)
+# e.g. Unit.building_id must equal BuildingFloor[Unit.floor_id].building_id. The
+# generator also uses them for dependent dropdowns (floors of the row's building).
+CONSISTENT_REFERENCES = (
+    ("Building", "ownership_id", "portfolio_id", "ownership_id"),
+    ("Unit", "building_id", "floor_id", "building_id"),
+    ("Unit", "ownership_id", "building_id", "ownership_id"),
+)
+
+# Unique keys enforced by the database and documented on the Instructions sheet: (sheet, columns)
+UNIQUE_KEYS = (
+    ("Ownership", ("registration",)),
+    ("Portfolio", ("ownership_id", "code")),
+    ("BuildingFloor", ("building_id", "number")),
+    ("Unit", ("building_id", "number")),
+    ("UnitSpecification", ("unit_id", "key")),
+)
+
+# Self-referencing trees that must not contain cycles: (sheet, parent column)
+HIERARCHIES = (
+    ("Portfolio", "parent_id"),
+    ("Building", "parent_id"),
+)
@@ -0,0 +1,572 @@
+"""
+Local service for template generation, validation and diff planning
+Every CLI run pays interpreter start-up and the openpyxl/numpy imports
+again, and calling it synchronously from a Laravel request holds a PHP
+worker for the whole run. The service keeps a pool of warm worker processes
+(modules imported, template skeletons rendered) behind a small asyncio HTTP
+server on localhost or a Unix socket, so controllers can delegate with one
+HTTP call:
+
+    GET  /health      workers, queue and cache statistics
+    POST /template    {"data": {"Ownership": [...], ...}} or {"snapshot": "current.db", "ownership": 7};
+                      answers with the xlsx, or writes it to "output" and answers {"file": ...}
+    POST /validate    {"path": "filled.xlsx", "max_errors": 100, "engine": "fast", "coordinates": false}
+    POST /diff        {"path": "filled.xlsx", "snapshot": "current.db", "ownership": 7,
+                       "keep_missing": false, "skip_checks": false}
+
+At most --workers jobs run at once; further requests wait in a queue of at
+most --queue entries and are refused with 503 and Retry-After once it is
+full, so a burst of uploads cannot pile up unbounded work. A job that runs
+longer than --timeout answers 504; the worker still finishes it and keeps
+its slot until then, and the late result is cached for a retry. When a
+worker process dies the pool is restarted and the requests it was running
+answer 503. Results are kept in an in-memory LRU cache (--cache-entries, --cache-mb) keyed by
+the request body and the size and modification time of every file it
+names (for a SQLite snapshot, also of its -wal file), and identical
+requests arriving while one is running share its result, so
+re-validating the same upload never reaches a worker twice. Request
+fields of the wrong type are refused with 400 before a job is queued.
+
+Job requests must be sent as application/json, and requests carrying an
+Origin header are refused, so a web page open in a browser on the same
+machine cannot reach the service with a cross-site form or fetch. Every
+"path", "snapshot" and "output" is resolved against --root (default: the
+working directory) and refused when it points outside of it.
+
+Usage:
+    python property_structure_service.py [--host 127.0.0.1] [--port 8765] [--workers 2] [--queue 32] [--root DIR]
+    python property_structure_service.py --unix /tmp/property-structure.sock
+    curl -s localhost:8765/validate -H 'Content-Type: application/json' -d '{"path": "filled.xlsx"}'
+"""
+
+import argparse
+import asyncio
+import functools
+import hashlib
+import json
+import os
+import signal
+import sys
+import tempfile
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from http import HTTPStatus
+
+from property_structure_batch_export import open_snapshots
+from property_structure_columnar import MANIFEST_NAME, ColumnarError
+from property_structure_diff import DiffError, diff_workbook
+from property_structure_loader import LoadError
+from property_structure_schema import SHEETS
+from property_structure_spatial import DEFAULT_CLOSE_METERS, CoordinateCheck, SpatialError
+from property_structure_stamp import GROUP_KEYS, StampError, default_cache, stamp_template
+from validate_property_structure import DEFAULT_MAX_ERRORS, ENGINES, FAST_ENGINE, validate_workbook
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+DEFAULT_WORKERS = 2
+DEFAULT_QUEUE = 32
+DEFAULT_TIMEOUT = 300
+DEFAULT_CACHE_ENTRIES = 256
+DEFAULT_CACHE_MB = 256
+DEFAULT_MAX_BODY_MB = 64
+# Seconds a refused client is told to wait before retrying
+RETRY_AFTER = 2
+
+XLSX_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+JSON_TYPE = "application/json; charset=utf-8"
+# Media type job requests must be sent as
+REQUEST_TYPE = "application/json"
+
+# Request fields holding paths whose contents the result depends on
+PATH_FIELDS = ("path", "snapshot")
+# /template field naming the file to write the xlsx to
+OUTPUT_FIELD = "output"
+# endpoint -> fields a request must carry
+REQUIRED_FIELDS = {"/validate": ("path",), "/diff": ("path", "snapshot")}
+# Optional request field -> (accepted JSON types, description for the error)
+FIELD_TYPES = {
+    "data": ((dict,), "an object mapping sheet titles to lists of rows"),
+    "ownership": ((int,), "an integer"),
+    "max_errors": ((int,), "a positive integer"),
+    "engine": ((str,), f"one of {', '.join(ENGINES)}"),
+    "coordinates": ((bool,), "true or false"),
+    "close_meters": ((int, float), "a number"),
+    "keep_missing": ((bool,), "true or false"),
+    "skip_checks": ((bool,), "true or false"),
+}
+# SQLite keeps committed writes in this file until a checkpoint copies them into the database
+WAL_SUFFIX = "-wal"
+# Failures caused by the request's files or data rather than by the service
+REQUEST_ERRORS = (
+    ColumnarError, DiffError, LoadError, SpatialError, StampError, OSError, ValueError,
+)
+
+
+class ServiceError(Exception):
+    """A request the service refuses, with the HTTP status to answer"""
+
+    def __init__(self, status, message, headers=None):
+        super().__init__(message)
+        self.status = status
+        self.headers = headers or {}
+
+
+# Jobs, run in the worker processes
+
+def warm_up():
+    """Worker initializer: render the skeletons of the empty and the fully exported template"""
+    cache = default_cache()
+    cache.get(None)
+    cache.get(tuple(schema.title for schema in SHEETS), GROUP_KEYS)
+
+
+def run_template(request):
+    """Render a template from inline data or one ownership of a snapshot; returns the xlsx bytes"""
+    if "snapshot" in request:
+        ownership_id = request.get("ownership")
+        if ownership_id is None:
+            raise ValueError("'ownership' is required with 'snapshot'")
+        data = next((data for _, data in open_snapshots(request["snapshot"], [ownership_id])), None)
+        if data is None:
+            raise ValueError(f"Ownership {ownership_id} does not exist in {request['snapshot']}")
+    else:
+        data = request.get("data")
+
+    handle, path = tempfile.mkstemp(suffix=".xlsx")
+    os.close(handle)
+    try:
+        stamp_template(path, data)
+        with open(path, "rb") as handle:
+            return handle.read()
+    finally:
+        os.remove(path)
+
+
+def run_validate(request):
+    engine = request.get("engine", FAST_ENGINE)
+    coordinates = None
+    if request.get("coordinates"):
+        coordinates = CoordinateCheck(close_meters=request.get("close_meters", DEFAULT_CLOSE_METERS))
+    return validate_workbook(
+        request["path"], request.get("max_errors", DEFAULT_MAX_ERRORS), engine, coordinates=coordinates,
+    )
+
+
+def run_diff(request):
+    return diff_workbook(
+        request["path"], request["snapshot"], request.get("ownership"), request.get("engine", FAST_ENGINE),
+        check=not request.get("skip_checks", False),
+        deactivate_missing=not request.get("keep_missing", False),
+        max_errors=request.get("max_errors", DEFAULT_MAX_ERRORS),
+    )
+
+
+# endpoint -> job
+JOBS = {
+    "/template": run_template,
+    "/validate": run_validate,
+    "/diff": run_diff,
+}
+
+
+def write_output(path, data):
+    """Write a rendered template next to its final path, then move it into place"""
+    partial = path + ".partial"
+    with open(partial, "wb") as handle:
+        handle.write(data)
+    os.replace(partial, path)
+
+
+def check_fields(request):
+    """Refuse optional fields of the wrong JSON type before they reach a job"""
+    for field, (types, expected) in FIELD_TYPES.items():
+        value = request.get(field)
+        if value is None:
+            continue
+        # bool is an int subclass, but true is not a count
+        valid = isinstance(value, types) and (bool in types or not isinstance(value, bool))
+        if field == "max_errors":
+            valid = valid and value > 0
+        elif field == "engine":
+            valid = valid and value in ENGINES
+        if not valid:
+            raise ServiceError(HTTPStatus.BAD_REQUEST, f"'{field}' must be {expected}")
+
+
+def cache_key(endpoint, body, request):
+    """Hash of the endpoint, the raw request and the size/mtime of every file it names
+
+    A SQLite snapshot in WAL mode takes writes in its -wal file first,
+    leaving the database file untouched, so that file is part of the key
+    too.
+    """
+    digest = hashlib.sha256(endpoint.encode() + b"\0" + body)
+    for field in PATH_FIELDS:
+        path = request.get(field)
+        if not isinstance(path, str):
+            continue
+        # A bundle directory is rewritten together with its manifest
+        manifest = os.path.join(path, MANIFEST_NAME)
+        try:
+            stat = os.stat(manifest if os.path.isdir(path) and os.path.exists(manifest) else path)
+        except OSError:
+            # The job itself reports the missing file
+            digest.update(b"\0missing")
+            continue
+        digest.update(f"\0{path}\0{stat.st_size}\0{stat.st_mtime_ns}".encode())
+        try:
+            wal = os.stat(path + WAL_SUFFIX)
+        except OSError:
+            continue
+        digest.update(f"\0{WAL_SUFFIX}\0{wal.st_size}\0{wal.st_mtime_ns}".encode())
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """LRU of recent results bounded by entry count and by the bytes of xlsx results"""
+
+    def __init__(self, max_entries=DEFAULT_CACHE_ENTRIES, max_bytes=DEFAULT_CACHE_MB * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _size(value):
+        return len(value) if isinstance(value, bytes) else 0
+
+    def get(self, key):
+        value = self.entries.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        size = self._size(value)
+        if self.max_entries <= 0 or size > self.max_bytes:
+            return
+        if key in self.entries:
+            self.bytes -= self._size(self.entries.pop(key))
+        self.entries[key] = value
+        self.bytes += size
+        while len(self.entries) > self.max_entries or self.bytes > self.max_bytes:
+            _, evicted = self.entries.popitem(last=False)
+            self.bytes -= self._size(evicted)
+
+    def stats(self):
+        return {"entries": len(self.entries), "bytes": self.bytes, "hits": self.hits, "misses": self.misses}
+
+
+class Service:
+    """HTTP front end: parses requests, queues jobs on the worker pool and caches their results"""
+
+    def __init__(self, workers=DEFAULT_WORKERS, queue=DEFAULT_QUEUE, timeout=DEFAULT_TIMEOUT,
+                 cache=None, max_body=DEFAULT_MAX_BODY_MB * 1024 * 1024, root=None):
+        self.workers = workers
+        self.queue = queue
+        self.timeout = timeout
+        self.cache = cache if cache is not None else ResultCache()
+        self.max_body = max_body
+        self.root = os.path.realpath(root if root is not None else os.getcwd())
+        self.pool = None
+        self.slots = None
+        self.running = 0
+        self.waiting = 0
+        self.inflight = {}
+        self.counts = {"requests": 0, "shared": 0, "rejected": 0, "failed": 0, "timeouts": 0, "restarts": 0}
+        self.started = time.monotonic()
+
+    async def start(self):
+        """Start the pool and wait until every worker has warmed up"""
+        self.pool = self._new_pool()
+        self.slots = asyncio.Semaphore(self.workers)
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*(loop.run_in_executor(self.pool, os.getpid) for _ in range(self.workers)))
+
+    def _new_pool(self):
+        return ProcessPoolExecutor(self.workers, initializer=warm_up)
+
+    def _restart_pool(self, broken):
+        """Replace a pool whose worker died (once, however many requests notice it)"""
+        if self.pool is broken:
+            self.counts["restarts"] += 1
+            self.pool = self._new_pool()
+            broken.shutdown(wait=False, cancel_futures=True)
+
+    def _submit(self, job, request):
+        """Queue a job on the pool; returns the pool and the job's future"""
+        loop = asyncio.get_running_loop()
+        pool = self.pool
+        try:
+            return pool, loop.run_in_executor(pool, job, request)
+        except BrokenProcessPool:
+            # A worker died while no request was waiting on it
+            self._restart_pool(pool)
+            return self.pool, loop.run_in_executor(self.pool, job, request)
+
+    def _job_done(self, key, pool=None, future=None):
+        """Free the job's slot once the worker is really done, and cache its result even if nobody waits for it"""
+        self.running -= 1
+        self.slots.release()
+        if future is None or future.cancelled():
+            return
+        error = future.exception()
+        if error is None:
+            self.cache.put(key, future.result())
+        elif isinstance(error, BrokenProcessPool):
+            self._restart_pool(pool)
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown(cancel_futures=True)
+
+    def health(self):
+        return {
+            "status": "ok",
+            "workers": self.workers,
+            "running": self.running,
+            "queued": self.waiting,
+            "queue_limit": self.queue,
+            "uptime_seconds": round(time.monotonic() - self.started, 1),
+            "cache": self.cache.stats(),
+            **self.counts,
+        }
+
+    async def _run(self, job, request, key):
+        """Run a job on the pool once a slot is free, refusing work beyond the queue limit
+
+        The slot is held until the worker finishes, not until the request
+        gives up waiting, so a timed-out job keeps later jobs queued here
+        rather than in the pool, where their timeout would already run.
+        """
+        if self.waiting >= self.queue and self.slots.locked():
+            self.counts["rejected"] += 1
+            raise ServiceError(
+                HTTPStatus.SERVICE_UNAVAILABLE, "the service is busy, retry later",
+                {"Retry-After": str(RETRY_AFTER)},
+            )
+        self.waiting += 1
+        try:
+            await self.slots.acquire()
+        finally:
+            self.waiting -= 1
+        self.running += 1
+        try:
+            pool, future = self._submit(job, request)
+        except BaseException:
+            self._job_done(key)
+            raise
+        future.add_done_callback(functools.partial(self._job_done, key, pool))
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), self.timeout)
+        except asyncio.TimeoutError:
+            self.counts["timeouts"] += 1
+            raise ServiceError(HTTPStatus.GATEWAY_TIMEOUT, f"the job did not finish within {self.timeout}s")
+        except BrokenProcessPool:
+            self._restart_pool(pool)
+            raise ServiceError(
+                HTTPStatus.SERVICE_UNAVAILABLE, "a worker process died while running the job; retry later",
+                {"Retry-After": str(RETRY_AFTER)},
+            )
+
+    def resolve(self, field, path):
+        """Absolute path of a request path under the root; refuses paths that leave it"""
+        if not isinstance(path, str) or not path:
+            raise ServiceError(HTTPStatus.BAD_REQUEST, f"'{field}' must be a path")
+        resolved = os.path.realpath(os.path.join(self.root, path))
+        if os.path.commonpath([self.root, resolved]) != self.root:
+            raise ServiceError(HTTPStatus.FORBIDDEN, f"'{field}' is outside the service root")
+        return resolved
+
+    async def call(self, endpoint, body):
+        """Result of one job request, from the cache, a running identical request or a worker"""
+        try:
+            request = json.loads(body or b"{}")
+        except ValueError as e:
+            raise ServiceError(HTTPStatus.BAD_REQUEST, f"invalid JSON: {e}")
+        if not isinstance(request, dict):
+            raise ServiceError(HTTPStatus.BAD_REQUEST, "the request body must be a JSON object")
+        missing = [field for field in REQUIRED_FIELDS.get(endpoint, ()) if field not in request]
+        if missing:
+            raise ServiceError(HTTPStatus.BAD_REQUEST, f"missing field(s): {', '.join(missing)}")
+        check_fields(request)
+        for field in PATH_FIELDS:
+            if field in request:
+                request[field] = self.resolve(field, request[field])
+        output = request.pop(OUTPUT_FIELD, None) if endpoint == "/template" else None
+        if output is not None:
+            output = self.resolve(OUTPUT_FIELD, output)
+
+        key = cache_key(endpoint, json.dumps(request, sort_keys=True).encode(), request)
+        result = self.cache.get(key)
+        if result is None:
+            shared = self.inflight.get(key)
+            if shared is None:
+                shared = self.inflight[key] = asyncio.ensure_future(self._run(JOBS[endpoint], request, key))
+                try:
+                    result = await shared
+                finally:
+                    del self.inflight[key]
+            else:
+                self.counts["shared"] += 1
+                result = await asyncio.shield(shared)
+
+        if output is not None:
+            await asyncio.get_running_loop().run_in_executor(None, write_output, output, result)
+            return {"file": output, "bytes": len(result)}
+        return result
+
+    async def respond(self, method, path, body, headers=None):
+        """(status, payload) for one request; payload is a JSON-able object or xlsx bytes"""
+        headers = headers or {}
+        if "origin" in headers:
+            # Browsers add Origin to cross-site requests; the service has no web clients
+            raise ServiceError(HTTPStatus.FORBIDDEN, "requests from web pages are not accepted")
+        path = path.split("?", 1)[0]
+        if path == "/health":
+            if method != "GET":
+                raise ServiceError(HTTPStatus.METHOD_NOT_ALLOWED, "use GET")
+            return HTTPStatus.OK, self.health()
+        if path not in JOBS:
+            raise ServiceError(HTTPStatus.NOT_FOUND, f"unknown endpoint {path}")
+        if method != "POST":
+            raise ServiceError(HTTPStatus.METHOD_NOT_ALLOWED, "use POST")
+        if headers.get("content-type", "").split(";", 1)[0].strip().lower() != REQUEST_TYPE:
+            raise ServiceError(HTTPStatus.UNSUPPORTED_MEDIA_TYPE, f"send the request as {REQUEST_TYPE}")
+        try:
+            return HTTPStatus.OK, await self.call(path, body)
+        except ServiceError:
+            raise
+        except REQUEST_ERRORS as e:
+            raise ServiceError(HTTPStatus.UNPROCESSABLE_ENTITY, f"{type(e).__name__}: {e}")
+
+    async def handle(self, reader, writer):
+        """One request per connection (Connection: close)"""
+        status, payload, headers = HTTPStatus.INTERNAL_SERVER_ERROR, {"error": "internal error"}, {}
+        try:
+            method, path, body, request_headers = await self.read_request(reader)
+            self.counts["requests"] += 1
+            status, payload = await self.respond(method, path, body, request_headers)
+        except ServiceError as e:
+            status, payload, headers = e.status, {"error": str(e)}, e.headers
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+            writer.close()
+            return
+        except Exception as e:
+            self.counts["failed"] += 1
+            print(f"error: {type(e).__name__}: {e}", file=sys.stderr)
+            status, payload = HTTPStatus.INTERNAL_SERVER_ERROR, {"error": f"{type(e).__name__}: {e}"}
+
+        if isinstance(payload, bytes):
+            content_type = XLSX_TYPE
+        else:
+            content_type = JSON_TYPE
+            payload = json.dumps(payload, ensure_ascii=False, default=str).encode()
+        head = [f"HTTP/1.1 {status.value} {status.phrase}", f"Content-Type: {content_type}",
+                f"Content-Length: {len(payload)}", "Connection: close"]
+        head.extend(f"{name}: {value}" for name, value in headers.items())
+        try:
+            writer.write(("\r\n".join(head) + "\r\n\r\n").encode() + payload)
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def read_request(self, reader):
+        """(method, path, body, headers) of a plain HTTP/1.1 request with a Content-Length body
+
+        Header names are lowercased; of repeated headers the last one is kept.
+        """
+        request_line = (await reader.readuntil(b"\r\n")).decode("latin-1").split()
+        if len(request_line) != 3:
+            raise ServiceError(HTTPStatus.BAD_REQUEST, "malformed request line")
+        method, path, _ = request_line
+        headers = {}
+        length = 0
+        while True:
+            line = await reader.readuntil(b"\r\n")
+            if line == b"\r\n":
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            name = name.strip().lower()
+            headers[name] = value.strip()
+            if name == "content-length":
+                if not value.strip().isdigit():
+                    raise ServiceError(HTTPStatus.BAD_REQUEST, "invalid Content-Length")
+                length = int(value)
+            elif name == "transfer-encoding":
+                raise ServiceError(HTTPStatus.LENGTH_REQUIRED, "send the body with a Content-Length")
+        if length > self.max_body:
+            raise ServiceError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, f"bodies are limited to {self.max_body} bytes")
+        body = await reader.readexactly(length) if length else b""
+        return method, path, body, headers
+
+
+async def serve(service, host=DEFAULT_HOST, port=DEFAULT_PORT, unix=None):
+    """Run the service until SIGINT/SIGTERM"""
+    await service.start()
+    if unix is not None:
+        server = await asyncio.start_unix_server(service.handle, unix)
+        address = unix
+    else:
+        server = await asyncio.start_server(service.handle, host, port)
+        address = "{}:{}".format(*server.sockets[0].getsockname()[:2])
+    print(f"Serving on {address} with {service.workers} warm workers", file=sys.stderr, flush=True)
+
+    stopped = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, stopped.set)
+    try:
+        async with server:
+            await stopped.wait()
+    finally:
+        service.close()
+        if unix is not None and os.path.exists(unix):
+            os.remove(unix)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Serve template generation, validation and diff planning locally")
+    parser.add_argument("--host", default=DEFAULT_HOST, help=f"Address to listen on (default: {DEFAULT_HOST})")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help=f"TCP port (default: {DEFAULT_PORT})")
+    parser.add_argument("--unix", help="Listen on this Unix socket instead of TCP")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="Warm worker processes (default: 2)")
+    parser.add_argument("--queue", type=int, default=DEFAULT_QUEUE, help="Requests allowed to wait for a worker")
+    parser.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT, help="Seconds before a job answers 504")
+    parser.add_argument("--cache-entries", type=int, default=DEFAULT_CACHE_ENTRIES, help="Results kept (0 disables)")
+    parser.add_argument("--cache-mb", type=float, default=DEFAULT_CACHE_MB, help="Memory for cached xlsx results")
+    parser.add_argument("--max-body-mb", type=float, default=DEFAULT_MAX_BODY_MB, help="Largest accepted request")
+    parser.add_argument(
+        "--root", default=os.getcwd(),
+        help="Directory request paths are resolved against and must stay within (default: the working directory)",
+    )
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.workers < 1 or args.queue < 0:
+        print("error: --workers must be at least 1 and --queue not negative", file=sys.stderr)
+        sys.exit(2)
+    if not os.path.isdir(args.root):
+        print(f"error: --root {args.root} is not a directory", file=sys.stderr)
+        sys.exit(2)
+    service = Service(
+        args.workers, args.queue, args.timeout,
+        ResultCache(args.cache_entries, int(args.cache_mb * 1024 * 1024)),
+        int(args.max_body_mb * 1024 * 1024), args.root,
+    )
+    try:
+        asyncio.run(serve(service, args.host, args.port, args.unix))
+    except OSError as e:
+        print(f"error: {e}", file=sys.stderr)
+        sys.exit(2)
@@ -0,0 +1,559 @@
+"""
+Spatial grid index for building and portfolio location coordinates
+Buildings and PortfolioLocations carry latitude/longitude (DECIMAL(10,8)
+and DECIMAL(11,8)); the template only range-checks them, so a building
+typed in London, with latitude and longitude swapped, or pasted with the
+coordinates of the row above goes through unnoticed.
+
+SpatialIndex keeps the points in flat float64 arrays sorted by grid cell
+(``cell`` degrees square, row-major keys). One row of cells around a query
+is one contiguous key range, so a radius query is a binary search per cell
+row followed by an exact haversine filter, and bulk queries, nearest
+neighbours (the radius grows until k points are inside) and all close pairs
+run vectorized over every query at once. Longitude does not wrap at 180
+degrees.
+
+Saudi Arabia is a coarse outline polygon (about 60 vertices); points outside
+it by more than --border-km are outliers, and an outlier whose swapped
+coordinates fall inside is reported as swapped.
+
+CoordinateCheck plugs into the validator (validate_property_structure.py
+--coordinates): it taps the Building and PortfolioLocation rows as they
+stream past and reports outliers and swapped pairs as errors, repeated and
+suspiciously close coordinates within the file as warnings. Rows whose
+country is filled with another country are not checked against the outline.
+
+Usage:
+    python property_structure_spatial.py import.db --near 24.7136,46.6753 [--near ...] [--radius 2 | --nearest 5]
+        [--sheet Building|PortfolioLocation] [--ownership 7] [--json]
+    python property_structure_spatial.py import.db --outliers [--border-km 20] [--json]
+    python property_structure_spatial.py import.db --close 20 [--json]      # point pairs within 20 m
+"""
+
+import argparse
+import json
+import math
+import sqlite3
+import sys
+import time
+
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+DEFAULT_CELL_DEGREES = 0.02
+# About 1 m; the finest grid close_pairs builds
+MIN_CELL_DEGREES = 0.00001
+DEFAULT_CLOSE_METERS = 20.0
+DEFAULT_BORDER_KM = 20.0
+DEFAULT_NEAREST = 5
+# Candidate pairs examined per vectorized batch
+PAIR_BATCH = 4_000_000
+# Radius, in cells, after which nearest() compares the remaining queries with every point
+DIRECT_CELLS = 16
+# Stored coordinates have 8 decimals; equal after rounding means the same point
+DECIMALS = 8
+
+# Coarse outline of Saudi Arabia as (latitude, longitude), clockwise from the Gulf of Aqaba;
+# coasts are traced slightly offshore so coastal cities stay inside
+SAUDI_OUTLINE = (
+    (29.36, 34.96), (29.19, 36.07), (29.87, 36.50), (30.50, 37.67), (31.50, 37.00), (32.16, 39.20),
+    (31.48, 41.10), (30.05, 43.60), (29.20, 44.70), (29.10, 46.55), (28.53, 48.43), (27.95, 48.95),
+    (27.05, 49.75), (26.65, 50.30), (26.15, 50.32), (25.60, 50.45), (24.75, 50.82), (24.55, 51.35),
+    (24.25, 51.60), (22.94, 52.58), (22.70, 55.20), (20.00, 55.00), (19.00, 52.00), (18.70, 51.00),
+    (17.80, 48.70), (17.25, 47.00), (17.30, 46.00), (17.25, 44.50), (17.40, 43.50), (16.95, 43.20),
+    (16.37, 42.75), (16.55, 41.85), (17.80, 41.60), (18.20, 41.50), (19.10, 40.85), (20.00, 40.25),
+    (21.00, 39.65), (21.50, 39.05), (22.30, 38.95), (22.80, 38.90), (23.60, 38.45), (24.10, 37.95),
+    (25.05, 37.15), (26.25, 36.35), (27.35, 35.60), (28.00, 34.60), (28.50, 34.78), (29.30, 34.88),
+)
+
+SAUDI_NAMES = {"saudi arabia", "kingdom of saudi arabia", "ksa", "sa", "السعودية", "المملكة العربية السعودية"}
+
+SHEETS = ("PortfolioLocation", "Building")
+
+QUERIES = {
+    "Building": (
+        "SELECT b.id, b.ownership_id, b.code || ' - ' || b.name, b.latitude, b.longitude, b.country "
+        "FROM buildings b WHERE b.latitude IS NOT NULL AND b.longitude IS NOT NULL"
+    ),
+    "PortfolioLocation": (
+        "SELECT l.id, p.ownership_id, p.code || coalesce(' - ' || l.city, ''), "
+        "l.latitude, l.longitude, l.country "
+        "FROM portfolio_locations l JOIN portfolios p ON p.id = l.portfolio_id "
+        "WHERE l.latitude IS NOT NULL AND l.longitude IS NOT NULL"
+    ),
+}
+
+
+class SpatialError(Exception):
+    """Raised for unreadable snapshots and malformed query points"""
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Great-circle distance in km between points given in degrees (arrays broadcast)"""
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(value, dtype=np.float64)) for value in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def _expand(lo, hi):
+    """For ranges [lo, hi): (range number, position) of every element, in order"""
+    counts = hi - lo
+    owner = np.repeat(np.arange(len(lo)), counts)
+    offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    return owner, lo[owner] + offsets
+
+
+class SpatialIndex:
+    """Points in a uniform latitude/longitude grid, sorted by cell key"""
+
+    def __init__(self, lat, lon, cell=DEFAULT_CELL_DEGREES):
+        self.lat = np.asarray(lat, dtype=np.float64)
+        self.lon = np.asarray(lon, dtype=np.float64)
+        if self.lat.shape != self.lon.shape:
+            raise SpatialError("latitude and longitude arrays differ in length")
+        self.cell = cell
+        self.columns = int(math.ceil(360 / cell)) + 1
+        self.rows = int(math.ceil(180 / cell)) + 1
+        keys = self._keys(self._row(self.lat), self._column(self.lon))
+        self.order = np.argsort(keys, kind="stable")
+        self.keys = keys[self.order]
+
+    def __len__(self):
+        return len(self.lat)
+
+    def _row(self, lat):
+        return np.clip(((np.asarray(lat) + 90) / self.cell).astype(np.int64), 0, self.rows - 1)
+
+    def _column(self, lon):
+        return np.clip(((np.asarray(lon) + 180) / self.cell).astype(np.int64), 0, self.columns - 1)
+
+    def _keys(self, rows, columns):
+        return rows * self.columns + columns
+
+    def _candidates(self, lat, lon, km):
+        """Per query and cell row within reach: the [lo, hi) range of sorted points in the column window"""
+        reach_rows = int(math.ceil(km / KM_PER_DEGREE / self.cell))
+        # Each query's column window covers ``km`` at the latitude within reach farthest from the equator
+        widest = np.radians(np.minimum(np.abs(lat) + km / KM_PER_DEGREE, 89.9))
+        reach_columns = np.ceil(km / (KM_PER_DEGREE * np.cos(widest)) / self.cell)
+        reach_columns = np.minimum(reach_columns, self.columns).astype(np.int64)
+        rows, columns = self._row(lat), self._column(lon)
+        first = np.clip(columns - reach_columns, 0, self.columns - 1)
+        last = np.clip(columns + reach_columns, 0, self.columns - 1)
+        queries, lows, highs = [], [], []
+        for step in range(-reach_rows, reach_rows + 1):
+            row = rows + step
+            inside = (row >= 0) & (row < self.rows)
+            lo = np.searchsorted(self.keys, self._keys(row, first), side="left")
+            hi = np.searchsorted(self.keys, self._keys(row, last), side="right")
+            keep = inside & (hi > lo)
+            queries.append(np.flatnonzero(keep))
+            lows.append(lo[keep])
+            highs.append(hi[keep])
+        return np.concatenate(queries), np.concatenate(lows), np.concatenate(highs)
+
+    def within(self, lat, lon, km):
+        """All (query, point, km) within ``km`` of each query point, sorted by query then distance
+
+        Queries are processed in batches of about PAIR_BATCH candidate pairs,
+        so a wide radius over a dense index stays within bounded memory.
+        """
+        lat = np.atleast_1d(np.asarray(lat, dtype=np.float64))
+        lon = np.atleast_1d(np.asarray(lon, dtype=np.float64))
+        empty = (np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), np.zeros(0))
+        if not len(self) or not len(lat):
+            return empty
+        queries, lows, highs = self._candidates(lat, lon, km)
+        # Batch whole queries: candidate counts per query, cut where the running total passes the budget
+        per_query = np.bincount(queries, weights=highs - lows, minlength=len(lat))
+        cuts = np.searchsorted(np.cumsum(per_query), np.arange(PAIR_BATCH, per_query.sum() + PAIR_BATCH, PAIR_BATCH))
+        bounds = np.unique(np.r_[0, np.minimum(cuts + 1, len(lat)), len(lat)])
+        by_query = np.argsort(queries, kind="stable")
+        queries, lows, highs = queries[by_query], lows[by_query], highs[by_query]
+        found = []
+        for start, stop in zip(bounds[:-1], bounds[1:]):
+            a, b = np.searchsorted(queries, [start, stop])
+            ranges, positions = _expand(lows[a:b], highs[a:b])
+            query = queries[a:b][ranges]
+            point = self.order[positions]
+            distance = haversine_km(lat[query], lon[query], self.lat[point], self.lon[point])
+            keep = distance <= km
+            found.append((query[keep], point[keep], distance[keep]))
+        if not found:
+            return empty
+        query, point, distance = (np.concatenate(parts) for parts in zip(*found))
+        order = np.lexsort((point, distance, query))
+        return query[order], point[order], distance[order]
+
+    def nearest(self, lat, lon, k=1, exclude_self=False):
+        """Up to ``k`` nearest points per query as (query, point, km), sorted by query then distance
+
+        The search radius starts at one cell and doubles for the queries
+        that have fewer than k points inside it; the answer is exact because
+        every point closer than the k-th found one is inside the radius.
+        Queries still short after DIRECT_CELLS cells (points far from the
+        rest) are compared with every point once few enough are left.
+        With ``exclude_self`` query i is point i of this index and skips itself.
+        """
+        lat = np.atleast_1d(np.asarray(lat, dtype=np.float64))
+        lon = np.atleast_1d(np.asarray(lon, dtype=np.float64))
+        k = min(k, len(self) - (1 if exclude_self else 0))
+        pending = np.arange(len(lat))
+        km = self.cell * KM_PER_DEGREE
+        results = []
+        while len(pending) and k > 0:
+            if km > DIRECT_CELLS * self.cell * KM_PER_DEGREE and len(pending) * len(self) <= PAIR_BATCH:
+                found = []
+                for idx in pending.tolist():
+                    distance = haversine_km(lat[idx], lon[idx], self.lat, self.lon)
+                    if exclude_self:
+                        distance[idx] = np.inf
+                    point = np.argpartition(distance, k - 1)[:k] if k < len(self) else np.arange(len(self))
+                    point = point[np.lexsort((point, distance[point]))]
+                    found.append((np.full(len(point), idx), point, distance[point]))
+                results.append(tuple(np.concatenate(parts) for parts in zip(*found)))
+                break
+            else:
+                query, point, distance = self.within(lat[pending], lon[pending], km)
+                query = pending[query]
+            if exclude_self:
+                keep = point != query
+                query, point, distance = query[keep], point[keep], distance[keep]
+            counts = np.bincount(query, minlength=len(lat))[pending]
+            # Past half the circumference every point is inside
+            done = pending[(counts >= k) | (km >= math.pi * EARTH_RADIUS_KM)]
+            hit = np.isin(query, done)
+            query, point, distance = query[hit], point[hit], distance[hit]
+            rank = np.arange(len(query)) - np.searchsorted(query, query, side="left")
+            keep = rank < k
+            results.append((query[keep], point[keep], distance[keep]))
+            pending = np.setdiff1d(pending, done, assume_unique=True)
+            km *= 2
+        if not results:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), np.zeros(0)
+        query, point, distance = (np.concatenate(parts) for parts in zip(*results))
+        order = np.lexsort((point, distance, query))
+        return query[order], point[order], distance[order]
+
+    def close_pairs(self, km):
+        """Point pairs (i, j, km) with i < j at most ``km`` apart
+
+        Runs on a grid with cells about ``km`` wide, so dense clusters do not
+        turn every point into thousands of candidates.
+        """
+        cell = min(self.cell, max(km / KM_PER_DEGREE, MIN_CELL_DEGREES))
+        index = self if cell == self.cell else SpatialIndex(self.lat, self.lon, cell)
+        query, point, distance = index.within(self.lat, self.lon, km)
+        keep = query < point
+        return query[keep], point[keep], distance[keep]
+
+
+def _outline_arrays(outline):
+    lat = np.array([point[0] for point in outline])
+    lon = np.array([point[1] for point in outline])
+    return lat, lon, np.roll(lat, -1), np.roll(lon, -1)
+
+
+def inside_outline(lat, lon, outline=SAUDI_OUTLINE):
+    """Even-odd ray casting of every point against a (latitude, longitude) polygon"""
+    lat, lon = np.asarray(lat, dtype=np.float64), np.asarray(lon, dtype=np.float64)
+    inside = np.zeros(lat.shape, dtype=bool)
+    for lat1, lon1, lat2, lon2 in zip(*_outline_arrays(outline)):
+        if lat1 == lat2:
+            continue
+        crosses = (lat1 > lat) != (lat2 > lat)
+        at = lon1 + (lat - lat1) * (lon2 - lon1) / (lat2 - lat1)
+        inside ^= crosses & (lon < at)
+    return inside
+
+
+def outline_distance_km(lat, lon, outline=SAUDI_OUTLINE):
+    """Distance in km from every point to the nearest edge of the polygon (locally flat projection)"""
+    lat, lon = np.asarray(lat, dtype=np.float64), np.asarray(lon, dtype=np.float64)
+    scale = np.cos(np.radians(lat)) * KM_PER_DEGREE
+    best = np.full(lat.shape, np.inf)
+    for lat1, lon1, lat2, lon2 in zip(*_outline_arrays(outline)):
+        # Edge from a to b in km around each point
+        ax, ay = (lon1 - lon) * scale, (lat1 - lat) * KM_PER_DEGREE
+        bx, by = (lon2 - lon) * scale, (lat2 - lat) * KM_PER_DEGREE
+        dx, dy = bx - ax, by - ay
+        length = dx * dx + dy * dy
+        t = np.clip(-(ax * dx + ay * dy) / np.where(length > 0, length, 1), 0, 1)
+        best = np.minimum(best, np.hypot(ax + t * dx, ay + t * dy))
+    return best
+
+
+def saudi_outliers(lat, lon, border_km=DEFAULT_BORDER_KM):
+    """(outside, km outside, swapped) per point: beyond ``border_km`` of the outline, and whether lat/lon swapped fit"""
+    lat, lon = np.asarray(lat, dtype=np.float64), np.asarray(lon, dtype=np.float64)
+    distance = np.zeros(lat.shape)
+    beyond = ~inside_outline(lat, lon)
+    distance[beyond] = outline_distance_km(lat[beyond], lon[beyond])
+    outside = distance > border_km
+    swapped = np.zeros(lat.shape, dtype=bool)
+    if outside.any():
+        swapped[outside] = inside_outline(lon[outside], lat[outside])
+    return outside, distance, swapped
+
+
+def is_saudi(country):
+    """Blank countries default to Saudi Arabia, as the template says"""
+    if country is None:
+        return True
+    text = " ".join(str(country).split()).casefold()
+    return not text or text in SAUDI_NAMES
+
+
+def parse_coordinate(value):
+    if value is None or isinstance(value, bool):
+        return None
+    try:
+        number = float(value.strip() if isinstance(value, str) else value)
+    except (TypeError, ValueError):
+        return None
+    return number if math.isfinite(number) else None
+
+
+def _position(header, name):
+    for idx, value in enumerate(header):
+        if isinstance(value, str) and value.strip() == name:
+            return idx
+    return None
+
+
+class CoordinateCheck:
+    """Collects coordinates from streamed template rows, then reports outliers, swaps and near-duplicates
+
+    ``wrap`` passes the rows of a sheet through unchanged (the validator
+    keeps streaming them) and remembers the row number, latitude, longitude
+    and country of every PortfolioLocation and Building row with both
+    coordinates, and the rows with only one of them. Values that are not
+    numbers or out of range are left to the validator's column checks.
+    """
+
+    def __init__(self, close_meters=DEFAULT_CLOSE_METERS, border_km=DEFAULT_BORDER_KM):
+        self.close_meters = close_meters
+        self.border_km = border_km
+        self.sheets = {}
+
+    def wrap(self, title, header, rows):
+        if title not in SHEETS:
+            return rows
+        positions = [_position(header, name) for name in ("latitude", "longitude", "country")]
+        if positions[0] is None or positions[1] is None:
+            return rows
+        found = self.sheets.setdefault(title, {"positions": positions, "rows": [], "lat": [], "lon": [],
+                                               "country": [], "incomplete": []})
+        return self._tap(rows, found)
+
+    @staticmethod
+    def _tap(rows, found):
+        lat_idx, lon_idx, country_idx = found["positions"]
+        numbers, lats, lons, countries, incomplete = (found[key] for key in ("rows", "lat", "lon", "country",
+                                                                              "incomplete"))
+        for row_number, row in rows:
+            size = len(row)
+            lat = parse_coordinate(row[lat_idx]) if lat_idx < size else None
+            lon = parse_coordinate(row[lon_idx]) if lon_idx < size else None
+            if lat is not None and lon is not None:
+                if -90 <= lat <= 90 and -180 <= lon <= 180:
+                    numbers.append(row_number)
+                    lats.append(lat)
+                    lons.append(lon)
+                    countries.append(row[country_idx] if country_idx is not None and country_idx < size else None)
+            elif lat is not None or lon is not None:
+                incomplete.append((row_number, "longitude" if lon is None else "latitude"))
+            yield row_number, row
+
+    def check(self, errors, warnings):
+        """Report into IssueCollector-like ``errors`` and ``warnings``; returns per-sheet counts"""
+        stats = {}
+        for title, found in self.sheets.items():
+            numbers, lat, lon = np.array(found["rows"], dtype=np.int64), np.array(found["lat"]), np.array(found["lon"])
+            lat_idx, lon_idx, _ = found["positions"]
+            col = lat_idx + 1
+            counts = {"points": len(numbers), "outside": 0, "swapped": 0, "duplicate": 0, "close": 0,
+                      "incomplete": len(found["incomplete"])}
+
+            for row_number, missing in found["incomplete"]:
+                present = "latitude" if missing == "longitude" else "longitude"
+                warnings.add(title, row_number, missing, "incomplete_coordinates",
+                             f"'{present}' is filled but '{missing}' is empty", None,
+                             (lon_idx if missing == "longitude" else lat_idx) + 1)
+
+            saudi = np.array([is_saudi(country) for country in found["country"]], dtype=bool)
+            outside, distance, swapped = saudi_outliers(lat, lon, self.border_km)
+            lat, lon = lat.tolist(), lon.tolist()
+            for idx in np.flatnonzero(outside & saudi).tolist():
+                if swapped[idx]:
+                    counts["swapped"] += 1
+                    errors.add(title, int(numbers[idx]), "latitude", "swapped_coordinates",
+                               f"Latitude and longitude look swapped: {lat[idx]}, {lon[idx]} is outside Saudi Arabia "
+                               f"but {lon[idx]}, {lat[idx]} is inside", lat[idx], col)
+                else:
+                    counts["outside"] += 1
+                    errors.add(title, int(numbers[idx]), "latitude", "outside_saudi_arabia",
+                               f"Coordinates {lat[idx]}, {lon[idx]} are {distance[idx]:,.0f} km outside Saudi Arabia",
+                               lat[idx], col)
+
+            # Repeated coordinates: every row after the first of a group points at the first
+            rounded = np.round(np.column_stack([found["lat"], found["lon"]]), DECIMALS)
+            _, first, inverse = np.unique(rounded.reshape(-1, 2), axis=0, return_index=True, return_inverse=True)
+            inverse = inverse.ravel()
+            for idx in np.flatnonzero(first[inverse] != np.arange(len(numbers))).tolist():
+                counts["duplicate"] += 1
+                warnings.add(title, int(numbers[idx]), "latitude", "duplicate_coordinates",
+                             f"Same coordinates as row {numbers[first[inverse[idx]]]}", lat[idx], col)
+
+            # Suspiciously close: distinct points within close_meters, reported once on the later row
+            index = SpatialIndex(np.array(found["lat"])[first], np.array(found["lon"])[first])
+            i, j, km = index.close_pairs(self.close_meters / 1000)
+            keep = km > 0
+            i, j, km = first[i[keep]], first[j[keep]], km[keep]
+            later, earlier = np.maximum(i, j), np.minimum(i, j)
+            order = np.lexsort((km, later))
+            reported = set()
+            for a, b, d in zip(later[order].tolist(), earlier[order].tolist(), km[order].tolist()):
+                if a in reported:
+                    continue
+                reported.add(a)
+                counts["close"] += 1
+                warnings.add(title, int(numbers[a]), "latitude", "close_coordinates",
+                             f"Only {d * 1000:.1f} m from row {numbers[b]}", lat[a], col)
+            stats[title] = counts
+        return stats
+
+
+def load_points(path, sheet="Building", ownership_ids=None):
+    """(ids, ownership ids, labels, latitudes, longitudes, countries) of a sheet in a SQLite or JSON snapshot"""
+    if path.endswith(".json"):
+        with open(path, encoding="utf-8") as handle:
+            snapshot = json.load(handle)
+        if sheet == "PortfolioLocation":
+            portfolios = {record.get("id"): record for record in snapshot.get("Portfolio", ())}
+        rows = []
+        for record in snapshot.get(sheet, ()):
+            if sheet == "PortfolioLocation":
+                portfolio = portfolios.get(record.get("portfolio_id"), {})
+                owner, label = portfolio.get("ownership_id"), " - ".join(
+                    str(part) for part in (portfolio.get("code"), record.get("city")) if part)
+            else:
+                owner, label = record.get("ownership_id"), f"{record.get('code')} - {record.get('name')}"
+            rows.append((record.get("id"), owner, label, record.get("latitude"), record.get("longitude"),
+                         record.get("country")))
+    else:
+        try:
+            conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+            try:
+                rows = conn.execute(QUERIES[sheet]).fetchall()
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            raise SpatialError(f"{path}: {e}") from e
+    lat = np.array([parse_coordinate(row[3]) for row in rows], dtype=np.float64)
+    lon = np.array([parse_coordinate(row[4]) for row in rows], dtype=np.float64)
+    keep = np.isfinite(lat) & np.isfinite(lon)
+    if ownership_ids is not None:
+        keep &= np.isin(np.array([row[1] for row in rows], dtype=object), list(ownership_ids))
+    rows = [row for row, kept in zip(rows, keep.tolist()) if kept]
+    return (
+        np.array([row[0] for row in rows], dtype=np.int64),
+        np.array([row[1] for row in rows], dtype=object),
+        [row[2] for row in rows],
+        lat[keep],
+        lon[keep],
+        [row[5] for row in rows],
+    )
+
+
+def parse_point(text):
+    try:
+        lat, lon = (float(part) for part in text.split(","))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected LAT,LON (got {text!r})") from None
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        raise argparse.ArgumentTypeError(f"{text} is out of range")
+    return lat, lon
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Nearest, radius, close-pair and outlier queries over coordinates")
+    parser.add_argument("snapshot", help="SQLite database with the loader's tables, or a .json snapshot")
+    parser.add_argument("--sheet", choices=SHEETS, default="Building", help="Points to index (default: Building)")
+    parser.add_argument("--ownership", type=int, action="append", help="Only this ownership's points (repeatable)")
+    parser.add_argument("--near", type=parse_point, action="append", metavar="LAT,LON", help="Query point (repeatable)")
+    parser.add_argument("--radius", type=float, help="With --near: every point within this many km")
+    parser.add_argument("--nearest", type=int, help=f"With --near: the k nearest points (default: {DEFAULT_NEAREST})")
+    parser.add_argument("--outliers", action="store_true", help="Points outside Saudi Arabia")
+    parser.add_argument("--border-km", type=float, default=DEFAULT_BORDER_KM,
+                        help=f"Tolerance around the outline (default: {DEFAULT_BORDER_KM:g} km)")
+    parser.add_argument("--close", type=float, metavar="METERS", help="Point pairs at most this many meters apart")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    if sum(bool(mode) for mode in (args.near, args.outliers, args.close)) != 1:
+        print("error: pick one of --near, --outliers and --close", file=sys.stderr)
+        sys.exit(2)
+    if args.radius is not None and args.nearest is not None:
+        print("error: --radius and --nearest exclude each other", file=sys.stderr)
+        sys.exit(2)
+    try:
+        started = time.perf_counter()
+        ids, owners, labels, lat, lon, countries = load_points(args.snapshot, args.sheet, args.ownership)
+        index = SpatialIndex(lat, lon)
+        loaded = time.perf_counter() - started
+    except (SpatialError, OSError) as e:
+        print(f"error: {e}", file=sys.stderr)
+        sys.exit(2)
+
+    def describe(point, km=None):
+        entry = {"id": int(ids[point]), "ownership_id": owners[point], "label": labels[point],
+                 "latitude": float(lat[point]), "longitude": float(lon[point])}
+        if km is not None:
+            entry["km"] = round(float(km), 3)
+        return entry
+
+    started = time.perf_counter()
+    if args.near:
+        points = np.array(args.near)
+        if args.radius is not None:
+            query, point, km = index.within(points[:, 0], points[:, 1], args.radius)
+        else:
+            query, point, km = index.nearest(points[:, 0], points[:, 1], args.nearest or DEFAULT_NEAREST)
+        results = [{"near": list(near), "points": [describe(p, d) for q, p, d in zip(query, point, km) if q == n]}
+                   for n, near in enumerate(args.near)]
+    elif args.outliers:
+        outside, distance, swapped = saudi_outliers(lat, lon, args.border_km)
+        saudi = np.array([is_saudi(country) for country in countries], dtype=bool)
+        results = [{**describe(p), "km_outside": round(float(distance[p]), 1), "swapped": bool(swapped[p])}
+                   for p in np.flatnonzero(outside & saudi).tolist()]
+    else:
+        first, second, km = index.close_pairs(args.close / 1000)
+        results = [{"meters": round(float(d) * 1000, 2), "points": [describe(a), describe(b)]}
+                   for a, b, d in zip(first.tolist(), second.tolist(), km.tolist())]
+    queried = time.perf_counter() - started
+
+    if args.json:
+        print(json.dumps({"points": len(index), "load_seconds": round(loaded, 3), "query_ms": round(queried * 1000, 3),
+                          "results": results}, ensure_ascii=False, indent=2))
+        sys.exit(0)
+    if args.near:
+        for result in results:
+            print(f"Near {result['near'][0]}, {result['near'][1]}: {len(result['points'])} points")
+            for entry in result["points"]:
+                print(f"  {entry['km']:8.3f} km  #{entry['id']} {entry['label']} (ownership {entry['ownership_id']})")
+    elif args.outliers:
+        for entry in results:
+            hint = " (latitude/longitude swapped?)" if entry["swapped"] else ""
+            print(f"  #{entry['id']} {entry['label']} (ownership {entry['ownership_id']}): {entry['latitude']}, "
+                  f"{entry['longitude']} is {entry['km_outside']:,} km outside Saudi Arabia{hint}")
+    else:
+        for entry in results:
+            a, b = entry["points"]
+            print(f"  {entry['meters']:7.2f} m  #{a['id']} {a['label']} (ownership {a['ownership_id']}) "
+                  f"and #{b['id']} {b['label']} (ownership {b['ownership_id']})")
+    print(f"{len(results)} results over {len(index)} points in {queried * 1000:.2f} ms (loaded in {loaded:.2f}s)")
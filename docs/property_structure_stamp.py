@@ -0,0 +1,520 @@
+"""
+Prefilled templates stamped from a cached template skeleton
+create_excel_template() rebuilds the whole workbook through openpyxl for
+every export: named styles, the Instructions sheet, header and description
+rows, dropdown validations, the Lists sheet and the defined names, and each
+data cell goes through an openpyxl cell object and its XML writer. Only the
+data rows, the validation ranges and the lookup lists depend on the records.
+
+A skeleton is the template rendered once by the generator itself
+(build_workbook with empty data sheets) and kept as its zip parts. Stamping
+copies the static parts (styles, theme, Instructions, relationships, content
+types) byte for byte, splices the data rows into each data sheet between
+its header rows and its validations, stretches the validation ranges and
+defined names to the new last row and rewrites the Lists sheet from the grouped lists collected on the way. Cells
+are encoded the way openpyxl writes them (inline strings, "%.16g" numbers,
+"true"/"false" for booleans, text starting with "=" as a formula), so the
+output reads back exactly like create_excel_template's; --check renders the
+same data with create_excel_template and compares the two files.
+
+A skeleton depends on whether it is an export or the empty template and on
+which grouped dropdowns (portfolios and buildings by ownership, floors by
+building) are non-empty, since those decide the validation formulas and
+the Lists columns. There are only a handful of such shapes and each is
+rendered once per process; with --cache-dir they are also kept on disk,
+keyed by a fingerprint of the generator, the schema and this module.
+
+Usage:
+    python property_structure_stamp.py -o empty.xlsx
+    python property_structure_stamp.py --data-dir data/ -o filled.xlsx [--cache-dir .skeletons] [--check] [--json]
+"""
+
+import argparse
+import contextlib
+import hashlib
+import io
+import json
+import math
+import os
+import re
+import sys
+import tempfile
+import zipfile
+from datetime import datetime, timezone
+from itertools import zip_longest
+
+from openpyxl.cell.cell import ERROR_CODES, ILLEGAL_CHARACTERS_RE
+from openpyxl.compat.numbers import NUMERIC_TYPES
+from openpyxl.utils import get_column_letter
+
+from create_property_structure_excel import (
+    EXPORT_EXTRA_ROWS,
+    LOOKUP_SHEET,
+    MAX_EXPORT_ROWS,
+    LookupLists,
+    build_workbook,
+    create_excel_template,
+    _cell_value,
+    load_data_dir,
+    row_limit_message,
+)
+from property_structure_instrumentation import current as instrumentation
+from property_structure_reader import read_workbook_rows, sheet_parts
+from property_structure_schema import FIRST_DATA_ROW, SHEETS, SHEETS_BY_TITLE
+
+SKELETON_FORMAT = 1
+# Files whose content shapes a skeleton; editing them invalidates the disk cache
+SKELETON_SOURCES = ("create_property_structure_excel.py", "property_structure_schema.py", "property_structure_stamp.py")
+
+# Data rows encoded per write to the zip stream
+CHUNK_ROWS = 2048
+# openpyxl truncates cell text to Excel's limit
+MAX_TEXT = 32767
+COLUMN_LETTERS = [get_column_letter(idx) for idx in range(1, 16385)]
+# Integers below this print the same with "%.16g" as with str()
+EXACT_INT = 10 ** 16
+
+# (parent sheet, parent column) of every grouped dropdown list, in LookupLists order
+GROUP_KEYS = tuple(LookupLists().groups)
+# Stand-in pair that makes a grouped list non-empty while the skeleton is rendered
+PLACEHOLDER = (0, 0)
+
+# Exported sheets of a skeleton have no rows, so their validations end here
+SKELETON_LAST_ROW = FIRST_DATA_ROW - 1 + EXPORT_EXTRA_ROWS
+SQREF_END_RE = re.compile(rb'(sqref="[A-Z]+%d:[A-Z]+)%d"' % (FIRST_DATA_ROW, SKELETON_LAST_ROW))
+DEFINED_NAME_RE = re.compile(rb'(<definedName name="([^"]+)"[^>]*>[^<]*?\$)(\d+)(</definedName>)')
+TIMESTAMP_RE = re.compile(rb"\d{4}-\d\d-\d\dT\d\d:\d\d:\d\dZ")
+VALIDATIONS_RE = re.compile(rb"<dataValidations.*?</dataValidations>", re.S)
+DEFINED_NAMES_RE = re.compile(rb"<definedNames>.*?</definedNames>", re.S)
+
+CORE_PART = "docProps/core.xml"
+WORKBOOK_PART = "xl/workbook.xml"
+
+
+class StampError(Exception):
+    """A value cannot be written into a stamped template"""
+
+
+def skeleton_fingerprint():
+    """Hash of the sources a skeleton is rendered from"""
+    digest = hashlib.sha256(b"%d" % SKELETON_FORMAT)
+    directory = os.path.dirname(os.path.abspath(__file__))
+    for name in SKELETON_SOURCES:
+        with open(os.path.join(directory, name), "rb") as handle:
+            digest.update(handle.read())
+    return digest.hexdigest()
+
+
+class Skeleton:
+    """One rendered template shape, split into the zip parts stamping reuses
+
+    ``columns`` lists the Lists sheet columns as (name, static values, group
+    key, pair index); grouped columns are refilled from the collected pairs.
+    ``names`` maps the defined names whose range grows with the data to the
+    sheet title (id ranges) or group key (grouped lists) that sizes them.
+    """
+
+    def __init__(self, exported, parts, titles, columns=(), names=None):
+        self.exported = exported
+        self.parts = parts
+        self.titles = titles
+        self.columns = [tuple(column) for column in columns]
+        self.names = {
+            name: source if isinstance(source, str) else tuple(source) for name, source in (names or {}).items()
+        }
+        self.content = content = dict(parts)
+
+        # Exported sheets: everything before </sheetData>, then the tail cut at each validation range end
+        self.sheets = {}
+        for title in exported or ():
+            xml = content[titles[title]]
+            cut = xml.index(b"</sheetData>")
+            tail = SQREF_END_RE.sub(lambda match: match.group(1) + b'\0"', xml[cut:])
+            self.sheets[title] = (titles[title], xml[:cut], tail.split(b"\0"))
+
+        self.lists = None
+        if exported is not None:
+            part = titles[LOOKUP_SHEET]
+            xml = content[part]
+            start = xml.index(b"<sheetData>") + len(b"<sheetData>")
+            self.lists = (part, xml[:start], xml[xml.index(b"</sheetData>"):])
+
+    @classmethod
+    def render(cls, exported, groups):
+        """Render a shape with the template generator"""
+        lookups = LookupLists()
+        for key in groups:
+            lookups.groups[key].append(PLACEHOLDER)
+        data = None if exported is None else {title: [] for title in exported}
+        buffer = io.BytesIO()
+        build_workbook(data, lookups).save(buffer)
+        with zipfile.ZipFile(buffer) as zf:
+            parts = [(info.filename, zf.read(info)) for info in zf.infolist()]
+            titles = sheet_parts(zf)
+
+        grouped = {name: (key, idx) for key, pair in lookups.grouped_names.items() for idx, name in enumerate(pair)}
+        columns = [
+            (name, None, *grouped[name]) if name in grouped else (name, values, None, None)
+            for name, values in lookups.columns
+        ]
+        names = {f"ids_{title}": title for title in exported or () if f"ids_{title}" in lookups.names}
+        names.update((name, key) for name, (key, _) in grouped.items())
+        return cls(exported, parts, titles, columns, names)
+
+    def to_json(self):
+        return {
+            "exported": self.exported,
+            "parts": [[name, data.decode("latin-1")] for name, data in self.parts],
+            "titles": self.titles,
+            "columns": self.columns,
+            "names": self.names,
+        }
+
+    @classmethod
+    def from_json(cls, document):
+        exported = document["exported"]
+        columns = [(name, values, tuple(key) if key else None, idx) for name, values, key, idx in document["columns"]]
+        return cls(
+            tuple(exported) if exported is not None else None,
+            [(name, data.encode("latin-1")) for name, data in document["parts"]],
+            document["titles"],
+            columns,
+            document["names"],
+        )
+
+    def lists_xml(self, groups):
+        """The Lists sheet with the grouped columns refilled from ``groups``"""
+        part, head, tail = self.lists
+        columns = [
+            values if key is None else [pair[idx] for pair in groups[key]]
+            for _, values, key, idx in self.columns
+        ]
+        rows = [_row_xml(1, [name for name, _, _, _ in self.columns])]
+        rows.extend(_row_xml(number, list(row)) for number, row in enumerate(zip_longest(*columns), start=2))
+        return head + "".join(rows).encode() + tail
+
+    def workbook_xml(self, last_rows, groups):
+        """workbook.xml with the data-sized defined names ending at the stamped rows"""
+        def end(match):
+            source = self.names.get(match.group(2).decode())
+            if source is None:
+                return match.group(0)
+            last = last_rows[source] if isinstance(source, str) else max(len(groups[source]), 1) + 1
+            return match.group(1) + b"%d" % last + match.group(4)
+        return DEFINED_NAME_RE.sub(end, self.content[WORKBOOK_PART])
+
+
+class SkeletonCache:
+    """Skeletons by shape, rendered on first use and optionally kept in a directory"""
+
+    def __init__(self, directory=None):
+        self.directory = directory
+        self.fingerprint = skeleton_fingerprint()
+        self.skeletons = {}
+        self.rendered = 0
+
+    def get(self, exported, groups=()):
+        shape = (exported, frozenset(groups) if exported is not None else frozenset())
+        skeleton = self.skeletons.get(shape)
+        if skeleton is None:
+            skeleton = self._load(shape)
+            if skeleton is None:
+                with instrumentation().span("skeleton", sheets=len(exported or ())):
+                    skeleton = Skeleton.render(*shape)
+                self.rendered += 1
+                self._store(shape, skeleton)
+            self.skeletons[shape] = skeleton
+        return skeleton
+
+    def _path(self, shape):
+        exported, groups = shape
+        key = json.dumps([self.fingerprint, exported, sorted(groups)])
+        return os.path.join(self.directory, f"skeleton-{hashlib.sha256(key.encode()).hexdigest()[:24]}.json")
+
+    def _load(self, shape):
+        if self.directory is None:
+            return None
+        path = self._path(shape)
+        if not os.path.exists(path):
+            return None
+        with open(path, encoding="utf-8") as handle:
+            document = json.load(handle)
+        if document.get("format") != SKELETON_FORMAT or document.get("fingerprint") != self.fingerprint:
+            return None
+        return Skeleton.from_json(document)
+
+    def _store(self, shape, skeleton):
+        if self.directory is None:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(shape)
+        document = {"format": SKELETON_FORMAT, "fingerprint": self.fingerprint, **skeleton.to_json()}
+        with open(path + ".partial", "w", encoding="utf-8") as handle:
+            json.dump(document, handle)
+        os.replace(path + ".partial", path)
+
+
+_default_cache = None
+
+
+def default_cache():
+    """Process-wide in-memory skeleton cache"""
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = SkeletonCache()
+    return _default_cache
+
+
+def _escape(text):
+    if "&" in text:
+        text = text.replace("&", "&amp;")
+    if "<" in text:
+        text = text.replace("<", "&lt;")
+    if ">" in text:
+        text = text.replace(">", "&gt;")
+    if "\r" in text:
+        text = text.replace("\r", "&#13;")
+    return text
+
+
+def _number(value):
+    if value != value or value in (math.inf, -math.inf):
+        return ""
+    return "%.16g" % value
+
+
+def _text_xml(ref, value):
+    if not value:
+        return f'<c r="{ref}" t="inlineStr"/>'
+    if len(value) > MAX_TEXT:
+        value = value[:MAX_TEXT]
+    # Only non-printable text can hold the control characters Excel rejects
+    if not value.isprintable() and ILLEGAL_CHARACTERS_RE.search(value):
+        raise StampError(f"{value!r} cannot be used in worksheets")
+    first = value[0]
+    if first == "=" and len(value) > 1:
+        return f'<c r="{ref}"><f>{_escape(value[1:])}</f><v/></c>'
+    if first == "#" and value in ERROR_CODES:
+        return f'<c r="{ref}" t="e"><v>{value}</v></c>'
+    space = ' xml:space="preserve"' if first.isspace() or value[-1].isspace() else ""
+    return f'<c r="{ref}" t="inlineStr"><is><t{space}>{_escape(value)}</t></is></c>'
+
+
+def _cell_xml(ref, value):
+    """One unstyled <c> element, typed as openpyxl types the value"""
+    cls = value.__class__
+    if cls is str:
+        return _text_xml(ref, value)
+    if cls is bool:
+        return f'<c r="{ref}" t="b"><v>{int(value)}</v></c>'
+    if isinstance(value, NUMERIC_TYPES):
+        return f'<c r="{ref}" t="n"><v>{_number(value)}</v></c>'
+    if isinstance(value, bytes):
+        return _text_xml(ref, value.decode("utf-8"))
+    raise StampError(f"cannot write {value!r} ({cls.__name__}); only text, numbers and booleans can be stamped")
+
+
+def _row_xml(number, values):
+    cells = [
+        _cell_xml(f"{letter}{number}", value)
+        for letter, value in zip(COLUMN_LETTERS, values) if value is not None
+    ]
+    return f'<row r="{number}">{"".join(cells)}</row>'
+
+
+def _data_row_xml(number, values):
+    """A data row: like _row_xml, with booleans as "true"/"false" text and the common types inlined"""
+    cells = []
+    append = cells.append
+    for letter, value in zip(COLUMN_LETTERS, values):
+        if value is None:
+            continue
+        cls = value.__class__
+        if cls is str:
+            append(_text_xml(f"{letter}{number}", value))
+        elif cls is int and -EXACT_INT < value < EXACT_INT:
+            append(f'<c r="{letter}{number}" t="n"><v>{value}</v></c>')
+        elif cls is bool:
+            append(f'<c r="{letter}{number}" t="inlineStr"><is><t>{"true" if value else "false"}</t></is></c>')
+        else:
+            append(_cell_xml(f"{letter}{number}", value))
+    return f'<row r="{number}">{"".join(cells)}</row>'
+
+
+def _write_rows(handle, schema, rows, collectors):
+    """Stream one sheet's data rows; returns how many were written"""
+    names = schema.headers
+    chunk = []
+    number = FIRST_DATA_ROW - 1
+    for row in rows:
+        if number - FIRST_DATA_ROW + 1 >= MAX_EXPORT_ROWS:
+            raise StampError(row_limit_message(schema.title))
+        values = [row.get(name) for name in names] if isinstance(row, dict) else row
+        for key_idx, id_idx, pairs in collectors:
+            if max(key_idx, id_idx) < len(values) and values[key_idx] is not None and values[id_idx] is not None:
+                pairs.append((_cell_value(values[key_idx]), _cell_value(values[id_idx])))
+        number += 1
+        try:
+            chunk.append(_data_row_xml(number, values))
+        except StampError as e:
+            raise StampError(f"{schema.title} row {number}: {e}") from None
+        if len(chunk) >= CHUNK_ROWS:
+            handle.write("".join(chunk).encode())
+            chunk.clear()
+    if chunk:
+        handle.write("".join(chunk).encode())
+    return number - FIRST_DATA_ROW + 1
+
+
+def _expected_groups(exported, groups, written):
+    """Grouped lists taken as non-empty: known for rendered parents, assumed for parents still to come
+
+    A sheet's validations only use groups fed by earlier sheets, so the guess
+    about later ones never changes its XML; it just avoids rendering a
+    skeleton per intermediate shape.
+    """
+    return frozenset(
+        key for key, pairs in groups.items()
+        if (bool(pairs) if key[0] in written else key[0] in (exported or ()))
+    )
+
+
+def stamp_template(filename, data=None, cache=None):
+    """Write the template create_excel_template(filename, data) would write, from a cached skeleton
+
+    ``data`` maps sheet titles to iterables of rows (mappings keyed by header
+    or sequences in header order); sheets missing from it are left without
+    rows and ``data=None`` gives the empty template. Returns the data rows
+    written per sheet. Sheets with more than MAX_EXPORT_ROWS rows raise
+    StampError, before anything is written when their length is known.
+    """
+    if data is not None:
+        for schema in SHEETS:
+            rows = data.get(schema.title)
+            if hasattr(rows, "__len__") and len(rows) > MAX_EXPORT_ROWS:
+                raise StampError(row_limit_message(schema.title, len(rows)))
+    cache = cache if cache is not None else default_cache()
+    exported = None if data is None else tuple(schema.title for schema in SHEETS)
+    groups = {key: [] for key in GROUP_KEYS}
+    written, last_rows, counts = set(), {}, {}
+    timestamp = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ").encode()
+
+    metrics = instrumentation()
+    with metrics.span("stamp", file=str(filename)) as span:
+        skeleton = cache.get(exported, _expected_groups(exported, groups, written))
+        sheet_titles = {part: title for title, part in skeleton.titles.items() if title != LOOKUP_SHEET}
+        lists_part = skeleton.titles.get(LOOKUP_SHEET)
+        with zipfile.ZipFile(filename, "w", zipfile.ZIP_DEFLATED) as zf:
+            for part, content in list(skeleton.parts):
+                title = sheet_titles.get(part)
+                if title is not None:
+                    # Validations may use grouped lists of the sheets before this one
+                    skeleton = cache.get(exported, _expected_groups(exported, groups, written))
+                    content = skeleton.content[part]
+                if title in skeleton.sheets:
+                    _, head, tail = skeleton.sheets[title]
+                    schema = SHEETS_BY_TITLE[title]
+                    collectors = [
+                        (schema.headers.index(column), schema.headers.index("id"), groups[(parent, column)])
+                        for parent, column in GROUP_KEYS if parent == title
+                    ]
+                    with metrics.span("sheet", sheet=title) as sheet_span:
+                        with zf.open(part, "w", force_zip64=True) as handle:
+                            handle.write(head)
+                            rows = data.get(title)
+                            count = _write_rows(handle, schema, rows if rows is not None else (), collectors)
+                            last_rows[title] = FIRST_DATA_ROW - 1 + count + EXPORT_EXTRA_ROWS
+                            handle.write((b"%d" % last_rows[title]).join(tail))
+                        sheet_span.set(rows=count)
+                    counts[title] = count
+                    written.add(title)
+                elif part == lists_part and exported is not None:
+                    for pairs in groups.values():
+                        pairs.sort(key=lambda pair: (isinstance(pair[0], str), pair[0]))
+                    skeleton = cache.get(exported, _expected_groups(exported, groups, written))
+                    zf.writestr(part, skeleton.lists_xml(groups))
+                elif part == WORKBOOK_PART and exported is not None:
+                    zf.writestr(part, skeleton.workbook_xml(last_rows, groups))
+                elif part == CORE_PART:
+                    zf.writestr(part, TIMESTAMP_RE.sub(timestamp, content))
+                else:
+                    zf.writestr(part, content)
+        span.set(rows=sum(counts.values()))
+    return counts
+
+
+def compare_templates(left, right):
+    """Differences between two templates: sheet values, validations and defined names"""
+    differences = []
+    left_rows = {title: list(rows) for title, rows in read_workbook_rows(left)}
+    right_rows = {title: list(rows) for title, rows in read_workbook_rows(right)}
+    if list(left_rows) != list(right_rows):
+        differences.append(f"sheets differ: {list(left_rows)} != {list(right_rows)}")
+    for title in left_rows.keys() & right_rows.keys():
+        for (number, values), other in zip_longest(left_rows[title], right_rows[title], fillvalue=(None, None)):
+            if (number, values) != other:
+                differences.append(f"{title} row {number or other[0]}: {values!r} != {other[1]!r}")
+                break
+
+    with zipfile.ZipFile(left) as left_zip, zipfile.ZipFile(right) as right_zip:
+        left_parts, right_parts = sheet_parts(left_zip), sheet_parts(right_zip)
+        for title in left_parts.keys() & right_parts.keys():
+            if (VALIDATIONS_RE.findall(left_zip.read(left_parts[title]))
+                    != VALIDATIONS_RE.findall(right_zip.read(right_parts[title]))):
+                differences.append(f"{title}: data validations differ")
+        if (DEFINED_NAMES_RE.findall(left_zip.read(WORKBOOK_PART))
+                != DEFINED_NAMES_RE.findall(right_zip.read(WORKBOOK_PART))):
+            differences.append("defined names differ")
+    return differences
+
+
+def check_against_generator(filename, data):
+    """Render ``data`` with create_excel_template and compare it with a stamped file"""
+    with tempfile.TemporaryDirectory() as directory:
+        reference = os.path.join(directory, "reference.xlsx")
+        with contextlib.redirect_stdout(io.StringIO()):
+            create_excel_template(reference, data)
+        return compare_templates(filename, reference)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Stamp a Property Structure template from a cached skeleton")
+    parser.add_argument("-o", "--output", required=True, help="Output .xlsx path")
+    parser.add_argument("--data-dir", help="Directory with <Sheet>.jsonl files to export (default: empty template)")
+    parser.add_argument("--cache-dir", help="Keep rendered skeletons in this directory between runs")
+    parser.add_argument("--check", action="store_true", help="Compare the result with create_excel_template's output")
+    parser.add_argument("--json", action="store_true", help="Print the summary as JSON")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    try:
+        cache = SkeletonCache(args.cache_dir)
+        started = datetime.now()
+        counts = stamp_template(args.output, load_data_dir(args.data_dir) if args.data_dir else None, cache)
+        summary = {
+            "file": args.output,
+            "rows": counts,
+            "skeletons_rendered": cache.rendered,
+            "seconds": round((datetime.now() - started).total_seconds(), 3),
+        }
+        if args.check:
+            summary["differences"] = check_against_generator(
+                args.output, load_data_dir(args.data_dir) if args.data_dir else None
+            )
+    except (StampError, OSError, ValueError) as e:
+        print(f"error: {e}", file=sys.stderr)
+        sys.exit(2)
+
+    if args.json:
+        print(json.dumps(summary, ensure_ascii=False, indent=2))
+    else:
+        print(f"{summary['file']}: {sum(counts.values())} rows in {summary['seconds']}s "
+              f"({summary['skeletons_rendered']} skeletons rendered)")
+        for title, count in counts.items():
+            print(f"  {title}: {count}")
+        for difference in summary.get("differences", ()):
+            print(f"  differs: {difference}")
+    if summary.get("differences"):
+        sys.exit(1)
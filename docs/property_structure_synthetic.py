@@ -0,0 +1,501 @@
+"""
+Seeded synthetic Property Structure hierarchies for load testing
+The seeders (AlNoorTowerSeeder, BumahrizCenterSeeder) describe one building
+each, so import, validation and report paths cannot be exercised at scale.
+This generator builds complete hierarchies of any size (ownership ->
+portfolio -> location -> building -> floor -> unit -> specification) with
+Arabic names, Saudi cities and coordinates, per-type floor counts, areas,
+rents and specification distributions modelled on those seeders.
+
+Every sheet is generated as numpy columns in a few vectorized passes:
+building sizes are drawn first, floors and units are expanded with
+np.repeat and cut at exactly --units, and ownership/portfolio boundaries
+are cut points over the building sequence. Ids are 1..n per sheet and
+every foreign key is derived from those arrays, so the references, the
+consistent references (a unit's floor is in its building, a building's
+portfolio belongs to its ownership) and the unique keys hold by
+construction. The same --seed gives the same rows whatever is written.
+
+Output goes to any combination of the xlsx template (stamped from the
+cached template skeleton), a columnar bundle (write_bundle) and SQLite
+(the loader's BulkLoader). Portfolio codes are PF-<ownership>-<n> and
+unique per database, so a database holds one generated hierarchy.
+
+The xlsx template is bound by the worksheet row limit: a sheet takes at
+most MAX_EXPORT_ROWS (1,048,074) rows, and with about 3.6 specifications
+per unit UnitSpecification reaches it at roughly 290,000 units. Larger
+hierarchies only go to --bundle or --sqlite; --xlsx raises SyntheticError
+before writing anything.
+
+Usage:
+    python property_structure_synthetic.py --units 1000000 [--seed 7] [--ownerships 100]
+        [--xlsx synthetic.xlsx] [--bundle synthetic/ [--format csv|parquet]] [--sqlite synthetic.db] [--json]
+"""
+
+import argparse
+import json
+import sqlite3
+import sys
+import time
+
+import numpy as np
+
+from create_property_structure_excel import MAX_EXPORT_ROWS
+from property_structure_columnar import CSV_FORMAT, FORMATS, ColumnarError, write_bundle
+from property_structure_loader import BulkLoader, LoadError, create_sqlite_schema
+from property_structure_schema import FIRST_DATA_ROW, SHEETS
+from property_structure_stamp import stamp_template
+
+DEFAULT_SEED = 7
+# One ownership per this many units unless --ownerships is given
+UNITS_PER_OWNERSHIP = 10000
+# Chance that a building starts a new portfolio within its ownership
+NEW_PORTFOLIO_RATE = 0.08
+# Share of portfolios nested under their ownership's first portfolio
+NESTED_PORTFOLIO_RATE = 0.1
+# Share of portfolios with a second (non-primary) location
+SECOND_LOCATION_RATE = 0.3
+
+# (name, Arabic name, state, zip prefix, latitude, longitude, weight)
+CITIES = (
+    ("Riyadh", "الرياض", "Riyadh Province", "11", 24.7136, 46.6753, 30),
+    ("Jeddah", "جدة", "Makkah Province", "21", 21.5433, 39.1728, 20),
+    ("Makkah", "مكة المكرمة", "Makkah Province", "24", 21.4225, 39.8262, 8),
+    ("Madinah", "المدينة المنورة", "Madinah Province", "42", 24.4672, 39.6111, 7),
+    ("Dammam", "الدمام", "Eastern Province", "32", 26.4207, 50.0888, 8),
+    ("Khobar", "الخبر", "Eastern Province", "34", 26.2172, 50.1971, 6),
+    ("Taif", "الطائف", "Makkah Province", "26", 21.2703, 40.4158, 4),
+    ("Buraidah", "بريدة", "Qassim Province", "52", 26.3592, 43.9818, 4),
+    ("Tabuk", "تبوك", "Tabuk Province", "71", 28.3835, 36.5662, 3),
+    ("Abha", "أبها", "Asir Province", "62", 18.2164, 42.5053, 3),
+    ("Hail", "حائل", "Hail Province", "55", 27.5114, 41.7208, 2),
+    ("Jazan", "جازان", "Jazan Province", "45", 16.8892, 42.5511, 2),
+    ("Najran", "نجران", "Najran Province", "66", 17.4917, 44.1277, 1),
+    ("Al Ahsa", "الأحساء", "Eastern Province", "31", 25.3838, 49.5867, 2),
+)
+# Residential buildings with this many floors are towers, with penthouses on the top floor
+TOWER_FLOORS = 8
+# Standard deviation of building coordinates around their city centre, in degrees
+CITY_SPREAD = 0.06
+
+FAMILIES = (
+    "الحربي", "القحطاني", "الغامدي", "الزهراني", "العتيبي", "الشمري", "الدوسري", "المطيري",
+    "العمري", "الشهري", "السبيعي", "البلوي", "العنزي", "الجهني", "المالكي", "السالم",
+)
+WORDS = (
+    "النور", "الياسمين", "الورود", "الندى", "الريان", "الواحة", "السلام", "الفردوس", "الأمل", "الصفا",
+    "المروة", "النخيل", "الخليج", "الربيع", "اللؤلؤ", "المرجان", "الزهراء", "الروضة", "القمة", "الرواد",
+)
+DISTRICTS = (
+    "حي الزهراء", "حي النخيل", "حي الملقا", "حي الروضة", "حي السلامة", "حي الشاطئ", "حي العزيزية",
+    "حي الفيصلية", "حي الياسمين", "حي الصفا", "حي المروج", "حي الحمراء", "حي العليا", "حي الربوة",
+)
+STREETS = (
+    "شارع الملك فهد", "طريق الملك عبدالعزيز", "شارع التحلية", "شارع الأمير سلطان", "طريق الملك عبدالله",
+    "شارع العليا", "شارع الستين", "طريق المدينة", "شارع الأمير محمد بن عبدالعزيز", "شارع بامحرز",
+)
+ORDINALS = ("الأول", "الثاني", "الثالث", "الرابع", "الخامس", "السادس", "السابع", "الثامن", "التاسع", "العاشر")
+
+OWNERSHIP_TYPES = (
+    ("company", 0.7), ("individual", 0.15), ("organization", 0.08), ("government", 0.05), ("other", 0.02),
+)
+OWNERSHIP_CATEGORIES = (("real_estate", 0.6), ("investment", 0.2), ("management", 0.12), ("development", 0.08))
+STATUSES = (("available", 0.55), ("rented", 0.35), ("reserved", 0.04), ("maintenance", 0.04), ("sold", 0.02))
+
+# Building type: (weight, floors low/high, units per floor low/high, unit types by weight, name prefix, portfolio type)
+BUILDING_TYPES = {
+    "residential": (0.55, 2, 20, 2, 8, (("apartment", 0.85), ("studio", 0.15)), "برج", "residential"),
+    "commercial": (0.12, 1, 4, 6, 20, (("shop", 1.0),), "مركز", "commercial"),
+    "mixed": (0.12, 2, 12, 3, 10, (("apartment", 0.6), ("office", 0.4)), "مجمع", "mixed"),
+    "office": (0.08, 3, 30, 2, 10, (("office", 1.0),), "برج أعمال", "commercial"),
+    "retail": (0.06, 1, 2, 8, 30, (("shop", 1.0),), "سوق", "commercial"),
+    "warehouse": (0.05, 1, 1, 2, 12, (("warehouse", 1.0),), "مستودعات", "industrial"),
+    "industrial": (0.02, 1, 2, 1, 6, (("warehouse", 1.0),), "مصنع", "industrial"),
+}
+
+# Unit type: (area mean, area sd, area low, area high, yearly rent per sqm low/high, Arabic name)
+UNIT_TYPES = {
+    "apartment": (140, 35, 60, 400, 280, 480, "شقة"),
+    "studio": (50, 10, 28, 80, 380, 600, "استوديو"),
+    "penthouse": (380, 80, 220, 700, 420, 700, "بنتهاوس"),
+    "shop": (55, 20, 18, 160, 960, 1800, "محل"),
+    "office": (120, 60, 35, 500, 450, 900, "مكتب"),
+    "warehouse": (900, 500, 150, 5000, 90, 200, "مستودع"),
+}
+UNIT_TYPE_NAMES = tuple(UNIT_TYPES)
+
+# Specification key: (type, {unit type: chance the unit has it}, value rule); bedrooms follow area
+SPECIFICATIONS = (
+    ("bedrooms", "integer", {"apartment": 1.0, "penthouse": 1.0}, "bedrooms"),
+    ("bathrooms", "integer", {"apartment": 1.0, "studio": 1.0, "penthouse": 1.0, "office": 0.6}, "bathrooms"),
+    ("balcony", "boolean", {"apartment": 0.7, "studio": 0.4, "penthouse": 1.0}, 0.6),
+    ("parking", "integer", {"apartment": 0.8, "penthouse": 1.0, "shop": 0.5, "office": 0.7}, (0, 3)),
+    ("furnished", "boolean", {"apartment": 0.5, "studio": 0.8, "penthouse": 0.6, "office": 0.4}, 0.35),
+    ("capacity", "integer", {"office": 0.8}, "capacity"),
+    ("meeting_rooms", "integer", {"office": 0.6}, (0, 4)),
+    ("storefront", "boolean", {"shop": 1.0}, 0.9),
+    ("storage", "boolean", {"shop": 0.7, "warehouse": 0.3}, 0.5),
+    ("loading_dock", "boolean", {"warehouse": 1.0}, 0.7),
+    ("ceiling_height", "integer", {"warehouse": 0.9}, (6, 14)),
+    ("security", "boolean", {"office": 0.5, "warehouse": 0.8, "penthouse": 0.5}, 0.8),
+)
+
+
+class SyntheticError(Exception):
+    """Raised for impossible size requests"""
+
+
+def _choice(rng, options, size):
+    """Indexes into ``options`` ((value, weight) pairs) drawn with the given weights"""
+    weights = np.array([weight for _, weight in options], dtype=np.float64)
+    return rng.choice(len(options), size=size, p=weights / weights.sum())
+
+
+def _pick(values, codes):
+    """Values (a tuple) at ``codes`` as a Python list"""
+    return np.array(values, dtype=object)[codes].tolist()
+
+
+def _within(groups, size):
+    """Position of every element within its group, for group ids that are sorted"""
+    starts = np.flatnonzero(np.r_[True, groups[1:] != groups[:-1]])
+    return np.arange(size) - np.repeat(starts, np.diff(np.r_[starts, size]))
+
+
+def _zip_codes(rng, cities):
+    """Five-digit postal codes: the city's two-digit prefix and three random digits"""
+    suffixes = rng.integers(0, 1000, len(cities))
+    return [f"{CITIES[city][3]}{n:03d}" for city, n in zip(cities.tolist(), suffixes.tolist())]
+
+
+def _money(values):
+    return np.round(values, 2).tolist()
+
+
+def generate(units, seed=DEFAULT_SEED, ownerships=None):
+    """Generate a hierarchy with exactly ``units`` units; returns {sheet title: {column: list}}
+
+    Columns follow the template headers, so ``template_sheets`` can turn the
+    result into (title, header, rows) triples for any writer.
+    """
+    if units < 1:
+        raise SyntheticError("--units must be at least 1")
+    ownerships = ownerships or max(1, units // UNITS_PER_OWNERSHIP)
+    rng = np.random.default_rng(seed)
+    type_names = tuple(BUILDING_TYPES)
+    specs = [BUILDING_TYPES[name] for name in type_names]
+
+    # Buildings: draw enough for the unit count (with margin), then cut at exactly ``units``
+    mean_units = sum(spec[0] * (spec[1] + spec[2]) * (spec[3] + spec[4]) / 4 for spec in specs)
+    estimate = int(units / mean_units * 1.5) + ownerships + 16
+    while True:
+        b_type = _choice(rng, [(name, spec[0]) for name, spec in zip(type_names, specs)], estimate)
+        low, high = (np.array([spec[i] for spec in specs])[b_type] for i in (1, 2))
+        floors = rng.integers(low, high + 1)
+        low, high = (np.array([spec[i] for spec in specs])[b_type] for i in (3, 4))
+        per_floor = rng.integers(low, high + 1)
+        if (floors * per_floor).sum() >= units:
+            break
+        estimate *= 2
+    floor_units = np.repeat(per_floor, floors)
+    floor_building = np.repeat(np.arange(estimate), floors)
+    cut = int(np.searchsorted(np.cumsum(floor_units), units))
+    floor_units, floor_building = floor_units[:cut + 1].copy(), floor_building[:cut + 1]
+    floor_units[cut] -= floor_units.sum() - units
+    building_count = int(floor_building[-1]) + 1
+    if building_count < ownerships:
+        raise SyntheticError(f"{units} units fill only {building_count} buildings; use fewer --ownerships")
+    b_type = b_type[:building_count]
+    floors = np.bincount(floor_building, minlength=building_count)
+    floor_number = _within(floor_building, len(floor_building)) + 1
+
+    # Ownership and portfolio boundaries are cut points over the building sequence
+    b_owner = np.zeros(building_count, dtype=np.int64)
+    b_owner[np.sort(rng.choice(np.arange(1, building_count), ownerships - 1, replace=False))] = 1
+    b_owner = np.cumsum(b_owner)
+    starts = np.r_[True, b_owner[1:] != b_owner[:-1]] | (rng.random(building_count) < NEW_PORTFOLIO_RATE)
+    b_portfolio = np.cumsum(starts) - 1
+    portfolio_count = int(b_portfolio[-1]) + 1
+    first_building = np.flatnonzero(starts)
+    p_owner = b_owner[first_building]
+    p_rank = _within(p_owner, portfolio_count)
+    # A portfolio takes its type from its first building; its city applies to all its buildings
+    p_type = np.array([spec[7] for spec in specs], dtype=object)[b_type[first_building]]
+    p_city = _choice(rng, [(city[0], city[6]) for city in CITIES], portfolio_count)
+    first_portfolio = np.flatnonzero(np.r_[True, p_owner[1:] != p_owner[:-1]])
+    p_parent = np.where(
+        (p_rank > 0) & (rng.random(portfolio_count) < NESTED_PORTFOLIO_RATE),
+        first_portfolio[p_owner] + 1, 0,
+    )
+
+    city_lat = np.array([city[4] for city in CITIES])
+    city_lon = np.array([city[5] for city in CITIES])
+    city_names, city_arabic, city_states = (tuple(city[i] for city in CITIES) for i in (0, 1, 2))
+
+    # Ownerships
+    o_ids = np.arange(1, ownerships + 1)
+    o_type = _choice(rng, OWNERSHIP_TYPES, ownerships)
+    o_city = p_city[first_portfolio]
+    o_family = rng.integers(0, len(FAMILIES), ownerships)
+    o_word = rng.integers(0, len(WORDS), ownerships)
+    o_names = [
+        f"{FAMILIES[family]} {WORDS[word]}" if kind == 1 else f"شركة {WORDS[word]} {FAMILIES[family]} للعقارات"
+        for family, word, kind in zip(o_family.tolist(), o_word.tolist(), o_type.tolist())
+    ]
+    data = {"Ownership": {
+        "id": o_ids.tolist(),
+        "name": o_names,
+        "legal": [f"{name} - {i}" for name, i in zip(o_names, o_ids.tolist())],
+        "type": _pick(tuple(name for name, _ in OWNERSHIP_TYPES), o_type),
+        "ownership_type": _pick(tuple(name for name, _ in OWNERSHIP_CATEGORIES),
+                                _choice(rng, OWNERSHIP_CATEGORIES, ownerships)),
+        "registration": [f"CR{7000000000 + i}" for i in o_ids.tolist()],
+        "tax_id": [f"3{i:013d}3" for i in rng.integers(0, 10 ** 13, ownerships).tolist()],
+        "street": _pick(STREETS, rng.integers(0, len(STREETS), ownerships)),
+        "city": _pick(city_names, o_city),
+        "state": _pick(city_states, o_city),
+        "country": ["Saudi Arabia"] * ownerships,
+        "zip_code": _zip_codes(rng, o_city),
+        "email": [f"info@ownership{i}.example.sa" for i in o_ids.tolist()],
+        "phone": [f"+9661{n:08d}" for n in rng.integers(0, 10 ** 8, ownerships).tolist()],
+        "active": (rng.random(ownerships) < 0.97).tolist(),
+    }}
+
+    # Portfolios: codes are unique across ownerships, as the portfolios table requires
+    p_ids = np.arange(1, portfolio_count + 1)
+    p_district = rng.integers(0, len(DISTRICTS), portfolio_count)
+    p_buildings = np.bincount(b_portfolio, minlength=portfolio_count)
+    data["Portfolio"] = {
+        "id": p_ids.tolist(),
+        "ownership_id": (p_owner + 1).tolist(),
+        "parent_id": [parent or None for parent in p_parent.tolist()],
+        "name": [f"محفظة {DISTRICTS[d]} - {city_arabic[c]}" for d, c in zip(p_district.tolist(), p_city.tolist())],
+        "code": [f"PF-{o + 1:05d}-{r + 1:03d}" for o, r in zip(p_owner.tolist(), p_rank.tolist())],
+        "type": p_type.tolist(),
+        "description": [f"محفظة تضم {n} مبانٍ" if n > 2 else None for n in p_buildings.tolist()],
+        "area": _money(p_buildings * rng.uniform(800, 4000, portfolio_count)),
+        "active": [True] * portfolio_count,
+    }
+
+    # Locations: one primary per portfolio, some with a second (at most one of each, per the unique key)
+    second = np.flatnonzero(rng.random(portfolio_count) < SECOND_LOCATION_RATE)
+    l_portfolio = np.sort(np.r_[np.arange(portfolio_count), second], kind="stable")
+    l_primary = np.r_[True, l_portfolio[1:] != l_portfolio[:-1]]
+    location_count = len(l_portfolio)
+    l_city = p_city[l_portfolio]
+    data["PortfolioLocation"] = {
+        "id": list(range(1, location_count + 1)),
+        "portfolio_id": (l_portfolio + 1).tolist(),
+        "street": _pick(STREETS, rng.integers(0, len(STREETS), location_count)),
+        "city": _pick(city_names, l_city),
+        "state": _pick(city_states, l_city),
+        "country": ["Saudi Arabia"] * location_count,
+        "zip_code": _zip_codes(rng, l_city),
+        "latitude": np.round(city_lat[l_city] + rng.normal(0, CITY_SPREAD, location_count), 6).tolist(),
+        "longitude": np.round(city_lon[l_city] + rng.normal(0, CITY_SPREAD, location_count), 6).tolist(),
+        "primary": l_primary.tolist(),
+    }
+
+    # Buildings
+    b_ids = np.arange(1, building_count + 1)
+    b_city = p_city[b_portfolio]
+    b_word = rng.integers(0, len(WORDS), building_count)
+    prefixes = np.array([spec[6] for spec in specs], dtype=object)[b_type]
+    # Low-rise residential buildings are "عمارة", towers keep "برج"
+    prefixes[(b_type == type_names.index("residential")) & (floors < TOWER_FLOORS)] = "عمارة"
+    data["Building"] = {
+        "id": b_ids.tolist(),
+        "portfolio_id": (b_portfolio + 1).tolist(),
+        "ownership_id": (b_owner + 1).tolist(),
+        "parent_id": [None] * building_count,
+        "name": [
+            f"{prefix} {WORDS[word]} {i}" for prefix, word, i in zip(prefixes.tolist(), b_word.tolist(), b_ids.tolist())
+        ],
+        "code": [f"B{i:07d}" for i in b_ids.tolist()],
+        "type": _pick(type_names, b_type),
+        "description": [f"يحتوي على {n} طوابق" if n > 2 else None for n in floors.tolist()],
+        "street": _pick(STREETS, rng.integers(0, len(STREETS), building_count)),
+        "city": _pick(city_names, b_city),
+        "state": _pick(city_states, b_city),
+        "country": ["Saudi Arabia"] * building_count,
+        "zip_code": _zip_codes(rng, b_city),
+        "latitude": np.round(city_lat[b_city] + rng.normal(0, CITY_SPREAD, building_count), 6).tolist(),
+        "longitude": np.round(city_lon[b_city] + rng.normal(0, CITY_SPREAD, building_count), 6).tolist(),
+        "floors": floors.tolist(),
+        "year": rng.integers(1985, 2025, building_count).tolist(),
+        "active": (rng.random(building_count) < 0.98).tolist(),
+    }
+
+    # Floors: number 1 is the ground floor, as in the seeders
+    floor_count = len(floor_building)
+    floor_names = ("الطابق الأرضي",) + tuple(f"الطابق {ordinal}" for ordinal in ORDINALS)
+    data["BuildingFloor"] = {
+        "id": list(range(1, floor_count + 1)),
+        "building_id": (floor_building + 1).tolist(),
+        "number": floor_number.tolist(),
+        "name": [floor_names[n - 1] if n <= len(floor_names) else f"الطابق {n - 1}" for n in floor_number.tolist()],
+        "description": [None] * floor_count,
+        "units": floor_units.tolist(),
+        "active": [True] * floor_count,
+    }
+
+    # Units: numbers are the floor number plus a two-digit position, unique per building
+    u_floor = np.repeat(np.arange(floor_count), floor_units)
+    u_building = floor_building[u_floor]
+    u_position = _within(u_floor, units) + 1
+    u_type = np.empty(units, dtype=np.int64)
+    unit_building_type = b_type[u_building]
+    for code, name in enumerate(type_names):
+        mask = unit_building_type == code
+        choices = specs[code][5]
+        picked = _choice(rng, choices, int(mask.sum()))
+        u_type[mask] = np.array([UNIT_TYPE_NAMES.index(unit) for unit, _ in choices])[picked]
+    # The top floor of residential towers holds penthouses
+    top = (floor_number[u_floor] == floors[u_building]) & (floors[u_building] >= TOWER_FLOORS)
+    u_type[top & (u_type == UNIT_TYPE_NAMES.index("apartment"))] = UNIT_TYPE_NAMES.index("penthouse")
+    # Mixed-use buildings have shops on the ground floor
+    mixed_ground = (unit_building_type == type_names.index("mixed")) & (floor_number[u_floor] == 1)
+    u_type[mixed_ground] = UNIT_TYPE_NAMES.index("shop")
+
+    unit_specs = [UNIT_TYPES[name] for name in UNIT_TYPE_NAMES]
+    mean, sd, low, high, rent_low, rent_high = (np.array([spec[i] for spec in unit_specs])[u_type] for i in range(6))
+    area = np.round(np.clip(rng.normal(mean, sd), low, high) * 2) / 2
+    yearly = np.round(area * rng.uniform(rent_low, rent_high) / 500) * 500
+    yearly = np.maximum(yearly, 500)
+    unit_numbers = [f"{f}{p:02d}" for f, p in zip(floor_number[u_floor].tolist(), u_position.tolist())]
+    arabic_types = tuple(spec[6] for spec in unit_specs)
+    data["Unit"] = {
+        "id": list(range(1, units + 1)),
+        "building_id": (u_building + 1).tolist(),
+        "floor_id": (u_floor + 1).tolist(),
+        "ownership_id": (b_owner[u_building] + 1).tolist(),
+        "number": unit_numbers,
+        "type": _pick(UNIT_TYPE_NAMES, u_type),
+        "name": [f"{arabic_types[t]} {n}" for t, n in zip(u_type.tolist(), unit_numbers)],
+        "description": [None] * units,
+        "area": area.tolist(),
+        "price_monthly": _money(yearly / 12),
+        "price_quarterly": _money(yearly / 4),
+        "price_yearly": yearly.tolist(),
+        "status": _pick(tuple(name for name, _ in STATUSES), _choice(rng, STATUSES, units)),
+        "active": (rng.random(units) < 0.97).tolist(),
+    }
+
+    data["UnitSpecification"] = _specifications(rng, u_type, area)
+    return data
+
+
+def _specifications(rng, u_type, area):
+    """Specification rows for every unit, grouped by unit in SPECIFICATIONS key order"""
+    units = len(u_type)
+    bedrooms = np.clip(np.round(area / 45 + rng.normal(0, 0.6, units)), 1, 7).astype(np.int64)
+    unit_ids, key_ranks, values = [], [], []
+    for rank, (key, kind, chances, rule) in enumerate(SPECIFICATIONS):
+        chance = np.zeros(len(UNIT_TYPE_NAMES))
+        for name, value in chances.items():
+            chance[UNIT_TYPE_NAMES.index(name)] = value
+        has = np.flatnonzero(rng.random(units) < chance[u_type])
+        if rule == "bedrooms":
+            value = bedrooms[has]
+        elif rule == "bathrooms":
+            value = np.clip(bedrooms[has] - rng.integers(0, 2, len(has)), 1, 5)
+        elif rule == "capacity":
+            value = np.maximum(np.round(area[has] / 8), 2).astype(np.int64)
+        elif kind == "boolean":
+            value = rng.random(len(has)) < rule
+        else:
+            value = rng.integers(rule[0], rule[1] + 1, len(has))
+        unit_ids.append(has)
+        key_ranks.append(np.full(len(has), rank))
+        values.append(np.where(value, "true", "false") if kind == "boolean" else value.astype(str))
+    unit_ids, key_ranks, values = np.concatenate(unit_ids), np.concatenate(key_ranks), np.concatenate(values)
+    order = np.lexsort((key_ranks, unit_ids))
+    keys = tuple(spec[0] for spec in SPECIFICATIONS)
+    kinds = tuple(spec[1] for spec in SPECIFICATIONS)
+    count = len(order)
+    return {
+        "id": list(range(1, count + 1)),
+        "unit_id": (unit_ids[order] + 1).tolist(),
+        "key": _pick(keys, key_ranks[order]),
+        "value": values[order].tolist(),
+        "type": _pick(kinds, key_ranks[order]),
+    }
+
+
+def template_sheets(data):
+    """(title, header, data rows) triples in fill order, rows numbered as on the template"""
+    for schema in SHEETS:
+        columns = data.get(schema.title)
+        if columns is None:
+            continue
+        header = schema.headers
+        count = len(columns["id"])
+        cells = [columns.get(name) or [None] * count for name in header]
+        yield schema.title, header, enumerate(map(list, zip(*cells)), start=FIRST_DATA_ROW)
+
+
+def write_xlsx(data, filename):
+    """Stream the hierarchy into a filled template; raises SyntheticError if a sheet does not fit"""
+    for title, columns in data.items():
+        count = len(columns["id"])
+        if count > MAX_EXPORT_ROWS:
+            raise SyntheticError(
+                f"{title} has {count:,} rows but an xlsx sheet takes at most {MAX_EXPORT_ROWS:,} "
+                f"(about 290,000 units); use --bundle or --sqlite for this size"
+            )
+    rows = {title: (row for _, row in rows) for title, _, rows in template_sheets(data)}
+    stamp_template(filename, rows)
+    return filename
+
+
+def write_sqlite(data, path, **options):
+    """Load the hierarchy into a SQLite database with the loader's schema; returns per-sheet stats"""
+    conn = sqlite3.connect(path)
+    try:
+        create_sqlite_schema(conn)
+        return BulkLoader(conn, **options).load(template_sheets(data))
+    finally:
+        conn.close()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Generate a seeded synthetic Property Structure hierarchy")
+    parser.add_argument("--units", type=int, required=True, help="Exact number of units to generate")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED, help=f"Random seed (default: {DEFAULT_SEED})")
+    parser.add_argument("--ownerships", type=int,
+                        help=f"Number of ownerships (default: one per {UNITS_PER_OWNERSHIP} units)")
+    parser.add_argument("--xlsx", help="Write a filled .xlsx template (up to about 290,000 units)")
+    parser.add_argument("--bundle", help="Write a columnar bundle directory")
+    parser.add_argument("--format", choices=FORMATS, default=CSV_FORMAT, help="Bundle encoding (default: csv)")
+    parser.add_argument("--sqlite", help="Load into a SQLite database (schema created if missing)")
+    parser.add_argument("--json", action="store_true", help="Print counts and timings as JSON")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    try:
+        started = time.perf_counter()
+        data = generate(args.units, args.seed, args.ownerships)
+        timings = {"generate": time.perf_counter() - started}
+        for name, path, write in (
+            ("xlsx", args.xlsx, write_xlsx),
+            ("bundle", args.bundle, lambda data, path: write_bundle(path, template_sheets(data), args.format)),
+            ("sqlite", args.sqlite, write_sqlite),
+        ):
+            if path:
+                started = time.perf_counter()
+                write(data, path)
+                timings[name] = time.perf_counter() - started
+    except (SyntheticError, ColumnarError, LoadError, sqlite3.Error, OSError) as e:
+        print(f"error: {e}", file=sys.stderr)
+        sys.exit(2)
+
+    counts = {title: len(columns["id"]) for title, columns in data.items()}
+    if args.json:
+        print(json.dumps({"seed": args.seed, "rows": counts,
+                          "seconds": {name: round(value, 3) for name, value in timings.items()}}, indent=2))
+    else:
+        for title, count in counts.items():
+            print(f"{title}: {count:,} rows")
+        print(", ".join(f"{name} {value:.2f}s" for name, value in timings.items()))
@@ -0,0 +1,773 @@
+"""
+Wide columnar index over unit specifications for unit search
+Unit features are key/value rows (unit_specifications: unit_id, key, value,
+type), so a search such as "available apartments with two bedrooms or more
+and parking" has to pivot those rows again for every query. This index
+pivots them once, per ownership, into typed columns over the ownership's
+units, one position per unit:
+
+    integer keys    the value of every unit plus the values sorted with their
+                    unit positions: a range is two binary searches
+    boolean keys    bitsets of the units where the key is true and where it is set
+    string keys     a code per unit over the key's values, compared the way
+                    the MySQL collation does (trimmed, case-insensitive)
+    unit columns    status and type (like string keys), active (like boolean
+                    keys), area and price_monthly (like integer keys, in
+                    hundredths)
+
+Every filter becomes a bitset of positions (one bit per unit, packed in
+bytes) and a search is the AND of its filters and of the live units, so
+combined filters over hundreds of thousands of units take milliseconds.
+
+A key's type is the one most of its rows declare, across the snapshot;
+keys whose rows declare none are typed from their values (all whole
+numbers: integer, all true/false: boolean, otherwise string). Values that
+do not parse as their key's type are left out of the index and counted.
+Filter names are unit columns first, then specification keys.
+
+Changes are applied as events, in the format of report_aggregates:
+specification upserts and deletes keyed by (unit_id, key) (a delete without
+a key drops all of the unit's specifications, as UnitController::update
+does before recreating them) and unit upserts and deletes. An update
+changes the unit's value and bits in place; the sorted arrays of integer
+keys collect the changed positions and merge them in one pass at the next
+search that uses the key, instead of re-sorting.
+
+Usage:
+    python property_structure_unit_index.py import.db --ownership 7 --where "bedrooms>=2" --where parking
+        [--where status=available --where type=apartment] [--events changes.jsonl] [--limit 20] [--json]
+    python property_structure_unit_index.py snapshot.json --stats [--ownership 7]
+"""
+
+import argparse
+import json
+import re
+import sqlite3
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from property_structure_integrity import normalize_text
+from report_aggregates import AggregateError, read_events
+from validate_property_structure import INTEGER_RE, parse_integer
+
+INTEGER = "integer"
+BOOLEAN = "boolean"
+STRING = "string"
+KINDS = (INTEGER, BOOLEAN, STRING)
+
+BOOLEAN_TEXT = {"true": True, "1": True, "false": False, "0": False}
+
+# Unit columns that can be filtered on: name -> (kind, scale)
+UNIT_COLUMNS = {
+    "status": (STRING, 1),
+    "type": (STRING, 1),
+    "active": (BOOLEAN, 1),
+    "area": (INTEGER, 100),
+    "price_monthly": (INTEGER, 100),
+}
+
+OPERATORS = (">=", "<=", "!=", "=", ">", "<")
+FILTER_RE = re.compile(r"^\s*([A-Za-z_][\w.]*)\s*(?:(>=|<=|!=|=|>|<)\s*(.*?))?\s*$")
+
+DEFAULT_LIMIT = 20
+# Capacity is kept a multiple of this, so every bitset is whole bytes
+CAPACITY_STEP = 64
+
+QUERIES = {
+    "units": "SELECT id, ownership_id, status, type, active, area, price_monthly FROM units",
+    "specifications": "SELECT unit_id, `key`, value, type FROM unit_specifications ORDER BY id",
+}
+
+
+class UnitIndexError(Exception):
+    """Raised for a malformed filter or an event the index cannot apply"""
+
+
+def _capacity(size):
+    return max(CAPACITY_STEP, -(-size // CAPACITY_STEP) * CAPACITY_STEP)
+
+
+def bits_from_positions(positions, capacity):
+    """Bitset (little-endian bits in uint8 bytes) with the given positions set"""
+    mask = np.zeros(capacity, dtype=bool)
+    mask[positions] = True
+    return np.packbits(mask, bitorder="little")
+
+
+def bits_from_mask(mask):
+    return np.packbits(mask, bitorder="little")
+
+
+def bit_positions(bits, size):
+    return np.flatnonzero(np.unpackbits(bits, count=size, bitorder="little"))
+
+
+def test_bits(bits, positions):
+    return (bits[positions >> 3] >> (positions & 7).astype(np.uint8)) & 1 == 1
+
+
+def set_bit(bits, position, flag):
+    if flag:
+        bits[position >> 3] |= np.uint8(1 << (position & 7))
+    else:
+        bits[position >> 3] &= np.uint8(~(1 << (position & 7)) & 0xFF)
+
+
+def _grow(array, capacity, fill=0):
+    extra = np.full(capacity - len(array), fill, dtype=array.dtype)
+    return np.concatenate([array, extra])
+
+
+def parse_boolean_text(value):
+    """True/False for 'true'/'false'/'1'/'0' (any case), None for anything else"""
+    if isinstance(value, bool):
+        return value
+    if value is None:
+        return None
+    return BOOLEAN_TEXT.get(str(value).strip().casefold())
+
+
+def value_text(value):
+    """A specification value as the text column stores it"""
+    if value is None or isinstance(value, str):
+        return value
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def infer_kind(values):
+    """Type of a key whose rows declare none, from its non-blank values"""
+    values = [value.strip() for value in values if isinstance(value, str) and value.strip()]
+    if values and all(INTEGER_RE.match(value) for value in values):
+        return INTEGER
+    if values and all(value.casefold() in BOOLEAN_TEXT for value in values):
+        return BOOLEAN
+    return STRING
+
+
+def declared_kind(value):
+    value = str(value).strip().casefold() if value is not None else None
+    return value if value in KINDS else None
+
+
+def parse_distinct(values, parse):
+    """Apply ``parse`` once per distinct value: (parsed values as objects, mask of the ones that parsed)
+
+    Specification and unit columns hold a handful of distinct values over
+    millions of rows, so parsing the distinct ones and gathering by code is
+    far cheaper than any per-row string operation.
+    """
+    codes, uniques = pd.factorize(np.asarray(values, dtype=object))
+    parsed = [parse(value) for value in uniques]
+    lookup = np.empty(len(parsed) + 1, dtype=object)
+    lookup[:-1] = parsed
+    ok = np.array([value is not None for value in parsed] + [False])
+    return lookup[codes], ok[codes]
+
+
+def key_kinds(specs):
+    """{key: kind}: the type most rows of the key declare, or the type its values suggest"""
+    key_codes, keys = pd.factorize(specs["key"])
+    type_codes, types = pd.factorize(specs["type"])
+    declared = np.array([KINDS.index(kind) if kind else -1 for kind in map(declared_kind, types)] + [-1])
+    row_kinds = declared[type_codes]
+    counted = row_kinds >= 0
+    votes = np.bincount(key_codes[counted] * len(KINDS) + row_kinds[counted], minlength=len(keys) * len(KINDS))
+    votes = votes.reshape(len(keys), len(KINDS))
+    kinds = {}
+    for code, key in enumerate(keys):
+        if votes[code].any():
+            # Ties go to the first kind in KINDS
+            kinds[key] = KINDS[int(np.argmax(votes[code]))]
+        else:
+            kinds[key] = infer_kind(value_text(value) for value in pd.unique(specs["value"].to_numpy()[key_codes == code]))
+    return kinds
+
+
+class IntegerColumn:
+    """Whole numbers (or fixed-point decimals, with ``scale``) by position, plus a sorted copy for ranges"""
+
+    kind = INTEGER
+
+    def __init__(self, capacity, scale=1):
+        self.scale = scale
+        self.values = np.zeros(capacity, dtype=np.int64)
+        self.present = np.zeros(capacity // 8, dtype=np.uint8)
+        self.sorted_values = np.zeros(0, dtype=np.int64)
+        self.sorted_positions = np.zeros(0, dtype=np.int64)
+        self.pending = set()
+
+    def load(self, positions, values):
+        self.values[positions] = values
+        self.present = bits_from_positions(positions, len(self.values))
+        order = np.argsort(values, kind="stable")
+        self.sorted_values = np.asarray(values, dtype=np.int64)[order]
+        self.sorted_positions = np.asarray(positions, dtype=np.int64)[order]
+
+    def grow(self, capacity):
+        self.values = _grow(self.values, capacity)
+        self.present = _grow(self.present, capacity // 8)
+
+    def parse(self, value):
+        """Stored value -> int, or None when it does not parse"""
+        if value is None:
+            return None
+        if self.scale == 1:
+            return parse_integer(value)
+        try:
+            return round(float(value) * self.scale)
+        except (TypeError, ValueError):
+            return None
+
+    def get(self, position):
+        if not test_bits(self.present, np.array([position]))[0]:
+            return None
+        value = int(self.values[position])
+        return value if self.scale == 1 else value / self.scale
+
+    def set(self, position, value):
+        """Store an already parsed value (None clears it); the sorted copy catches up at the next search"""
+        if value is None:
+            set_bit(self.present, position, False)
+        else:
+            self.values[position] = value
+            set_bit(self.present, position, True)
+        self.pending.add(position)
+
+    def _merge(self):
+        """Fold the changed positions into the sorted arrays: drop their old entries, insert the current ones"""
+        if not self.pending:
+            return
+        changed = np.fromiter(self.pending, dtype=np.int64, count=len(self.pending))
+        self.pending.clear()
+        keep = ~np.isin(self.sorted_positions, changed)
+        sorted_values, sorted_positions = self.sorted_values[keep], self.sorted_positions[keep]
+        current = changed[test_bits(self.present, changed)]
+        values = self.values[current]
+        order = np.argsort(values, kind="stable")
+        at = np.searchsorted(sorted_values, values[order], side="right")
+        self.sorted_values = np.insert(sorted_values, at, values[order])
+        self.sorted_positions = np.insert(sorted_positions, at, current[order])
+
+    def select(self, op, operand):
+        if op is None:
+            # A bare integer key means "has at least one" (parking, balcony counts); a bare decimal means "is set"
+            if self.scale != 1:
+                return self.present.copy()
+            op, bound = ">", 0
+        else:
+            bound = self._bound(operand)
+        self._merge()
+        values = self.sorted_values
+        if op == "!=":
+            return self.present & ~self.select("=", operand)
+        lo, hi = 0, len(values)
+        if op in (">=", "="):
+            lo = np.searchsorted(values, bound, side="left")
+        elif op == ">":
+            lo = np.searchsorted(values, bound, side="right")
+        if op in ("<=", "="):
+            hi = np.searchsorted(values, bound, side="right")
+        elif op == "<":
+            hi = np.searchsorted(values, bound, side="left")
+        return bits_from_positions(self.sorted_positions[lo:hi], len(self.values))
+
+    def _bound(self, operand):
+        if self.scale == 1:
+            number = parse_integer(operand)
+            if number is None:
+                raise UnitIndexError(f"{operand!r} is not a whole number")
+            return number
+        try:
+            # Compared as a float against the scaled integers, so 100.555 needs 10055.5 and over
+            return float(operand) * self.scale
+        except ValueError:
+            raise UnitIndexError(f"{operand!r} is not a number") from None
+
+
+class BooleanColumn:
+    """Bitsets of the positions where the value is true and where it is set at all"""
+
+    kind = BOOLEAN
+
+    def __init__(self, capacity):
+        self.true = np.zeros(capacity // 8, dtype=np.uint8)
+        self.present = np.zeros(capacity // 8, dtype=np.uint8)
+
+    def load(self, positions, values):
+        capacity = len(self.true) * 8
+        self.present = bits_from_positions(positions, capacity)
+        self.true = bits_from_positions(np.asarray(positions)[np.asarray(values, dtype=bool)], capacity)
+
+    def grow(self, capacity):
+        self.true = _grow(self.true, capacity // 8)
+        self.present = _grow(self.present, capacity // 8)
+
+    def parse(self, value):
+        return parse_boolean_text(value)
+
+    def get(self, position):
+        position = np.array([position])
+        if not test_bits(self.present, position)[0]:
+            return None
+        return bool(test_bits(self.true, position)[0])
+
+    def set(self, position, value):
+        set_bit(self.present, position, value is not None)
+        set_bit(self.true, position, bool(value))
+
+    def select(self, op, operand):
+        if op is None:
+            return self.true.copy()
+        if op not in ("=", "!="):
+            raise UnitIndexError(f"boolean values only compare with = and != (got {op})")
+        flag = parse_boolean_text(operand)
+        if flag is None:
+            raise UnitIndexError(f"{operand!r} is not true or false")
+        if (op == "=") == flag:
+            return self.true.copy()
+        return self.present & ~self.true
+
+
+class StringColumn:
+    """A code per position (-1: not set) over the distinct values, keyed like the MySQL collation"""
+
+    kind = STRING
+
+    def __init__(self, capacity):
+        self.codes = np.full(capacity, -1, dtype=np.int32)
+        self.values = []
+        self.lookup = {}
+
+    def _code(self, value):
+        key = normalize_text(value)
+        code = self.lookup.get(key)
+        if code is None:
+            code = self.lookup[key] = len(self.values)
+            self.values.append(value.strip())
+        return code
+
+    def load(self, positions, values):
+        codes, uniques = pd.factorize(np.asarray(values, dtype=object))
+        remap = np.array([self._code(value) for value in uniques] + [-1], dtype=np.int32)
+        self.codes[positions] = remap[codes]
+
+    def grow(self, capacity):
+        self.codes = _grow(self.codes, capacity, -1)
+
+    def parse(self, value):
+        if value is None:
+            return None
+        value = str(value)
+        return value if value.strip() else None
+
+    def get(self, position):
+        code = self.codes[position]
+        return None if code < 0 else self.values[code]
+
+    def set(self, position, value):
+        self.codes[position] = -1 if value is None else self._code(value)
+
+    def select(self, op, operand):
+        if op is None:
+            return bits_from_mask(self.codes >= 0)
+        if op not in ("=", "!="):
+            raise UnitIndexError(f"text values only compare with = and != (got {op})")
+        code = self.lookup.get(normalize_text(operand), -2)
+        if op == "=":
+            return bits_from_mask(self.codes == code)
+        return bits_from_mask((self.codes >= 0) & (self.codes != code))
+
+
+def new_column(kind, capacity, scale=1):
+    if kind == INTEGER:
+        return IntegerColumn(capacity, scale)
+    if kind == BOOLEAN:
+        return BooleanColumn(capacity)
+    return StringColumn(capacity)
+
+
+def parse_filter(text):
+    """'bedrooms>=2' -> ('bedrooms', '>=', '2'); a bare 'parking' -> ('parking', None, None)"""
+    match = FILTER_RE.match(text)
+    if match is None or (match.group(2) is not None and match.group(3) == ""):
+        raise UnitIndexError(f"malformed filter {text!r} (expected key, or key followed by one of "
+                             f"{' '.join(OPERATORS)} and a value)")
+    return match.group(1), match.group(2), match.group(3)
+
+
+class UnitIndex:
+    """One ownership's units: positions, the unit columns and a typed column per specification key"""
+
+    def __init__(self, ownership_id, unit_ids):
+        self.ownership_id = ownership_id
+        self.size = len(unit_ids)
+        capacity = _capacity(self.size)
+        self.unit_ids = _grow(np.asarray(unit_ids, dtype=np.int64), capacity)
+        self.position = {unit_id: position for position, unit_id in enumerate(unit_ids.tolist())}
+        self.alive = bits_from_positions(np.arange(self.size), capacity)
+        self.units = {name: new_column(kind, capacity, scale) for name, (kind, scale) in UNIT_COLUMNS.items()}
+        self.specs = {}
+        # Bitsets of the units whose value for a key did not parse as the key's type
+        self.invalid = {}
+
+    @property
+    def capacity(self):
+        return len(self.unit_ids)
+
+    def _columns(self):
+        return [*self.units.values(), *self.specs.values()]
+
+    def add_unit(self, unit_id):
+        position = self.position.get(unit_id)
+        if position is not None:
+            return position
+        if self.size == self.capacity:
+            capacity = _capacity(self.capacity * 2)
+            self.unit_ids = _grow(self.unit_ids, capacity)
+            self.alive = _grow(self.alive, capacity // 8)
+            for column in self._columns():
+                column.grow(capacity)
+            for key, bits in self.invalid.items():
+                self.invalid[key] = _grow(bits, capacity // 8)
+        position = self.position[unit_id] = self.size
+        self.unit_ids[position] = unit_id
+        set_bit(self.alive, position, True)
+        self.size += 1
+        return position
+
+    def remove_unit(self, unit_id):
+        """Clear a unit's bits and values; its position is not reused"""
+        position = self.position.pop(unit_id)
+        set_bit(self.alive, position, False)
+        for column in self._columns():
+            column.set(position, None)
+        for bits in self.invalid.values():
+            set_bit(bits, position, False)
+
+    def unit_values(self, unit_id):
+        """({unit column: value}, {key: (value, kind)}) of an indexed unit"""
+        position = self.position[unit_id]
+        units = {name: column.get(position) for name, column in self.units.items()}
+        specs = {key: (column.get(position), column.kind) for key, column in self.specs.items()}
+        return units, {key: found for key, found in specs.items() if found[0] is not None}
+
+    def set_unit_value(self, unit_id, name, value):
+        column = self.units[name]
+        parsed = column.parse(value)
+        if parsed is None and value is not None and value != "":
+            raise UnitIndexError(f"unit {unit_id}: {name} {value!r} is not a valid {column.kind}")
+        column.set(self.position[unit_id], parsed)
+
+    def set_spec(self, unit_id, key, value, kind):
+        """Store one specification; a value that does not parse as the key's type is left out and counted"""
+        column = self.specs.get(key)
+        if column is None:
+            column = self.specs[key] = new_column(kind, self.capacity)
+        position = self.position[unit_id]
+        parsed = column.parse(value)
+        invalid = parsed is None and value is not None and bool(str(value).strip())
+        if invalid or key in self.invalid:
+            set_bit(self.invalid_bits(key), position, invalid)
+        column.set(position, parsed)
+
+    def invalid_bits(self, key):
+        bits = self.invalid.get(key)
+        if bits is None:
+            bits = self.invalid[key] = np.zeros(self.capacity // 8, dtype=np.uint8)
+        return bits
+
+    def delete_spec(self, unit_id, key=None):
+        position = self.position[unit_id]
+        for name, column in self.specs.items():
+            if key is None or name == key:
+                column.set(position, None)
+                if name in self.invalid:
+                    set_bit(self.invalid[name], position, False)
+
+    def select(self, name, op=None, operand=None):
+        """Bitset of the units matching one filter; a key no unit has matches nothing"""
+        column = self.units.get(name) or self.specs.get(name)
+        if column is None:
+            return np.zeros(self.capacity // 8, dtype=np.uint8)
+        try:
+            return column.select(op, operand)
+        except UnitIndexError as e:
+            raise UnitIndexError(f"{name}: {e}") from None
+
+    def matches(self, filters):
+        """Bitset of the live units matching every (name, op, operand) filter"""
+        bits = self.alive.copy()
+        for name, op, operand in filters:
+            bits &= self.select(name, op, operand)
+        return bits
+
+    def search(self, filters):
+        """Unit ids matching every filter, ascending"""
+        positions = bit_positions(self.matches(filters), self.size)
+        return np.sort(self.unit_ids[positions])
+
+    def count(self, filters):
+        return int(np.unpackbits(self.matches(filters), count=self.size).sum())
+
+    def stats(self):
+        alive = bit_positions(self.alive, self.size)
+        keys = {}
+        for key, column in sorted(self.specs.items()):
+            if column.kind == STRING:
+                present = int((column.codes[alive] >= 0).sum())
+            else:
+                present = int(test_bits(column.present, alive).sum())
+            invalid = int(test_bits(self.invalid[key], alive).sum()) if key in self.invalid else 0
+            if present or invalid:
+                keys[key] = {"kind": column.kind, "units": present, "invalid": invalid}
+        return {"ownership_id": self.ownership_id, "units": len(alive), "keys": keys}
+
+
+class UnitSearchIndex:
+    """UnitIndex per ownership plus the unit -> ownership map events are routed by"""
+
+    def __init__(self, kinds=None):
+        self.ownerships = {}
+        self.owner_of = {}
+        self.kinds = dict(kinds or {})
+
+    @classmethod
+    def build(cls, units, specs, ownership_ids=None):
+        """Pivot unit and specification frames (the QUERIES columns) into per-ownership indexes"""
+        units = units[units["ownership_id"].notna()]
+        specs = specs[specs["unit_id"].isin(units["id"])]
+        # unit_specifications is unique on (unit_id, key); keep the last row should a snapshot repeat one
+        specs = specs.drop_duplicates(["unit_id", "key"], keep="last")
+        # Key types come from the whole snapshot, so they do not depend on the ownerships picked
+        index = cls(key_kinds(specs))
+        if ownership_ids is not None:
+            units = units[units["ownership_id"].isin(ownership_ids)]
+            specs = specs[specs["unit_id"].isin(units["id"])]
+        units = units.sort_values(["ownership_id", "id"], kind="stable")
+
+        owners = units["ownership_id"].to_numpy(dtype=np.int64)
+        unit_ids = units["id"].to_numpy(dtype=np.int64)
+        starts = np.flatnonzero(np.r_[True, owners[1:] != owners[:-1]]) if len(owners) else np.zeros(0, np.int64)
+        bounds = np.r_[starts, len(owners)]
+        positions = np.arange(len(owners)) - np.repeat(starts, np.diff(bounds))
+        index.owner_of = dict(zip(unit_ids.tolist(), owners.tolist()))
+        for ownership_id, lo, hi in zip(owners[starts].tolist(), bounds[:-1].tolist(), bounds[1:].tolist()):
+            index.ownerships[ownership_id] = UnitIndex(ownership_id, unit_ids[lo:hi])
+
+        parsers = {name: new_column(kind, 0, scale).parse for name, (kind, scale) in UNIT_COLUMNS.items()}
+        for name, (kind, _) in UNIT_COLUMNS.items():
+            parsed, ok = parse_distinct(units[name], parsers[name])
+            for ownership_id, lo, hi in zip(owners[starts].tolist(), bounds[:-1].tolist(), bounds[1:].tolist()):
+                keep = ok[lo:hi]
+                index.ownerships[ownership_id].units[name].load(np.flatnonzero(keep), _typed(kind, parsed[lo:hi][keep]))
+
+        # Specifications: parse each key's distinct values once, then split the rows by ownership
+        row_unit = pd.Index(unit_ids).get_indexer(specs["unit_id"])
+        row_owner, row_position = owners[row_unit], positions[row_unit]
+        values = specs["value"].to_numpy(dtype=object)
+        _, filled = parse_distinct(values, lambda value: True if value_text(value).strip() else None)
+        key_codes, keys = pd.factorize(specs["key"])
+        for code, key in sorted(enumerate(keys), key=lambda item: item[1]):
+            kind = index.kinds[key]
+            rows = np.flatnonzero(key_codes == code)
+            parsed, ok = parse_distinct(values[rows], new_column(kind, 0).parse)
+            invalid = rows[filled[rows] & ~ok]
+            for ownership_id in np.unique(row_owner[invalid]).tolist():
+                ownership = index.ownerships[ownership_id]
+                found = invalid[row_owner[invalid] == ownership_id]
+                ownership.invalid[key] = bits_from_positions(row_position[found], ownership.capacity)
+                ownership.specs[key] = new_column(kind, ownership.capacity)
+            rows, parsed = rows[ok], parsed[ok]
+            order = np.argsort(row_owner[rows], kind="stable")
+            rows, parsed = rows[order], parsed[order]
+            group_owners = row_owner[rows]
+            cuts = np.flatnonzero(group_owners[1:] != group_owners[:-1]) + 1
+            for lo, hi in zip(np.r_[0, cuts].tolist(), np.r_[cuts, len(rows)].tolist()):
+                if lo == hi:
+                    continue
+                ownership = index.ownerships[int(group_owners[lo])]
+                column = ownership.specs[key] = new_column(kind, ownership.capacity)
+                column.load(row_position[rows[lo:hi]], _typed(kind, parsed[lo:hi]))
+        return index
+
+    def kind_of(self, key, declared=None, value=None):
+        """Type of a key: the snapshot's, else the event's declared type, else the value's"""
+        kind = self.kinds.get(key)
+        if kind is None:
+            declared = str(declared).strip().casefold() if declared is not None else None
+            kind = self.kinds[key] = declared if declared in KINDS else infer_kind([value_text(value)])
+        return kind
+
+    def upsert_unit(self, row):
+        """Insert or update a unit; columns missing from ``row`` keep their value"""
+        if row.get("id") is None:
+            raise UnitIndexError("units event without an id")
+        unit_id = int(row["id"])
+        owner = self.owner_of.get(unit_id)
+        new_owner = int(row["ownership_id"]) if row.get("ownership_id") is not None else owner
+        if new_owner is None:
+            raise UnitIndexError(f"unit {unit_id} has no ownership_id")
+        units, specs = {}, {}
+        if owner is not None and owner != new_owner:
+            # Moving a unit to another ownership carries its indexed values along (invalid ones are not kept)
+            units, specs = self.ownerships[owner].unit_values(unit_id)
+            self.ownerships[owner].remove_unit(unit_id)
+        ownership = self.ownerships.get(new_owner)
+        if ownership is None:
+            ownership = self.ownerships[new_owner] = UnitIndex(new_owner, np.zeros(0, dtype=np.int64))
+        ownership.add_unit(unit_id)
+        self.owner_of[unit_id] = new_owner
+        for name, value in units.items():
+            ownership.units[name].set(ownership.position[unit_id], ownership.units[name].parse(value))
+        for key, (value, kind) in specs.items():
+            ownership.set_spec(unit_id, key, value, kind)
+        for name in UNIT_COLUMNS:
+            if name in row:
+                ownership.set_unit_value(unit_id, name, row[name])
+
+    def delete_unit(self, row):
+        if row.get("id") is None:
+            raise UnitIndexError("units event without an id")
+        unit_id = int(row["id"])
+        owner = self.owner_of.pop(unit_id, None)
+        if owner is not None:
+            self.ownerships[owner].remove_unit(unit_id)
+
+    def _unit_ownership(self, unit_id):
+        owner = self.owner_of.get(unit_id)
+        if owner is None:
+            raise UnitIndexError(f"unit {unit_id} is not indexed")
+        return self.ownerships[owner]
+
+    def upsert_spec(self, row):
+        if row.get("unit_id") is None or row.get("key") is None:
+            raise UnitIndexError("unit_specifications event without unit_id and key")
+        unit_id, key, value = int(row["unit_id"]), row["key"], value_text(row.get("value"))
+        kind = self.kind_of(key, row.get("type"), value)
+        self._unit_ownership(unit_id).set_spec(unit_id, key, value, kind)
+
+    def delete_spec(self, row):
+        if row.get("unit_id") is None:
+            raise UnitIndexError("unit_specifications event without a unit_id")
+        unit_id = int(row["unit_id"])
+        self._unit_ownership(unit_id).delete_spec(unit_id, row.get("key"))
+
+    def apply_events(self, events):
+        """Apply {"table", "op": "upsert"|"delete", "row"} events in order; returns the count"""
+        handlers = {
+            ("units", "upsert"): self.upsert_unit,
+            ("units", "delete"): self.delete_unit,
+            ("unit_specifications", "upsert"): self.upsert_spec,
+            ("unit_specifications", "delete"): self.delete_spec,
+        }
+        applied = 0
+        for event in events:
+            handler = handlers.get((event.get("table"), event.get("op", "upsert")))
+            if handler is None:
+                raise UnitIndexError(f"unsupported event: {event.get('table')!r} {event.get('op', 'upsert')!r}")
+            handler(event.get("row") or {})
+            applied += 1
+        return applied
+
+    def search(self, filters, ownership_ids=None):
+        """{ownership id: matching unit ids} for the given ownerships (default: all)"""
+        ids = sorted(self.ownerships) if ownership_ids is None else ownership_ids
+        return {ownership_id: self.ownerships[ownership_id].search(filters)
+                for ownership_id in ids if ownership_id in self.ownerships}
+
+
+def _typed(kind, parsed):
+    """Parsed object values as the array a column loads"""
+    if kind == INTEGER:
+        return parsed.astype(np.int64)
+    if kind == BOOLEAN:
+        return parsed.astype(bool)
+    return parsed
+
+
+def _describe_key(key, info):
+    invalid = f", {info['invalid']} invalid" if info["invalid"] else ""
+    return f"{key} ({info['kind']}: {info['units']} units{invalid})"
+
+
+def load_frames(path):
+    """(units, specifications) frames from a SQLite database or a JSON snapshot"""
+    if path.endswith(".json"):
+        with open(path, encoding="utf-8") as handle:
+            snapshot = json.load(handle)
+        units = pd.DataFrame(snapshot.get("Unit", ()), columns=["id", "ownership_id", *UNIT_COLUMNS])
+        specs = pd.DataFrame(snapshot.get("UnitSpecification", ()), columns=["unit_id", "key", "value", "type"])
+        return units, specs
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        return pd.read_sql_query(QUERIES["units"], conn), pd.read_sql_query(QUERIES["specifications"], conn)
+    finally:
+        conn.close()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Search units by specification through a columnar index")
+    parser.add_argument("snapshot", help="SQLite database with units and unit_specifications, or a .json snapshot")
+    parser.add_argument("--ownership", type=int, action="append", help="Only this ownership (repeatable)")
+    parser.add_argument("--where", action="append", default=[], help="Filter such as bedrooms>=2, parking, "
+                        "furnished=false or status=available (repeatable; all must hold)")
+    parser.add_argument("--events", help="JSON Lines file of unit and specification events to apply first")
+    parser.add_argument("--limit", type=int, default=DEFAULT_LIMIT, help="Unit ids to list per ownership")
+    parser.add_argument("--stats", action="store_true", help="Print each ownership's keys, types and counts")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    try:
+        filters = [parse_filter(text) for text in args.where]
+        started = time.perf_counter()
+        index = UnitSearchIndex.build(*load_frames(args.snapshot), ownership_ids=args.ownership)
+        built = time.perf_counter() - started
+        applied = index.apply_events(read_events(args.events)) if args.events else 0
+        if args.stats:
+            ids = args.ownership or sorted(index.ownerships)
+            report = [index.ownerships[ownership_id].stats() for ownership_id in ids if ownership_id in index.ownerships]
+        else:
+            started = time.perf_counter()
+            found = index.search(filters, args.ownership)
+            searched = time.perf_counter() - started
+    except (UnitIndexError, AggregateError, sqlite3.Error, OSError) as e:
+        print(f"error: {e}", file=sys.stderr)
+        sys.exit(2)
+
+    if args.stats:
+        if args.json:
+            print(json.dumps(report, ensure_ascii=False, indent=2))
+        else:
+            for entry in report:
+                keys = ", ".join(_describe_key(key, info) for key, info in entry["keys"].items())
+                print(f"Ownership {entry['ownership_id']}: {entry['units']} units; {keys or 'no specifications'}")
+        sys.exit(0)
+
+    total = sum(len(ids) for ids in found.values())
+    if args.json:
+        print(json.dumps({
+            "filters": args.where,
+            "units": total,
+            "ownerships": {str(owner): {"units": len(ids), "unit_ids": ids[:args.limit].tolist()}
+                           for owner, ids in found.items() if len(ids)},
+            "events": applied,
+            "build_seconds": round(built, 3),
+            "search_ms": round(searched * 1000, 3),
+        }, ensure_ascii=False, indent=2))
+    else:
+        for owner, ids in found.items():
+            if len(ids):
+                more = f" ... (+{len(ids) - args.limit})" if len(ids) > args.limit else ""
+                print(f"Ownership {owner}: {len(ids)} units: {', '.join(map(str, ids[:args.limit].tolist()))}{more}")
+        print(f"{total} units match {' and '.join(args.where) or 'no filter'} in {searched * 1000:.2f} ms "
+              f"(index built in {built:.2f}s{f', {applied} events applied' if applied else ''})")
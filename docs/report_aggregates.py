@@ -0,0 +1,606 @@
+"""
+Incrementally maintained report aggregates for ReportService
+ReportService::clearCache drops every cached dashboard key of an ownership
+whenever something changes, and the next request recomputes all of it with
+one query per month or period. This store keeps the invoice and payment
+figures behind those reports as running totals in SQLite, keyed by
+ownership, metric, bucket scheme (monthly, weekly, daily), calendar bucket
+(its first day) and category, each holding a row count and a halala sum.
+System-wide totals are kept under ownership 0.
+
+An invoice or payment event (insert, update or delete) is applied as a
+delta: the store keeps the last applied version of every row, subtracts
+that version's contributions and adds the new one's. A row touches a fixed
+number of aggregate keys whatever the size of the ownership, so an event
+costs O(1) indexed writes, and a dashboard read is a handful of primary-key
+range lookups: monthly revenue, revenue by period, invoice status counts,
+payment methods and the overdue list (a partial index on the mirrored
+invoices) come back in the ReportService shapes of report_analytics.
+
+A build computes the same aggregates column-wise from a source database
+(one np.unique per metric). The consistency check builds a fresh store
+from the current source rows and compares it row for row with the
+incrementally maintained one, then compares the store's reads for every
+ownership and the system with a full ReportAnalytics recompute. Both must
+match exactly.
+
+Usage:
+    python report_aggregates.py aggregates.db --build app.db
+    python report_aggregates.py aggregates.db --events events.jsonl   # {"table": "invoices", "op": "upsert", "row": {...}}
+    python report_aggregates.py aggregates.db --check app.db [--as-of 2026-10-17T09:00:00]
+    python report_aggregates.py aggregates.db --ownership 7 [--as-of ...] [--months 12] [--json]
+"""
+
+import argparse
+import itertools
+import json
+import os
+import sqlite3
+import sys
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from report_analytics import (
+    DEFAULT_DAYS,
+    DEFAULT_MONTHS,
+    DEFAULT_WEEKS,
+    INVOICE_STATUSES,
+    PAYMENT_METHODS,
+    PAYMENT_STATUSES,
+    ReportAnalytics,
+    daily_buckets,
+    distribution,
+    load_snapshot,
+    money,
+    monthly_buckets,
+    monthly_revenue_rows,
+    payment_methods_report,
+    period_series,
+    revenue_by_period_rows,
+    weekly_buckets,
+)
+
+SYSTEM_ID = 0
+SCHEMES = ("monthly", "weekly", "daily")
+BUCKET_FACTORIES = {"monthly": monthly_buckets, "weekly": weekly_buckets, "daily": daily_buckets}
+
+# First day of the bucket holding a moment (weeks start on Monday)
+BUCKET_KEYS = {
+    "monthly": lambda moment: f"{moment:%Y-%m}-01",
+    "weekly": lambda moment: f"{moment - timedelta(days=moment.weekday()):%Y-%m-%d}",
+    "daily": lambda moment: f"{moment:%Y-%m-%d}",
+}
+
+# (metric, schemes, moment column, paid rows only, category column, amount column)
+INVOICE_METRICS = (
+    ("receivables", SCHEMES, "period_start", False, None, "total"),
+    ("paid_receivables", SCHEMES, "paid_at", True, None, "total"),
+    ("invoice_status", ("monthly",), "period_start", False, "status", "total"),
+    ("invoice_amount", ("monthly",), "period_start", False, None, "amount"),
+    ("invoice_tax", ("monthly",), "period_start", False, None, "tax"),
+)
+PAYMENT_METRICS = (
+    ("revenue", SCHEMES, "paid_at", True, None, "amount"),
+    ("payment_method", ("monthly",), "created_at", False, "method", "amount"),
+    ("payment_status", ("monthly",), "created_at", False, "status", "amount"),
+)
+
+# Mirrored columns of the last applied version of each row; money columns are stored in halalas
+TABLES = {
+    "invoices": {
+        "columns": ("id", "ownership_id", "contract_id", "number", "period_start", "due", "status",
+                    "amount", "tax", "total", "paid_at"),
+        "money": ("amount", "tax", "total"),
+        "ids": ("id", "ownership_id", "contract_id"),
+        "metrics": INVOICE_METRICS,
+    },
+    "payments": {
+        "columns": ("id", "ownership_id", "invoice_id", "method", "status", "amount", "paid_at", "created_at"),
+        "money": ("amount",),
+        "ids": ("id", "ownership_id", "invoice_id"),
+        "metrics": PAYMENT_METRICS,
+    },
+}
+
+STORE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS report_aggregates (
+    ownership_id INTEGER NOT NULL,
+    metric TEXT NOT NULL,
+    scheme TEXT NOT NULL,
+    bucket TEXT NOT NULL,
+    category TEXT NOT NULL DEFAULT '',
+    count INTEGER NOT NULL DEFAULT 0,
+    amount INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (metric, scheme, ownership_id, bucket, category)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS report_invoices (
+    id INTEGER PRIMARY KEY,
+    ownership_id INTEGER,
+    contract_id INTEGER,
+    number TEXT,
+    period_start TEXT,
+    due TEXT,
+    status TEXT,
+    amount INTEGER,
+    tax INTEGER,
+    total INTEGER,
+    paid_at TEXT
+);
+CREATE INDEX IF NOT EXISTS report_invoices_overdue_index ON report_invoices (ownership_id, due, id)
+    WHERE status = 'overdue';
+CREATE TABLE IF NOT EXISTS report_payments (
+    id INTEGER PRIMARY KEY,
+    ownership_id INTEGER,
+    invoice_id INTEGER,
+    method TEXT,
+    status TEXT,
+    amount INTEGER,
+    paid_at TEXT,
+    created_at TEXT
+);
+"""
+
+UPSERT_AGGREGATE = (
+    "INSERT INTO report_aggregates (ownership_id, metric, scheme, bucket, category, count, amount) "
+    "VALUES (?, ?, ?, ?, ?, ?, ?) "
+    "ON CONFLICT (metric, scheme, ownership_id, bucket, category) "
+    "DO UPDATE SET count = count + excluded.count, amount = amount + excluded.amount"
+)
+
+
+class AggregateError(Exception):
+    pass
+
+
+def to_halalas(value):
+    """Decimal value in integer halalas, rounded like report_analytics.halalas; NULL and non-numbers are 0"""
+    if value is None or value == "":
+        return 0
+    try:
+        return int(round(float(value) * 100))
+    except (TypeError, ValueError):
+        return 0
+
+
+def parse_moment(value):
+    """Date or timestamp value as a datetime, None when empty or unparseable"""
+    if value is None or isinstance(value, datetime):
+        return value
+    try:
+        return datetime.fromisoformat(str(value).strip())
+    except ValueError:
+        return None
+
+
+def contributions(table, row):
+    """Aggregate keys a mirrored row adds to: {(ownership, metric, scheme, bucket, category): (count, amount)}"""
+    keys = {}
+    paid = row["status"] == "paid"
+    for metric, schemes, moment_column, paid_only, category_column, amount_column in TABLES[table]["metrics"]:
+        if paid_only and not paid:
+            continue
+        moment = parse_moment(row[moment_column])
+        if moment is None:
+            continue
+        category = "" if category_column is None else (row[category_column] or "")
+        amount = row[amount_column] or 0
+        for scheme in schemes:
+            bucket = BUCKET_KEYS[scheme](moment)
+            for ownership_id in (row["ownership_id"], SYSTEM_ID):
+                keys[(ownership_id, metric, scheme, bucket, category)] = (1, amount)
+    return keys
+
+
+def delta(table, old, new):
+    """Net change between two versions of a row (either may be None); unchanged keys cancel out"""
+    changes = {}
+    for row, sign in ((old, -1), (new, 1)):
+        if row is None:
+            continue
+        for key, (count, amount) in contributions(table, row).items():
+            previous = changes.get(key, (0, 0))
+            changes[key] = (previous[0] + sign * count, previous[1] + sign * amount)
+    return {key: change for key, change in changes.items() if change != (0, 0)}
+
+
+class AggregateStore:
+    """Running report totals in a SQLite database, updated one invoice or payment event at a time"""
+
+    def __init__(self, conn):
+        self.conn = conn
+        conn.executescript(STORE_SCHEMA)
+
+    @classmethod
+    def open(cls, path):
+        return cls(sqlite3.connect(path))
+
+    def close(self):
+        self.conn.close()
+
+    # ---- building and events ----
+
+    def build(self, source):
+        """Replace the store's contents with aggregates computed column-wise from a source database"""
+        self.conn.commit()
+        self.conn.execute("ATTACH DATABASE ? AS source", (source,))
+        try:
+            with self.conn:
+                for table, spec in TABLES.items():
+                    # DECIMAL(12, 2) values are whole halalas, so SQLite's round() agrees with to_halalas
+                    select = ", ".join(
+                        f"CAST(round(coalesce({column}, 0) * 100) AS INTEGER)" if column in spec["money"] else column
+                        for column in spec["columns"]
+                    )
+                    self.conn.execute(f"DELETE FROM report_{table}")
+                    self.conn.execute(
+                        f"INSERT INTO report_{table} ({', '.join(spec['columns'])}) SELECT {select} FROM source.{table}"
+                    )
+        finally:
+            self.conn.execute("DETACH DATABASE source")
+
+        batches = {}
+        for table, spec in TABLES.items():
+            # Only the columns the metrics read
+            columns = {"ownership_id", "status"}.union(*(
+                {moment, category, amount} - {None} for _, _, moment, _, category, amount in spec["metrics"]
+            ))
+            frame = pd.read_sql_query(
+                f"SELECT {', '.join(column for column in spec['columns'] if column in columns)} FROM report_{table}",
+                self.conn,
+            )
+            batches.update(aggregate_rows(table, frame))
+        with self.conn:
+            self.conn.execute("DELETE FROM report_aggregates")
+            # Batches in primary-key order make the inserts appends to the aggregates B-tree
+            for key in sorted(batches):
+                self.conn.executemany(
+                    "INSERT INTO report_aggregates (ownership_id, metric, scheme, bucket, category, count, amount) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    batches[key],
+                )
+
+    def row(self, table, row_id):
+        """The last applied version of a row as a dict, or None"""
+        columns = TABLES[table]["columns"]
+        found = self.conn.execute(
+            f"SELECT {', '.join(columns)} FROM report_{table} WHERE id = ?", (row_id,),
+        ).fetchone()
+        return None if found is None else dict(zip(columns, found))
+
+    def upsert(self, table, values):
+        """Apply an insert or update; columns missing from ``values`` keep their last applied value"""
+        spec = TABLES[table]
+        if values.get("id") is None:
+            raise AggregateError(f"{table} event without an id")
+        old = self.row(table, int(values["id"]))
+        new = dict(old) if old is not None else dict.fromkeys(spec["columns"])
+        for column in spec["columns"]:
+            if column not in values:
+                continue
+            value = values[column]
+            if column in spec["money"]:
+                value = to_halalas(value)
+            elif column in spec["ids"] and value is not None:
+                value = int(value)
+            new[column] = value
+        if new["ownership_id"] is None:
+            raise AggregateError(f"{table} {values['id']} has no ownership_id")
+        self._apply(table, old, new)
+        self.conn.execute(
+            f"INSERT OR REPLACE INTO report_{table} ({', '.join(spec['columns'])}) "
+            f"VALUES ({', '.join('?' * len(spec['columns']))})",
+            [new[column] for column in spec["columns"]],
+        )
+
+    def delete(self, table, row_id):
+        old = self.row(table, row_id)
+        if old is not None:
+            self._apply(table, old, None)
+            self.conn.execute(f"DELETE FROM report_{table} WHERE id = ?", (row_id,))
+
+    def _apply(self, table, old, new):
+        self.conn.executemany(
+            UPSERT_AGGREGATE, [(*key, count, amount) for key, (count, amount) in delta(table, old, new).items()],
+        )
+
+    def apply_events(self, events):
+        """Apply {"table", "op": "upsert"|"delete", "row"} events in one transaction; returns the count"""
+        applied = 0
+        with self.conn:
+            for event in events:
+                table, op, row = event.get("table"), event.get("op", "upsert"), event.get("row") or {}
+                if table not in TABLES:
+                    raise AggregateError(f"unknown table in event: {table!r}")
+                if op == "upsert":
+                    self.upsert(table, row)
+                elif op == "delete":
+                    self.delete(table, row.get("id"))
+                else:
+                    raise AggregateError(f"unknown event op: {op!r}")
+                applied += 1
+        return applied
+
+    # ---- reads: the ReportService shapes ----
+
+    def _figures(self, ownership_id, metrics, scheme, first, last):
+        """{(metric, bucket, category): (count, amount)} for buckets between ``first`` and ``last``"""
+        placeholders = ", ".join("?" * len(metrics))
+        found = self.conn.execute(
+            "SELECT metric, bucket, category, count, amount FROM report_aggregates "
+            f"WHERE ownership_id = ? AND metric IN ({placeholders}) AND scheme = ? AND bucket BETWEEN ? AND ?",
+            (ownership_id, *metrics, scheme, first, last),
+        )
+        return {(metric, bucket, category): (count, amount) for metric, bucket, category, count, amount in found}
+
+    def _series(self, ownership_id, buckets, scheme):
+        figures = self._figures(
+            ownership_id, ("revenue", "receivables", "paid_receivables"), scheme,
+            buckets.first_days[0], buckets.first_days[-1],
+        )
+
+        def column(metric, field):
+            return np.array([figures.get((metric, day, ""), (0, 0))[field] for day in buckets.first_days], dtype=np.int64)
+
+        return period_series({
+            "revenue": column("revenue", 1),
+            "receivables": column("receivables", 1),
+            "paid_receivables": column("paid_receivables", 1),
+            "invoices": column("receivables", 0),
+            "paid_invoices": column("paid_receivables", 0),
+        })
+
+    def monthly_revenue(self, ownership_id, as_of, months=DEFAULT_MONTHS):
+        buckets = monthly_buckets(as_of, months)
+        return monthly_revenue_rows(buckets, self._series(ownership_id, buckets, "monthly"))
+
+    def revenue_by_period(self, ownership_id, as_of, period="monthly", count=12):
+        if period not in BUCKET_FACTORIES:
+            raise AggregateError(f"unknown period: {period!r}")
+        buckets = BUCKET_FACTORIES[period](as_of, count)
+        return revenue_by_period_rows(buckets, self._series(ownership_id, buckets, period))
+
+    def _month_categories(self, ownership_id, as_of, metric, categories):
+        """Counts and amounts per category for the month of ``as_of``; the extra last entry is other values"""
+        month = BUCKET_KEYS["monthly"](as_of)
+        counts, amounts = [0] * (len(categories) + 1), [0] * (len(categories) + 1)
+        for (_, _, category), (count, amount) in self._figures(ownership_id, (metric,), "monthly", month, month).items():
+            idx = categories.index(category) if category in categories else len(categories)
+            counts[idx] += count
+            amounts[idx] += amount
+        return counts, amounts
+
+    def invoices_status(self, ownership_id, as_of):
+        counts, _ = self._month_categories(ownership_id, as_of, "invoice_status", INVOICE_STATUSES)
+        return distribution(INVOICE_STATUSES, counts)
+
+    def payment_methods(self, ownership_id, as_of):
+        return payment_methods_report(*self._month_categories(ownership_id, as_of, "payment_method", PAYMENT_METHODS))
+
+    def payments_status(self, ownership_id, as_of):
+        counts, _ = self._month_categories(ownership_id, as_of, "payment_status", PAYMENT_STATUSES)
+        return dict(zip(PAYMENT_STATUSES, counts))
+
+    def overdue_invoices(self, ownership_id, as_of):
+        """getOverdueInvoices without the tenant and unit names (join them on contract_id)"""
+        found = self.conn.execute(
+            "SELECT id, number, contract_id, due, total, amount FROM report_invoices "
+            "WHERE ownership_id = ? AND status = 'overdue' ORDER BY due, id",
+            (ownership_id,),
+        )
+        rows = []
+        for invoice_id, number, contract_id, due, total, amount in found:
+            due_day = parse_moment(due)
+            rows.append({
+                "id": invoice_id,
+                "number": number,
+                "contract_id": contract_id,
+                "due_date": None if due_day is None else f"{due_day:%Y-%m-%d}",
+                # Carbon 3's signed diffInDays (composer.lock pins 3.x) is a float: elapsed microseconds over a
+                # day's, without truncation, and ReportService returns it as is
+                "days_overdue": None if due_day is None else (due_day - as_of) // timedelta(microseconds=1) / 86400e6,
+                "total": money(total or 0),
+                "amount": money(amount or 0),
+            })
+        return rows
+
+    def dashboard(self, ownership_id, as_of, months=DEFAULT_MONTHS, weeks=DEFAULT_WEEKS, days=DEFAULT_DAYS):
+        """Every maintained report of one ownership (SYSTEM_ID for the whole system)"""
+        horizons = {"monthly": months, "weekly": weeks, "daily": days}
+        report = {
+            "invoices_status": self.invoices_status(ownership_id, as_of),
+            "payment_methods": self.payment_methods(ownership_id, as_of),
+            "monthly_revenue": self.monthly_revenue(ownership_id, as_of, months),
+            "revenue_by_period": {
+                period: self.revenue_by_period(ownership_id, as_of, period, count) for period, count in horizons.items()
+            },
+        }
+        if ownership_id != SYSTEM_ID:
+            report["overdue_invoices"] = self.overdue_invoices(ownership_id, as_of)
+        return report
+
+
+def aggregate_rows(table, frame):
+    """{(metric, scheme): aggregate rows in key order} for a table's mirrored rows, system rows first
+
+    Each distinct timestamp is parsed once with parse_moment, so rows land in
+    the buckets the incremental path assigns; the grouping itself is one
+    np.unique over a combined (ownership, bucket, category) code.
+    """
+    frame = frame[frame["ownership_id"].notna()]
+    owners = frame["ownership_id"].to_numpy(dtype=np.int64)
+    paid = frame["status"].to_numpy(dtype=object) == "paid"
+    moment_codes, bucket_codes, batches = {}, {}, {}
+    for metric, schemes, moment_column, paid_only, category_column, amount_column in TABLES[table]["metrics"]:
+        if moment_column not in moment_codes:
+            codes, values = pd.factorize(frame[moment_column].to_numpy(dtype=object))
+            moment_codes[moment_column] = (codes, [parse_moment(value) for value in values])
+        codes, moments = moment_codes[moment_column]
+        if category_column is None:
+            categories, category_values = np.zeros(len(frame), dtype=np.int64), np.array([""], dtype=object)
+        else:
+            categories, category_values = pd.factorize(frame[category_column].fillna("").to_numpy(dtype=object), sort=True)
+        amounts = frame[amount_column].to_numpy(dtype=np.int64)
+        for scheme in schemes:
+            if (moment_column, scheme) not in bucket_codes:
+                keys = [None if moment is None else BUCKET_KEYS[scheme](moment) for moment in moments]
+                key_codes, key_values = pd.factorize(np.array(keys + [None], dtype=object), sort=True)
+                # -1 (no moment) picks the trailing None, which factorizes to -1 as well
+                bucket_codes[moment_column, scheme] = (key_codes[codes], key_values)
+            buckets, bucket_values = bucket_codes[moment_column, scheme]
+            keep = buckets >= 0
+            if paid_only:
+                keep &= paid
+            rows = []
+            for owner in (np.zeros(keep.sum(), dtype=np.int64), owners[keep]):
+                owner_codes, owner_values = pd.factorize(owner, sort=True)
+                combined = (owner_codes * len(bucket_values) + buckets[keep]) * len(category_values) + categories[keep]
+                unique, inverse = np.unique(combined, return_inverse=True)
+                counts = np.bincount(inverse)
+                sums = np.rint(np.bincount(inverse, weights=amounts[keep])).astype(np.int64)
+                rest, category = np.divmod(unique, len(category_values))
+                owner_code, bucket = np.divmod(rest, len(bucket_values))
+                rows += zip(
+                    owner_values[owner_code].tolist(), itertools.repeat(metric), itertools.repeat(scheme),
+                    bucket_values[bucket].tolist(), category_values[category].tolist(), counts.tolist(), sums.tolist(),
+                )
+            batches[metric, scheme] = rows
+    return batches
+
+
+def _leaves(value, path=""):
+    """A nested report as {"a.b[2].c": leaf}"""
+    if isinstance(value, dict):
+        items = ((f"{path}.{key}" if path else str(key), child) for key, child in value.items())
+    elif isinstance(value, list):
+        items = ((f"{path}[{idx}]", child) for idx, child in enumerate(value))
+    else:
+        return {path: value}
+    leaves = {}
+    for child_path, child in items:
+        leaves.update(_leaves(child, child_path))
+    return leaves
+
+
+def _compare(kind, expected, actual, limit):
+    """Differences between two {key: value} maps, at most ``limit``"""
+    differences = []
+    for key in sorted(set(expected) | set(actual), key=repr):
+        if expected.get(key) != actual.get(key):
+            differences.append({"kind": kind, "key": key, "expected": expected.get(key), "actual": actual.get(key)})
+            if len(differences) >= limit:
+                break
+    return differences
+
+
+def check_consistency(store, source, as_of=None, limit=50):
+    """Compare the store with a full rebuild from ``source`` and with ReportAnalytics; returns the differences"""
+    as_of = as_of or datetime.now().replace(microsecond=0)
+    fresh = AggregateStore(sqlite3.connect(":memory:"))
+    fresh.build(source)
+    differences = []
+
+    # 1. Incrementally maintained rows and aggregates against a rebuild from the current source rows
+    for table, spec in TABLES.items():
+        columns = ", ".join(spec["columns"])
+        sql = f"SELECT {columns} FROM report_{table}"
+        differences += _compare(
+            f"{table}_row",
+            {found[0]: found for found in fresh.conn.execute(sql)},
+            {found[0]: found for found in store.conn.execute(sql)},
+            limit - len(differences),
+        )
+    sql = "SELECT ownership_id, metric, scheme, bucket, category, count, amount FROM report_aggregates WHERE count != 0"
+    differences += _compare(
+        "aggregate",
+        {found[:5]: found[5:] for found in fresh.conn.execute(sql)},
+        {found[:5]: found[5:] for found in store.conn.execute(sql)},
+        limit - len(differences),
+    )
+    fresh.close()
+
+    # 2. Reads against the full recompute, for every ownership and the system
+    analytics = ReportAnalytics(load_snapshot(source), as_of)
+    analytics.compute()
+    expected_reports = {SYSTEM_ID: analytics.system_report()}
+    for position, ownership_id in enumerate(analytics.ownership_ids.tolist()):
+        expected_reports[ownership_id] = analytics.ownership_report(position)
+    for ownership_id, expected in expected_reports.items():
+        if len(differences) >= limit:
+            break
+        actual = store.dashboard(ownership_id, as_of, analytics.months, analytics.weeks, analytics.days)
+        shared = [key for key in actual if key in expected]
+        differences += _compare(
+            f"report {ownership_id}",
+            _leaves({key: expected[key] for key in shared}),
+            _leaves({key: actual[key] for key in shared}),
+            limit - len(differences),
+        )
+    return differences
+
+
+def read_events(path):
+    """Events from a JSON Lines file, one per non-blank line"""
+    with open(path, encoding="utf-8") as handle:
+        for line_number, line in enumerate(handle, 1):
+            if line.strip():
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError as e:
+                    raise AggregateError(f"{path}:{line_number}: {e}") from e
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Maintain ReportService aggregates incrementally")
+    parser.add_argument("store", help="SQLite database holding the aggregates (created if missing)")
+    parser.add_argument("--build", metavar="SOURCE", help="Rebuild the store from an application SQLite database")
+    parser.add_argument("--events", help="JSON Lines file of invoice and payment events to apply")
+    parser.add_argument("--check", metavar="SOURCE", help="Verify the store against a full recompute from SOURCE")
+    parser.add_argument("--ownership", type=int, help=f"Print the maintained reports of an ownership ({SYSTEM_ID}: system)")
+    parser.add_argument("--as-of", type=datetime.fromisoformat, help="Reference time for reads and checks (default: now)")
+    parser.add_argument("--months", type=int, default=DEFAULT_MONTHS, help="Months of revenue to read")
+    parser.add_argument("--weeks", type=int, default=DEFAULT_WEEKS, help="Weeks of revenue to read")
+    parser.add_argument("--days", type=int, default=DEFAULT_DAYS, help="Days of revenue to read")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    as_of = args.as_of or datetime.now().replace(microsecond=0)
+    for source in (args.build, args.check):
+        if source and not os.path.exists(source):
+            print(f"error: {source} does not exist", file=sys.stderr)
+            sys.exit(2)
+    store = AggregateStore.open(args.store)
+    status = 0
+    try:
+        if args.build:
+            started = time.perf_counter()
+            store.build(args.build)
+            print(f"Built {args.store} from {args.build} in {time.perf_counter() - started:.3f}s", file=sys.stderr)
+        if args.events:
+            started = time.perf_counter()
+            applied = store.apply_events(read_events(args.events))
+            print(f"Applied {applied} events in {time.perf_counter() - started:.3f}s", file=sys.stderr)
+        if args.check:
+            differences = check_consistency(store, args.check, as_of)
+            if args.json:
+                print(json.dumps(differences, ensure_ascii=False, indent=2, default=str))
+            else:
+                for difference in differences:
+                    print(f"{difference['kind']} {difference['key']}: "
+                          f"expected {difference['expected']!r}, got {difference['actual']!r}")
+                print(f"{'Consistent' if not differences else f'{len(differences)} differences'} as of {as_of.isoformat()}")
+            status = 1 if differences else 0
+        if args.ownership is not None:
+            report = store.dashboard(args.ownership, as_of, args.months, args.weeks, args.days)
+            print(json.dumps(report, ensure_ascii=False, indent=2 if args.json else None))
+    except (AggregateError, sqlite3.Error) as e:
+        print(f"error: {e}", file=sys.stderr)
+        status = 2
+    finally:
+        store.close()
+    sys.exit(status)
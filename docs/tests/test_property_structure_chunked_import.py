@@ -0,0 +1,174 @@
+import json
+import sqlite3
+import uuid
+
+import pytest
+
+import property_structure_chunked_import as chunked
+from property_structure_loader import create_sqlite_schema
+from property_structure_synthetic import generate, write_xlsx
+
+TABLES = ("ownerships", "portfolios", "portfolio_locations", "buildings", "building_floors", "units",
+          "unit_specifications")
+CHUNK_SIZE = 100
+
+
+@pytest.fixture(scope="module")
+def data():
+    return generate(300, seed=3)
+
+
+@pytest.fixture(scope="module")
+def workbook(tmp_path_factory, data):
+    path = tmp_path_factory.mktemp("workbook") / "filled.xlsx"
+    write_xlsx(data, str(path))
+    return path
+
+
+@pytest.fixture(scope="module")
+def clean_counts(tmp_path_factory, workbook):
+    directory = tmp_path_factory.mktemp("clean")
+    report = import_into(directory / "clean.db", workbook, **run_options(directory))
+    assert report["rejected"] == 0
+    return database_counts(directory / "clean.db")
+
+
+def connect(path, create=False):
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA foreign_keys = ON")
+    if create:
+        create_sqlite_schema(conn)
+    return conn
+
+
+def table_counts(conn):
+    return {table: conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0] for table in TABLES}
+
+
+def database_counts(db):
+    conn = connect(db)
+    try:
+        return table_counts(conn)
+    finally:
+        conn.close()
+
+
+def take_portfolio_code(db, code):
+    """Give another ownership's portfolio the code, so the workbook's portfolio with it is rejected"""
+    conn = connect(db, create=True)
+    conn.execute("INSERT INTO ownerships (id, uuid, name, type, ownership_type, city) "
+                 "VALUES (1000, ?, 'Other', 'company', 'real_estate', 'Riyadh')", (str(uuid.uuid4()),))
+    conn.execute("INSERT INTO portfolios (id, uuid, ownership_id, name, code) VALUES (1000, ?, 1000, 'Taken', ?)",
+                 (str(uuid.uuid4()), code))
+    conn.commit()
+    conn.close()
+
+
+def read_rejects(path):
+    with open(path, encoding="utf-8") as handle:
+        return [json.loads(line) for line in handle]
+
+
+def write_rejects(path, records):
+    with open(path, "w", encoding="utf-8") as handle:
+        handle.writelines(json.dumps(record, ensure_ascii=False) + "\n" for record in records)
+
+
+def run_options(directory):
+    return {"chunk_size": CHUNK_SIZE, "checkpoint_path": str(directory / "run.json"),
+            "reject_path": str(directory / "run.jsonl")}
+
+
+def import_into(db, source, **options):
+    conn = connect(db, create=not db.exists())
+    try:
+        return chunked.import_chunked(source, conn, **options)
+    finally:
+        conn.close()
+
+
+class Killed(Exception):
+    pass
+
+
+@pytest.mark.parametrize("chunk", [0, 1])
+@pytest.mark.parametrize("moment", ["before_commit", "after_commit"])
+def test_interrupted_run_resumes_without_duplicates_or_rejects(tmp_path, workbook, clean_counts, monkeypatch,
+                                                               chunk, moment):
+    db = tmp_path / "import.db"
+    options = run_options(tmp_path)
+
+    if moment == "before_commit":
+        save = chunked.Checkpoint.save
+
+        def kill(checkpoint):
+            units = checkpoint.state["sheets"].get("Unit")
+            if units and units["pending"] is not None and len(units["chunks"]) == chunk:
+                raise Killed
+            save(checkpoint)
+
+        monkeypatch.setattr(chunked.Checkpoint, "save", kill)
+    else:
+        finish = chunked.ChunkedImporter._finish_chunk
+
+        def kill(importer, progress, pending):
+            if progress is importer.checkpoint.state["sheets"].get("Unit") and len(progress["chunks"]) == chunk:
+                raise Killed
+            finish(importer, progress, pending)
+
+        monkeypatch.setattr(chunked.ChunkedImporter, "_finish_chunk", kill)
+
+    with pytest.raises(Killed):
+        import_into(db, workbook, **options)
+    monkeypatch.undo()
+
+    assert database_counts(db)["units"] == CHUNK_SIZE * (chunk + (moment == "after_commit"))
+
+    report = import_into(db, workbook, **options)
+
+    assert report["resumed"]
+    assert report["rejected"] == 0
+    assert database_counts(db) == clean_counts
+
+
+def test_fixed_reject_file_imports_the_rejected_rows(tmp_path, data, workbook, clean_counts):
+    db = tmp_path / "import.db"
+    code = data["Portfolio"]["code"][0]
+    take_portfolio_code(db, code)
+
+    report = import_into(db, workbook, **run_options(tmp_path))
+
+    assert report["loaded"] and report["rejected"] > 0
+    records = read_rejects(report["rejects"])
+    assert records[0]["sheet"] == "Portfolio" and records[0]["values"]["code"] == code
+    assert {record["sheet"] for record in records} >= {"Building", "Unit"}
+
+    fixed = tmp_path / "fixed.rejects.jsonl"
+    records[0]["values"]["code"] = code + "-B"
+    write_rejects(fixed, records)
+
+    retry = import_into(db, fixed)
+
+    assert retry["loaded"], retry.get("errors")
+    assert retry["rejected"] == 0
+    assert retry["rows"] == len(records)
+    assert database_counts(db) == {table: count + (table in ("ownerships", "portfolios")) for table, count in clean_counts.items()}
+
+
+def test_reject_file_is_validated_before_import(tmp_path, data, workbook):
+    db = tmp_path / "import.db"
+    take_portfolio_code(db, data["Portfolio"]["code"][0])
+    report = import_into(db, workbook, **run_options(tmp_path))
+    records = read_rejects(report["rejects"])
+    before = database_counts(db)
+
+    unit = next(record for record in records if record["sheet"] == "Unit")
+    unit["values"]["area"] = "large"
+    broken = tmp_path / "broken.rejects.jsonl"
+    write_rejects(broken, records)
+
+    retry = import_into(db, broken)
+
+    assert not retry["loaded"]
+    assert retry["stage"] == "validation"
+    assert database_counts(db) == before
@@ -0,0 +1,106 @@
+import copy
+import sqlite3
+
+import pytest
+
+from property_structure_diff import DEACTIVATE, DELETE, INSERT, UPDATE, apply_plan, diff_workbook
+from property_structure_synthetic import generate, write_sqlite, write_xlsx
+
+
+@pytest.fixture(scope="module")
+def data():
+    return generate(120, seed=5, ownerships=1)
+
+
+@pytest.fixture
+def snapshot(tmp_path, data):
+    path = tmp_path / "current.db"
+    write_sqlite(data, str(path))
+    return str(path)
+
+
+def drop_row(columns, index):
+    for values in columns.values():
+        del values[index]
+
+
+def edited(data):
+    """The hierarchy with one unit's area changed, one unit removed and one unit added"""
+    data = copy.deepcopy(data)
+    units, specs = data["Unit"], data["UnitSpecification"]
+    units["area"][0] = round(units["area"][0] + 10, 2)
+
+    removed = units["id"][-1]
+    while removed in specs["unit_id"]:
+        drop_row(specs, specs["unit_id"].index(removed))
+    drop_row(units, len(units["id"]) - 1)
+
+    new_id = max(units["id"]) + 1
+    for values in units.values():
+        values.append(values[0])
+    units["id"][-1] = new_id
+    units["number"][-1] = "NEW-1"
+    for values in specs.values():
+        values.append(values[0])
+    specs["id"][-1] = max(specs["id"][:-1]) + 1
+    specs["unit_id"][-1] = new_id
+    return data
+
+
+def summary_totals(plan):
+    totals = {}
+    for counts in plan["summary"].values():
+        for name, count in counts.items():
+            totals[name] = totals.get(name, 0) + count
+    return totals
+
+
+def unit_row(conn, units, index):
+    """(area, active) of a unit; ids in a freshly loaded snapshot are the template ids"""
+    return conn.execute(
+        "SELECT area, active FROM units WHERE building_id = ? AND number = ?",
+        (units["building_id"][index], units["number"][index]),
+    ).fetchone()
+
+
+def test_unchanged_workbook_plans_nothing(tmp_path, data, snapshot):
+    workbook = str(tmp_path / "same.xlsx")
+    write_xlsx(data, workbook)
+
+    plan = diff_workbook(workbook, snapshot)
+
+    assert plan["valid"], plan.get("errors")
+    totals = summary_totals(plan)
+    assert totals.get(INSERT, 0) == totals.get(UPDATE, 0) == totals.get(DEACTIVATE, 0) == totals.get(DELETE, 0) == 0
+    assert totals["unchanged"] > 0
+
+
+def test_applied_plan_brings_snapshot_in_line_with_workbook(tmp_path, data, snapshot):
+    changed = edited(data)
+    workbook = str(tmp_path / "edited.xlsx")
+    write_xlsx(changed, workbook)
+    removed_specs = data["UnitSpecification"]["unit_id"].count(data["Unit"]["id"][-1])
+
+    plan = diff_workbook(workbook, snapshot)
+
+    assert plan["valid"], plan.get("errors")
+    assert plan["summary"]["Unit"][INSERT] == 1
+    assert plan["summary"]["Unit"][UPDATE] == 1
+    assert plan["summary"]["Unit"][DEACTIVATE] == 1
+    assert plan["summary"]["UnitSpecification"][INSERT] == 1
+    assert plan["summary"]["UnitSpecification"][DELETE] == removed_specs
+    assert plan["changes"]["Unit"][UPDATE][0]["changes"].keys() == {"area"}
+
+    conn = sqlite3.connect(snapshot)
+    conn.execute("PRAGMA foreign_keys = ON")
+    try:
+        apply_plan(conn, plan)
+        assert unit_row(conn, changed["Unit"], 0)[0] == pytest.approx(changed["Unit"]["area"][0])
+        assert unit_row(conn, data["Unit"], -1)[1] == 0
+        assert unit_row(conn, changed["Unit"], -1) == unit_row(conn, changed["Unit"], 0)
+    finally:
+        conn.close()
+
+    replanned = diff_workbook(workbook, snapshot)
+    totals = summary_totals(replanned)
+    assert totals.get(INSERT, 0) == totals.get(UPDATE, 0) == totals.get(DEACTIVATE, 0) == totals.get(DELETE, 0) == 0
@@ -0,0 +1,142 @@
+import random
+import sqlite3
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+
+from report_aggregates import AggregateStore, check_consistency
+from report_analytics import INVOICE_STATUSES, PAYMENT_METHODS, PAYMENT_STATUSES, create_report_schema
+
+AS_OF = datetime(2026, 10, 17, 9, 0, 0)
+OWNERSHIPS = (1, 2)
+
+
+def moment(rng, days=400):
+    return AS_OF - timedelta(days=rng.randrange(days), seconds=rng.randrange(86400))
+
+
+def build_source(path, seed=11, invoices=300):
+    """An application database with two ownerships' tenants, contracts, invoices and payments"""
+    rng = random.Random(seed)
+    conn = sqlite3.connect(path)
+    create_report_schema(conn)
+    for ownership_id in OWNERSHIPS:
+        conn.execute("INSERT INTO ownerships (id, uuid, name, type, ownership_type, city) "
+                     "VALUES (?, ?, ?, 'company', 'real_estate', 'Riyadh')",
+                     (ownership_id, str(uuid.uuid4()), f"Ownership {ownership_id}"))
+        conn.execute("INSERT INTO users (id, name) VALUES (?, ?)", (ownership_id, f"Tenant {ownership_id}"))
+        conn.execute("INSERT INTO tenants (id, user_id, ownership_id, created_at) VALUES (?, ?, ?, ?)",
+                     (ownership_id, ownership_id, ownership_id, f"{moment(rng):%Y-%m-%d %H:%M:%S}"))
+        conn.execute(
+            'INSERT INTO contracts (id, tenant_id, ownership_id, number, start, "end", total_rent, status) '
+            "VALUES (?, ?, ?, ?, '2025-01-01', '2027-12-31', 60000, 'active')",
+            (ownership_id, ownership_id, ownership_id, f"C-{ownership_id}"),
+        )
+    payment_id = 0
+    for invoice_id in range(1, invoices + 1):
+        conn.execute(
+            "INSERT INTO invoices (id, contract_id, ownership_id, number, period_start, period_end, due, amount, "
+            "tax, total, status, paid_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            invoice_row(rng, invoice_id, rng.choice(OWNERSHIPS)),
+        )
+        if rng.random() < 0.6:
+            payment_id += 1
+            conn.execute(
+                "INSERT INTO payments (id, invoice_id, ownership_id, method, amount, status, paid_at, created_at) "
+                "SELECT ?, id, ownership_id, ?, total, ?, ?, ? FROM invoices WHERE id = ?",
+                (payment_id, rng.choice(PAYMENT_METHODS), rng.choice(PAYMENT_STATUSES),
+                 f"{moment(rng):%Y-%m-%d %H:%M:%S}", f"{moment(rng):%Y-%m-%d %H:%M:%S}", invoice_id),
+            )
+    conn.commit()
+    conn.close()
+
+
+def invoice_row(rng, invoice_id, ownership_id):
+    start = moment(rng).date()
+    amount = rng.randrange(100000, 900000) / 100
+    tax = round(amount * 0.15, 2)
+    status = rng.choice(INVOICE_STATUSES)
+    paid_at = f"{moment(rng):%Y-%m-%d %H:%M:%S}" if status == "paid" else None
+    return (invoice_id, ownership_id, ownership_id, f"INV-{invoice_id}", f"{start}", f"{start + timedelta(days=29)}",
+            f"{start + timedelta(days=7)}", amount, tax, round(amount + tax, 2), status, paid_at)
+
+
+def source_row(conn, table, row_id):
+    cursor = conn.execute(f"SELECT * FROM {table} WHERE id = ?", (row_id,))
+    names = [column[0] for column in cursor.description]
+    return dict(zip(names, cursor.fetchone()))
+
+
+@pytest.fixture
+def source(tmp_path):
+    path = str(tmp_path / "app.db")
+    build_source(path)
+    return path
+
+
+@pytest.fixture
+def store(tmp_path, source):
+    store = AggregateStore.open(str(tmp_path / "aggregates.db"))
+    store.build(source)
+    yield store
+    store.close()
+
+
+def test_built_store_matches_full_recompute(store, source):
+    assert check_consistency(store, source, AS_OF) == []
+
+
+def test_events_keep_store_consistent_with_source(store, source):
+    rng = random.Random(3)
+    conn = sqlite3.connect(source)
+    events = []
+
+    # A new invoice
+    new = invoice_row(rng, 1000, 2)
+    conn.execute(
+        "INSERT INTO invoices (id, contract_id, ownership_id, number, period_start, period_end, due, amount, "
+        "tax, total, status, paid_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", new,
+    )
+    events.append({"table": "invoices", "op": "upsert", "row": source_row(conn, "invoices", 1000)})
+
+    # An unpaid invoice gets paid this month, and another changes ownership and amount
+    unpaid = conn.execute("SELECT id FROM invoices WHERE status != 'paid' ORDER BY id LIMIT 1").fetchone()[0]
+    conn.execute("UPDATE invoices SET status = 'paid', paid_at = ? WHERE id = ?", ("2026-10-16 12:00:00", unpaid))
+    events.append({"table": "invoices", "op": "upsert",
+                   "row": {"id": unpaid, "status": "paid", "paid_at": "2026-10-16 12:00:00"}})
+    conn.execute("UPDATE invoices SET ownership_id = 1, amount = 10.5, total = 12.08 WHERE id = 2")
+    events.append({"table": "invoices", "op": "upsert", "row": source_row(conn, "invoices", 2)})
+
+    # A payment is deleted, and one is changed to another method
+    first, second = (row[0] for row in conn.execute("SELECT id FROM payments ORDER BY id LIMIT 2"))
+    conn.execute("DELETE FROM payments WHERE id = ?", (first,))
+    events.append({"table": "payments", "op": "delete", "row": {"id": first}})
+    conn.execute("UPDATE payments SET method = 'visa', status = 'paid' WHERE id = ?", (second,))
+    events.append({"table": "payments", "op": "upsert", "row": {"id": second, "method": "visa", "status": "paid"}})
+    conn.commit()
+    conn.close()
+
+    assert store.apply_events(events) == len(events)
+    assert check_consistency(store, source, AS_OF) == []
+
+
+def test_check_reports_a_store_that_drifted_from_the_source(store, source):
+    store.apply_events([{"table": "invoices", "op": "upsert", "row": {"id": 1, "total": 1}}])
+
+    differences = check_consistency(store, source, AS_OF)
+
+    assert differences
+    assert {difference["kind"] for difference in differences} >= {"invoices_row", "aggregate"}
+
+
+def test_upsert_then_delete_leaves_no_aggregates():
+    store = AggregateStore(sqlite3.connect(":memory:"))
+    store.upsert("invoices", {"id": 1, "ownership_id": 5, "period_start": "2026-10-01", "status": "paid",
+                              "paid_at": "2026-10-02 10:00:00", "amount": 100, "tax": 15, "total": 115})
+    assert store.conn.execute("SELECT SUM(amount) FROM report_aggregates "
+                              "WHERE metric = 'paid_receivables' AND scheme = 'monthly' AND ownership_id = 5"
+                              ).fetchone()[0] == 11500
+    store.delete("invoices", 1)
+    assert store.conn.execute("SELECT COUNT(*) FROM report_aggregates WHERE count != 0 OR amount != 0").fetchone()[0] == 0
+    store.close()
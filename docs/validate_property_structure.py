@@ -0,0 +1,501 @@
+"""
+Pre-import validator for filled Property Structure workbooks
+Streams a filled template row by row (see property_structure_reader, or
+openpyxl's read-only mode with --engine openpyxl) and checks every rule
+the template documents: required columns, dropdown values,
+decimal/coordinate ranges, integer and year bounds and boolean literals.
+An xlsx file whose rows, dimension or data validation ranges go past the
+last worksheet row (MAX_ROW) is rejected too, since Excel and openpyxl
+cannot open it.
+
+Bad files are rejected with a structured report (sheet, row, column, cell)
+before they reach the PHP importer. Memory stays bounded: rows are streamed
+and only the first --max-errors errors are kept (all of them are counted).
+
+With --engine parallel the sheets are parsed in a process pool into
+columns first (see read_workbook_columns), which scales with the number
+of cores on large multi-sheet workbooks. --engine compact parses into the
+compact column model of property_structure_compact instead, which holds a
+million-unit workbook in a fraction of the memory.
+
+--coordinates also checks Building and PortfolioLocation coordinates
+against each other and an outline of Saudi Arabia (see
+property_structure_spatial): outliers and swapped latitude/longitude are
+errors, repeated or nearly identical coordinates are warnings.
+
+Usage:
+    python validate_property_structure.py filled.xlsx [--json] [--max-errors 1000]
+        [--engine fast|parallel|openpyxl|compact] [--coordinates [--close-meters 20]]
+"""
+
+import argparse
+import json
+import re
+import sys
+import zipfile
+from datetime import date
+
+import openpyxl
+from openpyxl.utils import get_column_letter
+
+from property_structure_schema import (
+    BOOLEAN,
+    DECIMAL,
+    FIRST_DATA_ROW,
+    INTEGER,
+    MAX_ROW,
+    MAX_YEAR_AHEAD,
+    MIN_YEAR,
+    SHEETS,
+    SHEETS_BY_TITLE,
+    YEAR,
+)
+from property_structure_columnar import is_bundle, read_bundle_sheets
+from property_structure_compact import read_compact_workbook
+from property_structure_instrumentation import add_arguments as add_instrumentation_arguments
+from property_structure_instrumentation import current as instrumentation
+from property_structure_instrumentation import instrumented_from_args
+from property_structure_reader import (
+    iter_part_ranges,
+    read_workbook_columns,
+    read_workbook_rows,
+    sheet_parts,
+    split_header,
+)
+from property_structure_spatial import DEFAULT_CLOSE_METERS, CoordinateCheck
+
+DEFAULT_MAX_ERRORS = 1000
+
+FAST_ENGINE = "fast"
+PARALLEL_ENGINE = "parallel"
+OPENPYXL_ENGINE = "openpyxl"
+COMPACT_ENGINE = "compact"
+ENGINES = (FAST_ENGINE, PARALLEL_ENGINE, OPENPYXL_ENGINE, COMPACT_ENGINE)
+# Engines that parse the whole workbook into columns once (see read_sheet_columns)
+COLUMN_ENGINES = (PARALLEL_ENGINE, COMPACT_ENGINE)
+
+INTEGER_RE = re.compile(r"^-?\d+$")
+DECIMAL_RE = re.compile(r"^-?\d+(\.\d+)?$")
+# Row numbers of the cell references in a range such as $A$3:$A$2000
+RANGE_ROW_RE = re.compile(r"[A-Z]+\$?(\d+)")
+
+
+def parse_integer(value):
+    """Return the integer in a cell, or None if it is not a whole number"""
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, int):
+        return value
+    if isinstance(value, float):
+        return int(value) if value.is_integer() else None
+    if isinstance(value, str):
+        value = value.strip()
+        if INTEGER_RE.match(value):
+            return int(value)
+    return None
+
+
+def parse_decimal(value):
+    """Return the number in a cell, or None if it is not a dot-separated decimal"""
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return value
+    if isinstance(value, str):
+        value = value.strip()
+        if DECIMAL_RE.match(value):
+            return float(value)
+    return None
+
+
+def parse_boolean(value):
+    """Return True/False for a boolean cell, or None for anything else
+
+    Only native Excel booleans and the lowercase 'true'/'false' literals are
+    accepted, as documented on the Instructions sheet.
+    """
+    if isinstance(value, bool):
+        return value
+    if value == "true":
+        return True
+    if value == "false":
+        return False
+    return None
+
+
+def is_blank(value):
+    return value is None or (isinstance(value, str) and not value.strip())
+
+
+def _range_message(min_value, max_value):
+    if min_value is not None and max_value is not None:
+        return f"between {min_value} and {max_value}"
+    if min_value is not None:
+        return f"at least {min_value}"
+    return f"at most {max_value}"
+
+
+def _bounded(parse, kind_label, code, min_value, max_value):
+    """Build a checker that parses a value and enforces optional bounds"""
+    def check(value):
+        number = parse(value)
+        if number is None:
+            return code, f"Must be {kind_label}"
+        if (min_value is not None and number < min_value) or (max_value is not None and number > max_value):
+            return "out_of_range", f"Must be {_range_message(min_value, max_value)}"
+        return None
+    return check
+
+
+def build_checker(column):
+    """Compile the value rule of one schema column into a checker
+
+    A checker takes a non-blank cell value and returns ``None`` when it is
+    valid, otherwise a ``(code, message)`` tuple.
+    """
+    if column.kind == BOOLEAN:
+        def check(value):
+            if parse_boolean(value) is None:
+                return "invalid_boolean", "Must be 'true' or 'false' (lowercase)"
+            return None
+        return check
+
+    if column.choices:
+        allowed = frozenset(column.choices)
+        message = "Must be one of: " + ", ".join(column.choices)
+
+        def check(value):
+            if value not in allowed:
+                return "invalid_choice", message
+            return None
+        return check
+
+    if column.kind == INTEGER:
+        return _bounded(parse_integer, "a whole number", "invalid_integer", column.min_value, column.max_value)
+    if column.kind == DECIMAL:
+        return _bounded(
+            parse_decimal, "a number using dot (.) as decimal separator", "invalid_decimal",
+            column.min_value, column.max_value,
+        )
+    if column.kind == YEAR:
+        return _bounded(parse_integer, "a year", "invalid_year", MIN_YEAR, date.today().year + MAX_YEAR_AHEAD)
+    return None
+
+
+def check_specification_value(row, positions):
+    """UnitSpecification.value must match its declared type"""
+    type_idx = positions.get("type")
+    value_idx = positions.get("value")
+    if type_idx is None or value_idx is None:
+        return None
+    value_type = row[type_idx] if type_idx < len(row) else None
+    value = row[value_idx] if value_idx < len(row) else None
+    if is_blank(value):
+        return None
+    if value_type == "integer" and parse_integer(value) is None:
+        return "value", "type_mismatch", "Value must be a whole number for type 'integer'"
+    if value_type == "boolean" and parse_boolean(value) is None:
+        return "value", "type_mismatch", "Value must be 'true' or 'false' for type 'boolean'"
+    return None
+
+
+# Cross-column rules per sheet: fn(row, positions) -> (column, code, message) or None
+ROW_RULES = {
+    "UnitSpecification": [check_specification_value],
+}
+
+
+class IssueCollector:
+    """Counts every issue but keeps only the first ``max_issues`` of them"""
+
+    def __init__(self, max_issues=DEFAULT_MAX_ERRORS):
+        self.max_issues = max_issues
+        self.issues = []
+        self.count = 0
+
+    def add(self, sheet, row, column, code, message, value=None, col_idx=None):
+        self.count += 1
+        if self.max_issues is not None and len(self.issues) >= self.max_issues:
+            return
+        cell = f"{get_column_letter(col_idx)}{row}" if col_idx is not None and row is not None else None
+        self.issues.append({
+            "sheet": sheet,
+            "row": row,
+            "column": column,
+            "cell": cell,
+            "code": code,
+            "message": message,
+            "value": value,
+        })
+
+
+def _example_key(row, width):
+    return tuple("" if value is None else str(value) for value in row[:width])
+
+
+def validate_rows(schema, header, rows, errors, warnings=None, max_row=None):
+    """Validate one sheet given its header row and an iterator of (row number, values)
+
+    Rows identical to the template's example rows are reported to
+    ``warnings`` (they are usually leftovers, but may be real data).
+    With ``max_row`` (MAX_ROW for xlsx files) a sheet with rows past it
+    gets one sheet-level "row_limit" error.
+    Returns the number of non-empty data rows seen.
+    """
+    if warnings is None:
+        warnings = IssueCollector(0)
+
+    positions = {}
+    for col_idx, name in enumerate(header):
+        if isinstance(name, str) and name.strip():
+            positions.setdefault(name.strip(), col_idx)
+
+    checks = []
+    for column in schema.columns:
+        col_idx = positions.get(column.name)
+        if col_idx is None:
+            if column.required:
+                errors.add(schema.title, 1, column.name, "missing_column", f"Required column '{column.name}' is missing")
+            continue
+        checks.append((col_idx, column.name, column.required, build_checker(column)))
+
+    width = len(schema.columns)
+    examples = {tuple(row) for row in schema.example_rows}
+    # Only rows whose first filled example column matches get the full comparison
+    probe = next((idx for idx, value in enumerate(schema.example_rows[0]) if value), 0) if examples else 0
+    probe_values = {row[probe] for row in examples}
+    row_rules = ROW_RULES.get(schema.title, ())
+    title = schema.title
+    count = 0
+    if max_row is None:
+        max_row = float("inf")
+
+    for row_number, row in rows:
+        if row_number > max_row:
+            errors.add(
+                title, None, None, "row_limit",
+                f"Sheet has rows past row {max_row}, the last row Excel and openpyxl can open", row_number,
+            )
+            max_row = float("inf")
+        if not any(row) and all(value is None or value == "" for value in row):
+            continue
+        count += 1
+
+        if len(row) > probe and row[probe] in probe_values and _example_key(row, width) in examples:
+            warnings.add(title, row_number, None, "example_row", "Row matches the template example; delete it before import")
+
+        row_len = len(row)
+        for col_idx, name, required, check in checks:
+            value = row[col_idx] if col_idx < row_len else None
+            if value is None or (value.__class__ is str and not value.strip()):
+                if required:
+                    errors.add(title, row_number, name, "required", f"'{name}' is required", None, col_idx + 1)
+                continue
+            if check is not None:
+                problem = check(value)
+                if problem is not None:
+                    errors.add(title, row_number, name, problem[0], problem[1], value, col_idx + 1)
+
+        for rule in row_rules:
+            problem = rule(row, positions)
+            if problem is not None:
+                name, code, message = problem
+                col_idx = positions[name]
+                errors.add(title, row_number, name, code, message, row[col_idx], col_idx + 1)
+
+    return count
+
+
+def read_sheet_columns(path, engine):
+    """Parse the template sheets once into {title: columns} for one of COLUMN_ENGINES"""
+    titles = [schema.title for schema in SHEETS]
+    with instrumentation().span("parse", engine=engine):
+        if engine == COMPACT_ENGINE:
+            return read_compact_workbook(path, titles)
+        return read_workbook_columns(path, titles, first_row=FIRST_DATA_ROW)
+
+
+def columns_to_sheets(columns):
+    """Turn read_sheet_columns() output into (title, header, data rows) triples
+
+    Can be called again on the same columns, so one parse can feed
+    validation, the integrity check and the loader.
+    """
+    for title, sheet in columns.items():
+        header, data = split_header(sheet.rows(), FIRST_DATA_ROW)
+        yield title, header, data
+
+
+def check_row_limits(path, errors):
+    """Report worksheet dimension and data validation ranges that go past MAX_ROW
+
+    Either makes the workbook unreadable for Excel and openpyxl even when
+    the data rows fit. One sheet-level "range_limit" error is added per
+    sheet and kind of range; returns {title: number of errors}.
+    """
+    counts = {}
+    with zipfile.ZipFile(path) as zf:
+        for title, part in sheet_parts(zf).items():
+            reported = set()
+            for tag, ref in iter_part_ranges(zf, part):
+                if tag in reported:
+                    continue
+                for area in ref.split():
+                    last = max((int(number) for number in RANGE_ROW_RE.findall(area)), default=0)
+                    if last > MAX_ROW:
+                        errors.add(
+                            title, None, None, "range_limit",
+                            f"The {tag} range {area} goes past row {MAX_ROW}, the last row of a worksheet", area,
+                        )
+                        reported.add(tag)
+                        counts[title] = counts.get(title, 0) + 1
+                        break
+    return counts
+
+
+def iter_template_sheets(path, engine=FAST_ENGINE):
+    """Yield (title, header, data rows) for the template sheets present in a workbook or bundle"""
+    if is_bundle(path):
+        # Columnar bundles are already typed and split per sheet; every engine streams them
+        yield from read_bundle_sheets(path)
+        return
+    if engine in COLUMN_ENGINES:
+        yield from columns_to_sheets(read_sheet_columns(path, engine))
+        return
+    titles = [schema.title for schema in SHEETS]
+    if engine == FAST_ENGINE:
+        for title, rows in read_workbook_rows(path, titles):
+            header, data = split_header(rows, FIRST_DATA_ROW)
+            yield title, header, data
+        return
+
+    wb = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        for title in titles:
+            if title in wb.sheetnames:
+                rows = enumerate(wb[title].iter_rows(values_only=True), start=1)
+                header, data = split_header(rows, FIRST_DATA_ROW)
+                yield title, header, data
+    finally:
+        wb.close()
+
+
+def validate_workbook(path, max_errors=DEFAULT_MAX_ERRORS, engine=FAST_ENGINE, template_sheets=None, coordinates=None):
+    """Validate a filled template and return a structured report
+
+    ``engine`` selects the row reader: the fast XML scanner in
+    property_structure_reader (default), the same scanner run in a process
+    pool, openpyxl's read-only mode, or the scanner feeding the compact
+    column model. Already parsed ``template_sheets``
+    triples can be passed instead. A CoordinateCheck passed as
+    ``coordinates`` sees the rows as they stream and adds its issues at the end.
+    """
+    errors = IssueCollector(max_errors)
+    warnings = IssueCollector(max_errors)
+    sheets = {}
+    # Columnar bundles have no worksheet row limit
+    max_row = None if is_bundle(path) else MAX_ROW
+    metrics = instrumentation()
+
+    range_errors = {}
+    if max_row is not None:
+        with metrics.span("row_limits", stage="validate"):
+            range_errors = check_row_limits(path, errors)
+    if template_sheets is None:
+        if range_errors and engine == OPENPYXL_ENGINE:
+            # openpyxl cannot read such a file at all; the XML scanner can
+            engine = FAST_ENGINE
+        template_sheets = iter_template_sheets(path, engine)
+    for title, header, rows in template_sheets:
+        with metrics.span("sheet", sheet=title, stage="validate") as span:
+            before = errors.count
+            if coordinates is not None:
+                rows = coordinates.wrap(title, header, rows)
+            count = validate_rows(SHEETS_BY_TITLE[title], header, rows, errors, warnings, max_row)
+            sheets[title] = {"rows": count, "errors": errors.count - before + range_errors.get(title, 0)}
+            span.set(rows=count, errors=errors.count - before)
+
+    for schema in SHEETS:
+        if schema.title not in sheets:
+            errors.add(schema.title, None, None, "missing_sheet", f"Sheet '{schema.title}' is missing")
+
+    coordinate_stats = None
+    if coordinates is not None:
+        with metrics.span("coordinates", stage="validate"):
+            coordinate_stats = coordinates.check(errors, warnings)
+        for title, stats in coordinate_stats.items():
+            sheets[title]["errors"] += stats["outside"] + stats["swapped"]
+
+    report = {
+        "file": str(path),
+        "valid": errors.count == 0,
+        "error_count": errors.count,
+        "truncated": errors.count > len(errors.issues),
+        "sheets": sheets,
+        "errors": errors.issues,
+        "warning_count": warnings.count,
+        "warnings": warnings.issues,
+    }
+    if coordinate_stats is not None:
+        report["coordinates"] = coordinate_stats
+    return report
+
+
+def _format_issue(issue):
+    location = issue["sheet"]
+    if issue["cell"]:
+        location += f"!{issue['cell']}"
+    elif issue["row"]:
+        location += f" row {issue['row']}"
+    value = f" (got {issue['value']!r})" if issue["value"] is not None else ""
+    return f"{location}: {issue['message']}{value}"
+
+
+def print_report(report):
+    """Print a human readable summary of a validation report"""
+    for title, stats in report["sheets"].items():
+        print(f"{title}: {stats['rows']} rows, {stats['errors']} errors")
+    for error in report["errors"]:
+        print(f"  {_format_issue(error)}")
+    for warning in report["warnings"]:
+        print(f"  warning: {_format_issue(warning)}")
+    if report["truncated"]:
+        print(f"  ... {report['error_count'] - len(report['errors'])} more errors not shown")
+    print("Workbook is valid" if report["valid"] else f"Workbook has {report['error_count']} errors")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Validate a filled Property Structure import workbook")
+    parser.add_argument("file", help="Filled .xlsx template or columnar bundle directory")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    parser.add_argument(
+        "--max-errors", type=int, default=DEFAULT_MAX_ERRORS,
+        help=f"Number of errors to keep in the report (default: {DEFAULT_MAX_ERRORS})",
+    )
+    parser.add_argument(
+        "--engine", choices=ENGINES, default=FAST_ENGINE,
+        help="Row reader: fast XML scanner (default), the scanner in a process pool, openpyxl read-only mode, "
+             "or the scanner into compact columns",
+    )
+    parser.add_argument(
+        "--coordinates", action="store_true",
+        help="Check coordinates for outliers, swapped latitude/longitude and near-duplicates",
+    )
+    parser.add_argument(
+        "--close-meters", type=float, default=DEFAULT_CLOSE_METERS,
+        help=f"With --coordinates: warn about distinct points this close (default: {DEFAULT_CLOSE_METERS:g} m)",
+    )
+    add_instrumentation_arguments(parser)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    with instrumented_from_args(args):
+        coordinates = CoordinateCheck(args.close_meters) if args.coordinates else None
+        report = validate_workbook(args.file, args.max_errors, args.engine, coordinates=coordinates)
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2, default=str))
+    else:
+        print_report(report)
+    sys.exit(0 if report["valid"] else 1)